@@ -38,6 +38,23 @@ class Settings(BaseSettings):
     # OpenAI配置
     OPENAI_API_KEY: str = Field(env="OPENAI_API_KEY")
     OPENAI_MODEL: str = Field(default="gpt-4", env="OPENAI_MODEL")
+    OPENAI_BASE_URL: Optional[str] = Field(default=None, env="OPENAI_BASE_URL")  # 兼容OpenAI接口的服务地址，为空时使用官方接口
+    OPENAI_TIMEOUT: int = Field(default=120, env="OPENAI_TIMEOUT")  # 单次请求超时(秒)
+    LLM_CACHE_ENABLED: bool = Field(default=True, env="LLM_CACHE_ENABLED")  # 相同输入的模型调用复用已有结果
+    LLM_CACHE_MAX_ENTRIES: int = Field(default=200000, env="LLM_CACHE_MAX_ENTRIES")  # 缓存条数上限，超出时淘汰最久未用的
+    LLM_RPM_LIMIT: int = Field(default=500, env="LLM_RPM_LIMIT")  # 所有worker合计的每分钟请求数配额
+    LLM_TPM_LIMIT: int = Field(default=40000, env="LLM_TPM_LIMIT")  # 所有worker合计的每分钟token配额
+    LLM_MAX_CONCURRENCY: int = Field(default=16, env="LLM_MAX_CONCURRENCY")  # 每个进程同时进行的请求数
+    LLM_MAX_RETRIES: int = Field(default=6, env="LLM_MAX_RETRIES")  # 429/超时/5xx的重试次数
+    LLM_BACKOFF_BASE: float = Field(default=1.0, env="LLM_BACKOFF_BASE")  # 退避基数(秒)
+    LLM_BACKOFF_MAX: float = Field(default=60.0, env="LLM_BACKOFF_MAX")  # 单次退避上限(秒)
+    LLM_COMPLETION_TOKENS: int = Field(default=800, env="LLM_COMPLETION_TOKENS")  # 未指定max_tokens时预估的输出token数
+    LLM_BATCH_MAX_DOCS: int = Field(default=8, env="LLM_BATCH_MAX_DOCS")  # 一次解读请求最多合并的文档数，1为逐篇请求
+    LLM_BATCH_INPUT_TOKENS: int = Field(default=6000, env="LLM_BATCH_INPUT_TOKENS")  # 合并请求的输入token上限
+    LLM_INTERPRET_OUTPUT_TOKENS: int = Field(default=600, env="LLM_INTERPRET_OUTPUT_TOKENS")  # 每篇文档预留的输出token数
+    LLM_INTERPRET_MAX_DOC_TOKENS: int = Field(default=4000, env="LLM_INTERPRET_MAX_DOC_TOKENS")  # 单篇正文超出时截断
+    LLM_CONTEXT_TOKENS: int = Field(default=0, env="LLM_CONTEXT_TOKENS")  # 模型上下文窗口（输入+输出）token数，0为按模型名取值
+    LLM_JSON_MODE: str = Field(default="auto", env="LLM_JSON_MODE")  # 解读请求的JSON模式：auto按模型名判断，on/off强制开启或关闭
     
     # 邮件配置
     SMTP_HOST: Optional[str] = Field(default=None, env="SMTP_HOST")
@@ -59,9 +76,62 @@ class Settings(BaseSettings):
     WECHAT_KEY: Optional[str] = Field(default=None, env="WECHAT_KEY")
     
     # 采集配置
-    CRAWL_DELAY: int = Field(default=3, env="CRAWL_DELAY")  # 秒
+    CRAWL_DELAY: int = Field(default=3, env="CRAWL_DELAY")  # 每个主机的初始请求间隔(秒)
     CRAWL_TIMEOUT: int = Field(default=30, env="CRAWL_TIMEOUT")
     MAX_RETRY_COUNT: int = Field(default=3, env="MAX_RETRY_COUNT")
+    CRAWL_CONCURRENCY: int = Field(default=50, env="CRAWL_CONCURRENCY")  # 并发采集协程数
+    CRAWL_MAX_DEPTH: int = Field(default=2, env="CRAWL_MAX_DEPTH")  # 站内链接跟进深度
+    CRAWL_MAX_PAGES_PER_SITE: int = Field(default=50, env="CRAWL_MAX_PAGES_PER_SITE")
+    CRAWL_SITES_PER_RUN: int = Field(default=50, env="CRAWL_SITES_PER_RUN")  # 定时任务每次采集的站点数上限
+    CRAWL_FETCH_BUDGET: int = Field(default=1000, env="CRAWL_FETCH_BUDGET")  # 定时任务每轮的请求预算
+    CRAWL_EXPLORE_RATIO: float = Field(default=0.2, env="CRAWL_EXPLORE_RATIO")  # 已知站点到期时，未采集过的站点最多占用的预算比例
+    CRAWL_SAVE_BATCH_SIZE: int = Field(default=100, env="CRAWL_SAVE_BATCH_SIZE")  # 批量入库条数
+    CRAWL_SEEN_BACKEND: str = Field(default="redis", env="CRAWL_SEEN_BACKEND")  # redis / memory
+    CRAWL_SEEN_TTL: int = Field(default=3000, env="CRAWL_SEEN_TTL")  # 已访问URL去重窗口(秒)
+    CRAWL_MAX_PAGE_BYTES: int = Field(default=5 * 1024 * 1024, env="CRAWL_MAX_PAGE_BYTES")  # 单页大小上限
+    CRAWL_PARSER_BACKEND: str = Field(default="lxml", env="CRAWL_PARSER_BACKEND")  # lxml / bs4
+    CRAWL_PARSE_MODE: str = Field(default="process", env="CRAWL_PARSE_MODE")  # process / thread / inline
+    CRAWL_PARSE_WORKERS: int = Field(default=0, env="CRAWL_PARSE_WORKERS")  # 0表示CPU核数
+    CRAWL_PARSE_QUEUE_SIZE: int = Field(default=0, env="CRAWL_PARSE_QUEUE_SIZE")  # 0表示工作数的2倍
+    CRAWL_MAX_RATE_PER_HOST: float = Field(default=2.0, env="CRAWL_MAX_RATE_PER_HOST")  # 单主机速率上限(次/秒)
+    CRAWL_MAX_BACKOFF: int = Field(default=300, env="CRAWL_MAX_BACKOFF")  # 退避后的最大间隔(秒)
+    CRAWL_RESPECT_ROBOTS: bool = Field(default=True, env="CRAWL_RESPECT_ROBOTS")
+    CRAWL_ROBOTS_TTL: int = Field(default=86400, env="CRAWL_ROBOTS_TTL")  # robots.txt缓存时间(秒)
+    CRAWL_ROBOTS_ERROR_TTL: int = Field(default=300, env="CRAWL_ROBOTS_ERROR_TTL")  # robots.txt获取失败(超时/5xx)时的缓存时间(秒)
+    CRAWL_DNS_CACHE_TTL: int = Field(default=300, env="CRAWL_DNS_CACHE_TTL")  # DNS解析缓存时间(秒)
+    CRAWL_ARCHIVE_ENABLED: bool = Field(default=True, env="CRAWL_ARCHIVE_ENABLED")  # 归档原始响应体
+    CRAWL_ARCHIVE_DIR: str = Field(default="archive", env="CRAWL_ARCHIVE_DIR")  # 相对路径以backend目录为基准，需可写（data目录在容器中只读挂载）；各节点写本地磁盘，重新提取按节点分发
+    CRAWL_ARCHIVE_SEGMENT_MB: int = Field(default=256, env="CRAWL_ARCHIVE_SEGMENT_MB")  # 单个段文件大小上限
+    CRAWL_ARCHIVE_LEVEL: int = Field(default=3, env="CRAWL_ARCHIVE_LEVEL")  # zstd压缩级别
+    CRAWL_ATTACHMENTS_ENABLED: bool = Field(default=True, env="CRAWL_ATTACHMENTS_ENABLED")  # 采集页面中的PDF/DOC/XLS附件
+    CRAWL_MAX_ATTACHMENT_BYTES: int = Field(default=20 * 1024 * 1024, env="CRAWL_MAX_ATTACHMENT_BYTES")  # 单个附件大小上限
+    CRAWL_MAX_ATTACHMENTS_PER_PAGE: int = Field(default=10, env="CRAWL_MAX_ATTACHMENTS_PER_PAGE")  # 每个页面最多跟进的附件数
+    CRAWL_DISCOVERY_ENABLED: bool = Field(default=True, env="CRAWL_DISCOVERY_ENABLED")  # 通过sitemap/RSS/栏目列表页增量发现新文档
+    CRAWL_DISCOVERY_MAX_PAGES: int = Field(default=10, env="CRAWL_DISCOVERY_MAX_PAGES")  # 每个栏目最多翻页数
+    CRAWL_DISCOVERY_REFRESH_DAYS: int = Field(default=7, env="CRAWL_DISCOVERY_REFRESH_DAYS")  # 自动探测的发现源缓存天数
+    CRAWL_CHECKPOINT_ENABLED: bool = Field(default=True, env="CRAWL_CHECKPOINT_ENABLED")  # 保存采集进度，任务重投时续采
+    CRAWL_CHECKPOINT_INTERVAL: int = Field(default=30, env="CRAWL_CHECKPOINT_INTERVAL")  # 检查点保存间隔(秒)
+    CRAWL_CHECKPOINT_TTL: int = Field(default=24, env="CRAWL_CHECKPOINT_TTL")  # 未完成检查点的保留时间(小时)
+    CRAWL_SITES_RELOAD_INTERVAL: int = Field(default=30, env="CRAWL_SITES_RELOAD_INTERVAL")  # 检查站点配置文件修改的间隔(秒)
+    CRAWL_SITE_PROFILE_ENABLED: bool = Field(default=True, env="CRAWL_SITE_PROFILE_ENABLED")  # 按站点学习命中的选择器和日期格式
+    CRAWL_SITE_PROFILE_MIN_PAGES: int = Field(default=5, env="CRAWL_SITE_PROFILE_MIN_PAGES")  # 学到画像前需要的页面数
+    CRAWL_TEMPLATE_ENABLED: bool = Field(default=True, env="CRAWL_TEMPLATE_ENABLED")  # 学习站点模板，去掉正文中的导航/页脚/侧栏
+    CRAWL_TEMPLATE_SAMPLE_PAGES: int = Field(default=8, env="CRAWL_TEMPLATE_SAMPLE_PAGES")  # 学习模板的样本页数
+    CRAWL_TEMPLATE_REFRESH_DAYS: int = Field(default=30, env="CRAWL_TEMPLATE_REFRESH_DAYS")  # 模板重新学习间隔(天)
+    CRAWL_DEDUP_ENABLED: bool = Field(default=True, env="CRAWL_DEDUP_ENABLED")  # 保存时检测转载的近似重复文档
+    CRAWL_DEDUP_DISTANCE: int = Field(default=3, env="CRAWL_DEDUP_DISTANCE")  # SimHash汉明距离阈值(不超过3)
+    CRAWL_QUEUE: str = Field(default="crawl", env="CRAWL_QUEUE")  # 采集任务主队列
+    CRAWL_SHARDS: int = Field(default=16, env="CRAWL_SHARDS")  # 按主机分片的子队列数，0表示不分片
+    CRAWL_SHARD_HEARTBEAT: int = Field(default=30, env="CRAWL_SHARD_HEARTBEAT")  # 分片成员心跳间隔(秒)
+    
+    # 清洗/分析流水线配置
+    PIPELINE_BATCH_SIZE: int = Field(default=20, env="PIPELINE_BATCH_SIZE")  # 每次认领的文档数
+    PIPELINE_LEASE_SECONDS: int = Field(default=600, env="PIPELINE_LEASE_SECONDS")  # 认领租约时长(秒)
+    PIPELINE_MAX_ATTEMPTS: int = Field(default=3, env="PIPELINE_MAX_ATTEMPTS")  # 同一文档最多认领次数
+    PIPELINE_TRIGGER_ENABLED: bool = Field(default=False, env="PIPELINE_TRIGGER_ENABLED")  # 新文档入库即触发清洗/分析（清洗/分析任务注册后开启）
+    PIPELINE_TRIGGER_MODE: str = Field(default="auto", env="PIPELINE_TRIGGER_MODE")  # auto/change_stream/redis
+    PIPELINE_TRIGGER_WAIT: float = Field(default=2.0, env="PIPELINE_TRIGGER_WAIT")  # 攒批最长等待(秒)
+    PIPELINE_TRIGGER_MAX_TASKS: int = Field(default=8, env="PIPELINE_TRIGGER_MAX_TASKS")  # 每次最多派发的任务数
     
     # 通知配置
     NOTIFICATION_RETRY_COUNT: int = Field(default=3, env="NOTIFICATION_RETRY_COUNT")
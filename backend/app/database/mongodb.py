@@ -116,6 +116,43 @@ class MongoDB:
             
         except Exception as e:
             logger.error(f"Failed to create indexes: {e}")
+        
+        # 采集和处理流水线的索引单独创建，失败时不影响上面的业务索引
+        try:
+            # 待处理文档租约索引
+            await self.database.raw_pages.create_index([("status", 1), ("lease.expires", 1)])
+            await self.database.raw_pages.create_index("lease.token", sparse=True)
+            await self.database.raw_pages.create_index("duplicate_of", sparse=True)
+            await self.database.raw_bids.create_index([("status", 1), ("lease.expires", 1)])
+            await self.database.raw_bids.create_index("lease.token", sparse=True)
+            await self.database.cleaned_docs.create_index([("analysis_status", 1), ("lease.expires", 1)])
+            await self.database.cleaned_docs.create_index("lease.token", sparse=True)
+            
+            # crawl_schedule集合索引
+            await self.database.crawl_schedule.create_index("site_id", unique=True)
+            await self.database.crawl_schedule.create_index("next_due")
+            
+            # content_fingerprints集合索引
+            await self.database.content_fingerprints.create_index("url", unique=True)
+            await self.database.content_fingerprints.create_index([("bands", 1), ("category", 1)])
+            
+            # crawl_discovery集合索引
+            await self.database.crawl_discovery.create_index("site_id", unique=True)
+            
+            # crawl_site_profiles集合索引
+            await self.database.crawl_site_profiles.create_index("site_id", unique=True)
+            
+            # llm_cache集合索引（按最近使用时间淘汰）
+            await self.database.llm_cache.create_index("last_used")
+            
+            # crawl_checkpoints集合索引（过期自动删除）
+            await self.database.crawl_checkpoints.create_index("key", unique=True)
+            await self.database.crawl_checkpoints.create_index("expires_at", expireAfterSeconds=0)
+            
+            logger.info("Pipeline indexes created successfully")
+            
+        except Exception as e:
+            logger.error(f"Failed to create pipeline indexes: {e}")
     
     def get_database(self) -> motor.motor_asyncio.AsyncIOMotorDatabase:
         """获取数据库实例"""
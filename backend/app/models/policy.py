@@ -15,6 +15,7 @@ class PolicyStatus(str, Enum):
     PROCESSING = "processing"
     PROCESSED = "processed"
     FAILED = "failed"
+    DUPLICATE = "duplicate"
 
 class PolicyCategory(str, Enum):
     """政策分类枚举"""
@@ -58,6 +59,15 @@ class RawPage(BaseModel):
     status: PolicyStatus = Field(default=PolicyStatus.PENDING, description="处理状态")
     metadata: Dict[str, Any] = Field(default_factory=dict, description="额外元数据")
     retry_count: int = Field(default=0, description="重试次数")
+    etag: Optional[str] = Field(None, description="ETag验证字段")
+    last_modified: Optional[str] = Field(None, description="Last-Modified验证字段")
+    content_hash: Optional[str] = Field(None, description="响应体哈希")
+    archive: Optional[Dict[str, Any]] = Field(None, description="原始响应体归档位置")
+    simhash: Optional[int] = Field(None, description="正文SimHash指纹")
+    duplicate_of: Optional[str] = Field(None, description="近似重复时指向的规范文档URL")
+    duplicate_urls: List[str] = Field(default_factory=list, description="转载本文档的URL")
+    attachments: List[str] = Field(default_factory=list, description="页面中的附件URL")
+    parent_url: Optional[str] = Field(None, description="附件所在页面的URL")
     
     class Config:
         populate_by_name = True
@@ -0,0 +1,2 @@
+# 性能基准模块初始化文件
+# 路径: /mnt/okcomputer/output/backend/benchmarks/__init__.py
@@ -0,0 +1,191 @@
+"""
+采集链路基准测试
+路径: /mnt/okcomputer/output/backend/benchmarks/bench_crawl.py
+
+在独立进程中启动本地模拟政府网站，用进程内MongoDB替身运行完整的采集、
+解析、入库流程，输出吞吐、抓取到入库延迟、CPU时间和峰值内存，便于回归对比。
+
+用法:
+    python -m benchmarks.bench_crawl --sites 20 --pages 200 --output bench_crawl.json
+    python -m benchmarks.bench_crawl --mode service     # 经 CrawlerService.run_crawl_task
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 基准测试不连接真实服务，补齐必填配置项以便在没有 .env 时运行
+for _name, _value in (
+    ('SECRET_KEY', 'bench'),
+    ('MONGODB_URL', 'mongodb://127.0.0.1:27017'),
+    ('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+    ('OPENAI_API_KEY', 'bench'),
+):
+    os.environ.setdefault(_name, _value)
+
+from app.config import settings
+from app.database.mongodb import mongodb
+from benchmarks.gov_site_server import LISTING_SIZE, ServerProcess
+from benchmarks.memory_mongo import MemoryDatabase, WriteClock
+from workers.services import crawler as crawler_module
+from workers.services.crawler import BulkResultWriter, CrawlerService, GovTreeCrawler
+
+
+class TimedCrawler(GovTreeCrawler):
+    """记录每个URL开始抓取的时间"""
+
+    fetch_started: Dict[str, float] = {}
+
+    async def _fetch_page(self, url: str, config: Dict[str, Any]):
+        self.fetch_started.setdefault(url, time.perf_counter())
+        return await super()._fetch_page(url, config)
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(pct / 100 * (len(values) - 1)))))
+    return values[index]
+
+
+def _rusage() -> Dict[str, float]:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        'cpu': own.ru_utime + own.ru_stime,
+        'children_cpu': children.ru_utime + children.ru_stime,
+        'maxrss_kb': own.ru_maxrss,
+        'children_maxrss_kb': children.ru_maxrss,
+    }
+
+
+def _reap_parse_workers(timeout: float = 5.0):
+    """等待解析子进程退出，使其资源占用计入 RUSAGE_CHILDREN（模拟站点进程除外）"""
+    deadline = time.monotonic() + timeout
+    while len(multiprocessing.active_children()) > 1 and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+async def run_crawler(site_configs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """直接驱动 GovTreeCrawler + BulkResultWriter"""
+    async with TimedCrawler() as crawler:
+        writer = BulkResultWriter(crawler, settings.CRAWL_SAVE_BATCH_SIZE)
+        await crawler.crawl_sites(site_configs, on_result=writer.add)
+        await writer.flush()
+        return {'saved': dict(writer.totals), 'crawler': dict(crawler.stats)}
+
+
+async def run_service(site_configs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """经 CrawlerService.run_crawl_task 运行，与定时任务路径一致"""
+    service = CrawlerService()
+    service.sites_config = site_configs
+    # run_crawl_task 内部直接实例化 GovTreeCrawler，这里换成计时子类
+    crawler_module.GovTreeCrawler = TimedCrawler
+    try:
+        result = await service.run_crawl_task([site['id'] for site in site_configs])
+    finally:
+        crawler_module.GovTreeCrawler = GovTreeCrawler
+    return {'saved': result}
+
+
+def configure(args: argparse.Namespace):
+    """按命令行参数覆盖采集配置"""
+    settings.CRAWL_DELAY = args.delay
+    settings.CRAWL_MAX_RATE_PER_HOST = args.max_rate
+    settings.CRAWL_CONCURRENCY = args.concurrency
+    settings.CRAWL_MAX_DEPTH = args.depth
+    # 每个站点的列表页加详情页
+    settings.CRAWL_MAX_PAGES_PER_SITE = args.pages + args.pages // LISTING_SIZE + 1
+    settings.CRAWL_PARSE_MODE = args.parse_mode
+    settings.CRAWL_PARSER_BACKEND = args.parser
+    # 默认整站遍历，--discovery 时经sitemap/列表页发现
+    settings.CRAWL_DISCOVERY_ENABLED = args.discovery
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the crawl pipeline against synthetic gov sites')
+    parser.add_argument('--sites', type=int, default=20, help='模拟站点数')
+    parser.add_argument('--pages', type=int, default=200, help='每个站点的详情页数')
+    parser.add_argument('--depth', type=int, default=12, help='链接跟进深度（列表页逐页翻页需要足够深）')
+    parser.add_argument('--concurrency', type=int, default=settings.CRAWL_CONCURRENCY)
+    parser.add_argument('--delay', type=float, default=0.01, help='每个主机的初始请求间隔(秒)')
+    parser.add_argument('--max-rate', type=float, default=100.0, help='单主机速率上限(次/秒)')
+    parser.add_argument('--parse-mode', default=settings.CRAWL_PARSE_MODE, choices=['process', 'thread', 'inline'])
+    parser.add_argument('--parser', default=settings.CRAWL_PARSER_BACKEND, choices=['lxml', 'bs4'])
+    parser.add_argument('--mode', default='crawler', choices=['crawler', 'service'])
+    parser.add_argument('--discovery', action='store_true', help='通过sitemap/列表页增量发现文档')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_crawl.json', help='结果JSON文件')
+    args = parser.parse_args()
+
+    configure(args)
+    clock = WriteClock()
+    mongodb.database = MemoryDatabase(on_write=clock)
+    TimedCrawler.fetch_started = {}
+
+    with ServerProcess(args.sites, args.pages, args.seed) as server:
+        site_configs = server.site_configs()
+        before = _rusage()
+        started = time.perf_counter()
+
+        runner = run_service if args.mode == 'service' else run_crawler
+        outcome = asyncio.run(runner(site_configs))
+
+        elapsed = time.perf_counter() - started
+        _reap_parse_workers()
+        after = _rusage()
+
+    latencies = [
+        saved - TimedCrawler.fetch_started[url]
+        for url, saved in clock.saved_at.items()
+        if url in TimedCrawler.fetch_started
+    ]
+    saved_pages = len(clock.saved_at)
+
+    report = {
+        'mode': args.mode,
+        'python': platform.python_version(),
+        'config': {
+            'sites': args.sites,
+            'pages_per_site': args.pages,
+            'concurrency': args.concurrency,
+            'depth': args.depth,
+            'delay': args.delay,
+            'max_rate': args.max_rate,
+            'parse_mode': args.parse_mode,
+            'parser': args.parser,
+        },
+        'seconds': round(elapsed, 3),
+        'pages_fetched': len(TimedCrawler.fetch_started),
+        'pages_saved': saved_pages,
+        'pages_per_sec': round(saved_pages / elapsed, 1) if elapsed else None,
+        'fetch_to_save_ms': {
+            'p50': round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+            'p99': round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+            'max': round(max(latencies) * 1000, 1) if latencies else None,
+        },
+        'cpu_seconds': round(after['cpu'] - before['cpu'], 3),
+        'parse_workers_cpu_seconds': round(after['children_cpu'] - before['children_cpu'], 3),
+        'peak_rss_mb': round(after['maxrss_kb'] / 1024, 1),
+        'parse_workers_peak_rss_mb': round(after['children_maxrss_kb'] / 1024, 1),
+        'result': outcome,
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
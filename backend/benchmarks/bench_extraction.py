@@ -0,0 +1,120 @@
+"""
+页面提取引擎基准测试
+路径: /mnt/okcomputer/output/backend/benchmarks/bench_extraction.py
+
+用法:
+    python -m benchmarks.bench_extraction --corpus data/bench_corpus --output bench_extraction.json
+
+corpus 目录中的 *.html / *.htm 为保存下来的政府网站页面；目录不存在或为空时
+使用 benchmarks.gov_pages 生成的样本。
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.gov_pages import generate_corpus
+from workers.services.extraction import LxmlExtractionEngine, SoupExtractionEngine
+
+# 与 gov.cn 详情页结构对应的站点配置
+SITE_CONFIG = {
+    'id': 'bench',
+    'name': 'bench',
+    'selectors': {
+        'title': ['h1', '.title', 'title'],
+        'content': ['.content', '.article', 'main'],
+        'date': ['.date', '.publish-date', '.time'],
+    }
+}
+
+COMPARED_FIELDS = ('title', 'content', 'metadata', 'links')
+
+
+def load_corpus(path: str, count: int) -> List[str]:
+    """读取保存的页面，没有时生成样本"""
+    pages = []
+    if path and os.path.isdir(path):
+        for filename in sorted(os.listdir(path)):
+            if filename.endswith(('.html', '.htm')):
+                with open(os.path.join(path, filename), 'rb') as f:
+                    pages.append(f.read().decode('utf-8', errors='replace'))
+    return pages or generate_corpus(count)
+
+
+def run_engine(engine, pages: List[str], repeat: int) -> Dict[str, Any]:
+    """逐页提取并计时"""
+    outputs = []
+    started = time.perf_counter()
+    for round_index in range(repeat):
+        for html in pages:
+            result = engine.extract(html, SITE_CONFIG)
+            if round_index == 0:
+                outputs.append(result)
+    elapsed = time.perf_counter() - started
+    total = len(pages) * repeat
+
+    return {
+        'engine': engine.name,
+        'pages': total,
+        'seconds': round(elapsed, 4),
+        'pages_per_sec': round(total / elapsed, 1) if elapsed else None,
+        'ms_per_page': round(elapsed * 1000 / total, 3) if total else None,
+        'outputs': outputs,
+    }
+
+
+def compare(baseline: List[Dict[str, Any]], candidate: List[Dict[str, Any]]) -> Dict[str, int]:
+    """统计与 BeautifulSoup 路径输出不一致的页面数"""
+    mismatches = {field: 0 for field in COMPARED_FIELDS}
+    mismatches['publish_date'] = 0
+
+    for expected, actual in zip(baseline, candidate):
+        for field in COMPARED_FIELDS:
+            if expected[field] != actual[field]:
+                mismatches[field] += 1
+        # 未解析出日期时两边都回退为当前时间，只比较日期部分
+        if expected['publish_date'].date() != actual['publish_date'].date():
+            mismatches['publish_date'] += 1
+
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark HTML extraction engines')
+    parser.add_argument('--corpus', default=os.path.join('data', 'bench_corpus'), help='保存的页面目录')
+    parser.add_argument('--count', type=int, default=300, help='无语料时生成的页面数')
+    parser.add_argument('--repeat', type=int, default=3, help='重复轮数')
+    parser.add_argument('--output', default='bench_extraction.json', help='结果JSON文件')
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus, args.count)
+    total_bytes = sum(len(page.encode('utf-8')) for page in pages)
+
+    soup = run_engine(SoupExtractionEngine(), pages, args.repeat)
+    fast = run_engine(LxmlExtractionEngine(), pages, args.repeat)
+
+    report = {
+        'corpus_pages': len(pages),
+        'corpus_bytes': total_bytes,
+        'repeat': args.repeat,
+        'engines': [
+            {key: value for key, value in result.items() if key != 'outputs'}
+            for result in (soup, fast)
+        ],
+        'speedup': round(soup['seconds'] / fast['seconds'], 2) if fast['seconds'] else None,
+        'mismatches': compare(soup['outputs'], fast['outputs']),
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
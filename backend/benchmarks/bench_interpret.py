@@ -0,0 +1,122 @@
+"""
+双视角解读基准测试
+路径: /mnt/okcomputer/output/backend/benchmarks/bench_interpret.py
+
+启动本地模拟大模型服务（可设RPM配额和不合格结果比例），对同一批短文档对比:
+  single   每篇文档一次请求
+  batched  按输入token上限合并多篇文档为一次请求
+输出请求数、输入/输出token数、每篇文档的平均输入token、耗时和失败数。
+
+用法:
+    python -m benchmarks.bench_interpret --docs 200 --rpm 120 --invalid-rate 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 基准测试不连接真实服务，补齐必填配置项以便在没有 .env 时运行
+for _name, _value in (
+    ('SECRET_KEY', 'bench'),
+    ('MONGODB_URL', 'mongodb://127.0.0.1:27017'),
+    ('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+    ('OPENAI_API_KEY', 'bench'),
+):
+    os.environ.setdefault(_name, _value)
+
+from app.config import settings
+from app.database.mongodb import mongodb
+from benchmarks.gov_pages import generate_documents
+from benchmarks.llm_stub_server import LLMStubServer
+from benchmarks.memory_mongo import MemoryDatabase
+from workers.services.interpretation import BatchInterpreter
+from workers.services.llm_cache import LLMCache
+from workers.services.llm_client import LLMClient
+from workers.services.llm_dispatcher import LLMDispatcher
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    docs = generate_documents(args.docs, args.seed, min_paragraphs=1, max_paragraphs=4)
+    modes = {}
+    for mode in args.modes:
+        # 每轮使用空缓存和新的模拟服务
+        mongodb.database = MemoryDatabase()
+        server = LLMStubServer(
+            args.latency, args.token_latency, rpm=args.rpm, tpm=args.tpm, invalid_rate=args.invalid_rate
+        )
+        await server.start()
+        settings.OPENAI_BASE_URL = server.base_url()
+        dispatcher = LLMDispatcher(
+            settings.OPENAI_MODEL,
+            rpm=args.rpm or 10 ** 6,
+            tpm=args.tpm or 10 ** 9,
+            max_concurrency=args.concurrency
+        )
+        client = LLMClient(cache=LLMCache(), dispatcher=dispatcher)
+        interpreter = BatchInterpreter(client, max_docs=1 if mode == 'single' else args.max_docs)
+
+        started = time.perf_counter()
+        results, errors, deferred = await interpreter.interpret(docs)
+        seconds = time.perf_counter() - started
+        counters = server.counters()
+        await client.close()
+        await server.stop()
+
+        modes[mode] = dict(
+            interpreter.stats,
+            interpreted=len(results),
+            errors=len(errors),
+            deferred=len(deferred),
+            llm_requests=counters['requests'],
+            rate_limited=counters['rate_limited'],
+            prompt_tokens=counters['prompt_tokens'],
+            completion_tokens=counters['completion_tokens'],
+            prompt_tokens_per_doc=round(counters['prompt_tokens'] / max(1, len(results)), 1),
+            seconds=round(seconds, 2),
+            docs_per_minute=round(len(results) / seconds * 60, 1),
+        )
+
+    if 'single' in modes and 'batched' in modes:
+        single, batched = modes['single'], modes['batched']
+        modes['batched']['prompt_token_saving'] = round(1 - batched['prompt_tokens'] / single['prompt_tokens'], 3)
+        modes['batched']['speedup'] = round(single['seconds'] / batched['seconds'], 2)
+    return {
+        'docs': args.docs,
+        'rpm': args.rpm,
+        'latency': args.latency,
+        'token_latency': args.token_latency,
+        'invalid_rate': args.invalid_rate,
+        'max_docs': args.max_docs,
+        'modes': modes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark batched dual interpretation against a stub LLM server')
+    parser.add_argument('--docs', type=int, default=200)
+    parser.add_argument('--rpm', type=int, default=120, help='模拟服务的每分钟请求数配额，0为不限')
+    parser.add_argument('--tpm', type=int, default=0, help='模拟服务的每分钟token配额，0为不限')
+    parser.add_argument('--latency', type=float, default=0.5, help='模拟服务每次请求的固定延迟(秒)')
+    parser.add_argument('--token-latency', type=float, default=0.002, help='模拟服务每个输出token的延迟(秒)')
+    parser.add_argument('--invalid-rate', type=float, default=0.05, help='解读结果项不合格的比例')
+    parser.add_argument('--max-docs', type=int, default=settings.LLM_BATCH_MAX_DOCS, help='每次请求最多合并的文档数')
+    parser.add_argument('--concurrency', type=int, default=settings.LLM_MAX_CONCURRENCY)
+    parser.add_argument('--modes', nargs='+', default=['single', 'batched'], choices=['single', 'batched'])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_interpret.json', help='结果JSON文件')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
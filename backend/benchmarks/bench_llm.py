@@ -0,0 +1,146 @@
+"""
+大模型调用缓存基准测试
+路径: /mnt/okcomputer/output/backend/benchmarks/bench_llm.py
+
+启动本地模拟大模型服务，用进程内MongoDB替身保存缓存，对同一批文档依次运行:
+  no_cache   不使用缓存
+  cold       空缓存，只有转载的重复文档（空白/全半角不同）命中
+  rerun      同一批文档再运行一次（重跑或失败重试），全部命中
+输出各轮的实际调用次数、命中率、token数和耗时。
+
+用法:
+    python -m benchmarks.bench_llm --docs 200 --duplicates 0.3 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 基准测试不连接真实服务，补齐必填配置项以便在没有 .env 时运行
+for _name, _value in (
+    ('SECRET_KEY', 'bench'),
+    ('MONGODB_URL', 'mongodb://127.0.0.1:27017'),
+    ('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+    ('OPENAI_API_KEY', 'bench'),
+):
+    os.environ.setdefault(_name, _value)
+
+from app.config import settings
+from app.database.mongodb import mongodb
+from benchmarks.gov_pages import generate_documents
+from benchmarks.llm_stub_server import LLMStubServer
+from benchmarks.memory_mongo import MemoryDatabase
+from workers.services.llm_cache import LLMCache
+from workers.services.llm_client import LLMClient
+from workers.services.llm_dispatcher import LLMDispatcher
+
+PROMPT_VERSION = 'bench-summary-v1'
+SYSTEM_PROMPT = '你是政策分析助手，请用100字以内概括用户提供的政策文件。'
+
+
+def build_workload(docs: int, duplicates: float, seed: int) -> List[Dict[str, str]]:
+    """文档列表，其中一部分是前面文档排版略有不同的转载"""
+    documents = generate_documents(docs, seed)
+    rng = random.Random(seed)
+    reposts = []
+    for index in range(int(docs * duplicates)):
+        original = rng.choice(documents)
+        # 转载常见的差异：段落间多空行、全角空格、首尾空白
+        content = original['content'].replace('\n', '\n\n')
+        reposts.append({'id': f"repost_{index}", 'title': original['title'], 'content': f"　{content} "})
+    workload = documents + reposts
+    rng.shuffle(workload)
+    return workload
+
+
+async def run_pass(client: LLMClient, workload: List[Dict[str, str]], concurrency: int, use_cache: bool) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def summarize(doc: Dict[str, str]):
+        async with semaphore:
+            await client.complete(
+                [
+                    {'role': 'system', 'content': SYSTEM_PROMPT},
+                    {'role': 'user', 'content': f"{doc['title']}\n{doc['content']}"},
+                ],
+                prompt_version=PROMPT_VERSION,
+                use_cache=use_cache
+            )
+
+    started = time.perf_counter()
+    await asyncio.gather(*(summarize(doc) for doc in workload))
+    return time.perf_counter() - started
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    mongodb.database = MemoryDatabase()
+    server = LLMStubServer(args.latency, args.token_latency)
+    await server.start()
+    settings.OPENAI_BASE_URL = server.base_url()
+    workload = build_workload(args.docs, args.duplicates, args.seed)
+
+    passes = {}
+    cache = LLMCache(max_entries=args.max_entries)
+    try:
+        for name in ('no_cache', 'cold', 'rerun'):
+            # 模拟服务不限速，调度器配额放开，只比较缓存的效果
+            dispatcher = LLMDispatcher(args.model, rpm=10 ** 6, tpm=10 ** 9, max_concurrency=args.concurrency)
+            client = LLMClient(model=args.model, cache=cache, dispatcher=dispatcher)
+            server.reset()
+            hits, misses = cache.hits, cache.misses
+            seconds = await run_pass(client, workload, args.concurrency, use_cache=name != 'no_cache')
+            lookups = cache.hits - hits + cache.misses - misses
+            passes[name] = {
+                'seconds': round(seconds, 3),
+                'docs_per_sec': round(len(workload) / seconds, 1),
+                'llm_requests': server.requests,
+                'tokens': server.prompt_tokens + server.completion_tokens_total,
+                'hit_rate': round((cache.hits - hits) / lookups, 4) if lookups else 0.0,
+            }
+            await client.close()
+    finally:
+        await server.stop()
+
+    baseline = passes['no_cache']['seconds']
+    for result in passes.values():
+        result['speedup'] = round(baseline / result['seconds'], 2) if result['seconds'] else None
+
+    return {
+        'docs': args.docs,
+        'reposts': len(workload) - args.docs,
+        'latency': args.latency,
+        'concurrency': args.concurrency,
+        'passes': passes,
+        'cache': cache.stats(),
+        'cache_entries': len(mongodb.database['llm_cache']),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the LLM response cache against a stub LLM server')
+    parser.add_argument('--docs', type=int, default=200, help='不重复的文档数')
+    parser.add_argument('--duplicates', type=float, default=0.3, help='转载文档占不重复文档数的比例')
+    parser.add_argument('--latency', type=float, default=0.2, help='模拟服务每次请求的延迟(秒)')
+    parser.add_argument('--token-latency', type=float, default=0.0, help='模拟服务每个输出token的延迟(秒)')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--max-entries', type=int, default=settings.LLM_CACHE_MAX_ENTRIES, help='缓存条数上限')
+    parser.add_argument('--model', default=settings.OPENAI_MODEL)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_llm.json', help='结果JSON文件')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+大模型请求调度基准测试
+路径: /mnt/okcomputer/output/backend/benchmarks/bench_llm_dispatch.py
+
+启动带RPM/TPM配额的本地模拟大模型服务，用同一批文档对比:
+  naive       各调用方直接并发请求，只靠 SDK 自带的重试（相当于各prefork进程互不协调）
+  dispatcher  经 LLMDispatcher 按配额调度，429时全局暂停并带抖动退避
+输出每分钟完成的文档数、429次数、失败数和配额利用率。
+
+--workers N 模拟N个worker进程各自持有一个调度器；配合 --redis 时通过
+REDIS_URL 共享配额，否则每个调度器各用一份进程内配额（会超出总配额）。
+
+用法:
+    python -m benchmarks.bench_llm_dispatch --docs 300 --rpm 600 --tpm 300000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 基准测试不连接真实服务，补齐必填配置项以便在没有 .env 时运行
+for _name, _value in (
+    ('SECRET_KEY', 'bench'),
+    ('MONGODB_URL', 'mongodb://127.0.0.1:27017'),
+    ('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+    ('OPENAI_API_KEY', 'bench'),
+):
+    os.environ.setdefault(_name, _value)
+
+import openai
+
+from app.config import settings
+from app.database.redis import redisdb
+from benchmarks.gov_pages import generate_documents
+from benchmarks.llm_stub_server import LLMStubServer
+from workers.services.llm_dispatcher import LLMDispatcher
+
+SYSTEM_PROMPT = '你是政策分析助手，请用100字以内概括用户提供的政策文件。'
+
+
+def build_requests(docs: int, seed: int, max_tokens: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            'model': settings.OPENAI_MODEL,
+            'messages': [
+                {'role': 'system', 'content': SYSTEM_PROMPT},
+                {'role': 'user', 'content': f"{doc['title']}\n{doc['content']}"},
+            ],
+            'max_tokens': max_tokens,
+        }
+        for doc in generate_documents(docs, seed)
+    ]
+
+
+async def run_naive(base_url: str, requests: List[Dict[str, Any]], concurrency: int) -> Dict[str, int]:
+    client = openai.AsyncOpenAI(api_key='bench', base_url=base_url)
+    semaphore = asyncio.Semaphore(concurrency)
+    outcome = {'ok': 0, 'failed': 0}
+
+    async def call(kwargs: Dict[str, Any]):
+        async with semaphore:
+            try:
+                await client.chat.completions.create(**kwargs)
+                outcome['ok'] += 1
+            except openai.APIError:
+                outcome['failed'] += 1
+
+    await asyncio.gather(*(call(kwargs) for kwargs in requests))
+    await client.close()
+    return outcome
+
+
+async def run_dispatcher(
+    base_url: str,
+    requests: List[Dict[str, Any]],
+    workers: int,
+    rpm: int,
+    tpm: int
+) -> Dict[str, int]:
+    client = openai.AsyncOpenAI(api_key='bench', base_url=base_url, max_retries=0)
+    dispatchers = [LLMDispatcher(settings.OPENAI_MODEL, rpm=rpm, tpm=tpm) for _ in range(workers)]
+    outcome = {'ok': 0, 'failed': 0}
+
+    async def call(index: int, kwargs: Dict[str, Any]):
+        try:
+            await dispatchers[index % workers].create(client, **kwargs)
+            outcome['ok'] += 1
+        except openai.APIError:
+            outcome['failed'] += 1
+
+    await asyncio.gather(*(call(index, kwargs) for index, kwargs in enumerate(requests)))
+    await client.close()
+    outcome['throttled_seconds'] = round(sum(d.stats['throttled_seconds'] for d in dispatchers), 1)
+    outcome['retries'] = sum(d.stats['retries'] for d in dispatchers)
+    return outcome
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.redis:
+        await redisdb.connect()
+        for key in await redisdb.client.keys('llm:*'):
+            await redisdb.client.delete(key)
+    requests = build_requests(args.docs, args.seed, args.max_tokens)
+    modes = {}
+    for mode in args.modes:
+        # 每轮使用新的模拟服务，配额从满额开始
+        server = LLMStubServer(args.latency, rpm=args.rpm, tpm=args.tpm)
+        await server.start()
+        started = time.perf_counter()
+        if mode == 'naive':
+            outcome = await run_naive(server.base_url(), requests, args.concurrency)
+        else:
+            outcome = await run_dispatcher(server.base_url(), requests, args.workers, args.rpm, args.tpm)
+        seconds = time.perf_counter() - started
+        counters = server.counters()
+        await server.stop()
+
+        tokens = counters['prompt_tokens'] + counters['completion_tokens']
+        modes[mode] = dict(
+            outcome,
+            seconds=round(seconds, 2),
+            docs_per_minute=round(outcome['ok'] / seconds * 60, 1),
+            rate_limited=counters['rate_limited'],
+            tokens_per_minute=round(tokens / seconds * 60),
+            tpm_utilization=round(tokens / seconds * 60 / args.tpm, 3) if args.tpm else None,
+        )
+    if args.redis:
+        await redisdb.close()
+    return {
+        'docs': args.docs,
+        'rpm': args.rpm,
+        'tpm': args.tpm,
+        'latency': args.latency,
+        'workers': args.workers,
+        'shared_budget': args.redis,
+        'modes': modes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark quota-aware LLM dispatching against a rate-limited stub')
+    parser.add_argument('--docs', type=int, default=300)
+    parser.add_argument('--rpm', type=int, default=600, help='模拟服务的每分钟请求数配额')
+    parser.add_argument('--tpm', type=int, default=300000, help='模拟服务的每分钟token配额')
+    parser.add_argument('--latency', type=float, default=0.5, help='模拟服务每次请求的延迟(秒)')
+    parser.add_argument('--max-tokens', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=64, help='naive 模式的并发调用数')
+    parser.add_argument('--workers', type=int, default=1, help='dispatcher 模式的调度器（worker进程）数')
+    parser.add_argument('--redis', action='store_true', help='通过 REDIS_URL 共享配额')
+    parser.add_argument('--modes', nargs='+', default=['naive', 'dispatcher'], choices=['naive', 'dispatcher'])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_llm_dispatch.json', help='结果JSON文件')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+政府网站页面样本生成
+路径: /mnt/okcomputer/output/backend/benchmarks/gov_pages.py
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+# 政策文件常用词句，用于拼接正文
+PHRASES = [
+    '为深入贯彻落实党中央、国务院决策部署', '进一步优化营商环境', '推动经济高质量发展',
+    '现就有关事项通知如下', '各地区、各部门要高度重视', '加强组织领导', '强化政策协同',
+    '支持中小微企业发展', '落实减税降费政策', '加大财政资金支持力度', '完善配套措施',
+    '推进数字政府建设', '促进科技成果转化', '鼓励社会资本参与', '切实做好风险防范',
+    '本通知自印发之日起施行', '请结合实际认真贯彻执行', '加快培育新动能',
+]
+
+TITLES = [
+    '关于进一步支持小微企业发展的若干措施', '关于印发数字经济发展三年行动计划的通知',
+    '关于做好2024年度项目申报工作的通知', '关于加快推进新型基础设施建设的实施意见',
+    '关于开展营商环境专项整治的通知', '关于调整部分行政事业性收费标准的公告',
+]
+
+NAV_ITEMS = ['首页', '机构概况', '政务公开', '政策文件', '政策解读', '办事服务', '互动交流', '专题专栏']
+
+DATE_STYLES = [
+    lambda d: d.strftime('%Y-%m-%d'),
+    lambda d: d.strftime('%Y年%m月%d日'),
+    lambda d: d.strftime('%Y/%m/%d'),
+    lambda d: d.strftime('%Y-%m-%d %H:%M:%S'),
+]
+
+
+def _paragraphs(rng: random.Random, count: int) -> List[str]:
+    return [
+        '，'.join(rng.choice(PHRASES) for _ in range(rng.randint(3, 8))) + '。'
+        for _ in range(count)
+    ]
+
+
+def detail_path(index: int, day: datetime) -> str:
+    """详情页路径，沿用 gov.cn 的 content_xxx.htm 形式"""
+    return f"/zhengce/content/{day:%Y-%m}/{day:%d}/content_{index}.htm"
+
+
+def render_detail_page(
+    rng: random.Random,
+    index: int,
+    site_name: str = '某省人民政府',
+    charset: str = 'utf-8',
+    paragraphs: Optional[int] = None,
+    related_links: int = 10,
+    related_paths: Optional[List[str]] = None
+) -> str:
+    """生成一张政策详情页，related_paths 指定侧栏“相关文件”的链接"""
+    day = datetime(2024, 1, 1) + timedelta(days=rng.randint(0, 365))
+    title = f"{rng.choice(TITLES)}（第{index}号）"
+    date_text = rng.choice(DATE_STYLES)(day)
+    body = ''.join(f'<p style="text-indent:2em">{text}</p>' for text in _paragraphs(rng, paragraphs or rng.randint(5, 40)))
+    nav = ''.join(f'<li><a href="/{i}/">{item}</a></li>' for i, item in enumerate(NAV_ITEMS))
+    if related_paths is None:
+        related_paths = [detail_path(rng.randint(1, 100000), day) for _ in range(related_links)]
+    related = ''.join(f'<li><a href="{path}">{rng.choice(TITLES)}</a></li>' for path in related_paths)
+
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta http-equiv="Content-Type" content="text/html; charset={charset}">
+<meta name="SiteName" content="{site_name}">
+<meta name="ArticleTitle" content="{title}">
+<meta name="PubDate" content="{day:%Y-%m-%d %H:%M}">
+<meta name="ContentSource" content="{site_name}办公厅">
+<meta name="keywords" content="政策,通知,{rng.choice(PHRASES)}">
+<title>{title}_{site_name}</title>
+<link rel="stylesheet" href="/css/common.css">
+<style>.header{{height:120px}} .nav li{{float:left}}</style>
+<script src="/js/jquery.min.js"></script>
+<script>var _hmt = _hmt || []; (function() {{ var hm = document.createElement("script"); }})();</script>
+</head>
+<body>
+<div class="header"><div class="logo"><img src="/images/logo.png" alt="{site_name}"></div>
+<div class="search"><form action="/search"><input name="q" type="text"><button>搜索</button></form></div></div>
+<div class="nav"><ul>{nav}</ul></div>
+<div class="crumb">当前位置：<a href="/">首页</a> &gt; <a href="/zwgk/">政务公开</a> &gt; <a href="/zcwj/">政策文件</a></div>
+<div class="main">
+  <div class="article">
+    <h1 class="article-title">{title}</h1>
+    <div class="pages-date">来源：{site_name}办公厅　<span class="date">{date_text}</span></div>
+    <div class="pages_content" id="UCAP-CONTENT">{body}</div>
+    <div class="keyword">主题词：{rng.choice(PHRASES)}</div>
+  </div>
+  <div class="sidebar"><h3>相关文件</h3><ul>{related}</ul></div>
+</div>
+<div class="footer"><p>主办单位：{site_name}办公厅　网站标识码：{rng.randint(1000000000, 9999999999)}</p>
+<p>ICP备{rng.randint(10000000, 99999999)}号　<a href="/sitemap/">网站地图</a></p></div>
+<script>document.write('<span id="count"></span>');</script>
+</body>
+</html>"""
+
+
+def render_listing_page(
+    rng: random.Random,
+    links: List[str],
+    site_name: str = '某省人民政府',
+    charset: str = 'utf-8',
+    next_page: Optional[str] = None
+) -> str:
+    """生成一张“政策文件”栏目列表页"""
+    items = ''.join(
+        f'<li><a href="{link}" target="_blank">{rng.choice(TITLES)}</a>'
+        f'<span class="time">{datetime(2024, 1, 1) + timedelta(days=rng.randint(0, 365)):%Y-%m-%d}</span></li>'
+        for link in links
+    )
+    nav = ''.join(f'<li><a href="/{i}/">{item}</a></li>' for i, item in enumerate(NAV_ITEMS))
+    pager = f'<a href="{next_page}">下一页</a>' if next_page else ''
+
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta http-equiv="Content-Type" content="text/html; charset={charset}">
+<title>政策文件_{site_name}</title>
+</head>
+<body>
+<div class="header"><div class="logo">{site_name}</div></div>
+<div class="nav"><ul>{nav}</ul></div>
+<div class="main"><h2>政策文件</h2><ul class="news-list">{items}</ul><div class="pager">{pager}</div></div>
+<div class="footer"><p>主办单位：{site_name}办公厅</p></div>
+</body>
+</html>"""
+
+
+def generate_corpus(count: int, seed: int = 42) -> List[str]:
+    """生成详情页样本"""
+    rng = random.Random(seed)
+    return [render_detail_page(rng, index) for index in range(count)]
+
+
+def generate_documents(count: int, seed: int = 42, min_paragraphs: int = 3, max_paragraphs: int = 12) -> List[dict]:
+    """生成清洗后的政策文档样本（标题和纯文本正文）"""
+    rng = random.Random(seed)
+    return [
+        {
+            'id': f"doc_{index}",
+            'title': rng.choice(TITLES),
+            'content': '\n'.join(_paragraphs(rng, rng.randint(min_paragraphs, max_paragraphs))),
+        }
+        for index in range(count)
+    ]
+
+
+__all__ = ['render_detail_page', 'render_listing_page', 'detail_path', 'generate_corpus', 'generate_documents']
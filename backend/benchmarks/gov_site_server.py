@@ -0,0 +1,253 @@
+"""
+本地模拟政府网站服务
+路径: /mnt/okcomputer/output/backend/benchmarks/gov_site_server.py
+
+每个模拟站点监听一个独立端口（对采集器而言是独立主机），提供分页的
+“政策文件”栏目列表页（新文件在前）、sitemap.xml 和互相链接的详情页。
+部分站点使用GBK编码，部分响应缓慢，部分按比例返回500/429，用于复现
+真实政府网站的情况。
+
+单独运行:
+    python -m benchmarks.gov_site_server --sites 20 --pages 200
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import re
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.gov_pages import detail_path, render_detail_page, render_listing_page
+
+# 每页列表条数
+LISTING_SIZE = 20
+
+# 每个详情页的“相关文件”链接数
+RELATED_LINKS = 5
+
+DETAIL_INDEX_PATTERN = re.compile(r'content_(\d+)\.htm$')
+LISTING_INDEX_PATTERN = re.compile(r'index(?:_(\d+))?\.htm$')
+
+ROBOTS_TXT = "User-agent: *\nDisallow: /search\nSitemap: http://{host}/sitemap.xml\n"
+
+
+def site_profile(index: int) -> Dict[str, Any]:
+    """站点的编码、延迟和出错比例，按序号确定以便结果可复现"""
+    return {
+        'name': f"模拟{index}号人民政府",
+        'charset': 'gbk' if index % 3 == 1 else 'utf-8',
+        'latency': 0.2 if index % 7 == 3 else 0.0,
+        'error_rate': 0.1 if index % 6 == 5 else 0.0,
+    }
+
+
+def page_date(index: int) -> datetime:
+    """详情页的发布日期，序号越大越新"""
+    return datetime(2024, 1, 1) + timedelta(days=index % 365)
+
+
+def page_path(index: int) -> str:
+    """详情页路径，日期由序号确定"""
+    return detail_path(index, page_date(index))
+
+
+def listing_path(page: int) -> str:
+    return '/zcwj/index.htm' if page == 0 else f'/zcwj/index_{page}.htm'
+
+
+class GovSiteServer:
+    """一组模拟站点"""
+
+    def __init__(self, sites: int, pages: int, seed: int = 42):
+        self.sites = sites
+        self.pages = pages
+        self.seed = seed
+        self.ports: List[int] = []
+        self._runner: Optional[web.AppRunner] = None
+        self._rng = random.Random(seed)
+
+    def _site_index(self, request: web.Request) -> int:
+        return self.ports.index(request.url.port)
+
+    def _encode(self, html: str, charset: str) -> web.Response:
+        return web.Response(
+            body=html.encode(charset, errors='replace'),
+            headers={'Content-Type': f'text/html; charset={charset}'}
+        )
+
+    async def _misbehave(self, profile: Dict[str, Any], errors: bool = True) -> Optional[web.Response]:
+        """按站点配置加入延迟或返回错误"""
+        if profile['latency']:
+            await asyncio.sleep(profile['latency'])
+        if errors and profile['error_rate']:
+            roll = self._rng.random()
+            if roll < profile['error_rate'] / 2:
+                return web.Response(status=500, text='Internal Server Error')
+            if roll < profile['error_rate']:
+                return web.Response(status=429, text='Too Many Requests', headers={'Retry-After': '1'})
+        return None
+
+    async def robots(self, request: web.Request) -> web.Response:
+        return web.Response(text=ROBOTS_TXT.format(host=request.host))
+
+    async def sitemap(self, request: web.Request) -> web.Response:
+        entries = ''.join(
+            f"<url><loc>http://{request.host}{page_path(index)}</loc>"
+            f"<lastmod>{page_date(index):%Y-%m-%d}</lastmod></url>"
+            for index in range(self.pages)
+        )
+        return web.Response(
+            text=f'<?xml version="1.0" encoding="UTF-8"?>'
+                 f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>',
+            content_type='application/xml'
+        )
+
+    async def listing(self, request: web.Request) -> web.Response:
+        site = self._site_index(request)
+        profile = site_profile(site)
+        # 列表页只加延迟不出错，否则整个站点都采不到
+        await self._misbehave(profile, errors=False)
+
+        match = LISTING_INDEX_PATTERN.search(request.path)
+        page = int(match.group(1) or 0) if match else 0
+        start = page * LISTING_SIZE
+        if start >= self.pages:
+            raise web.HTTPNotFound()
+
+        # 与真实栏目一致，最新的文件排在最前
+        newest = self.pages - 1 - start
+        links = [page_path(index) for index in range(newest, max(newest - LISTING_SIZE, -1), -1)]
+        next_page = listing_path(page + 1) if start + LISTING_SIZE < self.pages else None
+        rng = random.Random(f"{self.seed}:{site}:listing:{page}")
+        html = render_listing_page(rng, links, profile['name'], profile['charset'], next_page)
+        return self._encode(html, profile['charset'])
+
+    async def detail(self, request: web.Request) -> web.Response:
+        site = self._site_index(request)
+        profile = site_profile(site)
+        match = DETAIL_INDEX_PATTERN.search(request.path)
+        index = int(match.group(1)) if match else self.pages
+        if index >= self.pages:
+            raise web.HTTPNotFound()
+
+        error = await self._misbehave(profile)
+        if error is not None:
+            return error
+
+        rng = random.Random(f"{self.seed}:{site}:{index}")
+        related = [page_path(rng.randrange(self.pages)) for _ in range(RELATED_LINKS)]
+        html = render_detail_page(rng, index, profile['name'], profile['charset'], related_paths=related)
+        return self._encode(html, profile['charset'])
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/robots.txt', self.robots)
+        app.router.add_get('/sitemap.xml', self.sitemap)
+        app.router.add_get('/zcwj/{name}', self.listing)
+        app.router.add_get('/zhengce/content/{tail:.*}', self.detail)
+        return app
+
+    async def start(self, host: str = '127.0.0.1') -> List[int]:
+        """启动服务，每个站点一个端口，返回端口列表"""
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        for _ in range(self.sites):
+            site = web.TCPSite(self._runner, host, 0)
+            await site.start()
+            self.ports.append(self._runner.addresses[-1][1])
+        return self.ports
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def start_urls(self, host: str = '127.0.0.1') -> List[str]:
+        return [f"http://{host}:{port}{listing_path(0)}" for port in self.ports]
+
+
+def _serve(sites: int, pages: int, seed: int, ports_queue, stop_event):
+    async def main():
+        server = GovSiteServer(sites, pages, seed)
+        ports_queue.put(await server.start())
+        while not stop_event.is_set():
+            await asyncio.sleep(0.2)
+        await server.stop()
+
+    asyncio.run(main())
+
+
+class ServerProcess:
+    """在独立进程中运行模拟站点，避免服务端开销计入采集端的CPU和内存"""
+
+    def __init__(self, sites: int, pages: int, seed: int = 42):
+        self.sites = sites
+        self.pages = pages
+        self.seed = seed
+        self.ports: List[int] = []
+        self._stop = multiprocessing.Event()
+        self._process: Optional[multiprocessing.Process] = None
+
+    def __enter__(self) -> 'ServerProcess':
+        ports_queue = multiprocessing.Queue()
+        self._process = multiprocessing.Process(
+            target=_serve,
+            args=(self.sites, self.pages, self.seed, ports_queue, self._stop),
+            daemon=True
+        )
+        self._process.start()
+        self.ports = ports_queue.get(timeout=30)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+
+    def site_configs(self, host: str = '127.0.0.1') -> List[Dict[str, Any]]:
+        """与 CrawlerService 格式一致的站点配置"""
+        return [
+            {
+                'id': f"bench_{index}",
+                'name': site_profile(index)['name'],
+                'region': site_profile(index)['name'],
+                'level': 1,
+                'start_urls': [f"http://{host}:{port}{listing_path(0)}"],
+                'category': 'policy',
+                'selectors': {
+                    'title': ['h1', '.title', 'title'],
+                    'content': ['.content', '.article', 'main'],
+                    'date': ['.date', '.publish-date', '.time'],
+                }
+            }
+            for index, port in enumerate(self.ports)
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve synthetic government sites')
+    parser.add_argument('--sites', type=int, default=20, help='站点数')
+    parser.add_argument('--pages', type=int, default=200, help='每个站点的详情页数')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    async def run():
+        server = GovSiteServer(args.sites, args.pages, args.seed)
+        await server.start()
+        for url in server.start_urls():
+            print(url)
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    main()
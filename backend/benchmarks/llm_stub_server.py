@@ -0,0 +1,243 @@
+"""
+本地模拟大模型服务
+路径: /mnt/okcomputer/output/backend/benchmarks/llm_stub_server.py
+
+提供与 OpenAI 兼容的 /v1/chat/completions 接口，按输入输出token数模拟延迟，
+回复内容由输入确定，相同输入得到相同回复。可设置RPM/TPM配额，与 OpenAI 一样按
+令牌桶连续恢复，超出时返回429和 Retry-After。JSON模式下输入为 documents 数组时
+按双视角解读的格式逐篇返回结果，可按比例混入不合格或缺失的结果项。
+GET /stats 返回收到的请求数、token数和429次数，基准测试据此统计实际调用次数。
+
+单独运行（worker 设置 OPENAI_BASE_URL=http://127.0.0.1:8900/v1 即可离线联调）:
+    python -m benchmarks.llm_stub_server --port 8900 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计token数：中文约每字一个token，其余约每4个字符一个"""
+    cjk = sum(1 for char in text if '一' <= char <= '鿿')
+    return max(1, cjk + (len(text) - cjk) // 4)
+
+
+class RateBucket:
+    """每分钟配额的令牌桶，容量为 burst_seconds 秒的配额"""
+
+    def __init__(self, per_minute: int, burst_seconds: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def take(self, amount: float) -> float:
+        """扣减成功返回0，否则返回配额恢复所需的秒数；超过容量的请求在桶满时放行并全额扣减"""
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        needed = min(amount, self.capacity)
+        if self.level < needed:
+            return (needed - self.level) / self.rate
+        self.level -= amount
+        return 0.0
+
+
+class LLMStubServer:
+    """模拟的对话接口
+
+    延迟 = latency + 输出token数 * token_latency。rpm/tpm 为0时不限速。
+    invalid_rate 为解读结果项不合格（缺字段或遗漏）的比例，同一输入重试时可能通过。
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.2,
+        token_latency: float = 0.0,
+        completion_tokens: int = 200,
+        rpm: int = 0,
+        tpm: int = 0,
+        burst_seconds: float = 10.0,
+        invalid_rate: float = 0.0,
+        seed: int = 42
+    ):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.completion_tokens = completion_tokens
+        self.request_bucket = RateBucket(rpm, burst_seconds) if rpm else None
+        self.token_bucket = RateBucket(tpm, burst_seconds) if tpm else None
+        self.invalid_rate = invalid_rate
+        self._rng = random.Random(seed)
+        self.port: Optional[int] = None
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens_total = 0
+        self.rate_limited = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    def respond(self, messages: List[Dict[str, str]], json_mode: bool) -> str:
+        """由输入确定的回复"""
+        text = messages[-1]['content'] if messages else ''
+        digest = hashlib.sha1(json.dumps(messages, ensure_ascii=False).encode('utf-8')).hexdigest()[:12]
+        summary = text.replace('\n', '')[:100]
+        if json_mode:
+            documents = self._documents(text)
+            if documents is not None:
+                return json.dumps({'results': self._interpret(documents)}, ensure_ascii=False)
+            return json.dumps({'summary': summary, 'digest': digest}, ensure_ascii=False)
+        return f"摘要：{summary}（{digest}）"
+
+    @staticmethod
+    def _documents(text: str) -> Optional[List[Dict[str, Any]]]:
+        try:
+            payload = json.loads(text)
+        except ValueError:
+            return None
+        documents = payload.get('documents') if isinstance(payload, dict) else None
+        return documents if isinstance(documents, list) else None
+
+    def _interpret(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """逐篇生成解读，按 invalid_rate 遗漏结果项或缺少字段"""
+        results = []
+        for document in documents:
+            content = str(document.get('content', '')).replace('\n', '')
+            seed = int(hashlib.sha1(content.encode('utf-8')).hexdigest()[:8], 16)
+            item = {
+                'id': document.get('id'),
+                'aggressive': {'summary': f"积极把握：{content[:60]}", 'signals': ['opportunity', 'trend'], 'confidence': 0.8},
+                'conservative': {'summary': f"审慎评估：{content[:60]}", 'signals': ['risk'], 'confidence': 0.6},
+                'key_points': [sentence for sentence in content.split('。')[:4] if sentence][:4] or [content[:30]],
+                'risk_level': ('high', 'medium', 'low', 'none')[seed % 4],
+                'opportunity': f"{document.get('title', '')}相关企业可关注申报和配套支持。",
+            }
+            roll = self._rng.random()
+            if roll < self.invalid_rate / 2:
+                continue
+            if roll < self.invalid_rate:
+                del item['risk_level']
+            results.append(item)
+        return results
+
+    async def chat_completions(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        messages = body.get('messages', [])
+        json_mode = (body.get('response_format') or {}).get('type') == 'json_object'
+        prompt_tokens = sum(estimate_tokens(message.get('content', '')) for message in messages)
+        content = self.respond(messages, json_mode)
+        completion_tokens = min(estimate_tokens(content), body.get('max_tokens') or self.completion_tokens)
+
+        # 与 OpenAI 一样，指定 max_tokens 时按它计入TPM
+        error = self._check_limits(prompt_tokens + (body.get('max_tokens') or completion_tokens))
+        if error is not None:
+            return error
+
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens_total += completion_tokens
+        await asyncio.sleep(self.latency + completion_tokens * self.token_latency)
+
+        return web.json_response({
+            'id': f"chatcmpl-stub-{self.requests}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        })
+
+    def _check_limits(self, tokens: int) -> Optional[web.Response]:
+        wait, limit = 0.0, 'requests'
+        if self.request_bucket is not None:
+            wait = self.request_bucket.take(1)
+        if not wait and self.token_bucket is not None:
+            wait, limit = self.token_bucket.take(tokens), 'tokens'
+            if wait and self.request_bucket is not None:
+                self.request_bucket.level += 1
+        if not wait:
+            return None
+        self.rate_limited += 1
+        return web.json_response(
+            {'error': {
+                'message': f"Rate limit reached for {limit}, please try again later.",
+                'type': limit,
+                'code': 'rate_limit_exceeded',
+            }},
+            status=429,
+            headers={'Retry-After': str(math.ceil(wait)), 'Retry-After-Ms': str(math.ceil(wait * 1000))}
+        )
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.counters())
+
+    def counters(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens_total,
+            'rate_limited': self.rate_limited,
+        }
+
+    def reset(self):
+        self.requests = self.prompt_tokens = self.completion_tokens_total = self.rate_limited = 0
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_post('/v1/chat/completions', self.chat_completions)
+        app.router.add_get('/stats', self.stats)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> int:
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = self._runner.addresses[-1][1]
+        return self.port
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def base_url(self, host: str = '127.0.0.1') -> str:
+        return f"http://{host}:{self.port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a stub OpenAI-compatible chat completions API')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0.5, help='每次请求的固定延迟(秒)')
+    parser.add_argument('--token-latency', type=float, default=0.0, help='每个输出token的延迟(秒)')
+    parser.add_argument('--rpm', type=int, default=0, help='每分钟请求数配额，0为不限')
+    parser.add_argument('--tpm', type=int, default=0, help='每分钟token配额，0为不限')
+    parser.add_argument('--invalid-rate', type=float, default=0.0, help='解读结果项不合格的比例')
+    args = parser.parse_args()
+
+    async def run():
+        server = LLMStubServer(
+            args.latency, args.token_latency, rpm=args.rpm, tpm=args.tpm, invalid_rate=args.invalid_rate
+        )
+        await server.start(port=args.port)
+        print(server.base_url())
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,421 @@
+"""
+基准测试用的进程内MongoDB替身
+路径: /mnt/okcomputer/output/backend/benchmarks/memory_mongo.py
+
+只实现采集和处理链路用到的 Motor 接口子集（find/find_one/distinct/insert_one/update_one/
+update_many/find_one_and_update/bulk_write），过滤条件支持等值和常用比较操作符，更新支持 $set/$inc/
+$setOnInsert/$unset/$addToSet，唯一字段冲突按 11000 错误返回，与真实MongoDB一致。
+"""
+
+import copy
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+# 与 mongodb._create_indexes 中的唯一索引对应
+UNIQUE_FIELDS = {
+    'raw_pages': 'url',
+    'raw_bids': 'url',
+    'users': 'email',
+    'crawl_schedule': 'site_id',
+    'content_fingerprints': 'url',
+    'crawl_discovery': 'site_id',
+    'crawl_checkpoints': 'key',
+    'crawl_site_profiles': 'site_id',
+}
+
+_MISSING = object()
+
+
+def _get(doc: Dict[str, Any], key: str) -> Any:
+    value = doc
+    for part in key.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _set(doc: Dict[str, Any], key: str, value: Any):
+    parts = key.split('.')
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset(doc: Dict[str, Any], key: str):
+    parts = key.split('.')
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def _match_value(value: Any, condition: Any) -> bool:
+    # 数组字段：任一元素满足条件即匹配（$ne/$nin 要求所有元素都不相等）
+    if isinstance(value, list) and not isinstance(condition, list):
+        if isinstance(condition, dict) and '$exists' in condition:
+            pass
+        elif isinstance(condition, dict) and any(op in condition for op in ('$ne', '$nin')):
+            return all(_match_value(item, condition) for item in value)
+        else:
+            return any(_match_value(item, condition) for item in value)
+    if isinstance(condition, dict) and condition and all(key.startswith('$') for key in condition):
+        for op, operand in condition.items():
+            present = value is not _MISSING
+            if op == '$in':
+                # 与MongoDB一致，$in 中的 None 匹配缺失字段
+                if (value if present else None) not in operand:
+                    return False
+            elif op == '$nin':
+                if present and value in operand:
+                    return False
+            elif op == '$ne':
+                if present and value == operand:
+                    return False
+            elif op == '$exists':
+                if present != bool(operand):
+                    return False
+            elif op in ('$lt', '$lte', '$gt', '$gte'):
+                if not present or value is None:
+                    return False
+                if op == '$lt' and not value < operand:
+                    return False
+                if op == '$lte' and not value <= operand:
+                    return False
+                if op == '$gt' and not value > operand:
+                    return False
+                if op == '$gte' and not value >= operand:
+                    return False
+            else:
+                raise NotImplementedError(f"Unsupported operator {op}")
+        return True
+    return value is not _MISSING and value == condition
+
+
+def matches(doc: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    """文档是否满足过滤条件"""
+    for key, condition in (query or {}).items():
+        if key == '$or':
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == '$and':
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif not _match_value(_get(doc, key), condition):
+            return False
+    return True
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not projection:
+        return copy.deepcopy(doc)
+    fields = [value for key, value in projection.items() if key != '_id']
+    if fields and not any(fields):
+        result = copy.deepcopy(doc)
+        for key in projection:
+            _unset(result, key)
+        return result
+    result = {'_id': doc['_id']} if projection.get('_id', 1) else {}
+    for key, value in projection.items():
+        if value and key != '_id':
+            found = _get(doc, key)
+            if found is not _MISSING:
+                _set(result, key, copy.deepcopy(found))
+    return result
+
+
+class MemoryResult:
+    """写操作结果"""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class MemoryCursor:
+    """异步游标"""
+
+    def __init__(self, docs: List[Dict[str, Any]], projection: Optional[Dict[str, Any]] = None):
+        self._docs = docs
+        self._projection = projection
+        self._limit = 0
+
+    def sort(self, key, direction: int = 1) -> 'MemoryCursor':
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for field, order in reversed(keys):
+            self._docs.sort(
+                key=lambda doc: (_get(doc, field) is _MISSING, _get(doc, field) if _get(doc, field) is not _MISSING else 0),
+                reverse=order < 0
+            )
+        return self
+
+    def limit(self, count: int) -> 'MemoryCursor':
+        self._limit = count
+        return self
+
+    def _selected(self) -> List[Dict[str, Any]]:
+        # 与MongoDB一致，先排序再投影
+        docs = self._docs[:self._limit] if self._limit else self._docs
+        return [_project(doc, self._projection) for doc in docs]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._selected():
+            yield doc
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        docs = self._selected()
+        return docs[:length] if length else list(docs)
+
+
+class MemoryCollection:
+    """单个集合"""
+
+    def __init__(self, name: str, on_write: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        self.name = name
+        self.unique = UNIQUE_FIELDS.get(name)
+        self.on_write = on_write
+        self._docs: Dict[Any, Dict[str, Any]] = {}
+        self._unique_index: Dict[Any, Any] = {}
+
+    async def create_index(self, *args, **kwargs):
+        return None
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # 查询
+    def _matching(self, query: Optional[Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+        if self.unique and query and not isinstance(query.get(self.unique, {}), dict):
+            doc_id = self._unique_index.get(query[self.unique])
+            doc = self._docs.get(doc_id)
+            return [doc] if doc is not None and matches(doc, query) else []
+        return [doc for doc in self._docs.values() if matches(doc, query)]
+
+    def find(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None) -> MemoryCursor:
+        return MemoryCursor(list(self._matching(query)), projection)
+
+    async def find_one(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None):
+        for doc in self._matching(query):
+            return _project(doc, projection)
+        return None
+
+    async def count_documents(self, query: Optional[Dict[str, Any]] = None) -> int:
+        return len(list(self._matching(query)))
+
+    async def distinct(self, key: str, query: Optional[Dict[str, Any]] = None) -> List[Any]:
+        values = []
+        for doc in self._matching(query):
+            value = _get(doc, key)
+            if value is not _MISSING and value not in values:
+                values.append(value)
+        return values
+
+    async def estimated_document_count(self) -> int:
+        return len(self._docs)
+
+    # 写入
+    def _store(self, doc: Dict[str, Any], previous: Optional[Dict[str, Any]] = None):
+        if self.unique:
+            key = doc.get(self.unique)
+            owner = self._unique_index.get(key)
+            if key is not None and owner is not None and owner != doc['_id']:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {self.unique}", 11000)
+            if previous is not None and previous.get(self.unique) != key:
+                self._unique_index.pop(previous.get(self.unique), None)
+            if key is not None:
+                self._unique_index[key] = doc['_id']
+        self._docs[doc['_id']] = doc
+        if self.on_write is not None:
+            self.on_write(self.name, doc)
+
+    def _insert(self, document: Dict[str, Any]) -> Any:
+        doc = copy.deepcopy(document)
+        doc.setdefault('_id', ObjectId())
+        self._store(doc)
+        return doc['_id']
+
+    @staticmethod
+    def _apply(doc: Dict[str, Any], update: Dict[str, Any], inserting: bool):
+        for op, fields in update.items():
+            for key, value in fields.items():
+                if op == '$set':
+                    _set(doc, key, copy.deepcopy(value))
+                elif op == '$setOnInsert':
+                    if inserting:
+                        _set(doc, key, copy.deepcopy(value))
+                elif op == '$inc':
+                    current = _get(doc, key)
+                    _set(doc, key, (0 if current is _MISSING else current) + value)
+                elif op == '$unset':
+                    _unset(doc, key)
+                elif op == '$addToSet':
+                    current = _get(doc, key)
+                    items = [] if current is _MISSING else current
+                    if value not in items:
+                        _set(doc, key, items + [copy.deepcopy(value)])
+                else:
+                    raise NotImplementedError(f"Unsupported update operator {op}")
+
+    def _update(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool) -> Dict[str, Any]:
+        """返回 matched/modified/upserted_id"""
+        for doc in self._matching(query):
+            updated = copy.deepcopy(doc)
+            self._apply(updated, update, inserting=False)
+            modified = updated != doc
+            if modified:
+                self._store(updated, previous=doc)
+            return {'matched': 1, 'modified': int(modified), 'upserted_id': None}
+
+        if not upsert:
+            return {'matched': 0, 'modified': 0, 'upserted_id': None}
+
+        doc = {
+            key: value for key, value in query.items()
+            if not key.startswith('$') and not (isinstance(value, dict) and any(k.startswith('$') for k in value))
+        }
+        self._apply(doc, update, inserting=True)
+        return {'matched': 0, 'modified': 0, 'upserted_id': self._insert(doc)}
+
+    async def insert_one(self, document: Dict[str, Any]) -> MemoryResult:
+        inserted_id = self._insert(document)
+        document.setdefault('_id', inserted_id)
+        return MemoryResult(inserted_id=inserted_id)
+
+    async def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> MemoryResult:
+        outcome = self._update(query, update, upsert)
+        return MemoryResult(
+            matched_count=outcome['matched'],
+            modified_count=outcome['modified'],
+            upserted_id=outcome['upserted_id']
+        )
+
+    async def update_many(self, query: Dict[str, Any], update: Dict[str, Any]) -> MemoryResult:
+        matched = modified = 0
+        for doc in list(self._matching(query)):
+            updated = copy.deepcopy(doc)
+            self._apply(updated, update, inserting=False)
+            matched += 1
+            if updated != doc:
+                modified += 1
+                self._store(updated, previous=doc)
+        return MemoryResult(matched_count=matched, modified_count=modified)
+
+    async def find_one_and_update(
+        self,
+        query: Dict[str, Any],
+        update: Dict[str, Any],
+        projection: Optional[Dict[str, Any]] = None,
+        sort: Optional[List[Any]] = None,
+        return_document: bool = ReturnDocument.BEFORE
+    ) -> Optional[Dict[str, Any]]:
+        candidates = MemoryCursor(list(self._matching(query)))
+        if sort:
+            candidates.sort(sort)
+        for doc in candidates._selected():
+            updated = copy.deepcopy(doc)
+            self._apply(updated, update, inserting=False)
+            self._store(updated, previous=doc)
+            return _project(updated if return_document == ReturnDocument.AFTER else doc, projection)
+        return None
+
+    async def replace_one(self, query: Dict[str, Any], replacement: Dict[str, Any], upsert: bool = False) -> MemoryResult:
+        for doc in self._matching(query):
+            updated = copy.deepcopy(replacement)
+            updated['_id'] = doc['_id']
+            self._store(updated, previous=doc)
+            return MemoryResult(matched_count=1, modified_count=1, upserted_id=None)
+        if not upsert:
+            return MemoryResult(matched_count=0, modified_count=0, upserted_id=None)
+        return MemoryResult(matched_count=0, modified_count=0, upserted_id=self._insert(replacement))
+
+    async def delete_one(self, query: Dict[str, Any]) -> MemoryResult:
+        for doc in self._matching(query):
+            del self._docs[doc['_id']]
+            if self.unique:
+                self._unique_index.pop(doc.get(self.unique), None)
+            return MemoryResult(deleted_count=1)
+        return MemoryResult(deleted_count=0)
+
+    async def delete_many(self, query: Dict[str, Any]) -> MemoryResult:
+        deleted = 0
+        for doc in list(self._matching(query)):
+            del self._docs[doc['_id']]
+            if self.unique:
+                self._unique_index.pop(doc.get(self.unique), None)
+            deleted += 1
+        return MemoryResult(deleted_count=deleted)
+
+    async def bulk_write(self, operations: List[Any], ordered: bool = True) -> MemoryResult:
+        result = {
+            'writeErrors': [], 'writeConcernErrors': [], 'nInserted': 0, 'nUpserted': 0,
+            'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'upserted': [],
+        }
+        for index, operation in enumerate(operations):
+            try:
+                if isinstance(operation, InsertOne):
+                    self._insert(operation._doc)
+                    result['nInserted'] += 1
+                elif isinstance(operation, UpdateOne):
+                    outcome = self._update(operation._filter, operation._doc, bool(operation._upsert))
+                    result['nMatched'] += outcome['matched']
+                    result['nModified'] += outcome['modified']
+                    if outcome['upserted_id'] is not None:
+                        result['nUpserted'] += 1
+                        result['upserted'].append({'index': index, '_id': outcome['upserted_id']})
+                else:
+                    raise NotImplementedError(f"Unsupported bulk operation {type(operation).__name__}")
+            except DuplicateKeyError as e:
+                result['writeErrors'].append({'index': index, 'code': 11000, 'errmsg': str(e), 'op': operation})
+                if ordered:
+                    break
+
+        if result['writeErrors']:
+            raise BulkWriteError(result)
+        return MemoryResult(bulk_api_result=result, acknowledged=True)
+
+
+class MemoryDatabase:
+    """按名称惰性创建集合"""
+
+    def __init__(self, on_write: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        self.on_write = on_write
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = MemoryCollection(name, self.on_write)
+        return collection
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def __bool__(self) -> bool:
+        return True
+
+    async def command(self, *args, **kwargs):
+        return {'ok': 1}
+
+
+class WriteClock:
+    """记录每个URL首次写入的时间，用于计算抓取到入库的延迟"""
+
+    def __init__(self):
+        self.saved_at: Dict[str, float] = {}
+
+    def __call__(self, collection: str, doc: Dict[str, Any]):
+        url = doc.get('url')
+        if url and url not in self.saved_at:
+            self.saved_at[url] = time.perf_counter()
+
+
+__all__ = ['MemoryDatabase', 'MemoryCollection', 'MemoryCursor', 'WriteClock', 'matches']
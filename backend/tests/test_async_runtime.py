@@ -0,0 +1,100 @@
+"""
+Worker进程内常驻事件循环测试
+路径: /mnt/okcomputer/output/backend/tests/test_async_runtime.py
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+
+import pytest
+
+from workers.services.async_runtime import AsyncRuntime
+
+
+@pytest.fixture
+def runtime(monkeypatch):
+    """不连接MongoDB/Redis的运行时"""
+    instance = AsyncRuntime()
+
+    async def no_databases():
+        return None
+
+    monkeypatch.setattr(instance, 'ensure_databases', no_databases)
+    yield instance
+    instance.shutdown()
+
+
+async def _loop_and_thread():
+    return asyncio.get_running_loop(), threading.current_thread().name
+
+
+def test_tasks_share_one_background_loop(runtime):
+    first_loop, thread_name = runtime.run(_loop_and_thread())
+    second_loop, _ = runtime.run(_loop_and_thread())
+
+    assert first_loop is second_loop is runtime.loop
+    assert thread_name == 'async-runtime'
+    assert threading.current_thread().name != thread_name
+
+
+def test_session_is_reused_across_tasks(runtime):
+    first = runtime.run(runtime.get_session())
+    second = runtime.run(runtime.get_session())
+    assert first is second
+    assert not first.closed
+
+
+def test_timeout_cancels_the_coroutine(runtime):
+    cancelled = threading.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(concurrent.futures.TimeoutError):
+        runtime.run(slow(), timeout=0.05)
+    assert cancelled.wait(2)
+
+
+def test_exceptions_propagate_to_the_task(runtime):
+    async def failing():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError, match='boom'):
+        runtime.run(failing())
+    # 循环不受影响，后续任务照常执行
+    assert runtime.run(_loop_and_thread())[0] is runtime.loop
+
+
+def test_fork_rebuilds_loop_and_resources(runtime):
+    loop, _ = runtime.run(_loop_and_thread())
+    parse_pool = runtime.get_parse_pool()
+    rate_limiter = runtime.get_rate_limiter()
+
+    # 模拟fork：进程号变化后父进程的循环线程不再可用
+    runtime._pid = -1
+    assert not runtime.running
+    new_loop, _ = runtime.run(_loop_and_thread())
+
+    assert new_loop is not loop
+    assert runtime.get_parse_pool() is not parse_pool
+    assert runtime.get_rate_limiter() is not rate_limiter
+    parse_pool.close()
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def test_shutdown_closes_resources(runtime):
+    session = runtime.run(runtime.get_session())
+    runtime.get_parse_pool()
+
+    runtime.shutdown()
+
+    assert session.closed
+    assert runtime.loop is None
+    assert runtime._parse_pool is None
+    # 关闭后再次使用时重新启动
+    assert runtime.run(_loop_and_thread())[0] is runtime.loop
@@ -0,0 +1,210 @@
+"""
+政策附件采集与文本提取测试
+路径: /mnt/okcomputer/output/backend/tests/test_attachments.py
+"""
+
+import os
+import zipfile
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from tests.conftest import serve
+from workers.services.attachments import (
+    OLE_MAGIC,
+    AttachmentError,
+    attachment_name,
+    attachment_type,
+    download_to_tempfile,
+    extract_attachment,
+    select_attachments,
+    sniff_type,
+)
+from workers.services.crawler import GovTreeCrawler
+from workers.services.response_reader import ResponseTooLarge
+from workers.services.seen_store import CompactSeenStore
+
+WORD = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+SHEET = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+
+
+def make_docx(path, paragraphs):
+    body = ''.join(f'<w:p><w:r><w:t>{text}</w:t></w:r></w:p>' for text in paragraphs)
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('[Content_Types].xml', '<Types/>')
+        archive.writestr('word/document.xml', f'<w:document xmlns:w="{WORD}"><w:body>{body}</w:body></w:document>')
+    return path
+
+
+def make_xlsx(path, shared, rows):
+    strings = ''.join(f'<si><t>{text}</t></si>' for text in shared)
+    cells = ''.join(
+        '<row>' + ''.join(
+            f'<c t="s"><v>{value}</v></c>' if isinstance(value, int) else f'<c><v>{value}</v></c>'
+            for value in row
+        ) + '</row>'
+        for row in rows
+    )
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('xl/workbook.xml', f'<workbook xmlns="{SHEET}"/>')
+        archive.writestr('xl/sharedStrings.xml', f'<sst xmlns="{SHEET}">{strings}</sst>')
+        archive.writestr('xl/worksheets/sheet1.xml', f'<worksheet xmlns="{SHEET}"><sheetData>{cells}</sheetData></worksheet>')
+    return path
+
+
+def make_pdf(path, text):
+    """只含一页ASCII文本的最小PDF"""
+    stream = f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'.encode('latin-1')
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R '
+        b'/Resources << /Font << /F1 5 0 R >> >> >>',
+        b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    data = b'%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(data)
+    data += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    data += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    data += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+@pytest.mark.parametrize('url, kind', [
+    ('http://a.gov.cn/files/2024/通知.PDF', 'pdf'),
+    ('http://a.gov.cn/module/download/downfile.jsp?filename=abc.docx&id=1', 'docx'),
+    ('http://a.gov.cn/files/table.et', 'xls'),
+    ('http://a.gov.cn/files/notice.wps#page=2', 'doc'),
+    ('http://a.gov.cn/art/2024/1/1/art_1.html', None),
+    ('http://a.gov.cn/pdf/index.html', None),
+])
+def test_attachment_type(url, kind):
+    assert attachment_type(url) == kind
+
+
+def test_attachment_name_prefers_download_parameter():
+    assert attachment_name('http://a.gov.cn/down.jsp?filename=%E5%85%B3%E4%BA%8E%E9%80%9A%E7%9F%A5.pdf') == '关于通知.pdf'
+    assert attachment_name('http://a.gov.cn/files/a1b2.doc') == 'a1b2.doc'
+
+
+def test_select_attachments_allows_file_servers_and_caps(monkeypatch):
+    links = [
+        '/files/1.pdf',
+        'http://file.gov.cn/2.xlsx#sheet',
+        '/files/1.pdf',
+        '/art/3.html',
+        'javascript:download("4.doc")',
+        '/files/5.doc',
+    ]
+    page = 'http://a.gov.cn/art/index.html'
+    assert select_attachments(page, links) == [
+        'http://a.gov.cn/files/1.pdf',
+        'http://file.gov.cn/2.xlsx',
+        'http://a.gov.cn/files/5.doc',
+    ]
+    assert select_attachments(page, links, limit=1) == ['http://a.gov.cn/files/1.pdf']
+
+
+def test_docx_text(tmp_path):
+    path = make_docx(str(tmp_path / 'a.docx'), ['关于开展申报工作的通知', '各有关单位：'])
+    assert extract_attachment(path) == {'file_type': 'docx', 'content': '关于开展申报工作的通知\n各有关单位：'}
+
+
+def test_xlsx_text_resolves_shared_strings(tmp_path):
+    path = make_xlsx(str(tmp_path / 'a.xlsx'), ['项目名称', '金额'], [[0, 1], ['100', '200']])
+    assert extract_attachment(path) == {'file_type': 'xlsx', 'content': '项目名称\t金额\n100\t200'}
+
+
+def test_sniff_ignores_misleading_extension(tmp_path):
+    path = make_docx(str(tmp_path / 'a.doc'), ['正文内容'])
+    assert sniff_type(path, 'doc') == 'docx'
+
+    junk = tmp_path / 'b.pdf'
+    junk.write_bytes(b'<html>not found</html>')
+    with pytest.raises(AttachmentError):
+        sniff_type(str(junk))
+
+
+def test_legacy_binary_document_scans_utf16_text(tmp_path):
+    path = tmp_path / 'a.wps'
+    text = '关于印发政策文件的通知，请各单位遵照执行。'
+    path.write_bytes(OLE_MAGIC + b'\x00' * 504 + text.encode('utf-16-le') + b'\x00\x01\x02' * 50)
+    result = extract_attachment(str(path), 'doc')
+    assert result['file_type'] == 'doc'
+    assert text in result['content']
+
+
+def test_pdf_text(tmp_path):
+    pytest.importorskip('pypdf')
+    path = make_pdf(str(tmp_path / 'a.pdf'), 'Notice 2024 No 15')
+    assert extract_attachment(path) == {'file_type': 'pdf', 'content': 'Notice 2024 No 15'}
+
+
+@pytest.mark.asyncio
+async def test_download_stops_at_size_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr('tempfile.tempdir', str(tmp_path))
+
+    async def handle(request):
+        response = web.StreamResponse()
+        await response.prepare(request)
+        for _ in range(64):
+            await response.write(b'x' * 1024)
+        return response
+
+    async with serve(handle) as base, aiohttp.ClientSession() as session:
+        async with session.get(base) as response:
+            with pytest.raises(ResponseTooLarge):
+                await download_to_tempfile(response, 10 * 1024)
+        async with session.get(base) as response:
+            path, digest, size = await download_to_tempfile(response, 64 * 1024, suffix='.pdf')
+
+    assert size == 64 * 1024 and len(digest) == 40
+    # 超限时临时文件已删除
+    assert os.listdir(str(tmp_path)) == [os.path.basename(path)]
+    os.unlink(path)
+
+
+@pytest.mark.asyncio
+async def test_crawler_saves_attachments_as_linked_pages(memory_db, crawl_settings, tmp_path):
+    docx = open(make_docx(str(tmp_path / 'a.docx'), ['附件正文：申报指南']), 'rb').read()
+    requests = []
+
+    async def handle(request):
+        requests.append(request.path)
+        if request.path == '/':
+            return web.Response(
+                text='<html><head><title>关于开展申报工作的通知</title></head><body>'
+                     '<p>各有关单位：现将申报事项通知如下。</p>'
+                     '<a href="/files/20240101.docx">附件1</a><a href="/files/missing.pdf">附件2</a></body></html>',
+                content_type='text/html',
+            )
+        if request.path == '/files/20240101.docx':
+            return web.Response(body=docx, content_type='application/octet-stream')
+        return web.Response(status=404)
+
+    site = {'id': 'site', 'name': '测试站点', 'start_urls': [], 'discovery': False}
+    async with serve(handle) as base:
+        site['start_urls'] = [f"{base}/"]
+        async with GovTreeCrawler(seen_store=CompactSeenStore()) as crawler:
+            results = (await crawler.crawl_sites([site]))['site']
+
+    page = next(result for result in results if result['url'] == f"{base}/")
+    assert page['attachments'] == [f"{base}/files/20240101.docx", f"{base}/files/missing.pdf"]
+
+    attachment = next(result for result in results if result['url'] == f"{base}/files/20240101.docx")
+    assert attachment['parent_url'] == f"{base}/"
+    assert attachment['content'] == '附件正文：申报指南'
+    # 文件名是编号时用所在页面标题
+    assert attachment['title'] == '关于开展申报工作的通知（附件：20240101.docx）'
+    assert attachment['metadata']['file_type'] == 'docx'
+    assert crawler.stats['attachments'] == 1
+    assert '/files/missing.pdf' in requests
+    assert len(results) == 2
@@ -0,0 +1,80 @@
+"""
+采集结果批量入库测试
+路径: /mnt/okcomputer/output/backend/tests/test_bulk_save.py
+"""
+
+import pytest
+
+from app.config import settings
+from workers.services.crawler import BulkResultWriter, GovTreeCrawler
+from workers.services.seen_store import CompactSeenStore
+
+
+def page(index, content=None, etag=None):
+    return {
+        'url': f"http://a.gov.cn/art/{index}.html",
+        'title': f"通知{index}",
+        'content': content or f"第{index}号通知的正文",
+        'etag': etag,
+        'content_hash': f"hash{index}",
+        'status': 'pending',
+    }
+
+
+@pytest.fixture
+def crawler(memory_db, crawl_settings, monkeypatch):
+    monkeypatch.setattr(settings, 'CRAWL_DEDUP_ENABLED', False)
+    return GovTreeCrawler(seen_store=CompactSeenStore())
+
+
+@pytest.mark.asyncio
+async def test_new_pages_are_inserted(crawler, memory_db):
+    counts = await crawler.save_results_bulk([page(1), page(2)])
+
+    assert counts == {'inserted': 2, 'updated': 0, 'unchanged': 0, 'errors': 0}
+    assert await memory_db.raw_pages.count_documents({}) == 2
+
+
+@pytest.mark.asyncio
+async def test_unchanged_content_only_refreshes_validators(crawler, memory_db):
+    await crawler.save_results_bulk([page(1, etag='"v1"')])
+    await memory_db.raw_pages.update_one({'url': page(1)['url']}, {'$set': {'status': 'processed'}})
+
+    # 正文相同：过滤条件不匹配，upsert 撞上url唯一索引（11000），按未变化计数
+    counts = await crawler.save_results_bulk([page(1, etag='"v2"')])
+
+    assert counts == {'inserted': 0, 'updated': 0, 'unchanged': 1, 'errors': 0}
+    doc = await memory_db.raw_pages.find_one({'url': page(1)['url']})
+    assert doc['etag'] == '"v2"'
+    assert doc['status'] == 'processed'
+    assert await memory_db.raw_pages.count_documents({}) == 1
+
+
+@pytest.mark.asyncio
+async def test_changed_content_is_overwritten_and_requeued(crawler, memory_db):
+    await crawler.save_results_bulk([page(1), page(2)])
+    await memory_db.raw_pages.update_many({}, {'$set': {'status': 'processed'}})
+
+    counts = await crawler.save_results_bulk([page(1, content='修订后的正文'), page(2), page(3)])
+
+    assert counts == {'inserted': 1, 'updated': 1, 'unchanged': 1, 'errors': 0}
+    changed = await memory_db.raw_pages.find_one({'url': page(1)['url']})
+    assert changed['content'] == '修订后的正文'
+    assert changed['status'] == 'pending'
+    assert (await memory_db.raw_pages.find_one({'url': page(2)['url']}))['status'] == 'processed'
+
+
+@pytest.mark.asyncio
+async def test_writer_flushes_full_batches_per_category(crawler, memory_db):
+    writer = BulkResultWriter(crawler, batch_size=2)
+    policy = {'category': 'policy'}
+
+    await writer.add(page(1), policy)
+    assert await memory_db.raw_pages.count_documents({}) == 0
+    await writer.add(page(2), policy)
+    assert await memory_db.raw_pages.count_documents({}) == 2
+
+    await writer.add(dict(page(3), url='http://a.gov.cn/bid/3.html'), {'category': 'bid'})
+    await writer.flush()
+    assert await memory_db.raw_bids.count_documents({}) == 1
+    assert writer.totals['inserted'] == 3
@@ -0,0 +1,137 @@
+"""
+采集检查点与续采测试
+路径: /mnt/okcomputer/output/backend/tests/test_crawl_checkpoint.py
+"""
+
+import asyncio
+import contextlib
+
+import pytest
+from aiohttp import web
+
+from tests.conftest import serve
+from workers.services.crawl_checkpoint import CHECKPOINT_COLLECTION, CrawlCheckpoint
+from workers.services.crawler import BulkResultWriter, GovTreeCrawler
+from workers.services.seen_store import CompactSeenStore
+
+ARTICLES = 5
+
+
+@pytest.mark.asyncio
+async def test_save_load_and_clear(memory_db):
+    checkpoint = CrawlCheckpoint('task-1', interval=60)
+    assert await checkpoint.load() is None
+    assert not checkpoint.resumed
+    assert not checkpoint.due()
+
+    await checkpoint.save({'frontier': [{'url': 'http://a.gov.cn/1', 'site_id': 's', 'depth': 1, 'parent': None}]})
+    assert checkpoint.saves == 1
+
+    resumed = CrawlCheckpoint('task-1')
+    state = await resumed.load()
+    assert resumed.resumed
+    assert state['frontier'][0]['url'] == 'http://a.gov.cn/1'
+    assert state['expires_at'] > state['updated_at']
+
+    await resumed.clear()
+    assert await CrawlCheckpoint('task-1').load() is None
+
+
+@pytest.mark.asyncio
+async def test_save_failure_does_not_stop_the_crawl(memory_db, monkeypatch):
+    class Broken:
+        async def replace_one(self, *args, **kwargs):
+            raise ConnectionError('mongo down')
+
+    checkpoint = CrawlCheckpoint('task-1', interval=0)
+    monkeypatch.setattr(checkpoint, '_collection', lambda: Broken())
+    await checkpoint.save({})
+    assert checkpoint.saves == 0
+    assert checkpoint.due()
+
+
+class Site:
+    """首页链接若干文章，blocked 未放行时从 3 号文章开始挂起"""
+
+    def __init__(self):
+        self.requests = []
+        self.reached = asyncio.Event()
+        self.released = asyncio.Event()
+
+    async def handle(self, request):
+        self.requests.append(request.path)
+        if request.path == '/':
+            links = ''.join(f'<a href="/art/{index}.html">通知{index}</a>' for index in range(1, ARTICLES + 1))
+            return web.Response(text=f'<html><head><title>首页</title></head><body>{links}</body></html>', content_type='text/html')
+        if request.path.startswith('/art/'):
+            if request.path >= '/art/3.html' and not self.released.is_set():
+                self.reached.set()
+                await self.released.wait()
+            return web.Response(
+                text=f'<html><head><title>关于{request.path}的通知</title></head><body><p>正文内容。</p></body></html>',
+                content_type='text/html',
+            )
+        return web.Response(status=404)
+
+
+async def _crawl(base, seen_store, key):
+    site = {'id': 'site', 'name': '测试站点', 'start_urls': [f"{base}/"], 'discovery': False}
+    checkpoint = CrawlCheckpoint(key, interval=0)
+    await checkpoint.load()
+    async with GovTreeCrawler(seen_store=seen_store) as crawler:
+        writer = BulkResultWriter(crawler, batch_size=100)
+        checkpoint.writer = writer
+        await crawler.crawl_sites([site], on_result=writer.add, checkpoint=checkpoint)
+        await writer.flush()
+    await checkpoint.clear()
+    return crawler
+
+
+@pytest.mark.asyncio
+async def test_redelivered_task_resumes_from_checkpoint(memory_db, crawl_settings, monkeypatch):
+    monkeypatch.setattr(crawl_settings, 'CRAWL_CONCURRENCY', 1)
+    monkeypatch.setattr(crawl_settings, 'CRAWL_DEDUP_ENABLED', False)
+    # 已访问集合跨两次运行保留，模拟共享的Redis存储
+    seen_store = CompactSeenStore()
+    site = Site()
+
+    async with serve(site.handle) as base:
+        first = asyncio.create_task(_crawl(base, seen_store, 'task-1'))
+        await asyncio.wait_for(site.reached.wait(), 5)
+        # worker 被杀：任务中断，检查点保留
+        first.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await first
+        assert site.requests == ['/', '/art/1.html', '/art/2.html', '/art/3.html']
+
+        state = await memory_db[CHECKPOINT_COLLECTION].find_one({'key': 'task-1'})
+        assert [entry['url'] for entry in state['frontier']] == [f"{base}/art/{index}.html" for index in range(3, ARTICLES + 1)]
+        # 快照前缓冲的结果已写入
+        assert await memory_db.raw_pages.count_documents({}) == 3
+
+        site.requests = []
+        site.released.set()
+        crawler = await _crawl(base, seen_store, 'task-1')
+
+    # 不重新采集入口和已完成的文章，挂起中的 3 号文章重新请求
+    assert site.requests == ['/art/3.html', '/art/4.html', '/art/5.html']
+    assert crawler.page_outcomes[f"{base}/art/1.html"] == 'new'
+    assert await memory_db.raw_pages.count_documents({}) == ARTICLES + 1
+    assert await memory_db[CHECKPOINT_COLLECTION].find_one({'key': 'task-1'}) is None
+
+
+@pytest.mark.asyncio
+async def test_without_checkpoint_pages_are_skipped_as_seen(memory_db, crawl_settings, monkeypatch):
+    monkeypatch.setattr(crawl_settings, 'CRAWL_DEDUP_ENABLED', False)
+    seen_store = CompactSeenStore()
+    site = Site()
+    site.released.set()
+
+    async with serve(site.handle) as base:
+        await _crawl(base, seen_store, 'task-1')
+        site.requests = []
+        # 新任务没有检查点，已访问集合中的URL不再请求
+        crawler = await _crawl(base, seen_store, 'task-2')
+
+    assert site.requests == []
+    assert crawler.page_outcomes[f"{base}/"] == 'skipped'
@@ -0,0 +1,158 @@
+"""
+站点增量发现测试
+路径: /mnt/okcomputer/output/backend/tests/test_discovery.py
+"""
+
+import gzip
+
+import pytest
+from aiohttp import web
+
+from tests.conftest import serve
+from workers.services.crawler import GovTreeCrawler
+from workers.services.discovery import DISCOVERY_COLLECTION, find_sources, parse_date, parse_feed, parse_listing, parse_sitemap
+from workers.services.seen_store import CompactSeenStore
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def sitemap(entries) -> str:
+    urls = ''.join(f'<url><loc>{loc}</loc><lastmod>{lastmod}</lastmod></url>' for loc, lastmod in entries)
+    return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="{SITEMAP_NS}">{urls}</urlset>'
+
+
+def test_parse_sitemap_and_index():
+    entries, children = parse_sitemap(sitemap([('http://a.gov.cn/art/1.html', '2024-01-02')]).encode())
+    assert entries == [('http://a.gov.cn/art/1.html', '2024-01-02')]
+    assert children == []
+
+    index = (
+        f'<sitemapindex xmlns="{SITEMAP_NS}"><sitemap><loc>http://a.gov.cn/s1.xml.gz</loc>'
+        '<lastmod>2024-01-01T08:00:00+08:00</lastmod></sitemap></sitemapindex>'
+    )
+    entries, children = parse_sitemap(gzip.compress(index.encode()))
+    assert entries == []
+    assert children == [('http://a.gov.cn/s1.xml.gz', '2024-01-01T08:00:00+08:00')]
+    assert parse_date(children[0][1]).isoformat() == '2024-01-01T00:00:00'
+
+
+def test_parse_rss_and_atom():
+    rss = (
+        '<rss><channel><item><title>通知</title><link>http://a.gov.cn/art/1.html</link>'
+        '<pubDate>Tue, 02 Jan 2024 10:00:00 +0800</pubDate></item></channel></rss>'
+    )
+    assert parse_feed(rss.encode()) == [('http://a.gov.cn/art/1.html', 'Tue, 02 Jan 2024 10:00:00 +0800')]
+
+    atom = (
+        '<feed xmlns="http://www.w3.org/2005/Atom"><entry><link href="/art/2.html"/>'
+        '<updated>2024-01-03T00:00:00Z</updated></entry></feed>'
+    )
+    assert parse_feed(atom.encode()) == [('/art/2.html', '2024-01-03T00:00:00Z')]
+
+
+def test_parse_listing_next_page():
+    html = '<html><body><a href="/art/1.html">一</a><a href="index_1.html">下一页</a></body></html>'
+    assert parse_listing(html, 'http://a.gov.cn/zcwj/index.html') == (
+        ['/art/1.html'], 'http://a.gov.cn/zcwj/index_1.html'
+    )
+
+    # TRS站群的分页脚本，第0页之后是 index_1.html
+    script = '<html><body><a href="./t1.html">一</a><script>createPageHTML(3, 1, "index", "shtml");</script></body></html>'
+    assert parse_listing(script, 'http://a.gov.cn/zcwj/index_1.shtml')[1] == 'http://a.gov.cn/zcwj/index_2.shtml'
+    last = '<html><body><script>createPageHTML(3, 2, "index", "shtml");</script></body></html>'
+    assert parse_listing(last, 'http://a.gov.cn/zcwj/index_2.shtml')[1] is None
+
+
+def test_find_sources():
+    html = (
+        '<html><head><link rel="alternate" type="application/rss+xml" href="/rss.xml"></head><body>'
+        '<a href="/zcwj/">政策文件</a><a href="http://other.gov.cn/tzgg/">通知公告</a><a href="/about/">关于我们</a>'
+        '</body></html>'
+    )
+    assert find_sources(html, 'http://a.gov.cn/') == {
+        'feeds': ['http://a.gov.cn/rss.xml'],
+        'listings': ['http://a.gov.cn/zcwj/'],
+    }
+
+
+class Site:
+    """首页链接一篇文章，sitemap 内容由测试指定"""
+
+    def __init__(self):
+        self.entries = []
+        self.requests = []
+
+    async def handle(self, request):
+        self.requests.append(request.path)
+        if request.path == '/':
+            return web.Response(
+                text='<html><head><title>首页</title></head><body><a href="/art/1.html">通知</a></body></html>',
+                content_type='text/html',
+            )
+        if request.path == '/sitemap.xml':
+            return web.Response(text=sitemap(self.entries), content_type='application/xml')
+        if request.path.startswith('/art/'):
+            return web.Response(
+                text=f'<html><head><title>关于{request.path}的通知</title></head><body><p>正文内容。</p></body></html>',
+                content_type='text/html',
+            )
+        return web.Response(status=404)
+
+    def articles(self):
+        """本轮采集请求过的文章页，清空请求记录"""
+        paths = sorted(path for path in self.requests if path.startswith('/art/'))
+        self.requests = []
+        return paths
+
+
+async def _crawl(base):
+    site = {'id': 'site', 'name': '测试站点', 'start_urls': [f"{base}/"]}
+    async with GovTreeCrawler(seen_store=CompactSeenStore()) as crawler:
+        await crawler.crawl_sites([site])
+    return crawler
+
+
+@pytest.fixture
+def discovery_settings(crawl_settings, monkeypatch):
+    monkeypatch.setattr(crawl_settings, 'CRAWL_DISCOVERY_ENABLED', True)
+    return crawl_settings
+
+
+@pytest.mark.asyncio
+async def test_sitemap_cursor_fetches_only_new_entries(memory_db, discovery_settings):
+    site = Site()
+    async with serve(site.handle) as base:
+        site.entries = [(f"{base}/art/2.html", '2024-01-02'), (f"{base}/art/3.html", '2024-01-03')]
+        await _crawl(base)
+        # 有发现源时不从首页遍历，首页链接的 1 号文章不采集
+        assert site.articles() == ['/art/2.html', '/art/3.html']
+
+        site.entries.append((f"{base}/art/4.html", '2024-01-04'))
+        await _crawl(base)
+        assert site.articles() == ['/art/4.html']
+
+        # 没有新条目时不请求任何文章
+        crawler = await _crawl(base)
+        assert site.articles() == []
+        assert crawler.page_outcomes == {}
+
+    state = await memory_db[DISCOVERY_COLLECTION].find_one({'site_id': 'site'})
+    cursor = next(iter(state['cursors']['sitemaps'].values()))
+    assert cursor['last_modified'] == '2024-01-04T00:00:00'
+
+
+@pytest.mark.asyncio
+async def test_sources_without_documents_fall_back_to_seeds(memory_db, discovery_settings):
+    site = Site()
+    async with serve(site.handle) as base:
+        # sitemap 可以访问，但只列出其他主机的页面，全部被链接筛选排除
+        site.entries = [('http://other.gov.cn/art/9.html', '2024-01-02')]
+        for _ in range(2):
+            crawler = await _crawl(base)
+            assert crawler.page_outcomes[f"{base}/"] == 'new'
+            assert site.articles() == ['/art/1.html']
+
+        # sitemap 开始列出本站文档后转为增量发现
+        site.entries = [(f"{base}/art/5.html", '2024-01-05')]
+        await _crawl(base)
+        assert site.articles() == ['/art/5.html']
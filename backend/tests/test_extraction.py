@@ -0,0 +1,103 @@
+"""
+页面提取引擎测试
+路径: /mnt/okcomputer/output/backend/tests/test_extraction.py
+"""
+
+import random
+from datetime import datetime
+
+import pytest
+
+from benchmarks.gov_pages import generate_corpus, render_detail_page
+from workers.services.extraction import SoupExtractionEngine, get_engine, match_date, parse_date
+
+pytest.importorskip('lxml')
+
+COMPARED_FIELDS = ('title', 'content', 'metadata', 'links', 'matched')
+
+# 选择器命中的正文不足100字时视为误中，回退到body
+ARTICLE = '第一条 为规范市级专项资金管理，提高资金使用效益，根据有关规定，结合本市实际，制定本办法。' * 3
+
+EDGE_PAGES = [
+    # 没有命中任何正文选择器，回退到 body，脚本和样式不计入正文
+    '<html><head><title>关于印发实施方案的通知</title><script>var a = 1;</script></head>'
+    '<body><div class="nav"><a href="/index.html">首页</a></div><style>p {}</style>'
+    '<div class="main"><p>第一段。</p><p>第二段。</p></div><span>发布时间：2024年3月5日</span></body></html>',
+    # 自定义选择器和链接范围
+    '<html><body><h2 class="doc-title">市级专项资金管理办法</h2><div id="zoom"><p>' + ARTICLE + '</p></div>'
+    '<div class="info">2024/03/05 10:30</div><ul class="list"><li><a href="/art/1.html">一</a></li></ul>'
+    '<a href="/other.html">其他</a></body></html>',
+    # meta 关键词和描述
+    '<html><head><meta name="keywords" content="补贴,申报"><meta name="description" content="申报指南">'
+    '<title>申报指南</title></head><body><div class="content">正文内容</div>'
+    '<div class="date">05-03-2024</div></body></html>',
+]
+
+CUSTOM_CONFIG = {
+    'selectors': {'title': '.doc-title', 'content': '#zoom', 'date': '.info', 'links': '.list a'},
+}
+
+
+def _assert_same(expected, actual):
+    for field in COMPARED_FIELDS:
+        assert expected[field] == actual[field], field
+    assert expected['publish_date'].date() == actual['publish_date'].date()
+
+
+@pytest.mark.parametrize('html', generate_corpus(20, seed=7))
+def test_lxml_matches_soup_on_generated_pages(html):
+    _assert_same(SoupExtractionEngine().extract(html, {}), get_engine('lxml').extract(html, {}))
+
+
+@pytest.mark.parametrize('html', EDGE_PAGES)
+@pytest.mark.parametrize('config', [{}, CUSTOM_CONFIG])
+def test_lxml_matches_soup_on_edge_cases(html, config):
+    _assert_same(SoupExtractionEngine().extract(html, config), get_engine('lxml').extract(html, config))
+
+
+@pytest.mark.parametrize('name', ['bs4', 'lxml'])
+def test_custom_selectors(name):
+    extracted = get_engine(name).extract(EDGE_PAGES[1], CUSTOM_CONFIG)
+
+    assert extracted['title'] == '市级专项资金管理办法'
+    assert extracted['content'] == ARTICLE
+    assert extracted['matched']['content'] == '#zoom'
+    assert extracted['publish_date'] == datetime(2024, 3, 5, 10, 30)
+    assert extracted['links'] == ['/art/1.html']
+    assert extracted['matched']['title'] == '.doc-title'
+
+
+@pytest.mark.parametrize('name', ['bs4', 'lxml'])
+def test_body_fallback_skips_scripts(name):
+    extracted = get_engine(name).extract(EDGE_PAGES[0], {})
+
+    assert 'var a' not in extracted['content']
+    assert '第一段。' in extracted['content'] and '第二段。' in extracted['content']
+    assert extracted['matched'].get('content') is None
+    assert extracted['matched']['title'] == 'title'
+
+
+def test_generated_page_fields():
+    html = render_detail_page(random.Random(1), 3)
+    extracted = get_engine('lxml').extract(html, {})
+
+    assert '第3号' in extracted['title']
+    assert extracted['content']
+    assert extracted['matched']['date_format'] in ('ymd', 'dmy')
+
+
+@pytest.mark.parametrize('text, expected, fmt', [
+    ('发布日期：2024年1月2日', datetime(2024, 1, 2), 'ymd'),
+    ('2024-01-02 08:30:15', datetime(2024, 1, 2, 8, 30, 15), 'ymd'),
+    ('2024.1.2', datetime(2024, 1, 2), 'ymd'),
+    ('02/01/2024', datetime(2024, 1, 2), 'dmy'),
+    ('第12/3号文', None, None),
+    ('2024-13-40', None, None),
+])
+def test_match_date(text, expected, fmt):
+    assert match_date(text) == (expected, fmt)
+
+
+def test_known_date_format_is_tried_first():
+    assert parse_date('02/01/2024', 'dmy') == datetime(2024, 1, 2)
+    assert match_date('2024-01-02', 'dmy') == (datetime(2024, 1, 2), 'ymd')
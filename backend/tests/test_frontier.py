@@ -0,0 +1,104 @@
+"""
+URL采集队列和并发采集测试
+路径: /mnt/okcomputer/output/backend/tests/test_frontier.py
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.config import settings
+from workers.services.crawler import GovTreeCrawler
+from workers.services.frontier import CrawlFrontier
+from workers.services.seen_store import CompactSeenStore
+
+SITE = {'id': 'site', 'name': '测试站点', 'start_urls': ['http://a.gov.cn/'], 'discovery': False}
+
+
+@pytest.mark.asyncio
+async def test_one_request_in_flight_per_host():
+    frontier = CrawlFrontier(delay=0)
+    for index in range(3):
+        frontier.push(f"http://a.gov.cn/{index}", SITE)
+    frontier.push('http://b.gov.cn/0', SITE)
+
+    first = await frontier.pop()
+    second = await frontier.pop()
+    assert {first.host, second.host} == {'a.gov.cn', 'b.gov.cn'}
+
+    # a.gov.cn 的时间槽被占用，释放前取不到它的下一个URL
+    third = asyncio.ensure_future(frontier.pop())
+    await asyncio.sleep(0.02)
+    assert not third.done()
+
+    frontier.done(first if first.host == 'a.gov.cn' else second, delay=0)
+    assert (await asyncio.wait_for(third, 1)).url == 'http://a.gov.cn/1'
+
+
+@pytest.mark.asyncio
+async def test_delay_between_requests_to_same_host():
+    frontier = CrawlFrontier(delay=0)
+    frontier.push('http://a.gov.cn/0', SITE)
+    frontier.push('http://a.gov.cn/1', SITE)
+
+    item = await frontier.pop()
+    frontier.done(item, delay=0.1)
+    started = time.monotonic()
+    await frontier.pop()
+    assert time.monotonic() - started >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_duplicate_urls_are_enqueued_once():
+    frontier = CrawlFrontier(delay=0)
+    assert frontier.push('http://a.gov.cn/0', SITE)
+    assert not frontier.push('http://a.gov.cn/0', SITE)
+    assert len(frontier) == 1
+
+
+@pytest.mark.asyncio
+async def test_waiting_workers_exit_when_queue_drains():
+    frontier = CrawlFrontier(delay=0)
+    frontier.push('http://a.gov.cn/0', SITE)
+    item = await frontier.pop()
+
+    # 队列为空但还有在途请求时，其他协程等待它发现的新URL
+    waiter = asyncio.ensure_future(frontier.pop())
+    await asyncio.sleep(0.02)
+    assert not waiter.done()
+
+    frontier.done(item, delay=0)
+    assert await asyncio.wait_for(waiter, 1) is None
+
+
+@pytest.mark.asyncio
+async def test_single_seed_crawl_uses_full_concurrency(memory_db, monkeypatch):
+    monkeypatch.setattr(settings, 'CRAWL_DISCOVERY_ENABLED', False)
+    monkeypatch.setattr(settings, 'CRAWL_SITE_PROFILE_ENABLED', False)
+    monkeypatch.setattr(settings, 'CRAWL_TEMPLATE_ENABLED', False)
+    monkeypatch.setattr(settings, 'CRAWL_ARCHIVE_ENABLED', False)
+    monkeypatch.setattr(settings, 'CRAWL_DELAY', 0)
+
+    class FakeCrawler(GovTreeCrawler):
+        in_flight = 0
+        peak = 0
+
+        async def _fetch_page(self, url, config):
+            FakeCrawler.in_flight += 1
+            FakeCrawler.peak = max(FakeCrawler.peak, FakeCrawler.in_flight)
+            await asyncio.sleep(0.01)
+            FakeCrawler.in_flight -= 1
+            self.page_outcomes[url] = 'new'
+            if url == SITE['start_urls'][0]:
+                # 入口页链向多个主机，各主机的时间槽互不影响
+                return None, [f"http://h{index}.gov.cn/art/{index}.html" for index in range(8)]
+            return None, []
+
+    crawler = FakeCrawler(seen_store=CompactSeenStore())
+    crawler.concurrency = 8
+    crawler._select_links = lambda page_url, links, config: links
+
+    await crawler.crawl_sites([SITE])
+
+    assert FakeCrawler.peak == 8
@@ -0,0 +1,91 @@
+"""
+模拟政府网站服务与采集基准测试的冒烟测试
+路径: /mnt/okcomputer/output/backend/tests/test_gov_site_server.py
+"""
+
+import aiohttp
+import pytest
+import pytest_asyncio
+
+from benchmarks.bench_crawl import percentile, run_crawler
+from benchmarks.gov_site_server import LISTING_SIZE, GovSiteServer, ServerProcess, listing_path, page_path
+from workers.services.response_reader import decode_html
+
+PAGES = 25
+
+
+@pytest_asyncio.fixture
+async def server():
+    # 0号 UTF-8，1号 GBK，5号按比例返回500/429
+    gov_sites = GovSiteServer(sites=6, pages=PAGES)
+    await gov_sites.start()
+    yield gov_sites
+    await gov_sites.stop()
+
+
+def base(gov_sites: GovSiteServer, site: int) -> str:
+    return f"http://127.0.0.1:{gov_sites.ports[site]}"
+
+
+@pytest.mark.asyncio
+async def test_listing_pages_are_newest_first_and_paginated(server):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(base(server, 0) + listing_path(0)) as response:
+            html = await response.text()
+        assert page_path(PAGES - 1) in html
+        assert page_path(PAGES - LISTING_SIZE - 1) not in html
+        assert listing_path(1) in html
+
+        async with session.get(base(server, 0) + listing_path(1)) as response:
+            assert listing_path(2) not in await response.text()
+        async with session.get(base(server, 0) + listing_path(2)) as response:
+            assert response.status == 404
+
+
+@pytest.mark.asyncio
+async def test_gbk_site_serves_gbk_bytes(server):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(base(server, 1) + page_path(3)) as response:
+            assert 'charset=gbk' in response.headers['Content-Type']
+            body = await response.read()
+
+    with pytest.raises(UnicodeDecodeError):
+        body.decode('utf-8')
+    html, encoding = decode_html(body, response.headers['Content-Type'])
+    assert encoding == 'gb18030'
+    assert '模拟1号人民政府' in html
+
+
+@pytest.mark.asyncio
+async def test_erroring_site_returns_server_errors(server):
+    statuses = []
+    async with aiohttp.ClientSession() as session:
+        for index in range(PAGES):
+            async with session.get(base(server, 5) + page_path(index)) as response:
+                statuses.append(response.status)
+    assert 200 in statuses
+    assert {500, 429} & set(statuses)
+
+
+@pytest.mark.asyncio
+async def test_crawl_benchmark_saves_every_page(memory_db, crawl_settings, monkeypatch):
+    monkeypatch.setattr(crawl_settings, 'CRAWL_MAX_DEPTH', 6)
+    monkeypatch.setattr(crawl_settings, 'CRAWL_MAX_PAGES_PER_SITE', PAGES + PAGES // LISTING_SIZE + 1)
+
+    with ServerProcess(sites=2, pages=PAGES) as gov_sites:
+        result = await run_crawler(gov_sites.site_configs())
+
+    assert result['saved']['errors'] == 0
+    assert result['saved']['inserted'] >= 2 * PAGES
+    # GBK 站点的正文经编码识别后正确入库
+    port = gov_sites.ports[1]
+    gbk_page = await memory_db.raw_pages.find_one({'url': f"http://127.0.0.1:{port}{page_path(3)}"})
+    assert '（第3号）' in gbk_page['title']
+    assert '\ufffd' not in gbk_page['content']
+
+
+def test_percentile():
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 50) == 51.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 50) is None
@@ -0,0 +1,166 @@
+"""
+按主机分片的采集队列测试
+路径: /mnt/okcomputer/output/backend/tests/test_host_sharding.py
+"""
+
+import math
+
+import fakeredis
+import pytest
+import redis
+
+from app.config import settings
+from workers.services import host_sharding
+from workers.services.host_sharding import (
+    HashRing,
+    ShardBalancer,
+    assign_shards,
+    group_sites_by_queue,
+    queue_for_host,
+    shard_queues,
+)
+
+HOSTS = [f"www.county{index}.gov.cn" for index in range(2000)]
+
+
+@pytest.fixture
+def shards(monkeypatch):
+    monkeypatch.setattr(settings, 'CRAWL_SHARDS', 16)
+    monkeypatch.setattr(settings, 'CRAWL_QUEUE', 'crawl')
+    monkeypatch.setattr(host_sharding, '_shard_ring', None)
+
+
+def test_ring_moves_about_one_nth_of_keys_when_node_joins():
+    ring = HashRing([f"node{index}" for index in range(4)])
+    before = {host: ring.node_for(host) for host in HOSTS}
+    ring.add('node4')
+    after = {host: ring.node_for(host) for host in HOSTS}
+
+    moved = [host for host in HOSTS if before[host] != after[host]]
+    # 只有归属新节点的键会移动，约占 1/5
+    assert all(after[host] == 'node4' for host in moved)
+    assert 0.1 < len(moved) / len(HOSTS) < 0.3
+
+
+def test_ring_remove_only_moves_the_removed_nodes_keys():
+    ring = HashRing([f"node{index}" for index in range(4)])
+    before = {host: ring.node_for(host) for host in HOSTS}
+    ring.remove('node2')
+
+    for host in HOSTS:
+        if before[host] != 'node2':
+            assert ring.node_for(host) == before[host]
+        else:
+            assert ring.node_for(host) != 'node2'
+
+
+def test_walk_yields_each_node_once():
+    ring = HashRing(['a', 'b', 'c'])
+    assert sorted(ring.walk('www.gov.cn')) == ['a', 'b', 'c']
+    assert list(HashRing().walk('www.gov.cn')) == []
+    assert HashRing().node_for('www.gov.cn') is None
+
+
+def test_queue_for_host_is_stable_and_case_insensitive(shards):
+    queue = queue_for_host('WWW.Beijing.GOV.cn')
+    assert queue == queue_for_host('www.beijing.gov.cn')
+    assert queue in shard_queues()
+    assert shard_queues()[:2] == ['crawl.00', 'crawl.01']
+
+
+def test_sharding_disabled_uses_main_queue(shards, monkeypatch):
+    monkeypatch.setattr(settings, 'CRAWL_SHARDS', 0)
+    assert queue_for_host('www.beijing.gov.cn') == 'crawl'
+
+
+def test_sites_on_same_host_share_a_queue(shards):
+    sites = [
+        {'id': 'a', 'start_urls': ['http://www.sh.gov.cn/zcwj/']},
+        {'id': 'b', 'start_urls': ['http://www.sh.gov.cn/tzgg/']},
+        {'id': 'c', 'start_urls': []},
+    ]
+    groups = group_sites_by_queue(sites)
+    queue = queue_for_host('www.sh.gov.cn')
+    assert [site['id'] for site in groups[queue]] == ['a', 'b']
+    assert [site['id'] for site in groups['crawl']] == ['c']
+
+
+def test_assign_shards_bounded_and_complete():
+    queues = shard_queues(16)
+    members = [f"worker{index}@host" for index in range(5)]
+    assignment = assign_shards(members, queues)
+
+    assigned = [queue for owned in assignment.values() for queue in owned]
+    assert sorted(assigned) == queues
+    assert max(len(owned) for owned in assignment.values()) <= math.ceil(16 / 5)
+    # 成员顺序不影响结果，各节点独立计算得到同样的分配
+    assert assign_shards(list(reversed(members)), queues) == assignment
+    assert assign_shards([], queues) == {}
+
+
+def test_assign_shards_mostly_stable_when_member_leaves():
+    queues = shard_queues(16)
+    members = [f"worker{index}@host" for index in range(4)]
+    before = assign_shards(members, queues)
+    after = assign_shards(members[:-1], queues)
+
+    owner_before = {queue: node for node, owned in before.items() for queue in owned}
+    owner_after = {queue: node for node, owned in after.items() for queue in owned}
+    moved = [queue for queue in queues if owner_before[queue] != owner_after[queue]]
+    assert set(before[members[-1]]) <= set(moved)
+    # 有界负载会带动少量分片连锁换主，但大部分分片保持原主
+    assert len(moved) < len(queues) / 2
+
+
+class FakeControl:
+    def __init__(self):
+        self.added = []
+        self.cancelled = []
+
+    def add_consumer(self, queue, destination=None, reply=False):
+        self.added.append(queue)
+
+    def cancel_consumer(self, queue, destination=None, reply=False):
+        self.cancelled.append(queue)
+
+
+class FakeApp:
+    def __init__(self):
+        self.control = FakeControl()
+
+
+def balancer(name: str, client) -> ShardBalancer:
+    instance = ShardBalancer(FakeApp(), name, interval=30)
+    instance._client = client
+    return instance
+
+
+def test_balancers_split_shards_and_rebalance_on_join(shards):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    first = balancer('worker1@a', client)
+    first.rebalance()
+    assert first.owned == set(shard_queues())
+
+    second = balancer('worker2@b', client)
+    second.rebalance()
+    first.rebalance()
+
+    assert first.owned | second.owned == set(shard_queues())
+    assert not first.owned & second.owned
+    assert sorted(first.app.control.cancelled) == sorted(second.owned)
+
+    # 节点离开后其余节点接管全部分片
+    second.stop()
+    first.rebalance()
+    assert first.owned == set(shard_queues())
+
+
+def test_balancer_consumes_everything_without_redis(shards):
+    class BrokenRedis:
+        def pipeline(self):
+            raise redis.ConnectionError('redis down')
+
+    instance = balancer('worker1@a', BrokenRedis())
+    instance.rebalance()
+    assert instance.owned == set(shard_queues())
+    assert sorted(instance.app.control.added) == shard_queues()
@@ -0,0 +1,160 @@
+"""
+原始HTML归档与重新提取测试
+路径: /mnt/okcomputer/output/backend/tests/test_html_archive.py
+"""
+
+import os
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from benchmarks.gov_pages import render_detail_page
+from workers.services.html_archive import (
+    RECORD_HEADER,
+    ArchiveError,
+    HtmlArchive,
+    archive_node,
+    parse_record,
+    read_record,
+    scan_segment,
+    segment_node,
+)
+from workers.services.reextraction import ReextractionJob, archive_nodes
+
+SITE = {
+    'id': 'site',
+    'name': '测试站点',
+    'selectors': {'title': ['h1'], 'content': ['.pages_content'], 'date': ['.date']},
+}
+
+
+@pytest.fixture
+def archive_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'CRAWL_ARCHIVE_DIR', str(tmp_path))
+    monkeypatch.setattr(settings, 'CRAWL_SITE_PROFILE_ENABLED', False)
+    monkeypatch.setattr(settings, 'CRAWL_TEMPLATE_ENABLED', False)
+    return tmp_path
+
+
+def test_round_trip(tmp_path):
+    archive = HtmlArchive(str(tmp_path))
+    body = '<html><body>关于印发通知</body></html>'.encode('gbk')
+    pointer = archive.append('http://a.gov.cn/1.htm', body, content_type='text/html; charset=gbk')
+    archive.flush()
+
+    assert pointer['node'] == archive_node()
+    assert segment_node(pointer['segment']) == archive_node()
+    meta, stored = read_record(str(tmp_path), pointer['segment'], pointer['offset'], pointer['length'])
+    assert stored == body
+    assert meta['url'] == 'http://a.gov.cn/1.htm'
+    assert meta['content_type'] == 'text/html; charset=gbk'
+    archive.close()
+
+
+def test_segments_roll_over_and_scan_in_order(tmp_path):
+    archive = HtmlArchive(str(tmp_path), segment_bytes=1)
+    pointers = [archive.append(f"http://a.gov.cn/{index}.htm", os.urandom(200)) for index in range(3)]
+    archive.close()
+
+    assert len({pointer['segment'] for pointer in pointers}) == 3
+    records = list(scan_segment(os.path.join(str(tmp_path), pointers[1]['segment'])))
+    assert [(offset, meta['url']) for offset, meta, _ in records] == [(0, 'http://a.gov.cn/1.htm')]
+
+
+def test_scan_ignores_truncated_tail(tmp_path):
+    archive = HtmlArchive(str(tmp_path))
+    first = archive.append('http://a.gov.cn/1.htm', b'first')
+    archive.append('http://a.gov.cn/2.htm', b'second' * 100)
+    archive.close()
+
+    path = os.path.join(str(tmp_path), first['segment'])
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 10)
+    assert [meta['url'] for _, meta, _ in scan_segment(path)] == ['http://a.gov.cn/1.htm']
+
+
+def test_corrupt_records_raise():
+    with pytest.raises(ArchiveError):
+        parse_record(b'PPA')
+    with pytest.raises(ArchiveError):
+        parse_record(RECORD_HEADER.pack(b'XXXX', 1, 4) + b'abcd')
+
+
+@pytest.mark.parametrize('segment, node', [
+    ('segment-20240101120000-worker1-123-0001.ppa', 'worker1'),
+    ('segment-20240101120000-ip-10-0-0-1-123-0001.ppa', 'ip-10-0-0-1'),
+    ('other.ppa', None),
+])
+def test_segment_node(segment, node):
+    assert segment_node(segment) == node
+
+
+async def _archive_pages(memory_db, directory: str, count: int):
+    """归档 count 个详情页并写入带指针的文档，正文先置为旧内容"""
+    archive = HtmlArchive(directory)
+    for index in range(count):
+        url = f"http://a.gov.cn/content_{index}.htm"
+        html = render_detail_page(random.Random(index), index)
+        pointer = archive.append(url, html.encode('utf-8'), content_type='text/html; charset=utf-8')
+        pointer = dict(pointer, site_id='site', content_type='text/html; charset=utf-8')
+        await memory_db.raw_pages.insert_one({
+            'url': url,
+            'title': 'old',
+            'content': 'old',
+            'status': 'processed',
+            'crawl_date': datetime.utcnow(),
+            'archive': pointer,
+        })
+    archive.close()
+
+
+@pytest.mark.asyncio
+async def test_reextraction_updates_changed_documents(memory_db, archive_settings):
+    await _archive_pages(memory_db, str(archive_settings), 5)
+
+    counts = await ReextractionJob([SITE], workers=2).run(since=datetime.utcnow() - timedelta(days=1))
+
+    assert counts['scanned'] == counts['extracted'] == counts['updated'] == 5
+    assert counts['missing'] == 0
+    doc = await memory_db.raw_pages.find_one({'url': 'http://a.gov.cn/content_0.htm'})
+    assert doc['status'] == 'pending'
+    assert doc['title'] != 'old' and '（第0号）' in doc['title']
+    assert 'reextracted_at' in doc
+
+
+@pytest.mark.asyncio
+async def test_missing_segments_are_counted(memory_db, archive_settings):
+    await _archive_pages(memory_db, str(archive_settings), 3)
+    for name in os.listdir(str(archive_settings)):
+        os.unlink(os.path.join(str(archive_settings), name))
+
+    counts = await ReextractionJob([SITE], workers=1).run()
+    assert counts['missing'] == 3
+    assert counts['extracted'] == 0
+
+
+@pytest.mark.asyncio
+async def test_node_job_only_reads_its_own_records(memory_db, archive_settings):
+    await _archive_pages(memory_db, str(archive_settings), 2)
+    # 其他节点写的归档（本地不存在该段文件）
+    await memory_db.raw_pages.insert_one({
+        'url': 'http://b.gov.cn/1.htm',
+        'crawl_date': datetime.utcnow(),
+        'archive': {
+            'segment': 'segment-20240101000000-other-node-1-0001.ppa', 'offset': 0, 'length': 10,
+            'node': 'other-node', 'site_id': 'site',
+        },
+    })
+    # 早期没有 node 字段的指针按段文件名归属本节点
+    legacy = await memory_db.raw_pages.find_one({'url': 'http://a.gov.cn/content_1.htm'})
+    legacy['archive'].pop('node')
+    await memory_db.raw_pages.update_one({'url': legacy['url']}, {'$set': {'archive': legacy['archive']}})
+
+    counts = await ReextractionJob([SITE], workers=1, node=archive_node()).run()
+    assert counts['scanned'] == counts['extracted'] == 2
+    assert counts['missing'] == 0
+
+    assert await archive_nodes() == sorted([archive_node(), 'other-node'])
+    assert await archive_nodes(site_ids=['nope']) == []
@@ -0,0 +1,247 @@
+"""
+双视角解读测试
+路径: /mnt/okcomputer/output/backend/tests/test_interpretation.py
+"""
+
+import json
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.config import settings
+from workers.services.interpretation import BatchInterpreter, InterpretationItem, interpret_pending
+from workers.services.llm_dispatcher import supports_json_mode
+from workers.tasks import analyze_tasks
+
+REQUEST = httpx.Request('POST', 'http://llm.test/v1/chat/completions')
+
+
+class CharEstimator:
+    """每个字符计一个token"""
+
+    def count(self, text):
+        return len(text)
+
+
+class FakeClient:
+    """按请求中的文档依次调用 handler 的模拟客户端"""
+
+    cache = None
+
+    def __init__(self, handler, model='gpt-4', wrap='{}', reject_json_mode=False):
+        self.dispatcher = SimpleNamespace(estimator=CharEstimator())
+        self.handler = handler
+        self.model = model
+        self.wrap = wrap
+        self.reject_json_mode = reject_json_mode
+        self.calls = []
+        self.json_modes = []
+
+    async def complete(self, messages, prompt_version, max_tokens=None, json_mode=False, use_cache=True):
+        self.json_modes.append(json_mode)
+        if json_mode and self.reject_json_mode:
+            # 与不支持JSON模式的模型返回的错误一致
+            raise openai.BadRequestError(
+                "Invalid parameter: 'response_format' of type 'json_object' is not supported with this model.",
+                response=httpx.Response(400, request=REQUEST),
+                body=None
+            )
+        documents = json.loads(messages[-1]['content'])['documents']
+        self.calls.append((documents, max_tokens))
+        return self.wrap.format(json.dumps({'results': self.handler(documents)}))
+
+
+def item(doc_id):
+    return {
+        'id': doc_id,
+        'aggressive': {'summary': '积极', 'signals': ['opportunity'], 'confidence': 0.8},
+        'conservative': {'summary': '审慎', 'signals': ['risk'], 'confidence': 0.6},
+        'key_points': ['要点'],
+        'risk_level': 'low',
+        'opportunity': '可关注',
+    }
+
+
+def valid(documents):
+    return [item(document['id']) for document in documents]
+
+
+def docs(count, length=100):
+    return [{'_id': f"doc{index}", 'title': '', 'content': f"{index}" * length} for index in range(count)]
+
+
+def test_item_id_accepts_integers():
+    assert InterpretationItem.model_validate(item(1)).id == 1
+
+
+def test_pack_budgets_output_against_context_window(monkeypatch):
+    monkeypatch.setattr(settings, 'LLM_CONTEXT_TOKENS', 3000)
+    interpreter = BatchInterpreter(FakeClient(valid), input_tokens=100000, max_docs=20, output_tokens=500)
+    pending = [interpreter._prepare(doc) for doc in docs(10)]
+
+    batches = interpreter.pack(pending)
+
+    assert sum(len(batch) for batch in batches) == 10
+    for batch in batches:
+        used = interpreter.system_tokens + sum(entry.tokens for entry in batch) + 500 * len(batch)
+        assert used <= 3000
+    assert max(len(batch) for batch in batches) > 1
+
+
+def test_pack_respects_input_budget_and_max_docs():
+    interpreter = BatchInterpreter(FakeClient(valid), max_docs=3, output_tokens=10)
+    interpreter.input_tokens = interpreter.system_tokens + 300
+    pending = [interpreter._prepare(doc) for doc in docs(7)]
+
+    batches = interpreter.pack(pending)
+
+    assert [len(batch) for batch in batches] == [2, 2, 2, 1]
+    interpreter.input_tokens = 100000
+    assert [len(batch) for batch in interpreter.pack(pending)] == [3, 3, 1]
+
+
+@pytest.mark.asyncio
+async def test_invalid_items_are_split_out_and_retried():
+    def handler(documents):
+        # 合并请求时第一篇缺字段，单独请求时正常
+        results = valid(documents)
+        if len(documents) > 1:
+            del results[0]['risk_level']
+        return results
+
+    client = FakeClient(handler)
+    interpreter = BatchInterpreter(client, max_docs=4)
+
+    results, errors, deferred = await interpreter.interpret(docs(4))
+
+    assert sorted(results) == ['doc0', 'doc1', 'doc2', 'doc3']
+    assert not errors and not deferred
+    assert [len(documents) for documents, _ in client.calls] == [4, 1]
+    assert client.calls[0][1] == interpreter.output_tokens * 4
+
+
+@pytest.mark.asyncio
+async def test_rejected_request_is_split_and_bad_document_fails():
+    def handler(documents):
+        if len(documents) > 1 or documents[0]['content'].startswith('2'):
+            raise openai.BadRequestError(
+                'context_length_exceeded', response=httpx.Response(400, request=REQUEST), body=None
+            )
+        return valid(documents)
+
+    interpreter = BatchInterpreter(FakeClient(handler), max_docs=4)
+
+    results, errors, deferred = await interpreter.interpret(docs(4))
+
+    assert sorted(results) == ['doc0', 'doc1', 'doc3']
+    assert list(errors) == ['doc2']
+    assert not deferred
+    assert interpreter.stats['split'] == 4
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_deferred_not_failed():
+    def handler(documents):
+        raise openai.APIConnectionError(request=REQUEST)
+
+    interpreter = BatchInterpreter(FakeClient(handler), max_docs=4)
+
+    results, errors, deferred = await interpreter.interpret(docs(3))
+
+    assert not results and not errors
+    assert sorted(deferred) == ['doc0', 'doc1', 'doc2']
+
+
+@pytest.mark.asyncio
+async def test_interpret_pending_leaves_transient_failures_for_retry(memory_db, monkeypatch):
+    monkeypatch.setattr(settings, 'PIPELINE_MAX_ATTEMPTS', 2)
+    monkeypatch.setattr(settings, 'LLM_BATCH_MAX_DOCS', 1)
+    for doc in docs(2):
+        await memory_db.cleaned_docs.insert_one(doc)
+
+    def handler(documents):
+        if documents[0]['content'].startswith('1'):
+            raise openai.InternalServerError('overloaded', response=httpx.Response(503, request=REQUEST), body=None)
+        return valid(documents)
+
+    client = FakeClient(handler)
+    assert await interpret_pending(client, batch_size=2) == {'analyzed': 1, 'failed': 0, 'deferred': 1}
+    assert await memory_db.insights.count_documents({'docId': 'doc0'}) == 1
+
+    # 临时故障的文档可以重新认领，认领次数用尽后置为失败
+    assert await interpret_pending(client, batch_size=2) == {'analyzed': 0, 'failed': 0, 'deferred': 1}
+    assert await interpret_pending(client, batch_size=2) == {'analyzed': 0, 'failed': 0, 'deferred': 0}
+    doc = await memory_db.cleaned_docs.find_one({'_id': 'doc1'})
+    assert doc['analysis_status'] == 'failed'
+
+
+def test_json_mode_follows_model_capability(monkeypatch):
+    assert not supports_json_mode('gpt-4')
+    assert not supports_json_mode('gpt-4-0613')
+    assert not supports_json_mode('gpt-3.5-turbo-0613')
+    assert not supports_json_mode('qwen-max')
+    assert supports_json_mode('gpt-3.5-turbo')
+    assert supports_json_mode('gpt-4-turbo-2024-04-09')
+    assert supports_json_mode('gpt-4o-mini')
+
+    monkeypatch.setattr(settings, 'LLM_JSON_MODE', 'on')
+    assert supports_json_mode('qwen-max')
+    monkeypatch.setattr(settings, 'LLM_JSON_MODE', 'off')
+    assert not supports_json_mode('gpt-4o')
+
+
+def test_parse_tolerates_fenced_json():
+    payload = json.dumps({'results': [item(1)]}, ensure_ascii=False)
+
+    for content in (payload, f"```json\n{payload}\n```", f"解读结果如下：\n{payload}\n以上。"):
+        items, problem = BatchInterpreter._parse(content)
+        assert problem is None
+        assert list(items) == ['1']
+
+    assert BatchInterpreter._parse('无法解读')[1].startswith('invalid JSON')
+    assert BatchInterpreter._parse('```json\n{"results": [\n```')[1].startswith('invalid JSON')
+
+
+@pytest.mark.asyncio
+async def test_default_model_is_not_sent_json_mode():
+    client = FakeClient(valid, wrap='```json\n{}\n```', reject_json_mode=True)
+    interpreter = BatchInterpreter(client, max_docs=4)
+
+    results, errors, deferred = await interpreter.interpret(docs(3))
+
+    assert sorted(results) == ['doc0', 'doc1', 'doc2']
+    assert not errors and not deferred
+    assert client.json_modes == [False]
+
+
+@pytest.mark.asyncio
+async def test_rejected_json_mode_falls_back_to_prompt_only():
+    client = FakeClient(valid, model='gpt-4o', reject_json_mode=True)
+    interpreter = BatchInterpreter(client, max_docs=4)
+
+    results, errors, deferred = await interpreter.interpret(docs(3))
+
+    assert sorted(results) == ['doc0', 'doc1', 'doc2']
+    assert not errors and not deferred
+    # 关闭JSON模式后整批重试，不拆分
+    assert client.json_modes == [True, False]
+    assert interpreter.stats['split'] == 0
+    await interpreter.interpret(docs(1))
+    assert client.json_modes[-1] is False
+
+
+@pytest.mark.asyncio
+async def test_analyze_task_drains_pending_documents(memory_db, monkeypatch):
+    monkeypatch.setattr(settings, 'PIPELINE_BATCH_SIZE', 2)
+    for doc in docs(5):
+        await memory_db.cleaned_docs.insert_one(doc)
+    client = FakeClient(valid)
+    monkeypatch.setattr(analyze_tasks, '_get_client', lambda: client)
+
+    totals = await analyze_tasks._run_analyze()
+
+    assert totals == {'analyzed': 5, 'failed': 0, 'deferred': 0, 'batches': 3}
+    assert await memory_db.insights.count_documents({}) == 5
+    assert await analyze_tasks._run_analyze() == {'analyzed': 0, 'failed': 0, 'deferred': 0, 'batches': 0}
@@ -0,0 +1,87 @@
+"""
+大模型配额桶测试
+路径: /mnt/okcomputer/output/backend/tests/test_llm_budget.py
+"""
+
+import pytest
+
+from app.database.redis import redisdb
+from workers.services import llm_dispatcher
+from workers.services.llm_dispatcher import BURST_SECONDS, LLMDispatcher, LocalBudget
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_dispatcher.time, 'monotonic', clock)
+    return clock
+
+
+def test_request_within_capacity_is_charged(clock):
+    budget = LocalBudget(rpm=600, tpm=600)
+    assert budget.token_capacity == 10 * BURST_SECONDS
+    assert budget.acquire(40) == 0
+    assert budget.tokens == 60
+    assert budget.acquire(80) == pytest.approx(2.0)
+    assert budget.tokens == 60
+
+
+def test_request_over_capacity_waits_for_full_bucket_and_goes_into_debt(clock):
+    budget = LocalBudget(rpm=600, tpm=600)
+    budget.acquire(50)
+    # 超过容量的请求等到桶满为止，而不是永远等不到
+    assert budget.acquire(250) == pytest.approx(5.0)
+    clock.now += 5
+    assert budget.acquire(250) == 0
+    assert budget.tokens == pytest.approx(-150)
+    # 欠账还清前后面的请求都要等
+    assert budget.acquire(10) == pytest.approx(16.0)
+    clock.now += 16
+    assert budget.acquire(10) == 0
+
+
+def test_sustained_large_requests_stay_within_tpm(clock):
+    budget = LocalBudget(rpm=6000, tpm=600)
+    charged = 0
+    while clock.now < 1000.0 + 600:
+        wait = budget.acquire(250)
+        if wait:
+            clock.now += wait
+        else:
+            charged += 250
+    # 十分钟内放行的token不超过十分钟的配额加一个桶的突发
+    assert charged <= 600 * 10 + budget.token_capacity + 250
+
+
+def test_settle_refund_is_capped_at_capacity(clock):
+    budget = LocalBudget(rpm=600, tpm=600)
+    budget.acquire(30)
+    budget.settle(50)
+    assert budget.tokens == budget.token_capacity
+    budget.settle(-20)
+    assert budget.tokens == budget.token_capacity - 20
+
+
+@pytest.mark.asyncio
+async def test_shared_budget_charges_full_cost():
+    pytest.importorskip('lupa')
+    fakeredis = pytest.importorskip('fakeredis')
+    previous = redisdb.client
+    redisdb.client = fakeredis.FakeAsyncRedis()
+    try:
+        dispatcher = LLMDispatcher('test-model', rpm=600, tpm=600)
+        assert await dispatcher._wait_time(250) == 0
+        tokens = float(await redisdb.client.hget(dispatcher.budget_key, 'tokens'))
+        assert tokens == pytest.approx(-150, abs=1)
+        assert await dispatcher._wait_time(10) == pytest.approx(16.0, abs=0.2)
+    finally:
+        await redisdb.client.aclose()
+        redisdb.client = previous
@@ -0,0 +1,114 @@
+"""
+大模型调用结果缓存测试
+路径: /mnt/okcomputer/output/backend/tests/test_llm_cache.py
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fakeredis import FakeAsyncRedis
+
+from app.database.redis import redisdb
+from workers.services import llm_cache
+from workers.services.llm_cache import CACHE_COLLECTION, LLMCache, cache_key, cache_stats
+from workers.services.llm_client import LLMClient
+
+MESSAGES = [{'role': 'system', 'content': '你是政策解读助手'}, {'role': 'user', 'content': '关于开展申报工作的通知'}]
+
+
+@pytest.fixture
+def stats_redis(monkeypatch):
+    client = FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(redisdb, 'client', client)
+    return client
+
+
+def test_key_ignores_layout_but_not_prompt_or_params():
+    relaid = [
+        {'role': 'system', 'content': '你是政策解读助手\n'},
+        {'role': 'user', 'content': '关于开展申报工作的通知　'},
+    ]
+    key = cache_key('gpt-4o-mini', 'v1', MESSAGES)
+    assert cache_key('gpt-4o-mini', 'v1', relaid) == key
+    assert cache_key('gpt-4o-mini', 'v2', MESSAGES) != key
+    assert cache_key('gpt-4o', 'v1', MESSAGES) != key
+    assert cache_key('gpt-4o-mini', 'v1', MESSAGES, {'temperature': 0.7}) != key
+
+
+@pytest.mark.asyncio
+async def test_hit_refreshes_entry_and_counts_saved_tokens(memory_db, stats_redis):
+    cache = LLMCache(max_entries=10)
+    assert await cache.get('k') is None
+
+    await cache.put('k', '{"summary": "申报"}', 'gpt-4o-mini', 'v1', {'total_tokens': 120})
+    assert await cache.get('k') == '{"summary": "申报"}'
+    assert await cache.get('k') == '{"summary": "申报"}'
+
+    doc = await memory_db[CACHE_COLLECTION].find_one({'_id': 'k'})
+    assert doc['hits'] == 2
+    assert cache.stats() == {
+        'hits': 2, 'misses': 1, 'hit_rate': 0.6667, 'stores': 1, 'evictions': 0, 'tokens_saved': 240,
+    }
+    assert await cache_stats() == {'hits': 2, 'misses': 1, 'tokens_saved': 240, 'hit_rate': 0.6667}
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used(memory_db):
+    cache = LLMCache(max_entries=10)
+    collection = memory_db[CACHE_COLLECTION]
+    start = datetime.utcnow() - timedelta(days=1)
+    for index in range(15):
+        await cache.put(f'k{index}', 'r', 'm', 'v1')
+        await collection.update_one({'_id': f'k{index}'}, {'$set': {'last_used': start + timedelta(minutes=index)}})
+    # 最早写入的条目最近被命中过，不淘汰
+    assert await cache.get('k0') == 'r'
+
+    assert await cache.evict() == 5
+    remaining = sorted(int(doc['_id'][1:]) for doc in await collection.find({}).to_list(length=None))
+    assert remaining == [0] + list(range(6, 15))
+    assert await cache.evict() == 0
+
+
+@pytest.mark.asyncio
+async def test_eviction_runs_periodically_with_headroom(memory_db, monkeypatch):
+    monkeypatch.setattr(llm_cache, 'EVICT_CHECK_EVERY', 25)
+    cache = LLMCache(max_entries=20)
+    for index in range(25):
+        await cache.put(f'k{index}', 'r', 'm', 'v1')
+    # 超出5条，另按上限的5%多淘汰1条
+    assert await memory_db[CACHE_COLLECTION].count_documents({}) == 19
+    assert cache.evictions == 6
+
+
+class FakeDispatcher:
+    def __init__(self):
+        self.requests = []
+
+    async def create(self, client, **kwargs):
+        self.requests.append(kwargs)
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(
+            usage=SimpleNamespace(model_dump=lambda: {'total_tokens': 50}),
+            choices=[SimpleNamespace(message=SimpleNamespace(content='解读结果'))],
+        )
+
+
+@pytest.mark.asyncio
+async def test_client_reuses_cached_and_inflight_results(memory_db):
+    dispatcher = FakeDispatcher()
+    client = LLMClient(model='gpt-4o-mini', cache=LLMCache(), client=object(), dispatcher=dispatcher)
+
+    # 同时发起的相同调用只请求一次
+    results = await asyncio.gather(*(client.complete(MESSAGES, 'v1') for _ in range(3)))
+    assert results == ['解读结果'] * 3
+    assert len(dispatcher.requests) == 1
+
+    assert await client.complete(MESSAGES, 'v1') == '解读结果'
+    assert len(dispatcher.requests) == 1
+    assert client.cache.stats()['tokens_saved'] == 50
+
+    await client.complete(MESSAGES, 'v1', use_cache=False)
+    await client.complete(MESSAGES, 'v2')
+    assert len(dispatcher.requests) == 3
@@ -0,0 +1,142 @@
+"""
+近似重复内容检测测试
+路径: /mnt/okcomputer/output/backend/tests/test_near_duplicate.py
+"""
+
+import random
+
+import pytest
+
+from benchmarks.gov_pages import NAV_ITEMS, PHRASES, TITLES, generate_documents
+from workers.services.near_duplicate import (
+    FINGERPRINT_COLLECTION,
+    LSH_BANDS,
+    NearDuplicateIndex,
+    fingerprint_content,
+    hamming_distance,
+    lsh_bands,
+    simhash,
+)
+
+ARTICLE = generate_documents(1, seed=7, min_paragraphs=8, max_paragraphs=8)[0]['content']
+OTHER_ARTICLE = generate_documents(1, seed=8, min_paragraphs=8, max_paragraphs=8)[0]['content']
+
+# 同一站点每页都有的页眉、相关文件和页脚
+HEADER = '，'.join(f"{name}栏目导航" for name in NAV_ITEMS) + '。' + '，'.join(f"{phrase}专题链接" for phrase in PHRASES) + '。'
+RELATED = '相关文件：' + '；'.join(TITLES) + '。'
+FOOTER = (
+    '主办单位：某市人民政府办公室，承办单位：某市大数据中心，网站标识码1234567890，'
+    'ICP备12345678号，公网安备11010502030123号，联系电话010-12345678，建议使用1920×1080分辨率浏览。'
+)
+
+
+def boilerplate_page(notice: str) -> str:
+    return HEADER + notice + RELATED + FOOTER
+
+
+def result(url: str, content: str) -> dict:
+    return {'url': url, 'content': content}
+
+
+def test_short_content_has_no_fingerprint():
+    assert simhash('关于印发通知') is None
+    assert fingerprint_content('') is None
+
+
+def test_formatting_differences_do_not_change_fingerprint():
+    reformatted = ARTICLE.replace('，', ', ').replace('\n', '\n\n  ')
+    assert hamming_distance(simhash(ARTICLE), simhash(reformatted)) == 0
+
+
+def test_small_edits_stay_close_unrelated_articles_do_not():
+    edited = '转载自某省人民政府网站。' + ARTICLE + '（责任编辑：张三）'
+    assert hamming_distance(simhash(ARTICLE), simhash(edited)) <= 3
+    assert hamming_distance(simhash(ARTICLE), simhash(OTHER_ARTICLE)) > 10
+
+
+def test_close_fingerprints_share_an_lsh_band():
+    rng = random.Random(1)
+    fingerprint = simhash(ARTICLE)
+    for _ in range(100):
+        flipped = fingerprint
+        for bit in rng.sample(range(64), 3):
+            flipped ^= 1 << bit
+        assert set(lsh_bands(fingerprint)) & set(lsh_bands(flipped))
+    assert len(lsh_bands(fingerprint)) == LSH_BANDS
+
+
+def test_fingerprint_fits_signed_int64():
+    for seed in range(20):
+        content = generate_documents(1, seed=seed, min_paragraphs=6, max_paragraphs=6)[0]['content']
+        assert -(1 << 63) <= fingerprint_content(content) < (1 << 63)
+
+
+@pytest.mark.asyncio
+async def test_cross_site_reprint_is_duplicate(memory_db):
+    index = NearDuplicateIndex(max_distance=3)
+    original = [result('http://www.gov.cn/zhengce/1.htm', ARTICLE)]
+    assert await index.annotate(original) == 0
+    assert original[0]['duplicate_of'] is None
+
+    reprint = [result('http://www.sh.gov.cn/zcwj/9.htm', '转载自中国政府网。' + ARTICLE)]
+    assert await index.annotate(reprint) == 1
+    assert reprint[0]['status'] == 'duplicate'
+    assert reprint[0]['duplicate_of'] == 'http://www.gov.cn/zhengce/1.htm'
+
+    stored = await memory_db[FINGERPRINT_COLLECTION].find_one({'url': 'http://www.sh.gov.cn/zcwj/9.htm'})
+    assert stored['canonical_url'] == 'http://www.gov.cn/zhengce/1.htm'
+
+
+@pytest.mark.asyncio
+async def test_reprints_within_one_batch(memory_db):
+    batch = [
+        result('http://www.gov.cn/1.htm', ARTICLE),
+        result('http://www.bj.gov.cn/2.htm', ARTICLE),
+        result('http://www.gov.cn/3.htm', OTHER_ARTICLE),
+    ]
+    assert await NearDuplicateIndex().annotate(batch) == 1
+    assert batch[1]['duplicate_of'] == 'http://www.gov.cn/1.htm'
+    assert batch[2]['duplicate_of'] is None
+
+
+@pytest.mark.asyncio
+async def test_refetching_same_url_is_not_duplicate(memory_db):
+    index = NearDuplicateIndex()
+    await index.annotate([result('http://www.gov.cn/1.htm', ARTICLE)])
+    again = [result('http://www.gov.cn/1.htm', ARTICLE)]
+    assert await index.annotate(again) == 0
+
+
+@pytest.mark.asyncio
+async def test_same_site_notices_sharing_boilerplate_are_kept(memory_db):
+    first = boilerplate_page('关于2024年春节放假安排的通知。')
+    second = boilerplate_page('关于开展安全生产大检查的通知。')
+    # 正文不同，但页眉页脚占绝大部分，指纹几乎相同
+    assert hamming_distance(simhash(first), simhash(second)) <= 3
+
+    index = NearDuplicateIndex(max_distance=3)
+    assert await index.annotate([result('http://www.xx.gov.cn/tzgg/1.htm', first)]) == 0
+    later = [result('http://www.xx.gov.cn/tzgg/2.htm', second)]
+    assert await index.annotate(later) == 0
+    assert later[0]['duplicate_of'] is None
+
+
+@pytest.mark.asyncio
+async def test_same_site_notices_in_one_batch_are_kept(memory_db):
+    batch = [
+        result('http://www.xx.gov.cn/tzgg/1.htm', boilerplate_page('关于2024年春节放假安排的通知。')),
+        result('http://www.xx.gov.cn/tzgg/2.htm', boilerplate_page('关于开展安全生产大检查的通知。')),
+    ]
+    assert await NearDuplicateIndex(max_distance=3).annotate(batch) == 0
+
+
+@pytest.mark.asyncio
+async def test_same_site_page_does_not_match_through_foreign_reprint(memory_db):
+    index = NearDuplicateIndex(max_distance=3)
+    first = boilerplate_page('关于2024年春节放假安排的通知。')
+    await index.annotate([result('http://www.xx.gov.cn/tzgg/1.htm', first)])
+    # 其他站点原样转载了整页（含页眉页脚），指向 xx 站点的规范文档
+    await index.annotate([result('http://www.zz.gov.cn/zz/1.htm', first)])
+
+    sibling = [result('http://www.xx.gov.cn/tzgg/2.htm', boilerplate_page('关于开展安全生产大检查的通知。'))]
+    assert await index.annotate(sibling) == 0
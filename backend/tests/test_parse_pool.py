@@ -0,0 +1,106 @@
+"""
+HTML解析池测试
+路径: /mnt/okcomputer/output/backend/tests/test_parse_pool.py
+"""
+
+import asyncio
+import multiprocessing
+import os
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from benchmarks.gov_pages import render_detail_page
+from workers.services.extraction import get_engine
+from workers.services.parse_pool import ParsePool, create_process_executor
+
+CONFIG = {
+    'id': 'site',
+    'name': '测试站点',
+    'selectors': {'title': ['h1'], 'content': ['.pages_content'], 'date': ['.date']},
+}
+
+
+def _exit_once(marker: str) -> int:
+    """第一次调用时让子进程直接退出（模拟OOM被杀），之后返回进程号"""
+    if not os.path.exists(marker):
+        open(marker, 'w').close()
+        os._exit(1)
+    return os.getpid()
+
+
+@pytest.mark.asyncio
+async def test_process_pool_matches_direct_extraction():
+    html = render_detail_page(random.Random(1), 1)
+    pool = ParsePool(workers=2, mode='process').start()
+    try:
+        extracted = await pool.extract(html, CONFIG)
+    finally:
+        pool.close(wait=True)
+
+    expected = get_engine(pool.backend).extract(html, CONFIG)
+    for field in ('title', 'content', 'metadata', 'links'):
+        assert extracted[field] == expected[field]
+
+
+@pytest.mark.asyncio
+async def test_daemonic_worker_still_uses_processes(monkeypatch):
+    # Celery prefork 的子进程是守护进程
+    config = multiprocessing.current_process()._config
+    monkeypatch.setitem(config, 'daemon', True)
+
+    pool = ParsePool(workers=2, mode='process').start()
+    try:
+        assert isinstance(pool.executor, ProcessPoolExecutor)
+        pids = await asyncio.gather(*(pool.run(os.getpid) for _ in range(4)))
+    finally:
+        pool.close(wait=True)
+
+    assert os.getpid() not in pids
+    assert config['daemon'] is True
+
+
+def test_create_process_executor_outside_daemon():
+    executor = create_process_executor(1)
+    try:
+        assert isinstance(executor, ProcessPoolExecutor)
+        assert executor.submit(os.getpid).result(10) != os.getpid()
+    finally:
+        executor.shutdown(wait=True)
+
+
+@pytest.mark.asyncio
+async def test_broken_process_pool_is_restarted(tmp_path):
+    pool = ParsePool(workers=1, mode='process').start()
+    broken = pool.executor
+    try:
+        pid = await pool.run(_exit_once, str(tmp_path / 'marker'))
+        assert pool.executor is not broken
+        assert pid != os.getpid()
+    finally:
+        pool.close(wait=True)
+
+
+@pytest.mark.asyncio
+async def test_max_pending_applies_backpressure():
+    pool = ParsePool(workers=4, max_pending=2, mode='thread').start()
+    release = threading.Event()
+    running = []
+
+    def work():
+        running.append(1)
+        release.wait(5)
+
+    try:
+        tasks = [asyncio.ensure_future(pool.run(work)) for _ in range(4)]
+        await asyncio.sleep(0.05)
+        # 线程池有4个线程，但同时只允许2个任务进入池
+        assert len(running) == 2
+        release.set()
+        await asyncio.gather(*tasks)
+        assert len(running) == 4
+    finally:
+        release.set()
+        pool.close(wait=True)
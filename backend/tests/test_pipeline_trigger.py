@@ -0,0 +1,61 @@
+"""
+流水线触发器测试
+路径: /mnt/okcomputer/output/backend/tests/test_pipeline_trigger.py
+"""
+
+import pytest
+from fakeredis import FakeAsyncRedis
+
+from app.config import settings
+from app.database.redis import redisdb
+from workers.services import pipeline_trigger
+from workers.services.pipeline_trigger import EVENTS_STREAM, STAGE_TASKS, MicroBatcher, PipelineTrigger, publish_pending
+
+
+class FakeApp:
+    def __init__(self, tasks):
+        self.tasks = {name: object() for name in tasks}
+        self.sent = []
+
+    def send_task(self, name, queue=None):
+        self.sent.append((name, queue))
+
+
+def test_only_registered_stages_are_triggered():
+    app = FakeApp([STAGE_TASKS['analyze'][0]])
+    trigger = PipelineTrigger(app, 'worker@test', mode='redis')
+    assert set(trigger.stage_tasks) == {'analyze'}
+    assert trigger.dispatched == {'analyze': 0}
+
+
+def test_trigger_does_not_start_without_registered_tasks():
+    trigger = PipelineTrigger(FakeApp([]), 'worker@test', mode='redis')
+    trigger.start()
+    assert trigger._thread is None
+
+
+def test_batcher_flushes_full_batch_or_after_wait():
+    batcher = MicroBatcher(batch_size=10, wait=2.0)
+    batcher.add('clean', 10, now=0.0)
+    batcher.add('analyze', 1, now=0.0)
+    assert batcher.due(now=0.5) == {'clean': 10}
+    assert batcher.timeout(now=0.5) == 1.5
+    assert batcher.due(now=2.0) == {'analyze': 1}
+    assert batcher.due(now=3.0) == {}
+
+
+@pytest.mark.asyncio
+async def test_events_are_published_only_for_consumed_stages(monkeypatch):
+    client = FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(redisdb, 'client', client)
+    monkeypatch.setattr(settings, 'PIPELINE_TRIGGER_ENABLED', True)
+    monkeypatch.setattr(settings, 'PIPELINE_TRIGGER_MODE', 'redis')
+    # 清洗任务模块未注册，清洗事件没有消费者
+    monkeypatch.setattr(pipeline_trigger, 'current_app', FakeApp([STAGE_TASKS['analyze'][0]]))
+
+    await publish_pending('clean', 5)
+    await publish_pending('analyze', 2)
+    await publish_pending('analyze', 0)
+
+    entries = await client.xrange(EVENTS_STREAM)
+    assert [fields for _, fields in entries] == [{'stage': 'analyze', 'count': '2'}]
@@ -0,0 +1,157 @@
+"""
+按主机自适应限速测试
+路径: /mnt/okcomputer/output/backend/tests/test_rate_limiter.py
+"""
+
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from app.config import settings
+from app.database.redis import redisdb
+from tests.conftest import serve
+from workers.services.async_runtime import AsyncRuntime
+from workers.services.rate_limiter import RATE_INCREASE_STEP, HostRateLimiter
+
+HOST = 'a.gov.cn'
+
+
+@pytest.fixture(autouse=True)
+def no_redis(monkeypatch):
+    monkeypatch.setattr(redisdb, 'client', None)
+
+
+def limiter(**kwargs) -> HostRateLimiter:
+    options = {'default_delay': 1.0, 'max_rate': 2.0, 'max_backoff': 60, 'respect_robots': True}
+    options.update(kwargs)
+    return HostRateLimiter(**options)
+
+
+def test_healthy_responses_increase_rate_up_to_cap():
+    rate_limiter = limiter()
+    rate_limiter.record(HOST, status=200, elapsed=0.1)
+    assert rate_limiter.hosts[HOST].rate == pytest.approx(1.0 + RATE_INCREASE_STEP)
+
+    for _ in range(50):
+        rate_limiter.record(HOST, status=200, elapsed=0.1)
+    assert rate_limiter.hosts[HOST].rate == 2.0
+    assert rate_limiter.interval(HOST) == 0.5
+
+
+def test_slow_or_server_error_responses_do_not_increase_rate():
+    rate_limiter = limiter()
+    rate_limiter.record(HOST, status=200, elapsed=10.0)
+    rate_limiter.record(HOST, status=500, elapsed=0.1)
+    assert rate_limiter.hosts[HOST].rate == 1.0
+
+
+@pytest.mark.parametrize('status', [429, 503, None])
+def test_backoff_halves_rate_down_to_floor(status):
+    rate_limiter = limiter()
+    rate_limiter.record(HOST, status=status)
+    assert rate_limiter.hosts[HOST].rate == 0.5
+
+    for _ in range(20):
+        rate_limiter.record(HOST, status=status)
+    assert rate_limiter.interval(HOST) == pytest.approx(60)
+
+
+def test_retry_after_pushes_next_request():
+    rate_limiter = limiter()
+    rate_limiter.record(HOST, status=429, retry_after='30')
+    assert rate_limiter.delay_for(HOST) == pytest.approx(30, abs=0.5)
+
+    # 非数字（HTTP日期）忽略，超出上限的按 CRAWL_MAX_BACKOFF 截断
+    other = limiter()
+    other.record(HOST, status=503, retry_after='Wed, 21 Oct 2015 07:28:00 GMT')
+    assert other.delay_for(HOST) == pytest.approx(2.0)
+    other.record('b.gov.cn', status=503, retry_after='999999')
+    assert other.delay_for('b.gov.cn') <= settings.CRAWL_MAX_BACKOFF
+
+
+@pytest.mark.asyncio
+async def test_wait_spaces_requests_to_same_host():
+    rate_limiter = limiter(default_delay=0.05, max_rate=100)
+    started = time.monotonic()
+    for _ in range(3):
+        await rate_limiter.wait(f"http://{HOST}/page")
+    assert time.monotonic() - started >= 0.09
+
+
+def _robots_server(status: int, body: str = ''):
+    requests = []
+
+    async def handler(request: web.Request) -> web.Response:
+        requests.append(request.path)
+        return web.Response(status=status, text=body)
+
+    return requests, serve(handler)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('status, body, allowed, ttl_setting', [
+    (200, 'User-agent: *\nDisallow: /private/\n', False, 'CRAWL_ROBOTS_TTL'),
+    (401, '', False, 'CRAWL_ROBOTS_TTL'),
+    (403, '', False, 'CRAWL_ROBOTS_TTL'),
+    (404, '', True, 'CRAWL_ROBOTS_TTL'),
+    (503, '', True, 'CRAWL_ROBOTS_ERROR_TTL'),
+])
+async def test_robots_status_handling(status, body, allowed, ttl_setting):
+    requests, server = _robots_server(status, body)
+    async with server as base_url, aiohttp.ClientSession() as session:
+        rate_limiter = limiter()
+        url = f"{base_url}/private/page.htm"
+        await rate_limiter.ensure_robots(url, session)
+        await rate_limiter.ensure_robots(url, session)
+
+        assert rate_limiter.can_fetch(url) is allowed
+        assert requests == ['/robots.txt']
+        state = rate_limiter.hosts[url.split('/')[2]]
+        assert state.robots_expires - time.monotonic() == pytest.approx(getattr(settings, ttl_setting), abs=5)
+
+
+@pytest.mark.asyncio
+async def test_crawl_delay_is_interval_floor():
+    _, server = _robots_server(200, 'User-agent: *\nCrawl-delay: 7\n')
+    async with server as base_url, aiohttp.ClientSession() as session:
+        rate_limiter = limiter()
+        await rate_limiter.ensure_robots(f"{base_url}/", session)
+        host = base_url.split('/')[2]
+        for _ in range(20):
+            rate_limiter.record(host, status=200, elapsed=0.1)
+        assert rate_limiter.interval(host) == 7.0
+
+
+@pytest.mark.asyncio
+async def test_expired_robots_is_reloaded():
+    requests, server = _robots_server(200, 'User-agent: *\nCrawl-delay: 7\n')
+    async with server as base_url, aiohttp.ClientSession() as session:
+        rate_limiter = limiter()
+        await rate_limiter.ensure_robots(f"{base_url}/", session)
+        host = base_url.split('/')[2]
+        rate_limiter.hosts[host].robots_expires = time.monotonic() - 1
+
+        await rate_limiter.ensure_robots(f"{base_url}/", session)
+        assert requests == ['/robots.txt', '/robots.txt']
+        assert not rate_limiter._robots_tasks
+
+
+@pytest.mark.asyncio
+async def test_robots_ignored_when_disabled():
+    requests, server = _robots_server(403)
+    async with server as base_url, aiohttp.ClientSession() as session:
+        rate_limiter = limiter(respect_robots=False)
+        await rate_limiter.ensure_robots(f"{base_url}/", session)
+        assert rate_limiter.can_fetch(f"{base_url}/")
+        assert requests == []
+
+
+def test_runtime_shares_one_limiter_per_process():
+    runtime = AsyncRuntime()
+    shared = runtime.get_rate_limiter()
+    assert runtime.get_rate_limiter() is shared
+
+    runtime._reset_after_fork()
+    assert runtime.get_rate_limiter() is not shared
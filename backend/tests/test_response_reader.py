@@ -0,0 +1,134 @@
+"""
+响应体读取与编码识别测试
+路径: /mnt/okcomputer/output/backend/tests/test_response_reader.py
+"""
+
+import codecs
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from tests.conftest import serve
+from workers.services.response_reader import (
+    ResponseTooLarge,
+    decode_html,
+    detect_encoding,
+    normalize_encoding,
+    read_limited,
+)
+
+TEXT = '关于进一步优化营商环境的通知：各地区、各部门要高度重视，加强组织领导。'
+
+
+def page(charset: str = None, text: str = TEXT) -> str:
+    meta = f'<meta http-equiv="Content-Type" content="text/html; charset={charset}">' if charset else ''
+    return f'<html><head>{meta}<title>通知</title></head><body><p>{text}</p></body></html>'
+
+
+async def _chunked(request: web.Request) -> web.StreamResponse:
+    """不带 Content-Length 分块发送 4 x 64KB"""
+    response = web.StreamResponse()
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    for _ in range(4):
+        await response.write(b'x' * 64 * 1024)
+    await response.write_eof()
+    return response
+
+
+async def _fixed(request: web.Request) -> web.Response:
+    return web.Response(body=b'y' * 100 * 1024)
+
+
+@pytest.mark.asyncio
+async def test_read_limited_rejects_declared_length():
+    async with serve(_fixed) as base_url, aiohttp.ClientSession() as session:
+        async with session.get(base_url) as response:
+            with pytest.raises(ResponseTooLarge, match='Content-Length'):
+                await read_limited(response, 50 * 1024)
+
+
+@pytest.mark.asyncio
+async def test_read_limited_stops_streamed_body_at_cap():
+    async with serve(_chunked) as base_url, aiohttp.ClientSession() as session:
+        async with session.get(base_url) as response:
+            assert response.content_length is None
+            with pytest.raises(ResponseTooLarge, match='Body exceeds'):
+                await read_limited(response, 100 * 1024)
+
+        async with session.get(base_url) as response:
+            assert len(await read_limited(response, 256 * 1024)) == 256 * 1024
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('GB2312', 'gb18030'),
+    ('gbk', 'gb18030'),
+    ('UTF8', 'utf-8'),
+    ('iso-8859-1', 'iso8859-1'),
+    ('no-such-charset', None),
+    (None, None),
+])
+def test_normalize_encoding(name, expected):
+    assert normalize_encoding(name) == expected
+
+
+def test_gbk_meta_declaration():
+    body = page('gb2312').encode('gbk')
+    html, encoding = decode_html(body)
+    assert encoding == 'gb18030'
+    assert TEXT in html
+
+
+def test_header_wins_when_it_decodes():
+    body = page().encode('gbk')
+    assert detect_encoding(body, 'text/html; charset=GBK') == 'gb18030'
+
+
+def test_lying_utf8_header_is_ignored_for_gbk_body():
+    body = page('gbk').encode('gbk')
+    html, encoding = decode_html(body, 'text/html; charset=utf-8')
+    assert encoding == 'gb18030'
+    assert TEXT in html
+
+
+def test_undeclared_utf8_body_beats_stale_gbk_meta():
+    body = page('gb2312').encode('utf-8')
+    html, encoding = decode_html(body, 'text/html; charset=gb2312')
+    assert encoding == 'utf-8'
+    assert TEXT in html
+
+
+def test_untrusted_latin1_header_falls_through_to_sniffing():
+    body = page().encode('gbk')
+    html, encoding = decode_html(body, 'text/html; charset=ISO-8859-1')
+    assert encoding != 'iso8859-1'
+    assert TEXT in html
+
+
+def test_undeclared_gb_bytes_are_sniffed():
+    body = page(text=TEXT * 5).encode('gb18030')
+    html, _ = decode_html(body)
+    assert TEXT in html
+
+
+def test_rare_characters_decode_as_gb18030():
+    # 「镕」「堃」不在 GB2312 中，声明 GB2312 的页面也按 GB18030 解码
+    text = '朱镕基 王堃 ' + TEXT
+    body = page('gb2312', text).encode('gb18030')
+    html, _ = decode_html(body)
+    assert text in html
+
+
+@pytest.mark.parametrize('bom, codec', [
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+])
+def test_bom_takes_precedence(bom, codec):
+    body = bom + page('gbk').encode(codec)
+    html, _ = decode_html(body, 'text/html; charset=gbk')
+    assert TEXT in html
+
+
+def test_ascii_only_page_is_utf8():
+    assert detect_encoding(b'<html><body>hello</body></html>') == 'utf-8'
@@ -0,0 +1,101 @@
+"""
+条件GET和内容哈希再验证测试
+路径: /mnt/okcomputer/output/backend/tests/test_revalidation.py
+"""
+
+import pytest
+from aiohttp import web
+
+from tests.conftest import serve
+from workers.services.crawler import GovTreeCrawler
+from workers.services.revalidation import ValidatorCache, conditional_headers, content_hash
+from workers.services.seen_store import CompactSeenStore
+
+INDEX = '<html><head><title>首页</title></head><body><a href="/art/1.html">通知</a></body></html>'
+ARTICLE = '<html><head><title>关于开展申报工作的通知</title></head><body><p>各有关单位：现将申报事项通知如下。</p></body></html>'
+
+
+def test_conditional_headers():
+    assert conditional_headers(None) == {}
+    assert conditional_headers({'etag': '"v1"', 'last_modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}) == {
+        'If-None-Match': '"v1"',
+        'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT',
+    }
+
+
+@pytest.mark.asyncio
+async def test_validator_cache_prefetch_keeps_empty_links(memory_db):
+    await memory_db.raw_pages.insert_one({'url': 'http://a.gov.cn/1', 'etag': '"v1"', 'links': [], 'content': 'x'})
+    cache = ValidatorCache()
+
+    await cache.prefetch(['http://a.gov.cn/1', 'http://a.gov.cn/2'])
+
+    assert await cache.get('http://a.gov.cn/1') == {'etag': '"v1"', 'links': []}
+    assert await cache.get('http://a.gov.cn/2') is None
+
+
+class Site:
+    """首页带ETag，文章页总是返回200"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def handle(self, request):
+        self.requests.append((request.path, request.headers.get('If-None-Match')))
+        if request.path == '/':
+            if request.headers.get('If-None-Match') == '"v1"':
+                return web.Response(status=304)
+            return web.Response(text=INDEX, content_type='text/html', headers={'ETag': '"v1"'})
+        return web.Response(text=ARTICLE, content_type='text/html')
+
+
+async def _crawl(base):
+    site = {'id': 'site', 'name': '测试站点', 'start_urls': [f"{base}/"], 'discovery': False}
+    async with GovTreeCrawler(seen_store=CompactSeenStore()) as crawler:
+        crawler.results = (await crawler.crawl_sites([site]))['site']
+    return crawler
+
+
+@pytest.mark.asyncio
+async def test_not_modified_page_still_expands_cached_links(memory_db, crawl_settings):
+    site = Site()
+    async with serve(site.handle) as base:
+        await memory_db.raw_pages.insert_one({
+            'url': f"{base}/", 'etag': '"v1"', 'content_hash': 'old', 'links': [f"{base}/art/1.html"],
+        })
+        crawler = await _crawl(base)
+
+    assert crawler.page_outcomes[f"{base}/"] == 'not_modified'
+    assert crawler.page_outcomes[f"{base}/art/1.html"] == 'new'
+    assert ('/', '"v1"') in site.requests
+
+
+@pytest.mark.asyncio
+async def test_unchanged_page_without_cached_links_is_parsed_once(memory_db, crawl_settings):
+    site = Site()
+    async with serve(site.handle) as base:
+        # 出链字段加入前保存的文档：不发条件请求，正文未变时补存出链
+        await memory_db.raw_pages.insert_one({
+            'url': f"{base}/", 'etag': '"v1"', 'content_hash': content_hash(INDEX.encode('utf-8')),
+        })
+        crawler = await _crawl(base)
+
+    assert crawler.page_outcomes[f"{base}/"] == 'unchanged'
+    assert crawler.page_outcomes[f"{base}/art/1.html"] == 'new'
+    assert ('/', None) in site.requests
+    doc = await memory_db.raw_pages.find_one({'url': f"{base}/"})
+    assert doc['links'] == [f"{base}/art/1.html"]
+
+
+@pytest.mark.asyncio
+async def test_new_page_result_carries_links_and_validators(memory_db, crawl_settings):
+    site = Site()
+    async with serve(site.handle) as base:
+        crawler = await _crawl(base)
+        saved = crawler.results
+
+    index = next(result for result in saved if result['url'] == f"{base}/")
+    assert index['etag'] == '"v1"'
+    assert index['content_hash'] == content_hash(INDEX.encode('utf-8'))
+    assert index['links'] == [f"{base}/art/1.html"]
+    assert crawler.page_outcomes[f"{base}/art/1.html"] == 'new'
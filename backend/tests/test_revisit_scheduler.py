@@ -0,0 +1,135 @@
+"""
+站点重访调度测试
+路径: /mnt/okcomputer/output/backend/tests/test_revisit_scheduler.py
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from workers.services.revisit_scheduler import (
+    MAX_REVISIT_HOURS,
+    MIN_REVISIT_HOURS,
+    PRIOR_RATE,
+    SCHEDULE_COLLECTION,
+    RevisitScheduler,
+)
+
+
+def sites(*ids):
+    return [{'id': site_id, 'start_urls': [f"http://{site_id}.gov.cn/"]} for site_id in ids]
+
+
+async def seed_state(db, site_id, rate, cost=10.0, hours_ago=24.0, due_in_hours=-1.0):
+    now = datetime.utcnow()
+    await db[SCHEDULE_COLLECTION].insert_one({
+        'site_id': site_id,
+        'rate': rate,
+        'cost': cost,
+        'last_crawl': now - timedelta(hours=hours_ago),
+        'next_due': now + timedelta(hours=due_in_hours),
+    })
+
+
+def ids(selected):
+    return [site['id'] for site in selected]
+
+
+@pytest.mark.asyncio
+async def test_hot_sites_outrank_cold_ones(memory_db):
+    await seed_state(memory_db, 'cold', rate=0.01)
+    await seed_state(memory_db, 'hot', rate=2.0)
+    await seed_state(memory_db, 'warm', rate=0.5)
+
+    selected = await RevisitScheduler(budget=20, max_sites=10).select_sites(sites('cold', 'warm', 'hot'))
+    assert ids(selected) == ['hot', 'warm']
+
+
+@pytest.mark.asyncio
+async def test_sites_not_yet_due_are_skipped(memory_db):
+    await seed_state(memory_db, 'hot', rate=2.0, due_in_hours=2)
+    await seed_state(memory_db, 'cold', rate=0.01)
+
+    selected = await RevisitScheduler(budget=100, max_sites=10).select_sites(sites('hot', 'cold'))
+    assert ids(selected) == ['cold']
+
+
+@pytest.mark.asyncio
+async def test_new_sites_rank_at_median_not_above_hot_sites(memory_db):
+    await seed_state(memory_db, 'hot', rate=2.0)
+    await seed_state(memory_db, 'warm', rate=0.5)
+    await seed_state(memory_db, 'cold', rate=0.01)
+
+    # 预算只够两个站点：热点站点在前，新站点排在中位数（warm）之后
+    selected = await RevisitScheduler(budget=20, max_sites=10).select_sites(
+        sites('new', 'cold', 'warm', 'hot')
+    )
+    assert ids(selected) == ['hot', 'warm']
+
+
+@pytest.mark.asyncio
+async def test_many_new_sites_cannot_starve_hot_sites(memory_db, monkeypatch):
+    monkeypatch.setattr(settings, 'CRAWL_EXPLORE_RATIO', 0.2)
+    await seed_state(memory_db, 'hot', rate=2.0)
+    await seed_state(memory_db, 'warm', rate=0.1)
+    new_ids = [f"new{index}" for index in range(20)]
+
+    selected = ids(await RevisitScheduler(budget=100, max_sites=50).select_sites(sites(*new_ids, 'hot', 'warm')))
+    # 新站点按已知站点的中位数排队，只占 20% 的预算（两个站点）；
+    # 已知站点装完后，剩余预算继续用于探测
+    assert selected[:4] == ['hot', 'new0', 'new1', 'warm']
+    assert selected[4:] == new_ids[2:8]
+
+
+@pytest.mark.asyncio
+async def test_first_run_with_only_new_sites_uses_whole_budget(memory_db):
+    selected = await RevisitScheduler(budget=50, max_sites=50).select_sites(sites(*[f"s{i}" for i in range(10)]))
+    assert ids(selected) == [f"s{i}" for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_max_sites_caps_selection(memory_db):
+    selected = await RevisitScheduler(budget=1000, max_sites=3).select_sites(sites(*[f"s{i}" for i in range(10)]))
+    assert len(selected) == 3
+
+
+@pytest.mark.asyncio
+async def test_record_crawl_updates_rate_and_next_due(memory_db):
+    scheduler = RevisitScheduler(budget=100, max_sites=10)
+    site_list = sites('a')
+    url = site_list[0]['start_urls'][0]
+
+    # 首次采集的存量页面不计入更新速率
+    await scheduler.record_crawl(site_list, {'a': {'new': 30, 'unchanged': 0}}, {url: 'new'})
+    state = await memory_db[SCHEDULE_COLLECTION].find_one({'site_id': 'a'})
+    assert state['rate'] == PRIOR_RATE
+    assert state['cost'] == pytest.approx(10 + 0.3 * (30 - 10))
+    assert state['crawls'] == 1
+    first_due = state['next_due'] - state['last_crawl']
+    assert first_due == timedelta(hours=min(1 / PRIOR_RATE, MAX_REVISIT_HOURS))
+
+    # 之后按变化页数/间隔平滑更新，更新越多到期越早
+    await memory_db[SCHEDULE_COLLECTION].update_one(
+        {'site_id': 'a'}, {'$set': {'last_crawl': datetime.utcnow() - timedelta(hours=2)}}
+    )
+    await scheduler.record_crawl(site_list, {'a': {'changed': 20, 'unchanged': 5}}, {url: 'changed'})
+    state = await memory_db[SCHEDULE_COLLECTION].find_one({'site_id': 'a'})
+    assert state['rate'] > PRIOR_RATE
+    assert state['next_due'] - state['last_crawl'] == timedelta(hours=MIN_REVISIT_HOURS)
+    entry = next(iter(state['urls'].values()))
+    assert entry['url'] == url
+    assert entry['checks'] == 2
+    assert entry['changes'] == 2
+
+
+@pytest.mark.asyncio
+async def test_schedule_unavailable_falls_back_to_sampling(monkeypatch):
+    scheduler = RevisitScheduler(budget=100, max_sites=2)
+
+    async def broken(site_ids):
+        raise ConnectionError('mongo down')
+
+    monkeypatch.setattr(scheduler, '_load', broken)
+    selected = await scheduler.select_sites(sites('a', 'b', 'c'))
+    assert len(selected) == 2
@@ -0,0 +1,89 @@
+"""
+已访问URL存储测试
+路径: /mnt/okcomputer/output/backend/tests/test_seen_store.py
+"""
+
+import pytest
+import pytest_asyncio
+
+from app.database.redis import RedisDB
+from workers.services.crawler import GovTreeCrawler
+from workers.services.seen_store import CompactSeenStore, RedisSeenStore, url_fingerprint
+
+
+@pytest.mark.asyncio
+async def test_compact_store_add_and_contains():
+    store = CompactSeenStore(capacity=4)
+
+    assert await store.add('http://a.gov.cn/1')
+    assert not await store.add('http://a.gov.cn/1')
+    assert await store.contains('http://a.gov.cn/1')
+    assert not await store.contains('http://a.gov.cn/2')
+    assert await store.add_many(['http://a.gov.cn/2', 'http://a.gov.cn/1']) == [True, False]
+
+
+@pytest.mark.asyncio
+async def test_compact_store_grows_without_losing_urls():
+    store = CompactSeenStore(capacity=4)
+    initial = store.memory_bytes
+    urls = [f"http://a.gov.cn/art/{index}.html" for index in range(1000)]
+
+    assert all(await store.add_many(urls))
+
+    assert len(store) == 1000
+    assert store.memory_bytes > initial
+    assert all([await store.contains(url) for url in urls])
+    assert not await store.contains('http://a.gov.cn/art/1000.html')
+
+
+def test_fingerprint_never_uses_empty_slot_marker():
+    assert url_fingerprint('http://a.gov.cn/') != 0
+
+
+def test_crawler_keeps_an_empty_store_passed_in():
+    store = CompactSeenStore()
+    assert GovTreeCrawler(seen_store=store).seen_urls is store
+
+
+@pytest_asyncio.fixture
+async def fake_redis():
+    pytest.importorskip('lupa')
+    fakeredis = pytest.importorskip('fakeredis')
+    redis = RedisDB()
+    redis.client = fakeredis.FakeAsyncRedis()
+    yield redis
+    await redis.client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_redis_store_is_shared_between_workers(fake_redis):
+    first, second = RedisSeenStore(fake_redis, ttl=600), RedisSeenStore(fake_redis, ttl=600)
+
+    assert await first.add_many(['http://a.gov.cn/1', 'http://a.gov.cn/2']) == [True, True]
+    assert not await second.add('http://a.gov.cn/1')
+    assert await second.contains('http://a.gov.cn/2')
+    assert not await second.contains('http://a.gov.cn/3')
+
+
+@pytest.mark.asyncio
+async def test_redis_store_forgets_urls_after_two_buckets(fake_redis, monkeypatch):
+    from workers.services import seen_store
+
+    now = [1_000_000.0]
+    monkeypatch.setattr(seen_store.time, 'time', lambda: now[0])
+    store = RedisSeenStore(fake_redis, ttl=600)
+
+    await store.add('http://a.gov.cn/1')
+    now[0] += 300
+    assert await store.contains('http://a.gov.cn/1')
+    now[0] += 600
+    assert not await store.contains('http://a.gov.cn/1')
+
+
+@pytest.mark.asyncio
+async def test_redis_store_falls_back_to_local_store():
+    store = RedisSeenStore(RedisDB(), ttl=600)
+
+    assert await store.add('http://a.gov.cn/1')
+    assert not await store.add('http://a.gov.cn/1')
+    assert await store.contains('http://a.gov.cn/1')
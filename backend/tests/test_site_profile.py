@@ -0,0 +1,99 @@
+"""
+站点提取画像测试
+路径: /mnt/okcomputer/output/backend/tests/test_site_profile.py
+"""
+
+from datetime import datetime
+
+import pytest
+
+from app.config import settings
+from workers.services.extraction import get_engine, normalize_selectors
+from workers.services.site_profile import PROFILE_COLLECTION, SiteProfileCache
+
+SITE = {'id': 'site', 'name': '测试站点'}
+
+ARTICLE = '第一条 为规范市级专项资金管理，提高资金使用效益，根据有关规定，结合本市实际，制定本办法。' * 3
+
+
+def page(index: int) -> str:
+    """正文在 #content、日期在 .time 中，都不是通用选择器列表的第一项"""
+    return (
+        f'<html><head><title>通知{index}</title></head><body><h1>关于第{index}号事项的通知</h1>'
+        f'<div id="content"><p>{ARTICLE}</p></div><span class="time">03/01/2024</span></body></html>'
+    )
+
+
+@pytest.fixture
+def profile_settings(monkeypatch):
+    monkeypatch.setattr(settings, 'CRAWL_SITE_PROFILE_ENABLED', True)
+    monkeypatch.setattr(settings, 'CRAWL_TEMPLATE_ENABLED', True)
+    return settings
+
+
+def test_majority_selectors_are_learned_after_min_pages(profile_settings):
+    cache = SiteProfileCache(min_pages=3)
+    for _ in range(2):
+        cache.record(SITE, {'title': 'h1', 'content': '.TRS_Editor', 'date': '.date', 'date_format': 'ymd'})
+    assert cache.apply(SITE, learn=False) is SITE
+
+    cache.record(SITE, {'title': 'h1', 'content': '.content', 'date': '.date', 'date_format': 'ymd'})
+    profile = cache.apply(SITE, learn=False)['profile']
+    # .TRS_Editor 占 2/3，达到多数比例
+    assert profile == {'title': 'h1', 'content': '.TRS_Editor', 'date': '.date', 'date_format': 'ymd'}
+
+    cache.record(SITE, {'content': '.content'})
+    cache.record(SITE, {'content': '.article'})
+    assert 'content' not in cache.apply(SITE, learn=False)['profile']
+
+
+def test_profile_disabled_keeps_config(monkeypatch):
+    monkeypatch.setattr(settings, 'CRAWL_SITE_PROFILE_ENABLED', False)
+    monkeypatch.setattr(settings, 'CRAWL_TEMPLATE_ENABLED', False)
+    cache = SiteProfileCache(min_pages=1)
+    cache.record(SITE, {'title': 'h1'})
+    assert cache.apply(SITE) is SITE
+
+
+def test_learned_selectors_are_tried_first():
+    config = {'selectors': {'content': ['.content', '.TRS_Editor', 'article']}, 'profile': {'content': '.TRS_Editor'}}
+    assert normalize_selectors(config)['content'] == ['.TRS_Editor', '.content', 'article']
+    # 画像中的选择器已不在配置里（配置改过）时忽略
+    config['profile']['content'] = '#zoom'
+    assert normalize_selectors(config)['content'] == ['.content', '.TRS_Editor', 'article']
+
+
+@pytest.mark.asyncio
+async def test_profiles_round_trip_through_mongo(memory_db, profile_settings):
+    cache = SiteProfileCache(min_pages=1, template_pages=2)
+    cache.record(SITE, {'content': '.TRS_Editor', 'date': 'span#pubdate', 'blocks': ['a', 'b']})
+    cache.record(SITE, {'content': '.TRS_Editor', 'blocks': ['a', 'c']})
+    await cache.commit()
+
+    stored = await memory_db[PROFILE_COLLECTION].find_one({'site_id': 'site'})
+    assert stored['counts']['content'] == [['.TRS_Editor', 2]]
+    assert stored['template'] == ['a']
+
+    loaded = SiteProfileCache(min_pages=1)
+    await loaded.load([SITE])
+    profile = loaded.apply(SITE)['profile']
+    assert profile['content'] == '.TRS_Editor'
+    assert profile['template'] == frozenset(['a'])
+    # 模板未过期，不再采样
+    assert 'sample_blocks' not in profile
+
+
+def test_engine_learns_and_uses_site_profile(profile_settings):
+    pytest.importorskip('lxml')
+    engine = get_engine('lxml')
+    cache = SiteProfileCache(min_pages=2)
+    for index in range(2):
+        extracted = engine.extract(page(index), cache.apply(SITE, learn=False))
+        cache.record(SITE, extracted['matched'])
+    assert extracted['matched'] == {'title': 'h1', 'content': '#content', 'date': '.time', 'date_format': 'dmy'}
+
+    config = cache.apply(SITE, learn=False)
+    assert normalize_selectors(config)['content'][0] == '#content'
+    extracted = engine.extract(page(2), config)
+    assert extracted['publish_date'] == datetime(2024, 1, 3)
+    assert extracted['content'] == ARTICLE
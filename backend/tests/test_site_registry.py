@@ -0,0 +1,113 @@
+"""
+站点配置注册表测试
+路径: /mnt/okcomputer/output/backend/tests/test_site_registry.py
+"""
+
+import json
+import os
+
+import pytest
+
+from workers.services.site_registry import SiteRegistry, parse_gov_tree
+
+TREE = {
+    'id': 'cn', 'name': '国务院', 'website': 'http://www.gov.cn/',
+    'children': [
+        {'id': 'bj', 'name': '北京市', 'website': 'http://www.beijing.gov.cn/', 'children': [
+            {'id': 'bj-hd', 'name': '海淀区', 'website': 'http://www.bjhd.gov.cn/'},
+        ]},
+        {'id': 'sh', 'name': '上海市', 'website': 'http://www.shanghai.gov.cn/'},
+        {'name': '没有网站的部门'},
+    ],
+}
+
+
+def write(path, content, mtime=None):
+    path.write_text(content, encoding='utf-8')
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def files(tmp_path):
+    tree = tmp_path / 'gov_tree.json'
+    custom = tmp_path / 'sites_custom'
+    custom.mkdir()
+    write(tree, json.dumps(TREE, ensure_ascii=False), 1000)
+    write(custom / 'bid.yml', 'site_id: bid\nname: 公共资源交易\nregion: 北京市\ncategory: bid\n', 1000)
+    return tree, custom
+
+
+def registry(files, check_interval=0):
+    tree, custom = files
+    return SiteRegistry(str(tree), str(custom), check_interval=check_interval)
+
+
+def test_parse_gov_tree_levels():
+    sites = parse_gov_tree(TREE)
+    assert [(site['id'], site['level']) for site in sites] == [('cn', 0), ('bj', 1), ('bj-hd', 2), ('sh', 1)]
+    assert sites[1]['start_urls'] == ['http://www.beijing.gov.cn/']
+
+
+def test_loads_lazily_and_indexes(files):
+    sites = registry(files)
+    assert not sites._loaded
+
+    assert sites.get('bj')['name'] == '北京市'
+    assert sites.get('bid')['category'] == 'bid'
+    assert sites.get('missing') is None
+    assert len(sites) == 5
+
+    assert [site['id'] for site in sites.get_many(['sh', 'missing', 'sh', 'cn'])] == ['sh', 'cn']
+    assert [site['id'] for site in sites.find(region='北京市')] == ['bj', 'bid']
+    assert [site['id'] for site in sites.find(region='北京市', category='policy')] == ['bj']
+    assert [site['id'] for site in sites.find(level=1)] == ['bj', 'sh']
+    with pytest.raises(ValueError):
+        sites.find(name='北京市')
+
+
+def test_changed_added_and_removed_files_are_reloaded(files):
+    tree, custom = files
+    sites = registry(files)
+    assert sites.get('bid')['name'] == '公共资源交易'
+
+    write(custom / 'bid.yml', 'site_id: bid\nname: 交易中心\ncategory: bid\n', 2000)
+    write(custom / 'new.yaml', 'id: new\nname: 新站点\n', 2000)
+    assert sites.get('bid')['name'] == '交易中心'
+    assert sites.get('new')['name'] == '新站点'
+    assert sites.find(region='北京市') == [sites.get('bj')]
+
+    os.unlink(custom / 'new.yaml')
+    assert sites.get('new') is None
+    # 未修改的文件不重新读取
+    assert sites._files[str(tree)][0] == 1000
+
+
+def test_broken_file_keeps_previous_content(files):
+    _, custom = files
+    sites = registry(files)
+    before = sites.get('bid')
+
+    write(custom / 'bid.yml', 'site_id: [unclosed\n', 2000)
+    assert sites.get('bid') is before
+
+    write(custom / 'bid.yml', 'site_id: bid\nname: 修好了\n', 3000)
+    assert sites.get('bid')['name'] == '修好了'
+
+
+def test_checks_are_throttled(files):
+    _, custom = files
+    sites = registry(files, check_interval=3600)
+    assert sites.get('bid')['name'] == '公共资源交易'
+
+    write(custom / 'bid.yml', 'site_id: bid\nname: 交易中心\n', 2000)
+    assert sites.get('bid')['name'] == '公共资源交易'
+    sites.reload()
+    assert sites.get('bid')['name'] == '交易中心'
+
+
+def test_from_configs_never_reads_files():
+    sites = SiteRegistry.from_configs([{'id': 1, 'name': 'a', 'category': 'policy'}])
+    sites.gov_tree_path = '/nonexistent/gov_tree.json'
+    assert sites.get('1')['name'] == 'a'
+    assert sites.find(category='policy') == sites.all()
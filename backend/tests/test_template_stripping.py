@@ -0,0 +1,76 @@
+"""
+站点模板学习与去除测试
+路径: /mnt/okcomputer/output/backend/tests/test_template_stripping.py
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from workers.services.extraction import SoupExtractionEngine, get_engine, join_blocks
+from workers.services.site_profile import SiteProfileCache
+
+pytest.importorskip('lxml')
+
+SITE = {'id': 'site', 'name': '测试站点'}
+
+NAV = '<div class="nav"><a href="/">首页</a> <a href="/zwgk/">政务公开</a> <a href="/zcwj/">政策文件</a></div>'
+FOOTER = '<div class="footer"><p>主办单位：某市人民政府办公室</p><p>网站标识码1234567890</p></div>'
+
+
+def page(index: int) -> str:
+    """正文选择器都不命中的页面，正文回退到整个body"""
+    return (
+        f'<html><head><title>通知{index}</title></head><body>{NAV}'
+        f'<div class="main"><p>第{index}号通知正文第一段。</p><p>第{index}号通知正文第二段。</p></div>'
+        f'{FOOTER}</body></html>'
+    )
+
+
+@pytest.fixture
+def profile_settings(monkeypatch):
+    monkeypatch.setattr(settings, 'CRAWL_SITE_PROFILE_ENABLED', True)
+    monkeypatch.setattr(settings, 'CRAWL_TEMPLATE_ENABLED', True)
+    return settings
+
+
+@pytest.mark.parametrize('engine', [get_engine('lxml'), SoupExtractionEngine()], ids=['lxml', 'soup'])
+def test_template_is_learned_and_stripped(engine, profile_settings):
+    cache = SiteProfileCache(template_pages=4)
+    for index in range(4):
+        config = cache.apply(SITE)
+        assert config['profile']['sample_blocks']
+        cache.record(SITE, engine.extract(page(index), config)['matched'])
+
+    config = cache.apply(SITE)
+    assert 'sample_blocks' not in config['profile']
+    content = engine.extract(page(9), config)['content']
+    assert content == '第9号通知正文第一段。 第9号通知正文第二段。'
+
+    # 没有模板时保留导航和页脚
+    assert '政务公开' in engine.extract(page(9), SITE)['content']
+
+
+def test_template_only_page_keeps_full_text():
+    blocks = [('body/div.nav', '首页 政务公开'), ('body/div.footer/p', '主办单位')]
+    matched = {}
+    join_blocks(blocks, {'sample_blocks': True}, matched)
+    assert len(matched['blocks']) == 2
+    # 整页都是模板块（如栏目页）时不返回空正文
+    assert join_blocks(blocks, {'template': set(matched['blocks'])}, {}) == '首页 政务公开 主办单位'
+
+
+def test_template_is_relearned_after_refresh(profile_settings):
+    cache = SiteProfileCache(template_pages=2, refresh_days=30)
+    cache.record(SITE, {'blocks': ['nav', 'a']})
+    cache.record(SITE, {'blocks': ['nav', 'b']})
+    assert cache.apply(SITE)['profile']['template'] == frozenset(['nav'])
+
+    state = cache.states['site']
+    state['template_at'] = datetime.utcnow() - timedelta(days=31)
+    assert cache.apply(SITE)['profile']['sample_blocks']
+    # 改版后按新样本重新学习
+    cache.record(SITE, {'blocks': ['new-nav', 'c']})
+    cache.record(SITE, {'blocks': ['new-nav', 'd']})
+    assert cache.apply(SITE)['profile']['template'] == frozenset(['new-nav'])
@@ -0,0 +1,141 @@
+"""
+租约认领测试
+路径: /mnt/okcomputer/output/backend/tests/test_work_leases.py
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from workers.services.work_leases import FAILED, PROCESSING, LeaseQueue, stage_queues
+
+
+async def _insert_pages(db, count, status='pending'):
+    for index in range(count):
+        await db.raw_pages.insert_one({'_id': index, 'url': f"http://example.gov.cn/{index}", 'status': status})
+
+
+async def _expire(db, collection, doc_id):
+    """模拟持有者崩溃：把租约改为已过期"""
+    await db[collection].update_one(
+        {'_id': doc_id},
+        {'$set': {'lease.expires': datetime.utcnow() - timedelta(seconds=1)}}
+    )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_claims_are_disjoint(memory_db):
+    await _insert_pages(memory_db, 10)
+    queues = [LeaseQueue('raw_pages', owner=f"worker-{index}") for index in range(3)]
+
+    leases = await asyncio.gather(*(queue.claim(4) for queue in queues))
+
+    claimed = [doc_id for lease in leases for doc_id in lease.ids]
+    assert sorted(claimed) == list(range(10))
+    assert sorted(len(lease) for lease in leases) == [2, 4, 4]
+    for lease in leases:
+        for doc in lease.docs:
+            assert doc['status'] == PROCESSING
+            assert doc['lease']['token'] == lease.token
+            assert doc['lease']['attempts'] == 1
+
+
+@pytest.mark.asyncio
+async def test_claim_returns_empty_lease_when_nothing_pending(memory_db):
+    await _insert_pages(memory_db, 2, status='processed')
+
+    lease = await LeaseQueue('raw_pages').claim(5)
+
+    assert len(lease) == 0
+
+
+@pytest.mark.asyncio
+async def test_complete_sets_status_and_clears_lease(memory_db):
+    await _insert_pages(memory_db, 3)
+    queue = LeaseQueue('raw_pages')
+    lease = await queue.claim(3)
+
+    assert await queue.complete(lease, [0, 1], 'processed', {'cleaned': True}) == 2
+
+    doc = await memory_db.raw_pages.find_one({'_id': 0})
+    assert doc['status'] == 'processed'
+    assert doc['cleaned'] is True
+    assert 'lease' not in doc
+    assert (await memory_db.raw_pages.find_one({'_id': 2}))['status'] == PROCESSING
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_reclaimed_and_stale_owner_cannot_complete(memory_db):
+    await _insert_pages(memory_db, 1)
+    first, second = LeaseQueue('raw_pages', owner='a'), LeaseQueue('raw_pages', owner='b')
+    stale = await first.claim(1)
+    await _expire(memory_db, 'raw_pages', 0)
+
+    fresh = await second.claim(1)
+
+    assert fresh.ids == [0]
+    assert fresh.docs[0]['lease']['attempts'] == 2
+    assert await first.complete(stale, [0], 'processed') == 0
+    assert await second.complete(fresh, [0], 'processed') == 1
+
+
+@pytest.mark.asyncio
+async def test_document_fails_after_max_attempts(memory_db):
+    await _insert_pages(memory_db, 1)
+    queue = LeaseQueue('raw_pages', max_attempts=2)
+    for _ in range(2):
+        assert (await queue.claim(1)).ids == [0]
+        await _expire(memory_db, 'raw_pages', 0)
+
+    lease = await queue.claim(1)
+
+    assert len(lease) == 0
+    doc = await memory_db.raw_pages.find_one({'_id': 0})
+    assert doc['status'] == FAILED
+    assert doc['error'] == 'lease expired repeatedly'
+
+
+@pytest.mark.asyncio
+async def test_release_returns_documents_without_counting_the_attempt(memory_db):
+    await _insert_pages(memory_db, 2)
+    queue = LeaseQueue('raw_pages')
+    lease = await queue.claim(2)
+
+    assert await queue.release(lease, [1]) == 1
+
+    doc = await memory_db.raw_pages.find_one({'_id': 1})
+    assert doc['status'] == 'pending'
+    assert doc['lease']['attempts'] == 0
+    assert (await queue.claim(2)).ids == [1]
+
+
+@pytest.mark.asyncio
+async def test_analyze_stage_claims_documents_without_status(memory_db):
+    await memory_db.cleaned_docs.insert_one({'_id': 1, 'title': 't', 'content': 'c'})
+    await memory_db.cleaned_docs.insert_one({'_id': 2, 'analysis_status': 'processed'})
+    queue = stage_queues('analyze', projection={'title': 1})[0]
+
+    lease = await queue.claim(5)
+
+    assert lease.docs == [{'_id': 1, 'title': 't'}]
+
+
+@pytest.mark.asyncio
+async def test_counted_release_retries_until_max_attempts(memory_db):
+    await _insert_pages(memory_db, 1)
+    queue = LeaseQueue('raw_pages', max_attempts=2)
+
+    lease = await queue.claim(1)
+    assert await queue.release(lease, count_attempt=True) == 1
+    doc = await memory_db.raw_pages.find_one({'_id': 0})
+    assert doc['status'] == PROCESSING
+    assert doc['lease']['attempts'] == 1
+
+    lease = await queue.claim(1)
+    assert lease.ids == [0]
+    await queue.release(lease, count_attempt=True)
+
+    assert len(await queue.claim(1)) == 0
+    doc = await memory_db.raw_pages.find_one({'_id': 0})
+    assert doc['status'] == FAILED
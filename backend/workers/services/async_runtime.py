@@ -0,0 +1,184 @@
+"""
+Worker进程内的常驻事件循环
+路径: /mnt/okcomputer/output/backend/workers/services/async_runtime.py
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Awaitable, Optional
+
+import aiohttp
+
+from app.database.mongodb import mongodb
+from app.database.redis import redisdb
+from .crawler import create_session
+from .html_archive import HtmlArchive, create_archive
+from .llm_client import LLMClient
+from .parse_pool import ParsePool
+from .rate_limiter import HostRateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRuntime:
+    """每个worker进程一个常驻事件循环，同步的Celery任务把协程提交给它执行
+
+    事件循环运行在后台线程中，进程内只建立一次 MongoDB(Motor)/Redis 连接、
+    一个带DNS缓存的 aiohttp 连接池、按主机限速器、解析池、归档写入器和大模型客户端，
+    所有任务共享，keep-alive 连接、DNS缓存和各主机的限速状态得以跨任务复用。fork 后的子进程会自动重建。
+    """
+
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._rate_limiter: Optional[HostRateLimiter] = None
+        self._parse_pool: Optional[ParsePool] = None
+        self._archive: Optional[HtmlArchive] = None
+        self._llm_client: Optional[LLMClient] = None
+        self._databases_ready = False
+
+    @property
+    def running(self) -> bool:
+        return self.loop is not None and self._pid == os.getpid() and self.loop.is_running()
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        """启动事件循环线程（已启动时直接返回）"""
+        with self._lock:
+            if self.running:
+                return self.loop
+
+            if self._pid is not None and self._pid != os.getpid():
+                # 父进程的循环线程不会随fork复制，连接也不能跨进程共用
+                self._reset_after_fork()
+
+            self.loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run_loop, args=(ready,), name='async-runtime', daemon=True
+            )
+            self._thread.start()
+            ready.wait()
+            self._pid = os.getpid()
+            logger.info(f"Async runtime started in process {self._pid}")
+            return self.loop
+
+    def _run_loop(self, ready: threading.Event):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(ready.set)
+        self.loop.run_forever()
+
+    def _reset_after_fork(self):
+        self.loop = None
+        self._thread = None
+        self._session = None
+        self._rate_limiter = None
+        self._parse_pool = None
+        self._archive = None
+        self._llm_client = None
+        self._databases_ready = False
+        mongodb.client = None
+        mongodb.database = None
+        redisdb.client = None
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """在常驻循环中执行协程并等待结果"""
+        loop = self.start()
+        future = asyncio.run_coroutine_threadsafe(self._with_resources(coro), loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # 超时或任务被终止（如软超时）时同时取消协程，避免它在后台继续运行
+            future.cancel()
+            raise
+
+    async def _with_resources(self, coro: Awaitable[Any]) -> Any:
+        await self.ensure_databases()
+        return await coro
+
+    async def ensure_databases(self):
+        """首次使用时连接MongoDB和Redis，之后复用"""
+        if self._databases_ready:
+            return
+
+        await mongodb.connect()
+        try:
+            await redisdb.connect()
+        except Exception as e:
+            # Redis只用于去重和缓存，不可用时各组件退回进程内实现
+            logger.warning(f"Redis unavailable, continuing without it: {e}")
+            redisdb.client = None
+        self._databases_ready = True
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """进程共享的HTTP会话"""
+        if self._session is None or self._session.closed:
+            self._session = create_session()
+        return self._session
+
+    def get_rate_limiter(self) -> HostRateLimiter:
+        """进程共享的按主机限速器，并发任务访问同一主机时共用一个速率"""
+        if self._rate_limiter is None:
+            self._rate_limiter = HostRateLimiter()
+        return self._rate_limiter
+
+    def get_parse_pool(self) -> ParsePool:
+        """进程共享的解析池"""
+        if self._parse_pool is None:
+            self._parse_pool = ParsePool().start()
+        return self._parse_pool
+
+    def get_archive(self) -> Optional[HtmlArchive]:
+        """进程共享的原始页面归档，未启用时为None"""
+        if self._archive is None:
+            self._archive = create_archive()
+        return self._archive
+
+    def get_llm_client(self) -> LLMClient:
+        """进程共享的大模型客户端，缓存统计按进程累计"""
+        if self._llm_client is None:
+            self._llm_client = LLMClient()
+        return self._llm_client
+
+    async def _close_resources(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._llm_client is not None:
+            await self._llm_client.close()
+            self._llm_client = None
+        if self._databases_ready:
+            await mongodb.close()
+            await redisdb.close()
+            self._databases_ready = False
+
+    def shutdown(self, timeout: float = 10.0):
+        """关闭共享连接并停止事件循环"""
+        with self._lock:
+            if not self.running:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._close_resources(), self.loop).result(timeout)
+            except Exception as e:
+                logger.error(f"Error closing async runtime resources: {e}")
+            if self._parse_pool is not None:
+                self._parse_pool.close(wait=True)
+                self._parse_pool = None
+            if self._archive is not None:
+                self._archive.close()
+                self._archive = None
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout)
+            self.loop.close()
+            self.loop = None
+            logger.info(f"Async runtime stopped in process {os.getpid()}")
+
+
+# 每个进程一个实例
+async_runtime = AsyncRuntime()
+
+__all__ = ['AsyncRuntime', 'async_runtime']
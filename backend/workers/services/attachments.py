@@ -0,0 +1,295 @@
+"""
+政策附件（PDF/DOC/XLS/WPS）采集与文本提取
+路径: /mnt/okcomputer/output/backend/workers/services/attachments.py
+"""
+
+import logging
+import mmap
+import os
+import re
+import tempfile
+import zipfile
+from hashlib import sha1
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote, urljoin, urlparse
+
+import aiohttp
+from lxml import etree
+
+from app.config import settings
+from .response_reader import CHUNK_SIZE, ResponseTooLarge
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pypdf
+except ImportError:  # pragma: no cover - 未安装时PDF附件无法提取
+    pypdf = None
+
+try:
+    import olefile
+except ImportError:  # pragma: no cover - 未安装时扫描整个文件
+    olefile = None
+
+try:
+    import xlrd
+except ImportError:  # pragma: no cover - 未安装时按文本片段扫描
+    xlrd = None
+
+# 附件扩展名 -> 类型（.et 为WPS表格）
+ATTACHMENT_EXTENSIONS = {
+    'pdf': 'pdf',
+    'doc': 'doc',
+    'docx': 'docx',
+    'wps': 'doc',
+    'xls': 'xls',
+    'xlsx': 'xlsx',
+    'et': 'xls',
+}
+
+# 路径或下载参数中的附件扩展名，如 /module/download/downfile.jsp?filename=xxx.pdf
+ATTACHMENT_PATTERN = re.compile(r'\.(pdf|docx?|wps|xlsx?|et)(?=$|[?&#])', re.I)
+
+# 文件头魔数
+PDF_MAGIC = b'%PDF'
+ZIP_MAGIC = b'PK\x03\x04'
+OLE_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+# 附件正文保存上限（字符），避免超大表格撑破文档大小限制
+MAX_TEXT_CHARS = 200_000
+
+# 旧版二进制文档的UTF-16LE文本片段: ASCII可见字符、中日韩文字、中文标点和全角字符
+UTF16_TEXT_PATTERN = re.compile(
+    rb'(?:[\x09\x0a\x0d\x20-\x7e]\x00|[\x00-\xff][\x4e-\x9f]|[\x00-\x3f]\x30|[\x01-\xef]\xff){12,}'
+)
+
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+
+class AttachmentError(Exception):
+    """附件无法提取文本"""
+
+
+def attachment_type(url: str) -> Optional[str]:
+    """按URL判断附件类型，不是附件时返回None"""
+    parsed = urlparse(url)
+    match = ATTACHMENT_PATTERN.search(parsed.path) or ATTACHMENT_PATTERN.search(unquote(parsed.query))
+    return ATTACHMENT_EXTENSIONS[match.group(1).lower()] if match else None
+
+
+def attachment_name(url: str) -> str:
+    """附件文件名，用作缺省标题"""
+    parsed = urlparse(url)
+    for part in (unquote(parsed.query), unquote(parsed.path)):
+        match = re.search(r'([^/=&?]+\.(?:pdf|docx?|wps|xlsx?|et))(?=$|[?&#])', part, re.I)
+        if match:
+            return match.group(1)
+    return os.path.basename(parsed.path) or url
+
+
+def select_attachments(page_url: str, links: List[str], limit: Optional[int] = None) -> List[str]:
+    """从页面链接中挑出附件，附件常放在独立的文件服务器上，不限制主机"""
+    limit = settings.CRAWL_MAX_ATTACHMENTS_PER_PAGE if limit is None else limit
+    selected = []
+    for href in links:
+        url = urljoin(page_url, href.strip()).split('#')[0]
+        if urlparse(url).scheme not in ('http', 'https') or url in selected:
+            continue
+        if attachment_type(url):
+            selected.append(url)
+            if len(selected) >= limit:
+                break
+    return selected
+
+
+async def download_to_tempfile(response: aiohttp.ClientResponse, max_bytes: int, suffix: str = '') -> Tuple[str, str, int]:
+    """分块把响应体写入临时文件，超过 max_bytes 立即中止
+
+    返回 (临时文件路径, 内容哈希, 字节数)，调用方负责删除文件。
+    """
+    if response.content_length is not None and response.content_length > max_bytes:
+        raise ResponseTooLarge(f"Content-Length {response.content_length} exceeds {max_bytes}")
+
+    digest = sha1()
+    size = 0
+    fd, path = tempfile.mkstemp(prefix='attachment-', suffix=suffix)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ResponseTooLarge(f"Body exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+
+    return path, digest.hexdigest(), size
+
+
+def sniff_type(path: str, hint: Optional[str] = None) -> str:
+    """按文件头确定实际类型，扩展名不可信（如 .doc 实为 docx）"""
+    with open(path, 'rb') as f:
+        head = f.read(8)
+    if head.startswith(PDF_MAGIC):
+        return 'pdf'
+    if head.startswith(ZIP_MAGIC):
+        with zipfile.ZipFile(path) as archive:
+            names = set(archive.namelist())
+        if 'word/document.xml' in names:
+            return 'docx'
+        if 'xl/workbook.xml' in names:
+            return 'xlsx'
+        raise AttachmentError("Unsupported zip attachment")
+    if head == OLE_MAGIC:
+        return 'xls' if hint == 'xls' else 'doc'
+    raise AttachmentError(f"Unrecognized attachment format {head[:4]!r}")
+
+
+def _pdf_text(path: str) -> str:
+    if pypdf is None:
+        raise AttachmentError("pypdf is required to extract PDF attachments")
+    reader = pypdf.PdfReader(path)
+    pages = []
+    for page in reader.pages:
+        pages.append(page.extract_text() or '')
+        if sum(len(text) for text in pages) > MAX_TEXT_CHARS:
+            break
+    return '\n'.join(pages)
+
+
+def _iter_xml(archive: zipfile.ZipFile, name: str, tag: str) -> Iterator[etree._Element]:
+    """流式解析压缩包内的XML，逐个给出 tag 元素并释放已处理节点"""
+    with archive.open(name) as f:
+        for _, element in etree.iterparse(f, events=('end',), tag=tag):
+            yield element
+            element.clear()
+
+
+def _docx_text(path: str) -> str:
+    paragraphs = []
+    with zipfile.ZipFile(path) as archive:
+        for paragraph in _iter_xml(archive, 'word/document.xml', f'{WORD_NS}p'):
+            parts = []
+            for node in paragraph.iter(f'{WORD_NS}t', f'{WORD_NS}tab', f'{WORD_NS}br'):
+                if node.tag == f'{WORD_NS}t':
+                    parts.append(node.text or '')
+                else:
+                    parts.append('\t' if node.tag == f'{WORD_NS}tab' else '\n')
+            paragraphs.append(''.join(parts))
+    return '\n'.join(paragraphs)
+
+
+def _xlsx_text(path: str) -> str:
+    rows = []
+    with zipfile.ZipFile(path) as archive:
+        names = archive.namelist()
+        shared = []
+        if 'xl/sharedStrings.xml' in names:
+            for item in _iter_xml(archive, 'xl/sharedStrings.xml', f'{SHEET_NS}si'):
+                shared.append(''.join(node.text or '' for node in item.iter(f'{SHEET_NS}t')))
+
+        sheets = sorted(
+            (name for name in names if re.match(r'xl/worksheets/sheet\d+\.xml$', name)),
+            key=lambda name: int(re.search(r'(\d+)\.xml$', name).group(1))
+        )
+        for sheet in sheets:
+            for row in _iter_xml(archive, sheet, f'{SHEET_NS}row'):
+                cells = []
+                for cell in row.iter(f'{SHEET_NS}c'):
+                    if cell.get('t') == 'inlineStr':
+                        cells.append(''.join(node.text or '' for node in cell.iter(f'{SHEET_NS}t')))
+                        continue
+                    value = cell.findtext(f'{SHEET_NS}v')
+                    if value is None:
+                        continue
+                    cells.append(shared[int(value)] if cell.get('t') == 's' else value)
+                if cells:
+                    rows.append('\t'.join(cells))
+    return '\n'.join(rows)
+
+
+def _utf16_fragments(data) -> str:
+    """从二进制数据中找出UTF-16LE文本片段"""
+    fragments = []
+    for match in UTF16_TEXT_PATTERN.finditer(data):
+        start, end = match.span()
+        # 奇数偏移的匹配错位了一个字节
+        if start % 2:
+            start += 1
+            end -= 1
+        fragments.append(bytes(data[start:end]).decode('utf-16-le', errors='ignore'))
+    return '\n'.join(fragment.strip() for fragment in fragments if fragment.strip())
+
+
+def _ole_text(path: str, stream: str) -> str:
+    """旧版Word/WPS/Excel文档的文本
+
+    中文文档的正文在 WordDocument（或 Workbook）流中以UTF-16LE保存，
+    有 olefile 时只扫描对应的流，否则用mmap扫描整个文件；
+    文件头损坏（下载不完整、转换工具生成）olefile 无法解析时同样扫描整个文件。
+    """
+    if olefile is not None and olefile.isOleFile(path):
+        try:
+            with olefile.OleFileIO(path) as ole:
+                if ole.exists(stream):
+                    return _utf16_fragments(ole.openstream(stream).read())
+        except (OSError, ValueError) as e:
+            logger.debug(f"Cannot parse OLE structure of {path}, scanning whole file: {e}")
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return _utf16_fragments(data)
+
+
+def _xls_text(path: str) -> str:
+    if xlrd is None:
+        return _ole_text(path, 'Workbook')
+    book = xlrd.open_workbook(path, on_demand=True)
+    rows = []
+    try:
+        for index in range(book.nsheets):
+            sheet = book.sheet_by_index(index)
+            for row in range(sheet.nrows):
+                cells = [str(value) for value in sheet.row_values(row) if value not in ('', None)]
+                if cells:
+                    rows.append('\t'.join(cells))
+            book.unload_sheet(index)
+    finally:
+        book.release_resources()
+    return '\n'.join(rows)
+
+
+def extract_attachment(path: str, hint: Optional[str] = None) -> Dict[str, Any]:
+    """提取附件文本，在解析池中执行
+
+    返回 {'file_type', 'content'}，正文超过 MAX_TEXT_CHARS 时截断。
+    """
+    file_type = sniff_type(path, hint)
+    if file_type == 'pdf':
+        text = _pdf_text(path)
+    elif file_type == 'docx':
+        text = _docx_text(path)
+    elif file_type == 'xlsx':
+        text = _xlsx_text(path)
+    elif file_type == 'xls':
+        text = _xls_text(path)
+    else:
+        text = _ole_text(path, 'WordDocument')
+
+    text = re.sub(r'[ \t　]+\n', '\n', text)
+    text = re.sub(r'\n{3,}', '\n\n', text).strip()
+    return {'file_type': file_type, 'content': text[:MAX_TEXT_CHARS]}
+
+
+__all__ = [
+    'ATTACHMENT_PATTERN',
+    'AttachmentError',
+    'attachment_name',
+    'attachment_type',
+    'download_to_tempfile',
+    'extract_attachment',
+    'select_attachments',
+    'sniff_type',
+]
@@ -0,0 +1,101 @@
+"""
+采集检查点
+路径: /mnt/okcomputer/output/backend/workers/services/crawl_checkpoint.py
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.database.mongodb import mongodb
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_COLLECTION = 'crawl_checkpoints'
+
+
+class CrawlCheckpoint:
+    """按任务保存的采集进度，任务被重新投递或重试时从中恢复
+
+    Celery 开启了 acks_late，worker 重启或被OOM杀掉后任务会以同一个任务ID重新投递，
+    重试也沿用原ID，因此以任务ID为键。采集过程中每隔 interval 秒保存一次：
+    待采集队列（含在途URL）、已入队URL、各站点页数和统计、未提交的发现游标。
+    先记下队列快照再写入缓冲的采集结果，快照之后完成的页面恢复后会重新采集，
+    不会丢失；结果按URL upsert，重复采集不产生重复文档。
+    采集正常结束后删除检查点，异常退出的检查点在 CRAWL_CHECKPOINT_TTL 小时后过期。
+    """
+
+    def __init__(self, key: str, writer=None, interval: Optional[float] = None):
+        self.key = key
+        # 结果缓冲区（BulkResultWriter），保存检查点前先写入
+        self.writer = writer
+        self.interval = settings.CRAWL_CHECKPOINT_INTERVAL if interval is None else interval
+        self.state: Optional[Dict[str, Any]] = None
+        self.saves = 0
+        self._last_save = time.monotonic()
+        self._saving = False
+
+    @staticmethod
+    def _collection():
+        return mongodb.get_collection(CHECKPOINT_COLLECTION)
+
+    @property
+    def resumed(self) -> bool:
+        return self.state is not None
+
+    async def load(self) -> Optional[Dict[str, Any]]:
+        """读取上次保存的进度，没有时返回None"""
+        try:
+            self.state = await self._collection().find_one({'key': self.key})
+        except Exception as e:
+            logger.warning(f"Failed to load crawl checkpoint {self.key}: {e}")
+            self.state = None
+        if self.state is not None:
+            logger.info(
+                f"Resuming crawl {self.key} from checkpoint of {self.state.get('updated_at')}: "
+                f"{len(self.state.get('frontier', []))} URLs pending"
+            )
+        return self.state
+
+    def due(self) -> bool:
+        """距上次保存超过间隔，且没有其他协程正在保存"""
+        return not self._saving and time.monotonic() - self._last_save >= self.interval
+
+    async def save(self, state: Dict[str, Any]):
+        """写入缓冲结果后保存进度
+
+        state 须在调用前取好快照，写入结果期间其他协程仍在采集。
+        """
+        if self._saving:
+            return
+        self._saving = True
+        try:
+            if self.writer is not None:
+                await self.writer.flush()
+                state['totals'] = dict(self.writer.totals)
+            now = datetime.utcnow()
+            state.update({
+                'key': self.key,
+                'updated_at': now,
+                'expires_at': now + timedelta(hours=settings.CRAWL_CHECKPOINT_TTL),
+            })
+            await self._collection().replace_one({'key': self.key}, state, upsert=True)
+            self.saves += 1
+        except Exception as e:
+            # 检查点只是优化，保存失败不影响采集
+            logger.warning(f"Failed to save crawl checkpoint {self.key}: {e}")
+        finally:
+            self._last_save = time.monotonic()
+            self._saving = False
+
+    async def clear(self):
+        """采集完成后删除检查点"""
+        try:
+            await self._collection().delete_one({'key': self.key})
+        except Exception as e:
+            logger.warning(f"Failed to clear crawl checkpoint {self.key}: {e}")
+
+
+__all__ = ['CrawlCheckpoint']
@@ -5,422 +5,908 @@
 
 import aiohttp
 import asyncio
-from typing import Dict, List, Optional, Any
-from bs4 import BeautifulSoup
+import functools
+from typing import Dict, List, Optional, Any, Tuple, Callable, Awaitable
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 import logging
 from datetime import datetime
-import json
+import os
 import time
-import random
+import re
 from urllib.parse import urljoin, urlparse
 
-from ...config import settings
-from ...database.mongodb import mongodb
+from app.config import settings
+from app.database.mongodb import mongodb
+from .attachments import AttachmentError, attachment_name, attachment_type, download_to_tempfile, extract_attachment, select_attachments
+from .crawl_checkpoint import CrawlCheckpoint
+from .discovery import SiteDiscovery
+from .frontier import CrawlFrontier, FrontierItem
+from .html_archive import HtmlArchive, create_archive
+from .near_duplicate import NearDuplicateIndex, link_duplicates
+from .extraction import ExtractionEngine, get_engine
+from .parse_pool import ParsePool
+from .pipeline_trigger import publish_pending
+from .rate_limiter import HostRateLimiter
+from .revisit_scheduler import RevisitScheduler
+from .response_reader import ResponseTooLarge, decode_html, read_limited
+from .seen_store import SeenURLStore, create_seen_store
+from .site_registry import SiteRegistry, site_registry
+from .site_profile import SiteProfileCache
+from .revalidation import CACHED_FIELDS, LINKS_FIELD, ValidatorCache, collection_for, conditional_headers, content_hash
 
 logger = logging.getLogger(__name__)
 
+# 单个页面的采集结果类型
+PAGE_OUTCOMES = ('new', 'changed', 'unchanged', 'not_modified', 'skipped', 'error')
+
+# 政府网站常见的详情页/栏目页URL特征
+DETAIL_LINK_PATTERN = re.compile(
+    r'(/art/|/content/|/zwgk/|/zcwj/|/zcfg/|/xxgk/|/zfxxgk/|/tzgg/|/gongkai/|t\d{8}_\d+|/\d{6,}\.s?html?$)',
+    re.I
+)
+
+# 不跟进的静态资源和附件
+SKIP_LINK_PATTERN = re.compile(
+    r'\.(jpg|jpeg|png|gif|bmp|svg|ico|css|js|zip|rar|7z|mp3|mp4|avi|flv|exe|apk)$',
+    re.I
+)
+
+# 采集请求的公共请求头
+CRAWL_HEADERS = {
+    'User-Agent': 'PolicyPulse-Bot/1.0 (Compatible; Email: support@policypulse.com)',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
+
+
+def create_session(timeout: Optional[int] = None) -> aiohttp.ClientSession:
+    """创建采集用的HTTP会话，连接池带DNS缓存，可跨多次采集复用"""
+    connector = aiohttp.TCPConnector(
+        limit=100,
+        limit_per_host=10,
+        use_dns_cache=True,
+        ttl_dns_cache=settings.CRAWL_DNS_CACHE_TTL,
+        keepalive_timeout=30
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=timeout or settings.CRAWL_TIMEOUT),
+        headers=CRAWL_HEADERS
+    )
+
+
 class GovTreeCrawler:
     """政府网站数据采集服务"""
     
-    def __init__(self):
-        self.session: Optional[aiohttp.ClientSession] = None
-        self.visited_urls = set()
+    def __init__(
+        self,
+        seen_store: Optional[SeenURLStore] = None,
+        extractor: Optional[ExtractionEngine] = None,
+        parse_pool: Optional[ParsePool] = None,
+        rate_limiter: Optional[HostRateLimiter] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        archive: Optional[HtmlArchive] = None
+    ):
+        # HTTP会话，传入时复用（如worker进程内的长连接池），否则进入上下文时创建
+        self.session = session
+        self._owns_session = session is None
+        self.extractor = extractor or get_engine()
+        # 解析工作池，未传入时在进入上下文时按配置创建
+        self.parse_pool = parse_pool
+        self._owns_parse_pool = False
+        # 按主机自适应限速，CRAWL_DELAY 为初始间隔；worker 内传入进程共享的实例
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        # 已访问URL存储，默认跨worker共享（Redis），未连接时为进程内紧凑存储
+        # 空的进程内存储长度为0，不能用 or 判断
+        self.seen_urls = seen_store if seen_store is not None else create_seen_store()
+        # 原始响应体归档，便于改选择器后离线重新提取
+        self.archive = archive if archive is not None else create_archive()
+        self._owns_archive = archive is None
+        # 转载文档的近似重复检测
+        self.dedup = NearDuplicateIndex() if settings.CRAWL_DEDUP_ENABLED else None
+        # 按站点学习的选择器、日期格式和页面模板，提取时优先使用
+        self.profiles = (
+            SiteProfileCache()
+            if settings.CRAWL_SITE_PROFILE_ENABLED or settings.CRAWL_TEMPLATE_ENABLED else None
+        )
         self.delay = settings.CRAWL_DELAY
         self.timeout = settings.CRAWL_TIMEOUT
         self.max_retry = settings.MAX_RETRY_COUNT
+        self.concurrency = settings.CRAWL_CONCURRENCY
+        self.max_depth = settings.CRAWL_MAX_DEPTH
+        self.max_pages = settings.CRAWL_MAX_PAGES_PER_SITE
+        self.max_page_bytes = settings.CRAWL_MAX_PAGE_BYTES
+        # 页面中的PDF/DOC/XLS附件作为关联文档单独入库
+        self.attachments_enabled = settings.CRAWL_ATTACHMENTS_ENABLED
+        self.max_attachment_bytes = settings.CRAWL_MAX_ATTACHMENT_BYTES
+        self.validators = ValidatorCache()
+        self.stats = {
+            'fetched': 0, 'not_modified': 0, 'unchanged': 0, 'too_large': 0, 'attachments': 0, 'archive_errors': 0
+        }
+        # 每个URL本次采集的结果: new/changed/unchanged/not_modified/skipped，缺省为error
+        self.page_outcomes: Dict[str, str] = {}
+        # 按站点汇总的页面结果，供重访调度估计更新频率
+        self.site_stats: Dict[str, Dict[str, int]] = {}
+        # 从检查点恢复的待采集URL及由它们（递归）发现的链接，可能已在中断前记入共享的已访问集合；
+        # 以及各站点已采集页数
+        self.resumed_urls: set = set()
+        self._resumed_pages: Dict[str, int] = {}
         
     async def __aenter__(self):
         """异步上下文管理器入口"""
-        connector = aiohttp.TCPConnector(limit=100, limit_per_host=10)
-        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        if self._owns_session:
+            self.session = create_session(self.timeout)
+        
+        if self.parse_pool is None and settings.CRAWL_PARSE_MODE != 'inline':
+            self.parse_pool = ParsePool(backend=self.extractor.name).start()
+            self._owns_parse_pool = True
         
-        self.session = aiohttp.ClientSession(
-            connector=connector,
-            timeout=timeout,
-            headers={
-                'User-Agent': 'PolicyPulse-Bot/1.0 (Compatible; Email: support@policypulse.com)',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-                'Accept-Encoding': 'gzip, deflate',
-                'Connection': 'keep-alive',
-            }
-        )
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """异步上下文管理器出口"""
-        if self.session:
+        if self._owns_session and self.session:
             await self.session.close()
+            self.session = None
+        if self._owns_archive and self.archive is not None:
+            self.archive.close()
+        if self._owns_parse_pool:
+            self.parse_pool.close()
+            self.parse_pool = None
+            self._owns_parse_pool = False
     
     async def crawl_page(self, url: str, source_config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """采集单个页面"""
+        # 检查是否已经访问过
+        if await self.seen_urls.contains(url):
+            logger.info(f"URL already visited: {url}")
+            return None
+        
+        # 按主机限速，替代固定的随机延迟
+        await self.rate_limiter.ensure_robots(url, self.session)
+        await self.rate_limiter.wait(url)
+        
+        result, _ = await self._fetch_page(url, source_config)
+        return result
+    
+    async def _fetch_page(self, url: str, source_config: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+        """抓取并解析页面，返回采集结果和页面中的链接"""
         try:
-            # 检查是否已经访问过
-            if url in self.visited_urls:
+            if not await self.seen_urls.add(url) and url not in self.resumed_urls:
                 logger.info(f"URL already visited: {url}")
-                return None
+                self.page_outcomes[url] = 'skipped'
+                return None, []
             
-            self.visited_urls.add(url)
-            
-            # 随机延迟避免被封
-            await asyncio.sleep(random.uniform(1, self.delay))
+            await self.rate_limiter.ensure_robots(url, self.session)
+            if not self.rate_limiter.can_fetch(url):
+                logger.info(f"Disallowed by robots.txt: {url}")
+                self.page_outcomes[url] = 'skipped'
+                return None, []
             
             logger.info(f"Crawling: {url}")
             
-            async with self.session.get(url) as response:
+            # 带上次保存的验证字段发起条件请求；没有缓存出链的旧文档取回正文，补存出链
+            category = source_config.get('category', 'policy')
+            validators = await self.validators.get(url, category)
+            headers = conditional_headers(validators) if validators and LINKS_FIELD in validators else {}
+            
+            host = urlparse(url).netloc.lower()
+            started = time.monotonic()
+            async with self.session.get(url, headers=headers) as response:
+                self.rate_limiter.record(
+                    host,
+                    response.status,
+                    time.monotonic() - started,
+                    response.headers.get('Retry-After')
+                )
+                
+                if response.status == 304:
+                    self.stats['not_modified'] += 1
+                    self.page_outcomes[url] = 'not_modified'
+                    logger.info(f"Not modified: {url}")
+                    # 页面本身不再保存，但仍沿上次的出链遍历，下层页面可能已更新
+                    return None, (validators or {}).get(LINKS_FIELD, [])
+                
                 if response.status != 200:
                     logger.warning(f"HTTP {response.status} for {url}")
-                    return None
+                    return None, []
                 
                 content_type = response.headers.get('content-type', '')
                 if 'text/html' not in content_type:
                     logger.info(f"Non-HTML content: {content_type}")
-                    return None
-                
-                html = await response.text()
+                    return None, []
                 
-                # 解析页面内容
-                soup = BeautifulSoup(html, 'html.parser')
+                # 分块读取，超过上限立即中止
+                body = await read_limited(response, self.max_page_bytes)
+                self.stats['fetched'] += 1
                 
-                # 提取标题
-                title = self._extract_title(soup, source_config)
+                # 内容未变化时跳过解析和保存
+                body_hash = content_hash(body)
+                if validators and validators.get('content_hash') == body_hash:
+                    self.stats['unchanged'] += 1
+                    self.page_outcomes[url] = 'unchanged'
+                    logger.info(f"Content unchanged: {url}")
+                    if LINKS_FIELD in validators:
+                        return None, validators[LINKS_FIELD]
+                    html, _ = decode_html(body, content_type)
+                    return None, await self._backfill_links(url, html, source_config, validators)
                 
-                # 提取正文内容
-                content = self._extract_content(soup, source_config)
+                # 按响应头/meta/字节探测识别编码后一次解码
+                html, _ = decode_html(body, content_type)
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+            
+            # 连接已释放，解析交给工作池，不阻塞其他在途请求
+            extracted = await self._extract(html, source_config)
+            if self.profiles is not None:
+                self.profiles.record(source_config, extracted.get('matched'))
+            
+            result = {
+                'url': url,
+                'title': extracted['title'],
+                'content': extracted['content'],
+                'source': source_config.get('name', 'unknown'),
+                'region': source_config.get('region', 'unknown'),
+                'industry': source_config.get('industry', 'unknown'),
+                'publish_date': extracted['publish_date'],
+                'crawl_date': datetime.utcnow(),
+                'metadata': extracted['metadata'],
+                'etag': etag,
+                'last_modified': last_modified,
+                'content_hash': body_hash,
+                # 需要跟进的站内链接，页面未变化时据此继续遍历
+                LINKS_FIELD: self._select_links(url, extracted['links'], source_config),
+                'status': 'pending'
+            }
+            if extracted.get('simhash') is not None:
+                result['simhash'] = extracted['simhash']
+            
+            if self.archive is not None:
+                pointer = await self._archive_page(url, body, content_type, source_config)
+                if pointer is not None:
+                    result['archive'] = pointer
+            
+            self.page_outcomes[url] = 'changed' if validators else 'new'
+            logger.info(f"Successfully crawled: {extracted['title']}")
+            return result, extracted['links']
+            
+        except ResponseTooLarge as e:
+            self.stats['too_large'] += 1
+            logger.warning(f"Skipping oversized page {url}: {e}")
+        except asyncio.TimeoutError:
+            logger.error(f"Timeout crawling {url}")
+            self.rate_limiter.record(urlparse(url).netloc.lower())
+        except aiohttp.ClientError as e:
+            logger.error(f"Client error crawling {url}: {e}")
+            self.rate_limiter.record(urlparse(url).netloc.lower())
+        except Exception as e:
+            logger.error(f"Unexpected error crawling {url}: {e}")
+        
+        return None, []
+    
+    async def _backfill_links(
+        self,
+        url: str,
+        html: str,
+        source_config: Dict[str, Any],
+        validators: Dict[str, Any]
+    ) -> List[str]:
+        """正文未变、但保存时还没有出链字段的页面解析一次，补存出链，之后即可走条件请求"""
+        extracted = await self._extract(html, source_config)
+        links = self._select_links(url, extracted['links'], source_config)
+        try:
+            collection = mongodb.get_collection(collection_for(source_config.get('category', 'policy')))
+            await collection.update_one({'url': url}, {'$set': {LINKS_FIELD: links}})
+        except Exception as e:
+            logger.warning(f"Failed to save links of {url}: {e}")
+        self.validators.update(url, dict(validators, **{LINKS_FIELD: links}))
+        return links
+    
+    async def _fetch_attachment(
+        self,
+        url: str,
+        parent: Dict[str, Any],
+        source_config: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """流式下载附件到临时文件，在工作池中提取文本，作为关联文档返回"""
+        path = None
+        try:
+            if not await self.seen_urls.add(url) and url not in self.resumed_urls:
+                self.page_outcomes[url] = 'skipped'
+                return None
+            
+            await self.rate_limiter.ensure_robots(url, self.session)
+            if not self.rate_limiter.can_fetch(url):
+                logger.info(f"Disallowed by robots.txt: {url}")
+                self.page_outcomes[url] = 'skipped'
+                return None
+            
+            logger.info(f"Downloading attachment: {url}")
+            
+            category = source_config.get('category', 'policy')
+            validators = await self.validators.get(url, category)
+            hint = attachment_type(url)
+            
+            host = urlparse(url).netloc.lower()
+            started = time.monotonic()
+            async with self.session.get(url, headers=conditional_headers(validators)) as response:
+                self.rate_limiter.record(
+                    host,
+                    response.status,
+                    time.monotonic() - started,
+                    response.headers.get('Retry-After')
+                )
                 
-                # 提取发布日期
-                publish_date = self._extract_date(soup, source_config)
+                if response.status == 304:
+                    self.stats['not_modified'] += 1
+                    self.page_outcomes[url] = 'not_modified'
+                    return None
                 
-                # 提取元数据
-                metadata = self._extract_metadata(soup, source_config)
+                if response.status != 200:
+                    logger.warning(f"HTTP {response.status} for attachment {url}")
+                    return None
                 
-                result = {
-                    'url': url,
-                    'title': title,
-                    'content': content,
-                    'source': source_config.get('name', 'unknown'),
-                    'region': source_config.get('region', 'unknown'),
-                    'industry': source_config.get('industry', 'unknown'),
-                    'publish_date': publish_date,
-                    'crawl_date': datetime.utcnow(),
-                    'metadata': metadata,
-                    'status': 'pending'
-                }
+                # 附件直接落盘，不在内存中保留整个文件
+                path, body_hash, size = await download_to_tempfile(
+                    response, self.max_attachment_bytes, suffix=f'.{hint}'
+                )
+                self.stats['fetched'] += 1
                 
-                logger.info(f"Successfully crawled: {title}")
-                return result
+                if validators and validators.get('content_hash') == body_hash:
+                    self.stats['unchanged'] += 1
+                    self.page_outcomes[url] = 'unchanged'
+                    return None
                 
+                content_type = response.headers.get('content-type', '')
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+            
+            # 文本提取（PDF解析等）耗CPU，交给工作池
+            if self.parse_pool is not None:
+                extracted = await self.parse_pool.extract_attachment(path, hint)
+            else:
+                extracted = await asyncio.get_running_loop().run_in_executor(None, extract_attachment, path, hint)
+            
+            if not extracted['content']:
+                logger.info(f"No text in attachment {url}, probably a scanned document")
+                self.page_outcomes[url] = 'skipped'
+                return None
+            
+            name = attachment_name(url)
+            stem = os.path.splitext(name)[0]
+            # 文件名常是无意义的编号，此时用所在页面标题
+            title = stem if re.search(r'[\u4e00-\u9fff]', stem) else f"{parent.get('title') or stem}（附件：{name}）"
+            
+            result = {
+                'url': url,
+                'title': title,
+                'content': extracted['content'],
+                'source': source_config.get('name', 'unknown'),
+                'region': source_config.get('region', 'unknown'),
+                'industry': source_config.get('industry', 'unknown'),
+                'publish_date': parent.get('publish_date'),
+                'crawl_date': datetime.utcnow(),
+                'metadata': {
+                    'attachment': True,
+                    'file_type': extracted['file_type'],
+                    'file_name': name,
+                    'file_size': size,
+                    'content_type': content_type,
+                },
+                'parent_url': parent['url'],
+                'etag': etag,
+                'last_modified': last_modified,
+                'content_hash': body_hash,
+                'status': 'pending'
+            }
+            if extracted.get('simhash') is not None:
+                result['simhash'] = extracted['simhash']
+            
+            self.stats['attachments'] += 1
+            self.page_outcomes[url] = 'changed' if validators else 'new'
+            logger.info(f"Extracted attachment: {title}")
+            return result
+        
+        except ResponseTooLarge as e:
+            self.stats['too_large'] += 1
+            logger.warning(f"Skipping oversized attachment {url}: {e}")
+        except AttachmentError as e:
+            logger.warning(f"Cannot extract attachment {url}: {e}")
         except asyncio.TimeoutError:
-            logger.error(f"Timeout crawling {url}")
+            logger.error(f"Timeout downloading {url}")
+            self.rate_limiter.record(urlparse(url).netloc.lower())
         except aiohttp.ClientError as e:
-            logger.error(f"Client error crawling {url}: {e}")
+            logger.error(f"Client error downloading {url}: {e}")
+            self.rate_limiter.record(urlparse(url).netloc.lower())
         except Exception as e:
-            logger.error(f"Unexpected error crawling {url}: {e}")
+            logger.error(f"Unexpected error processing attachment {url}: {e}")
+        finally:
+            if path is not None:
+                os.unlink(path)
         
         return None
     
-    def _extract_title(self, soup: BeautifulSoup, config: Dict[str, Any]) -> str:
-        """提取页面标题"""
-        selectors = config.get('selectors', {})
-        
-        # 尝试多个选择器
-        title_selectors = selectors.get('title', ['h1', 'title', '.title', '#title'])
-        
-        for selector in title_selectors:
-            element = soup.select_one(selector)
-            if element:
-                return element.get_text(strip=True)
-        
-        # 默认使用页面title
-        title_tag = soup.find('title')
-        if title_tag:
-            return title_tag.get_text(strip=True)
-        
-        return "Untitled"
+    async def _archive_page(
+        self,
+        url: str,
+        body: bytes,
+        content_type: str,
+        source_config: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """在线程池中压缩并追加归档，归档失败（如目录只读、磁盘满）时页面照常保存，只是没有归档指针"""
+        site_key = self._site_key(source_config)
+        try:
+            pointer = await asyncio.get_running_loop().run_in_executor(
+                None,
+                functools.partial(self.archive.append, url, body, content_type=content_type, site_id=site_key)
+            )
+        except OSError as e:
+            self._archive_failed(e)
+            return None
+        return dict(pointer, site_id=site_key, content_type=content_type)
     
-    def _extract_content(self, soup: BeautifulSoup, config: Dict[str, Any]) -> str:
-        """提取正文内容"""
-        selectors = config.get('selectors', {})
-        
-        # 移除脚本和样式
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # 尝试内容选择器
-        content_selectors = selectors.get('content', [
-            '.content', '.article', '.post', '#content', '#article', '.news-content'
-        ])
-        
-        for selector in content_selectors:
-            elements = soup.select(selector)
-            if elements:
-                content = ' '.join([elem.get_text(separator=' ', strip=True) for elem in elements])
-                if len(content) > 100:  # 确保内容足够长
-                    return content
-        
-        # 如果没有找到特定内容区域，使用body内容
-        body = soup.find('body')
-        if body:
-            return body.get_text(separator=' ', strip=True)
-        
-        return ""
+    def _archive_failed(self, error: OSError):
+        """同一次采集只记录一次归档错误"""
+        self.stats['archive_errors'] += 1
+        if self.stats['archive_errors'] == 1:
+            logger.error(f"Cannot write page archive under {self.archive.directory}, saving pages without it: {error}")
+    
+    async def _extract(self, html: str, source_config: Dict[str, Any]) -> Dict[str, Any]:
+        """解析页面，有工作池时在池中执行"""
+        if self.profiles is not None:
+            source_config = self.profiles.apply(source_config)
+        if self.parse_pool is not None:
+            return await self.parse_pool.extract(html, source_config)
+        return self.extractor.extract(html, source_config)
     
-    def _extract_date(self, soup: BeautifulSoup, config: Dict[str, Any]) -> datetime:
-        """提取发布日期"""
-        selectors = config.get('selectors', {})
+    def _select_links(self, page_url: str, links: List[str], config: Dict[str, Any]) -> List[str]:
+        """筛选需要跟进的站内链接"""
+        host = urlparse(page_url).netloc.lower()
+        pattern = re.compile(config['link_pattern']) if config.get('link_pattern') else DETAIL_LINK_PATTERN
         
-        date_selectors = selectors.get('date', [
-            '.date', '.publish-date', '.pub-date', '.time', '#date'
-        ])
+        selected = []
+        for href in links:
+            url = urljoin(page_url, href.strip()).split('#')[0]
+            parsed = urlparse(url)
+            if parsed.scheme not in ('http', 'https') or parsed.netloc.lower() != host:
+                continue
+            if SKIP_LINK_PATTERN.search(parsed.path) or not pattern.search(url):
+                continue
+            # 附件走单独的下载流程
+            if attachment_type(url):
+                continue
+            selected.append(url)
         
-        for selector in date_selectors:
-            element = soup.select_one(selector)
-            if element:
-                date_text = element.get_text(strip=True)
-                parsed_date = self._parse_date(date_text)
-                if parsed_date:
-                    return parsed_date
+        return selected
+    
+    def _snapshot(
+        self,
+        site_configs: List[Dict[str, Any]],
+        frontier: CrawlFrontier,
+        results: Dict[str, List[Dict[str, Any]]],
+        discovery: Optional[SiteDiscovery]
+    ) -> Dict[str, Any]:
+        """当前采集进度的快照（URL作键的字典存成列表，避免字段名中的"."）"""
+        items, enqueued = frontier.snapshot()
+        return {
+            'site_ids': [site.get('id') for site in site_configs],
+            'frontier': [
+                {'url': item.url, 'site_id': self._site_key(item.site_config), 'depth': item.depth, 'parent': item.parent}
+                for item in items
+            ],
+            'enqueued': enqueued,
+            'site_pages': [[key, len(pages) + self._resumed_pages.get(key, 0)] for key, pages in results.items()],
+            'site_stats': [[key, dict(counts)] for key, counts in self.site_stats.items()],
+            'page_outcomes': [[url, outcome] for url, outcome in self.page_outcomes.items()],
+            'stats': dict(self.stats),
+            'discovery': discovery.pending() if discovery is not None else [],
+        }
+    
+    def _restore(
+        self,
+        state: Dict[str, Any],
+        frontier: CrawlFrontier,
+        site_configs: List[Dict[str, Any]],
+        discovery: Optional[SiteDiscovery]
+    ):
+        """从检查点恢复队列和统计"""
+        sites = {self._site_key(site): site for site in site_configs}
+        items = [
+            FrontierItem(entry['url'], sites[entry['site_id']], entry['depth'], entry.get('parent'))
+            for entry in state.get('frontier', [])
+            if entry['site_id'] in sites
+        ]
+        frontier.restore(items, state.get('enqueued', []))
+        self.resumed_urls.update(item.url for item in items)
+        self._resumed_pages.update(dict(state.get('site_pages', [])))
+        for key, counts in state.get('site_stats', []):
+            if key in self.site_stats:
+                self.site_stats[key].update(counts)
+        self.page_outcomes.update(dict(state.get('page_outcomes', [])))
+        self.stats.update(state.get('stats', {}))
+        if discovery is not None:
+            discovery.restore(state.get('discovery', []))
+        logger.info(f"Restored {len(items)} pending URLs from checkpoint")
+    
+    @staticmethod
+    def _site_key(site_config: Dict[str, Any]) -> str:
+        """站点标识"""
+        return str(site_config.get('id', site_config.get('name', 'unknown')))
+    
+    async def crawl_sites(
+        self,
+        site_configs: List[Dict[str, Any]],
+        on_result: Optional[Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[None]]] = None,
+        checkpoint: Optional[CrawlCheckpoint] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """并发采集多个站点，按站点返回采集结果
         
-        # 尝试从meta标签提取
-        date_meta = soup.find('meta', attrs={'name': 'date'}) or \
-                   soup.find('meta', attrs={'property': 'article:published_time'})
-        if date_meta:
-            date_content = date_meta.get('content', '')
-            parsed_date = self._parse_date(date_content)
-            if parsed_date:
-                return parsed_date
+        on_result 在每个页面采集成功后被调用，用于边采集边入库。
+        传入 checkpoint 时定期保存进度，已有进度时从中恢复而不重新发现入口。
+        """
+        frontier = CrawlFrontier(self.delay)
+        results: Dict[str, List[Dict[str, Any]]] = {}
         
-        # 默认使用当前时间
-        return datetime.utcnow()
-    
-    def _parse_date(self, date_text: str) -> Optional[datetime]:
-        """解析日期字符串"""
-        if not date_text:
-            return None
+        discovery = None
+        if settings.CRAWL_DISCOVERY_ENABLED:
+            discovery = SiteDiscovery(self.session, self.rate_limiter, self.parse_pool)
+            await discovery.load(site_configs)
+        if self.profiles is not None:
+            await self.profiles.load(site_configs)
+        slots = asyncio.Semaphore(self.concurrency)
         
-        # 常见的日期格式
-        date_formats = [
-            '%Y-%m-%d',
-            '%Y-%m-%d %H:%M:%S',
-            '%Y/%m/%d',
-            '%Y/%m/%d %H:%M:%S',
-            '%d-%m-%Y',
-            '%d/%m/%Y',
-            '%Y年%m月%d日',
-            '%Y年%m月%d日 %H时%M分',
-        ]
+        async def seed(site_config: Dict[str, Any]):
+            """有可用发现源时只入队新文档，否则从入口页遍历整站"""
+            start_urls = site_config.get('start_urls', [])
+            if not start_urls:
+                logger.warning(f"No start URLs for site: {site_config.get('name', 'unknown')}")
+                return
+            
+            discovered = None
+            if discovery is not None and site_config.get('discovery', True):
+                try:
+                    async with slots:
+                        discovered = await discovery.discover(site_config, self._select_links)
+                except Exception as e:
+                    logger.error(f"Discovery failed for {site_config.get('name', 'unknown')}: {e}")
+            
+            if discovered is None:
+                urls = [url for url in start_urls if frontier.push(url, site_config)]
+            else:
+                # 新文档本身不再向下遍历，只跟进其中的附件
+                urls = [url for url in discovered if frontier.push(url, site_config, self.max_depth)]
+            await self.validators.prefetch(urls, site_config.get('category', 'policy'))
         
-        for fmt in date_formats:
-            try:
-                return datetime.strptime(date_text.strip(), fmt)
-            except ValueError:
-                continue
+        for site_config in site_configs:
+            results[self._site_key(site_config)] = []
+            self.site_stats[self._site_key(site_config)] = {outcome: 0 for outcome in PAGE_OUTCOMES}
         
-        return None
-    
-    def _extract_metadata(self, soup: BeautifulSoup, config: Dict[str, Any]) -> Dict[str, Any]:
-        """提取元数据"""
-        metadata = {}
+        if checkpoint is not None and checkpoint.resumed:
+            self._restore(checkpoint.state, frontier, site_configs, discovery)
+        else:
+            await asyncio.gather(*(seed(site_config) for site_config in site_configs))
+            if checkpoint is not None:
+                # 入口发现完成即保存，中断后不必重新请求sitemap和列表页
+                await checkpoint.save(self._snapshot(site_configs, frontier, results, discovery))
         
-        # 提取meta标签信息
-        meta_tags = soup.find_all('meta')
-        for tag in meta_tags:
-            name = tag.get('name') or tag.get('property')
-            content = tag.get('content')
-            if name and content:
-                metadata[name] = content
+        async def save_checkpoint():
+            if checkpoint is not None and checkpoint.due():
+                await checkpoint.save(self._snapshot(site_configs, frontier, results, discovery))
         
-        # 提取页面中的关键词
-        keywords = soup.find_all(attrs={'class': re.compile('keyword', re.I)})
-        if keywords:
-            metadata['keywords'] = [kw.get_text(strip=True) for kw in keywords]
+        # 协程数按并发上限而不是初始队列长度：通常只有几个入口页，队列随遍历增长，
+        # 暂时取不到URL的协程在 frontier.pop() 中等待，队列耗尽后一起退出
+        workers = [
+            asyncio.create_task(self._frontier_worker(frontier, results, on_result, save_checkpoint))
+            for _ in range(max(1, self.concurrency))
+        ]
+        await asyncio.gather(*workers)
         
-        # 提取链接
-        links = []
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            text = link.get_text(strip=True)
-            if href.startswith('http') or href.startswith('/'):
-                links.append({'url': href, 'text': text})
+        # 本轮采集完成后再推进发现游标，没有采集成功的URL留待下一轮
+        if discovery is not None:
+            await discovery.commit(self.page_outcomes)
+        if self.profiles is not None:
+            await self.profiles.commit()
         
-        if links:
-            metadata['links'] = links[:10]  # 限制数量
+        for site_config in site_configs:
+            logger.info(
+                f"Crawl site {site_config.get('name', 'unknown')} completed: "
+                f"{len(results[self._site_key(site_config)])} pages"
+            )
+        logger.info(
+            f"Fetched {self.stats['fetched']} pages, "
+            f"{self.stats['not_modified']} not modified, {self.stats['unchanged']} unchanged"
+        )
         
-        return metadata
+        return results
     
-    async def crawl_site(self, site_config: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """采集整个站点"""
-        results = []
-        
-        try:
-            # 加载起始URL
-            start_urls = site_config.get('start_urls', [])
-            if not start_urls:
-                logger.warning(f"No start URLs for site: {site_config.get('name', 'unknown')}")
-                return results
+    async def _frontier_worker(
+        self,
+        frontier: CrawlFrontier,
+        results: Dict[str, List[Dict[str, Any]]],
+        on_result: Optional[Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[None]]] = None,
+        after_item: Optional[Callable[[], Awaitable[None]]] = None
+    ):
+        """从队列中持续取URL采集，直到队列耗尽"""
+        while True:
+            item = await frontier.pop()
+            if item is None:
+                return
             
-            # 采集每个起始URL
-            for url in start_urls:
-                result = await self.crawl_page(url, site_config)
+            delay = None
+            try:
+                site_key = self._site_key(item.site_config)
+                site_results = results[site_key]
+                if len(site_results) + self._resumed_pages.get(site_key, 0) >= self.max_pages:
+                    # 站点已达上限，未发起请求，不占用礼貌间隔
+                    delay = 0
+                    continue
+                
+                if item.parent is not None:
+                    result, links = await self._fetch_attachment(item.url, item.parent, item.site_config), []
+                else:
+                    result, links = await self._fetch_page(item.url, item.site_config)
+                self.site_stats[self._site_key(item.site_config)][self.page_outcomes.get(item.url, 'error')] += 1
+                
+                attachment_urls = []
+                if result and item.parent is None and self.attachments_enabled:
+                    attachment_urls = select_attachments(item.url, links)
+                    result['attachments'] = attachment_urls
+                
                 if result:
-                    results.append(result)
+                    site_results.append(result)
+                    if on_result:
+                        await on_result(result, item.site_config)
                 
-                # 限制单次采集数量
-                if len(results) >= 10:  # 每个站点最多采集10个页面
-                    break
-            
-            logger.info(f"Crawl site {site_config.get('name', 'unknown')} completed: {len(results)} pages")
+                # 附件不受深度限制，与页面共用主机礼貌间隔
+                new_attachments = []
+                if attachment_urls:
+                    parent = {'url': item.url, 'title': result['title'], 'publish_date': result['publish_date']}
+                    new_attachments = [
+                        url for url in attachment_urls
+                        if frontier.push(url, item.site_config, item.depth + 1, parent)
+                    ]
+                    await self.validators.prefetch(new_attachments, item.site_config.get('category', 'policy'))
+                
+                new_urls = []
+                if item.depth < self.max_depth:
+                    new_urls = [
+                        url for url in self._select_links(item.url, links, item.site_config)
+                        if frontier.push(url, item.site_config, item.depth + 1)
+                    ]
+                    # 一次查询取回新链接的验证字段
+                    await self.validators.prefetch(new_urls, item.site_config.get('category', 'policy'))
+                
+                # 中断前上个检查点之后发现的链接不在快照中，但可能已记入已访问集合，结果也可能
+                # 还在缓冲区中没有写入；恢复的页面重新发现它们时同样不受已访问集合限制
+                if item.url in self.resumed_urls:
+                    self.resumed_urls.update(new_attachments)
+                    self.resumed_urls.update(new_urls)
+                        
+            except Exception as e:
+                logger.error(f"Error crawling {item.url}: {e}")
+            finally:
+                frontier.done(item, self.rate_limiter.delay_for(item.host) if delay is None else delay)
             
+            if after_item is not None:
+                await after_item()
+    
+    async def crawl_site(self, site_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """采集整个站点"""
+        try:
+            results = await self.crawl_sites([site_config])
+            return results[self._site_key(site_config)]
         except Exception as e:
             logger.error(f"Error crawling site {site_config.get('name', 'unknown')}: {e}")
-        
-        return results
+            return []
     
     async def save_results(self, results: List[Dict[str, Any]], collection_type: str = 'policy') -> int:
-        """保存采集结果到数据库"""
+        """保存采集结果到数据库，返回新增数量"""
+        counts = await self.save_results_bulk(results, collection_type)
+        return counts['inserted']
+    
+    async def save_results_bulk(self, results: List[Dict[str, Any]], collection_type: str = 'policy') -> Dict[str, int]:
+        """以一次无序bulk_write批量upsert采集结果
+        
+        正文变化的文档被覆盖并重新置为pending；正文相同的文档不匹配过滤条件，
+        upsert触发url唯一索引冲突，按未变化计数，只补刷验证字段。
+        """
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'errors': 0}
         if not results:
-            return 0
+            return counts
+        
+        # 归档记录先落盘，再保存指向它的指针；落盘失败时不保存指针
+        if self.archive is not None:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.archive.flush)
+            except OSError as e:
+                self._archive_failed(e)
+                for result in results:
+                    result.pop('archive', None)
         
         try:
-            collection = mongodb.get_collection('raw_pages' if collection_type == 'policy' else 'raw_bids')
+            collection = mongodb.get_collection(collection_for(collection_type))
+            
+            # 其他站点转载的文档标记为duplicate，不再进入清洗和解读
+            if self.dedup is not None:
+                await self.dedup.annotate(results, collection_type, self.parse_pool)
             
-            # 批量插入数据
-            inserted_count = 0
+            operations = []
             for result in results:
-                try:
-                    # 检查是否已存在
-                    existing = await collection.find_one({'url': result['url']})
-                    if existing:
-                        logger.info(f"URL already exists: {result['url']}")
-                        continue
-                    
-                    # 插入新数据
-                    await collection.insert_one(result)
-                    inserted_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error saving result: {e}")
-                    continue
+                document = {key: value for key, value in result.items() if key != '_id'}
+                operations.append(UpdateOne(
+                    {'url': result['url'], 'content': {'$ne': result['content']}},
+                    {'$set': document},
+                    upsert=True
+                ))
+            
+            duplicate_indexes = []
+            try:
+                outcome = (await collection.bulk_write(operations, ordered=False)).bulk_api_result
+            except BulkWriteError as e:
+                outcome = e.details
+                for error in outcome.get('writeErrors', []):
+                    if error.get('code') == 11000:
+                        duplicate_indexes.append(error['index'])
+                    else:
+                        counts['errors'] += 1
+                if counts['errors']:
+                    logger.error(f"Bulk save had {counts['errors']} write errors")
             
-            logger.info(f"Saved {inserted_count} new pages to database")
-            return inserted_count
+            counts['inserted'] = outcome.get('nUpserted', 0)
+            counts['updated'] = outcome.get('nModified', 0)
+            counts['unchanged'] = outcome.get('nMatched', 0) - counts['updated'] + len(duplicate_indexes)
+            
+            # 正文未变的页面只刷新验证字段和出链
+            if duplicate_indexes:
+                await collection.bulk_write([
+                    UpdateOne(
+                        {'url': results[index]['url']},
+                        {'$set': {field: results[index].get(field) for field in CACHED_FIELDS}}
+                    )
+                    for index in duplicate_indexes
+                ], ordered=False)
+            
+            for result in results:
+                self.validators.update(result['url'], result)
+            
+            if self.dedup is not None:
+                await link_duplicates(results, collection)
+            
+            logger.info(
+                f"Saved {counts['inserted']} new pages to database, "
+                f"{counts['updated']} updated, {counts['unchanged']} unchanged"
+            )
+            await publish_pending('clean', counts['inserted'] + counts['updated'])
             
         except Exception as e:
             logger.error(f"Error saving results to database: {e}")
-            return 0
+            counts['errors'] = len(results)
+        
+        return counts
+
+
+class BulkResultWriter:
+    """采集结果缓冲区，按集合攒够一批后批量写入"""
+    
+    def __init__(self, crawler: GovTreeCrawler, batch_size: Optional[int] = None):
+        self.crawler = crawler
+        self.batch_size = batch_size or settings.CRAWL_SAVE_BATCH_SIZE
+        self.buffers: Dict[str, List[Dict[str, Any]]] = {}
+        self.totals = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'errors': 0}
+    
+    async def add(self, result: Dict[str, Any], site_config: Dict[str, Any]):
+        """加入一条结果，缓冲区满时写入"""
+        category = site_config.get('category', 'policy')
+        buffer = self.buffers.setdefault(category, [])
+        buffer.append(result)
+        if len(buffer) >= self.batch_size:
+            await self._flush_category(category)
+    
+    async def flush(self):
+        """写入全部缓冲结果"""
+        for category in list(self.buffers):
+            await self._flush_category(category)
+    
+    async def _flush_category(self, category: str):
+        # 先换出缓冲区，写入期间其他协程可继续追加
+        batch = self.buffers.pop(category, [])
+        if not batch:
+            return
+        counts = await self.crawler.save_results_bulk(batch, category)
+        for key, value in counts.items():
+            self.totals[key] += value
 
 class CrawlerService:
     """数据采集服务管理类"""
     
-    def __init__(self):
-        self.sites_config = []
-        self.load_sites_config()
+    def __init__(self, registry: Optional[SiteRegistry] = None):
+        # 站点配置在首次使用时加载，配置文件修改后自动重新读取
+        self.registry = registry or site_registry
+    
+    @property
+    def sites_config(self) -> List[Dict[str, Any]]:
+        """全部站点配置"""
+        return self.registry.all()
+    
+    @sites_config.setter
+    def sites_config(self, site_configs: List[Dict[str, Any]]):
+        self.registry = SiteRegistry.from_configs(site_configs)
     
     def load_sites_config(self):
-        """加载站点配置"""
-        try:
-            # 加载政府树形结构配置
-            import os
-            gov_tree_path = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'gov_tree.json')
-            
-            if os.path.exists(gov_tree_path):
-                with open(gov_tree_path, 'r', encoding='utf-8') as f:
-                    gov_data = json.load(f)
-                    self.sites_config.extend(self._parse_gov_tree(gov_data))
-            
-            # 加载自定义站点配置
-            custom_sites_path = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'sites_custom')
-            if os.path.exists(custom_sites_path):
-                for filename in os.listdir(custom_sites_path):
-                    if filename.endswith('.yml') or filename.endswith('.yaml'):
-                        filepath = os.path.join(custom_sites_path, filename)
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            import yaml
-                            config = yaml.safe_load(f)
-                            self.sites_config.append(config)
-            
-            logger.info(f"Loaded {len(self.sites_config)} site configurations")
-            
-        except Exception as e:
-            logger.error(f"Error loading sites configuration: {e}")
+        """重新加载站点配置"""
+        self.registry.reload()
     
-    def _parse_gov_tree(self, tree_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """解析政府树形结构为站点配置"""
-        sites = []
+    async def run_crawl_task(
+        self,
+        site_ids: Optional[List[str]] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        parse_pool: Optional[ParsePool] = None,
+        archive: Optional[HtmlArchive] = None,
+        checkpoint_key: Optional[str] = None,
+        rate_limiter: Optional[HostRateLimiter] = None
+    ) -> Dict[str, Any]:
+        """运行采集任务，session/parse_pool/archive/rate_limiter 传入时跨任务复用
         
-        def process_node(node, level=0):
-            if level > 5:  # 限制层级深度
-                return
-            
-            # 生成站点配置
-            if 'website' in node:
-                site_config = {
-                    'id': node.get('id', f"gov_{len(sites)}"),
-                    'name': node.get('name', 'Unknown'),
-                    'region': node.get('name', 'Unknown'),
-                    'level': level,
-                    'start_urls': [node['website']],
-                    'category': 'policy',
-                    'selectors': {
-                        'title': ['h1', '.title', 'title'],
-                        'content': ['.content', '.article', 'main'],
-                        'date': ['.date', '.publish-date', '.time']
-                    }
-                }
-                sites.append(site_config)
-            
-            # 处理子节点
-            if 'children' in node:
-                for child in node['children']:
-                    process_node(child, level + 1)
-        
-        if isinstance(tree_data, list):
-            for node in tree_data:
-                process_node(node)
-        else:
-            process_node(tree_data)
-        
-        return sites
-    
-    async def run_crawl_task(self, site_ids: Optional[List[str]] = None) -> Dict[str, Any]:
-        """运行采集任务"""
+        checkpoint_key（通常为Celery任务ID）用于保存进度，同一任务重新投递或重试时续采。
+        """
         try:
             total_results = 0
+            total_updated = 0
+            total_unchanged = 0
             total_errors = 0
+            scheduler = RevisitScheduler()
+            
+            checkpoint = None
+            if checkpoint_key and settings.CRAWL_CHECKPOINT_ENABLED:
+                checkpoint = CrawlCheckpoint(checkpoint_key)
+                state = await checkpoint.load()
+                if state:
+                    # 续采时沿用中断前选定的站点
+                    site_ids = [site_id for site_id in state.get('site_ids', []) if site_id is not None] or site_ids
             
             # 筛选要采集的站点
             sites_to_crawl = []
             if site_ids:
-                sites_to_crawl = [site for site in self.sites_config if site['id'] in site_ids]
+                sites_to_crawl = self.registry.get_many(site_ids)
             else:
-                # 随机选择部分站点进行采集
-                import random
-                sites_to_crawl = random.sample(self.sites_config, min(5, len(self.sites_config)))
+                # 按各站点的更新频率分配本轮请求预算
+                sites_to_crawl = await scheduler.select_sites(self.sites_config)
             
             logger.info(f"Starting crawl task for {len(sites_to_crawl)} sites")
             
-            async with GovTreeCrawler() as crawler:
+            async with GovTreeCrawler(
+                parse_pool=parse_pool, session=session, archive=archive, rate_limiter=rate_limiter
+            ) as crawler:
+                # 所有站点共享同一个URL队列并发采集，结果按批次写入数据库
+                writer = BulkResultWriter(crawler, settings.CRAWL_SAVE_BATCH_SIZE)
+                if checkpoint is not None:
+                    checkpoint.writer = writer
+                    writer.totals.update(checkpoint.state.get('totals', {}) if checkpoint.resumed else {})
+                site_results = await crawler.crawl_sites(sites_to_crawl, on_result=writer.add, checkpoint=checkpoint)
+                await writer.flush()
+                
                 for site_config in sites_to_crawl:
-                    try:
-                        # 采集站点
-                        results = await crawler.crawl_site(site_config)
-                        
-                        # 保存结果
-                        saved_count = await crawler.save_results(results, site_config.get('category', 'policy'))
-                        
-                        total_results += saved_count
-                        
-                        logger.info(f"Site {site_config['id']} crawl completed: {saved_count} pages saved")
-                        
-                    except Exception as e:
-                        logger.error(f"Error crawling site {site_config.get('id', 'unknown')}: {e}")
-                        total_errors += 1
-                        continue
+                    crawled = len(site_results.get(GovTreeCrawler._site_key(site_config), []))
+                    logger.info(f"Site {site_config.get('id', 'unknown')} crawl completed: {crawled} pages crawled")
+                
+                total_results = writer.totals['inserted']
+                total_updated = writer.totals['updated']
+                total_unchanged = writer.totals['unchanged']
+                total_errors = writer.totals['errors']
+                
+                await scheduler.record_crawl(sites_to_crawl, crawler.site_stats, crawler.page_outcomes)
+                if checkpoint is not None:
+                    await checkpoint.clear()
             
             return {
                 'success': True,
                 'total_sites': len(sites_to_crawl),
                 'total_pages': total_results,
+                'updated_pages': total_updated,
+                'unchanged_pages': total_unchanged,
                 'errors': total_errors,
                 'message': f'Crawl task completed. {total_results} pages saved from {len(sites_to_crawl)} sites.'
             }
@@ -437,4 +923,4 @@ class CrawlerService:
 crawler_service = CrawlerService()
 
 # 导出服务
-__all__ = ['crawler_service', 'CrawlerService', 'GovTreeCrawler']
\ No newline at end of file
+__all__ = ['crawler_service', 'CrawlerService', 'GovTreeCrawler', 'create_session']
\ No newline at end of file
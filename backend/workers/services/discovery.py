@@ -0,0 +1,567 @@
+"""
+站点增量发现（sitemap / RSS / 栏目列表页）
+路径: /mnt/okcomputer/output/backend/workers/services/discovery.py
+"""
+
+import asyncio
+import gzip
+import logging
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import aiohttp
+from dateutil import parser as date_parser
+from lxml import etree, html as lxml_html
+from pymongo import UpdateOne
+
+from app.config import settings
+from app.database.mongodb import mongodb
+from .parse_pool import ParsePool
+from .rate_limiter import HostRateLimiter
+from .response_reader import ResponseTooLarge, decode_html, read_limited
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_COLLECTION = 'crawl_discovery'
+
+# 首页上指向文件类栏目的链接文字
+LISTING_TEXT_PATTERN = re.compile(
+    r'政策文件|政策法规|规范性文件|政府文件|文件发布|通知公告|公示公告|政策解读|招标公告|采购公告|中标公告'
+)
+
+# 列表页的翻页链接文字
+NEXT_PAGE_TEXT_PATTERN = re.compile(r'^\s*(下一页|下页|后页|>|›|»)\s*$')
+
+# TRS等站群系统的分页脚本: createPageHTML(总页数, 当前页, "index", "html")
+CREATE_PAGE_PATTERN = re.compile(
+    r'createPageHTML\(\s*[\'"]?(\d+)[\'"]?\s*,\s*[\'"]?(\d+)[\'"]?\s*,\s*[\'"](\w+)[\'"]\s*,\s*[\'"](\w+)[\'"]'
+)
+
+# 栏目列表页本身（含分页），不作为文档条目
+LISTING_PAGE_PATTERN = re.compile(r'/(index|list|default)(_\d+)?\.s?html?$|/$', re.I)
+
+FEED_TYPES = ('application/rss+xml', 'application/atom+xml')
+
+# 每个站点最多跟踪的栏目数
+MAX_LISTINGS = 5
+
+# sitemap索引最多展开的子sitemap数
+MAX_CHILD_SITEMAPS = 10
+
+# 每个发现源记住的最近条目数
+MAX_SEEN = 500
+
+# 列表页连续遇到这么多已见条目即停止翻页（置顶条目通常只有一两条）
+KNOWN_RUN_TO_STOP = 3
+
+# 发现后未采集成功（失败或超出站点页数上限）的URL留待下一轮，最多重试的轮数
+MAX_RETRY_RUNS = 3
+
+# 视为已处理的页面结果（skipped 为robots禁止或已被其他worker采集）
+DONE_OUTCOMES = frozenset(['new', 'changed', 'unchanged', 'not_modified', 'skipped'])
+
+# sitemap/feed 大小上限，是页面上限的若干倍
+FEED_BYTES_FACTOR = 10
+
+
+def _localname(tag) -> str:
+    return etree.QName(tag).localname if isinstance(tag, str) else ''
+
+
+def _absolute(base_url: str, href: Optional[str]) -> Optional[str]:
+    if not href:
+        return None
+    url = urljoin(base_url, href.strip()).split('#')[0]
+    return url if urlparse(url).scheme in ('http', 'https') else None
+
+
+def parse_date(value: Optional[str]) -> Optional[datetime]:
+    """解析sitemap/feed中的日期，统一为不带时区的UTC时间"""
+    if not value:
+        return None
+    try:
+        parsed = date_parser.parse(value.strip())
+    except (ValueError, OverflowError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def find_sources(html: str, base_url: str) -> Dict[str, List[str]]:
+    """从首页找出RSS/Atom订阅和文件类栏目入口"""
+    document = lxml_html.fromstring(html)
+    host = urlparse(base_url).netloc.lower()
+
+    feeds = []
+    for link in document.iter('link'):
+        if (link.get('rel') or '').lower() == 'alternate' and (link.get('type') or '').lower() in FEED_TYPES:
+            url = _absolute(base_url, link.get('href'))
+            if url and url not in feeds:
+                feeds.append(url)
+
+    listings = []
+    for anchor in document.iter('a'):
+        if not LISTING_TEXT_PATTERN.search(anchor.text_content() or ''):
+            continue
+        url = _absolute(base_url, anchor.get('href'))
+        if url and urlparse(url).netloc.lower() == host and url not in listings:
+            listings.append(url)
+            if len(listings) >= MAX_LISTINGS:
+                break
+
+    return {'feeds': feeds, 'listings': listings}
+
+
+def parse_listing(html: str, base_url: str) -> Tuple[List[str], Optional[str]]:
+    """解析栏目列表页，返回按页面顺序排列的链接和下一页URL"""
+    document = lxml_html.fromstring(html)
+    links = []
+    next_url = None
+    for anchor in document.iter('a'):
+        href = anchor.get('href')
+        if next_url is None and NEXT_PAGE_TEXT_PATTERN.match(anchor.text_content() or ''):
+            next_url = _absolute(base_url, href)
+            continue
+        if href and href not in links:
+            links.append(href)
+
+    if next_url is None:
+        match = CREATE_PAGE_PATTERN.search(html)
+        if match:
+            total, current, prefix, extension = int(match.group(1)), int(match.group(2)), match.group(3), match.group(4)
+            # 当前页从0开始计数，第一页为 index.html，之后为 index_1.html ...
+            if current + 1 < total:
+                next_url = urljoin(base_url, f"{prefix}_{current + 1}.{extension}")
+
+    return links, next_url
+
+
+def _xml_root(body: bytes):
+    if body[:2] == b'\x1f\x8b':
+        body = gzip.decompress(body)
+    parser = etree.XMLParser(recover=True, huge_tree=True, resolve_entities=False, no_network=True)
+    return etree.parse(BytesIO(body), parser).getroot()
+
+
+def parse_sitemap(body: bytes) -> Tuple[List[Tuple[str, Optional[str]]], List[Tuple[str, Optional[str]]]]:
+    """解析sitemap或sitemap索引，返回 (页面条目, 子sitemap)，条目为 (URL, lastmod)"""
+    root = _xml_root(body)
+    if root is None:
+        return [], []
+
+    entries, children = [], []
+    for node in root:
+        kind = _localname(node.tag)
+        if kind not in ('url', 'sitemap'):
+            continue
+        loc = lastmod = None
+        for child in node:
+            name = _localname(child.tag)
+            if name == 'loc':
+                loc = (child.text or '').strip()
+            elif name == 'lastmod':
+                lastmod = (child.text or '').strip()
+        if loc:
+            (entries if kind == 'url' else children).append((loc, lastmod))
+    return entries, children
+
+
+def parse_feed(body: bytes) -> List[Tuple[str, Optional[str]]]:
+    """解析RSS/Atom订阅，返回 (URL, 发布时间)，保持订阅中的顺序"""
+    root = _xml_root(body)
+    if root is None:
+        return []
+
+    items = []
+    for node in root.iter():
+        kind = _localname(node.tag)
+        if kind not in ('item', 'entry'):
+            continue
+        link = date = None
+        for child in node:
+            name = _localname(child.tag)
+            if name == 'link':
+                # RSS 为文本，Atom 为 href 属性
+                link = link or (child.get('href') or (child.text or '')).strip()
+            elif name in ('pubDate', 'published', 'updated', 'date') and date is None:
+                date = (child.text or '').strip()
+        if link:
+            items.append((link, date))
+    return items
+
+
+def _cursor_key(source: str) -> str:
+    """发现源URL作为游标字段名时替换掉MongoDB不允许的字符"""
+    return source.replace('.', '%2E').replace('$', '%24')
+
+
+class SiteDiscovery:
+    """按站点增量发现新文档，替代从首页开始的整站遍历
+
+    发现源包括 robots.txt 声明的（或默认位置的）sitemap、首页声明的RSS/Atom订阅
+    和“政策文件”“通知公告”等栏目列表页，站点配置中的 sitemaps/feeds/listing_urls
+    优先。自动找到的发现源按站点缓存在 crawl_discovery 中，定期重新探测。
+
+    每个发现源保存一个游标：最近见过的条目URL和最新的 lastmod/发布时间。
+    sitemap 和订阅只取比游标新的条目；列表页从第一页往后翻，连续遇到已见条目
+    即停止。游标在本轮采集结束后调用 commit 保存，本轮发现但没有采集成功的URL
+    记入游标的重试列表，下一轮优先返回。
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        rate_limiter: HostRateLimiter,
+        parse_pool: Optional[ParsePool] = None,
+        max_listing_pages: Optional[int] = None,
+        refresh_days: Optional[int] = None
+    ):
+        self.session = session
+        self.rate_limiter = rate_limiter
+        self.parse_pool = parse_pool
+        self.max_listing_pages = max_listing_pages or settings.CRAWL_DISCOVERY_MAX_PAGES
+        self.refresh = timedelta(days=refresh_days or settings.CRAWL_DISCOVERY_REFRESH_DAYS)
+        self.max_feed_bytes = settings.CRAWL_MAX_PAGE_BYTES * FEED_BYTES_FACTOR
+        self.states: Dict[str, Dict[str, Any]] = {}
+        self._dirty: set = set()
+        self.stats = {'requests': 0, 'discovered': 0}
+
+    @staticmethod
+    def _collection():
+        return mongodb.get_collection(DISCOVERY_COLLECTION)
+
+    @staticmethod
+    def _site_key(site_config: Dict[str, Any]) -> str:
+        return str(site_config.get('id', site_config.get('name', 'unknown')))
+
+    async def load(self, site_configs: List[Dict[str, Any]]):
+        """一次查询取回本轮站点的发现源和游标"""
+        keys = [self._site_key(site) for site in site_configs]
+        try:
+            async for doc in self._collection().find({'site_id': {'$in': keys}}):
+                self.states[doc['site_id']] = doc
+        except Exception as e:
+            logger.warning(f"Failed to load discovery cursors: {e}")
+
+    async def commit(self, outcomes: Optional[Dict[str, str]] = None):
+        """保存本轮更新的发现源和游标
+
+        outcomes 为采集器的页面结果，发现的URL没有成功结果时（请求失败、超出页数上限
+        未请求）记入重试列表，避免游标越过它们后再也发现不到。
+        """
+        if outcomes is not None:
+            for key in self._dirty:
+                self._record_retries(self.states[key], outcomes)
+        operations = [
+            UpdateOne(
+                {'site_id': key},
+                {'$set': {
+                    'sources': self.states[key].get('sources', {}),
+                    'sources_at': self.states[key].get('sources_at'),
+                    'cursors': self.states[key].get('cursors', {}),
+                    'updated_at': datetime.utcnow(),
+                }},
+                upsert=True
+            )
+            for key in sorted(self._dirty)
+        ]
+        if not operations:
+            return
+        try:
+            await self._collection().bulk_write(operations, ordered=False)
+            self._dirty.clear()
+        except Exception as e:
+            logger.error(f"Failed to save discovery cursors: {e}")
+
+    @staticmethod
+    def _record_retries(state: Dict[str, Any], outcomes: Dict[str, str]):
+        """按本轮采集结果更新各游标的重试列表"""
+        cursors = state.get('cursors', {})
+        for url, kind, source_key in state.pop('discovered', []):
+            cursor = cursors.get(kind, {}).get(source_key)
+            if cursor is None:
+                continue
+            retry = dict(cursor.get('retry', []))
+            if outcomes.get(url) in DONE_OUTCOMES:
+                retry.pop(url, None)
+            elif retry.get(url, 0) + 1 < MAX_RETRY_RUNS:
+                retry[url] = retry.get(url, 0) + 1
+            else:
+                logger.warning(f"Giving up on discovered URL after {MAX_RETRY_RUNS} runs: {url}")
+                retry.pop(url, None)
+            # 存成列表，URL不能作为MongoDB字段名
+            cursor['retry'] = [[retry_url, runs] for retry_url, runs in retry.items()][:MAX_SEEN]
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """尚未保存的站点状态，供采集检查点保存"""
+        return [self.states[key] for key in sorted(self._dirty)]
+
+    def restore(self, states: List[Dict[str, Any]]):
+        """恢复检查点中尚未保存的站点状态"""
+        for state in states:
+            self.states[state['site_id']] = state
+            self._dirty.add(state['site_id'])
+
+    async def discover(
+        self,
+        site_config: Dict[str, Any],
+        select_links: Callable[[str, List[str], Dict[str, Any]], List[str]]
+    ) -> Optional[List[str]]:
+        """返回站点的新文档URL；没有可用的发现源时返回None，调用方退回整站遍历
+
+        发现源可以访问但从未给出过文档页（条目全部被链接筛选排除）时同样视为不可用，
+        否则每轮都返回空列表，站点再也不会被采集。
+
+        select_links 为采集器的链接筛选函数，用来从列表页和sitemap中挑出文档页。
+        """
+        start_urls = site_config.get('start_urls') or []
+        if not start_urls:
+            return None
+
+        key = self._site_key(site_config)
+        state = self.states.setdefault(key, {'site_id': key})
+        sources = await self._sources(site_config, state)
+        cursors = state.setdefault('cursors', {})
+
+        urls: List[str] = []
+        # 本轮返回的URL及其来源游标，commit 时按采集结果更新重试列表
+        discovered = state.setdefault('discovered', [])
+        working = {'sitemaps': [], 'feeds': [], 'listings': []}
+        for kind, handler in (
+            ('sitemaps', self._from_sitemap),
+            ('feeds', self._from_feed),
+            ('listings', self._from_listing),
+        ):
+            for source in sources.get(kind, []):
+                cursor = dict(cursors.get(kind, {}).get(_cursor_key(source)) or {'url': source})
+                found = await handler(source, site_config, cursor, select_links)
+                # 请求失败，或条目从未通过链接筛选（如sitemap只列出其他主机、栏目页），视为无效
+                if found is None or not cursor.get('seen'):
+                    continue
+                cursors.setdefault(kind, {})[_cursor_key(source)] = cursor
+                working[kind].append(source)
+                # 上一轮没有采集成功的URL优先
+                for url in [url for url, _ in cursor.get('retry', [])] + found:
+                    if url not in urls:
+                        urls.append(url)
+                        discovered.append([url, kind, _cursor_key(source)])
+
+        self._dirty.add(key)
+        if state.get('sources') is sources:
+            # 自动探测的发现源只保留有效的
+            state['sources'] = working
+        if not any(working.values()):
+            # 发现源全部失效，下次重新探测
+            state['sources_at'] = None
+            return None
+
+        self.stats['discovered'] += len(urls)
+        logger.info(
+            f"Discovered {len(urls)} new URLs for {site_config.get('name', key)} from "
+            f"{len(working['sitemaps'])} sitemaps, {len(working['feeds'])} feeds, "
+            f"{len(working['listings'])} listings"
+        )
+        return urls
+
+    async def _sources(self, site_config: Dict[str, Any], state: Dict[str, Any]) -> Dict[str, List[str]]:
+        """站点配置的发现源，未配置时使用缓存的自动探测结果，过期后重新探测"""
+        configured = {
+            'sitemaps': list(site_config.get('sitemaps') or []),
+            'feeds': list(site_config.get('feeds') or []),
+            'listings': list(site_config.get('listing_urls') or []),
+        }
+        if any(configured.values()):
+            return configured
+
+        sources_at = state.get('sources_at')
+        if sources_at and datetime.utcnow() - sources_at < self.refresh and state.get('sources'):
+            return state['sources']
+
+        homepage = site_config['start_urls'][0]
+        parsed = urlparse(homepage)
+        sources = {'sitemaps': [], 'feeds': [], 'listings': []}
+
+        await self.rate_limiter.ensure_robots(homepage, self.session)
+        robots = self.rate_limiter.robots_for(homepage)
+        declared = robots.site_maps() if robots is not None else None
+        sources['sitemaps'] = list(declared or [f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"])
+
+        fetched = await self._get(homepage, settings.CRAWL_MAX_PAGE_BYTES)
+        if fetched is not None:
+            html, _ = decode_html(*fetched)
+            found = await self._parse(find_sources, html, homepage)
+            sources['feeds'] = found['feeds']
+            # 入口本身就是列表页时直接跟踪
+            sources['listings'] = found['listings'] or (
+                [homepage] if LISTING_PAGE_PATTERN.search(parsed.path) and parsed.path != '/' else []
+            )
+
+        state['sources'] = sources
+        state['sources_at'] = datetime.utcnow()
+        return sources
+
+    async def _get(self, url: str, max_bytes: int) -> Optional[Tuple[bytes, str]]:
+        """按主机限速抓取发现源，失败时返回None"""
+        try:
+            await self.rate_limiter.ensure_robots(url, self.session)
+            if not self.rate_limiter.can_fetch(url):
+                return None
+            await self.rate_limiter.wait(url)
+
+            host = urlparse(url).netloc.lower()
+            started = time.monotonic()
+            self.stats['requests'] += 1
+            async with self.session.get(url) as response:
+                self.rate_limiter.record(
+                    host,
+                    response.status,
+                    time.monotonic() - started,
+                    response.headers.get('Retry-After')
+                )
+                if response.status != 200:
+                    return None
+                return await read_limited(response, max_bytes), response.headers.get('content-type', '')
+
+        except ResponseTooLarge as e:
+            logger.warning(f"Discovery source too large {url}: {e}")
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            logger.warning(f"Failed to fetch discovery source {url}: {e!r}")
+            self.rate_limiter.record(urlparse(url).netloc.lower())
+        return None
+
+    async def _parse(self, func: Callable[..., Any], *args) -> Any:
+        """解析在工作池中执行"""
+        if self.parse_pool is not None:
+            return await self.parse_pool.run(func, *args)
+        return func(*args)
+
+    async def _from_sitemap(self, url, site_config, cursor, select_links) -> Optional[List[str]]:
+        fetched = await self._get(url, self.max_feed_bytes)
+        if fetched is None:
+            return None
+        try:
+            entries, children = await self._parse(parse_sitemap, fetched[0])
+        except Exception as e:
+            logger.warning(f"Invalid sitemap {url}: {e}")
+            return None
+
+        since = parse_date(cursor.get('last_modified'))
+        # sitemap索引只展开比游标新的子sitemap
+        children = [
+            (loc, lastmod) for loc, lastmod in children
+            if since is None or (parse_date(lastmod) or datetime.max) > since
+        ]
+        children.sort(key=lambda child: parse_date(child[1]) or datetime.max, reverse=True)
+        for loc, _ in children[:MAX_CHILD_SITEMAPS]:
+            child = await self._get(loc, self.max_feed_bytes)
+            if child is not None:
+                try:
+                    entries.extend((await self._parse(parse_sitemap, child[0]))[0])
+                except Exception as e:
+                    logger.warning(f"Invalid sitemap {loc}: {e}")
+
+        if not entries and not children:
+            return None
+        return self._advance(cursor, entries, site_config['start_urls'][0], site_config, select_links, since)
+
+    async def _from_feed(self, url, site_config, cursor, select_links) -> Optional[List[str]]:
+        fetched = await self._get(url, self.max_feed_bytes)
+        if fetched is None:
+            return None
+        try:
+            items = await self._parse(parse_feed, fetched[0])
+        except Exception as e:
+            logger.warning(f"Invalid feed {url}: {e}")
+            return None
+        if not items:
+            return None
+        items = [(_absolute(url, link) or link, date) for link, date in items]
+        return self._advance(
+            cursor, items, site_config['start_urls'][0], site_config, select_links,
+            parse_date(cursor.get('last_modified'))
+        )
+
+    def _advance(self, cursor, entries, base_url, site_config, select_links, since) -> List[str]:
+        """按游标筛选条目并推进游标
+
+        带日期的条目取比游标新的（与游标同一时间的取没见过的），不带日期的取没见过的。
+        每轮最多取 CRAWL_MAX_PAGES_PER_SITE 条：首次发现时sitemap可能有数万条，只取最新的，
+        更早的存量不再补采；之后按时间从旧到新取，游标只推进到实际返回的最新条目，
+        超出上限的条目下一轮继续取。
+        """
+        allowed = set(select_links(base_url, [loc for loc, _ in entries], site_config))
+        seen = set(cursor.get('seen', []))
+        candidates: Dict[str, datetime] = {}
+        for loc, lastmod in entries:
+            if loc not in allowed or LISTING_PAGE_PATTERN.search(urlparse(loc).path):
+                continue
+            modified = parse_date(lastmod)
+            if modified is None or modified == since:
+                is_new = loc not in seen
+            else:
+                is_new = since is None or modified > since
+            if is_new and loc not in candidates:
+                candidates[loc] = modified or datetime.min
+
+        new = sorted(candidates, key=candidates.get, reverse=since is None)[:settings.CRAWL_MAX_PAGES_PER_SITE]
+        # 没有返回的候选不记为已见，下一轮仍可取到
+        cursor['seen'] = (new + [url for url in cursor.get('seen', []) if url not in candidates])[:MAX_SEEN]
+        dated = [candidates[url] for url in new if candidates[url] != datetime.min]
+        if dated and (since is None or max(dated) > since):
+            cursor['last_modified'] = max(dated).isoformat()
+        return new
+
+    async def _from_listing(self, url, site_config, cursor, select_links) -> Optional[List[str]]:
+        seen = set(cursor.get('seen', []))
+        new: List[str] = []
+        page_url: Optional[str] = url
+        pages = 0
+        visited = set()
+
+        while page_url and pages < self.max_listing_pages and page_url not in visited:
+            visited.add(page_url)
+            fetched = await self._get(page_url, settings.CRAWL_MAX_PAGE_BYTES)
+            if fetched is None:
+                break
+            pages += 1
+            html, _ = decode_html(*fetched)
+            links, next_url = await self._parse(parse_listing, html, page_url)
+
+            known_run = 0
+            stop = False
+            for item in select_links(page_url, links, site_config):
+                if item == next_url or LISTING_PAGE_PATTERN.search(urlparse(item).path):
+                    continue
+                if item in seen:
+                    known_run += 1
+                    if known_run >= KNOWN_RUN_TO_STOP:
+                        stop = True
+                        break
+                    continue
+                known_run = 0
+                if item not in new:
+                    new.append(item)
+            if stop:
+                break
+            page_url = next_url
+
+        if pages == 0:
+            return None
+        cursor['seen'] = (new + [item for item in cursor.get('seen', []) if item not in new])[:MAX_SEEN]
+        cursor['pages'] = pages
+        return new
+
+
+__all__ = [
+    'SiteDiscovery',
+    'find_sources',
+    'parse_date',
+    'parse_feed',
+    'parse_listing',
+    'parse_sitemap',
+]
@@ -0,0 +1,743 @@
+"""
+页面内容提取引擎
+路径: /mnt/okcomputer/output/backend/workers/services/extraction.py
+"""
+
+import logging
+import re
+from datetime import datetime
+from functools import lru_cache
+from hashlib import blake2b
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # pragma: no cover - lxml 为可选加速后端
+    lxml = None
+
+try:
+    from lxml.cssselect import CSSSelector
+except ImportError:  # pragma: no cover - 复杂选择器需要 cssselect
+    CSSSelector = None
+
+# 默认选择器（与原采集器保持一致）
+DEFAULT_SELECTORS = {
+    'title': ['h1', 'title', '.title', '#title'],
+    'content': ['.content', '.article', '.post', '#content', '#article', '.news-content'],
+    'date': ['.date', '.publish-date', '.pub-date', '.time', '#date'],
+}
+
+# 正文提取时忽略的标签
+SKIP_TEXT_TAGS = frozenset(['script', 'style'])
+
+KEYWORD_CLASS_PATTERN = re.compile('keyword', re.I)
+
+# 按块切分页面文本时作为块边界的标签，导航、页脚、侧栏等模板内容按块识别
+BLOCK_TAGS = frozenset([
+    'address', 'article', 'aside', 'blockquote', 'body', 'center', 'dd', 'div', 'dl', 'dt',
+    'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'header', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'td', 'th', 'tr', 'ul',
+])
+
+XML_DECLARATION_PATTERN = re.compile(r'^\s*<\?xml[^>]*\?>', re.I)
+SIMPLE_SELECTOR_PATTERN = re.compile(r'^([a-zA-Z][\w-]*)?((?:[.#][\w-]+)*)$')
+
+# 可选的时间部分: 10:30、10:30:00、10时30分、T10:30:00
+TIME_PATTERN = (
+    r'(?:[\sT]*(?P<hour>[01]?\d|2[0-3])\s*[:时]\s*(?P<minute>[0-5]?\d)'
+    r'(?:\s*[:分]\s*(?P<second>[0-5]?\d))?)?'
+)
+
+# 通用日期解析: 2024-01-02、2024/1/2、2024.01.02、2024年1月2日、02/01/2024，
+# 四位数在前为年月日，在后为日月年
+DATE_PATTERN = re.compile(
+    r'(?<!\d)(?P<first>\d{4}|\d{1,2})\s*[-/.年]\s*(?P<middle>\d{1,2})\s*[-/.月]\s*(?P<last>\d{4}|\d{1,2})(?!\d)\s*日?'
+    + TIME_PATTERN
+)
+
+# 站点画像中记录的日期格式，已知格式时先用对应的正则直接匹配
+DATE_FORMAT_PATTERNS = {
+    'ymd': re.compile(
+        r'(?<!\d)(?P<year>\d{4})\s*[-/.年]\s*(?P<month>\d{1,2})\s*[-/.月]\s*(?P<day>\d{1,2})(?!\d)\s*日?'
+        + TIME_PATTERN
+    ),
+    'dmy': re.compile(
+        r'(?<!\d)(?P<day>\d{1,2})\s*[-/.]\s*(?P<month>\d{1,2})\s*[-/.]\s*(?P<year>\d{4})(?!\d)'
+        + TIME_PATTERN
+    ),
+}
+
+
+def _to_datetime(year: str, month: str, day: str, match) -> Optional[datetime]:
+    if not 1900 <= int(year) < 2100:
+        return None
+    try:
+        return datetime(
+            int(year), int(month), int(day),
+            int(match.group('hour') or 0), int(match.group('minute') or 0), int(match.group('second') or 0)
+        )
+    except ValueError:
+        return None
+
+
+def match_date(date_text: str, date_format: Optional[str] = None) -> Tuple[Optional[datetime], Optional[str]]:
+    """从文本中找出日期，返回 (日期, 格式名)
+
+    传入站点已知的格式时先按该格式匹配，失败再用通用正则。
+    """
+    if not date_text:
+        return None, None
+
+    pattern = DATE_FORMAT_PATTERNS.get(date_format) if date_format else None
+    if pattern is not None:
+        match = pattern.search(date_text)
+        if match:
+            parsed = _to_datetime(match.group('year'), match.group('month'), match.group('day'), match)
+            if parsed:
+                return parsed, date_format
+
+    for match in DATE_PATTERN.finditer(date_text):
+        first, middle, last = match.group('first', 'middle', 'last')
+        if len(first) == 4:
+            parsed, fmt = _to_datetime(first, middle, last, match), 'ymd'
+        elif len(last) == 4:
+            parsed, fmt = _to_datetime(last, middle, first, match), 'dmy'
+        else:
+            continue
+        if parsed:
+            return parsed, fmt
+
+    return None, None
+
+
+def parse_date(date_text: str, date_format: Optional[str] = None) -> Optional[datetime]:
+    """解析日期字符串"""
+    return match_date(date_text, date_format)[0]
+
+
+def block_fingerprint(path: str, text: str) -> str:
+    """文本块指纹，包含块在文档中的路径；跨进程稳定（不能用内置hash）"""
+    return blake2b(f'{path}\x00{text}'.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def join_blocks(
+    blocks: Iterable[Tuple[str, str]],
+    profile: Dict[str, Any],
+    matched: Dict[str, Any]
+) -> str:
+    """拼接正文块，去掉站点模板中的块
+
+    profile 中 sample_blocks 为真时，把本页的块指纹放入 matched['blocks'] 供学习模板。
+    去掉模板后没有剩余文本时保留全文。
+    """
+    template: Optional[Collection[str]] = profile.get('template')
+    sample = profile.get('sample_blocks')
+    if not template and not sample:
+        return ' '.join(text for _, text in blocks)
+
+    texts = []
+    kept = []
+    fingerprints = []
+    for path, text in blocks:
+        fingerprint = block_fingerprint(path, text)
+        texts.append(text)
+        if sample:
+            fingerprints.append(fingerprint)
+        if not template or fingerprint not in template:
+            kept.append(text)
+
+    if sample:
+        matched['blocks'] = list(dict.fromkeys(fingerprints))
+    return ' '.join(kept or texts)
+
+
+def normalize_selectors(config: Dict[str, Any]) -> Dict[str, Any]:
+    """统一站点选择器配置，YAML中的单个字符串转为列表
+
+    配置带有站点画像（profile）时，画像中命中过的选择器排到最前。
+    """
+    selectors = config.get('selectors') or {}
+    profile = config.get('profile') or {}
+    normalized = {}
+
+    for field, defaults in DEFAULT_SELECTORS.items():
+        value = selectors.get(field, defaults)
+        normalized[field] = [value] if isinstance(value, str) else list(value)
+        learned = profile.get(field)
+        if learned in normalized[field] and normalized[field][0] != learned:
+            normalized[field].remove(learned)
+            normalized[field].insert(0, learned)
+
+    normalized['links'] = selectors.get('links')
+    return normalized
+
+
+class ExtractionEngine:
+    """页面提取引擎接口
+
+    extract 返回 title/content/publish_date/metadata/links/matched，
+    其中 links 为页面中供队列跟进的全部候选链接，matched 记录标题、正文、日期
+    命中的选择器（回退到<title>/body/meta时为None）和日期格式，供站点画像学习。
+    正文回退到整个body时按块拼接，去掉站点模板（导航、页脚、侧栏）中的块。
+    """
+
+    name = 'base'
+
+    def extract(self, html: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    @staticmethod
+    def _result(
+        title: str,
+        content: str,
+        publish_date: Optional[datetime],
+        metadata: Dict[str, Any],
+        links: List[str],
+        matched: Optional[Dict[str, Optional[str]]] = None
+    ) -> Dict[str, Any]:
+        return {
+            'title': title,
+            'content': content,
+            'publish_date': publish_date or datetime.utcnow(),
+            'metadata': metadata,
+            'links': links,
+            'matched': matched or {},
+        }
+
+
+class SoupExtractionEngine(ExtractionEngine):
+    """BeautifulSoup 提取引擎（原采集器的解析路径）"""
+
+    name = 'bs4'
+
+    def extract(self, html: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        soup = BeautifulSoup(html, 'html.parser')
+        selectors = normalize_selectors(config)
+        profile = config.get('profile') or {}
+        matched: Dict[str, Any] = {}
+
+        # 提取链接（需在正文提取移除标签之前）
+        links = self._extract_links(soup, selectors)
+        title = self._extract_title(soup, selectors, matched)
+        content = self._extract_content(soup, selectors, matched, profile)
+        publish_date = self._extract_date(soup, selectors, matched, profile.get('date_format'))
+        metadata = self._extract_metadata(soup)
+
+        return self._result(title, content, publish_date, metadata, links, matched)
+
+    def _extract_links(self, soup: BeautifulSoup, selectors: Dict[str, Any]) -> List[str]:
+        """提取页面中的候选链接"""
+        anchors = soup.select(selectors['links']) if selectors['links'] else []
+        if not anchors:
+            anchors = soup.find_all('a', href=True)
+
+        return [a['href'] for a in anchors if a.get('href')]
+
+    def _extract_title(self, soup: BeautifulSoup, selectors: Dict[str, Any], matched: Dict[str, Optional[str]]) -> str:
+        """提取页面标题"""
+        for selector in selectors['title']:
+            element = soup.select_one(selector)
+            if element:
+                matched['title'] = selector
+                return element.get_text(strip=True)
+
+        # 默认使用页面title
+        title_tag = soup.find('title')
+        if title_tag:
+            return title_tag.get_text(strip=True)
+
+        return "Untitled"
+
+    def _extract_content(
+        self,
+        soup: BeautifulSoup,
+        selectors: Dict[str, Any],
+        matched: Dict[str, Any],
+        profile: Dict[str, Any]
+    ) -> str:
+        """提取正文内容"""
+        # 移除脚本和样式
+        for script in soup(["script", "style"]):
+            script.decompose()
+
+        for selector in selectors['content']:
+            elements = soup.select(selector)
+            if elements:
+                content = ' '.join([elem.get_text(separator=' ', strip=True) for elem in elements])
+                if len(content) > 100:  # 确保内容足够长
+                    matched['content'] = selector
+                    return content
+
+        # 如果没有找到特定内容区域，使用body内容（去掉站点模板）
+        body = soup.find('body')
+        if body:
+            return join_blocks(_iter_soup_blocks(body), profile, matched)
+
+        return ""
+
+    def _extract_date(
+        self,
+        soup: BeautifulSoup,
+        selectors: Dict[str, Any],
+        matched: Dict[str, Optional[str]],
+        date_format: Optional[str] = None
+    ) -> Optional[datetime]:
+        """提取发布日期"""
+        for selector in selectors['date']:
+            element = soup.select_one(selector)
+            if element:
+                parsed_date, matched['date_format'] = match_date(element.get_text(strip=True), date_format)
+                if parsed_date:
+                    matched['date'] = selector
+                    return parsed_date
+
+        # 尝试从meta标签提取
+        date_meta = soup.find('meta', attrs={'name': 'date'}) or \
+            soup.find('meta', attrs={'property': 'article:published_time'})
+        if date_meta:
+            parsed_date, matched['date_format'] = match_date(date_meta.get('content', ''), date_format)
+            return parsed_date
+
+        return None
+
+    def _extract_metadata(self, soup: BeautifulSoup) -> Dict[str, Any]:
+        """提取元数据"""
+        metadata = {}
+
+        # 提取meta标签信息
+        for tag in soup.find_all('meta'):
+            name = tag.get('name') or tag.get('property')
+            content = tag.get('content')
+            if name and content:
+                metadata[name] = content
+
+        # 提取页面中的关键词
+        keywords = soup.find_all(attrs={'class': KEYWORD_CLASS_PATTERN})
+        if keywords:
+            metadata['keywords'] = [kw.get_text(strip=True) for kw in keywords]
+
+        # 提取链接
+        links = []
+        for link in soup.find_all('a', href=True):
+            href = link['href']
+            if href.startswith('http') or href.startswith('/'):
+                links.append({'url': href, 'text': link.get_text(strip=True)})
+
+        if links:
+            metadata['links'] = links[:10]  # 限制数量
+
+        return metadata
+
+
+def _block_name(tag: str, classes: Optional[str]) -> str:
+    """块路径中的一级: 标签名加第一个class"""
+    first = classes.split(None, 1)[0] if classes and classes.strip() else ''
+    return f'{tag}.{first}' if first else tag
+
+
+def _iter_soup_blocks(root: Tag) -> Iterator[Tuple[str, str]]:
+    """按块级元素切分 BeautifulSoup 元素的文本，输出 (块路径, 块文本)
+
+    各块文本以空格相连即为 get_text(separator=' ', strip=True) 的结果。
+    """
+    names = [_block_name(root.name, root.get('class') and ' '.join(root.get('class')))]
+    buffer: List[str] = []
+    stack = [(iter(root.contents), False)]
+    while stack:
+        children, is_block = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            if is_block:
+                if buffer:
+                    yield '/'.join(names), ' '.join(buffer)
+                    buffer = []
+                names.pop()
+            continue
+
+        if isinstance(child, Tag):
+            is_child_block = child.name in BLOCK_TAGS
+            if is_child_block:
+                if buffer:
+                    yield '/'.join(names), ' '.join(buffer)
+                    buffer = []
+                classes = child.get('class')
+                names.append(_block_name(child.name, classes and ' '.join(classes)))
+            stack.append((iter(child.contents), is_child_block))
+        elif type(child) in (NavigableString, CData):
+            text = child.strip()
+            if text:
+                buffer.append(text)
+
+    if buffer:
+        yield '/'.join(names), ' '.join(buffer)
+
+
+class CompiledSelector:
+    """预编译的CSS选择器
+
+    tag/#id/.class 组合的简单选择器在单次遍历中直接匹配，
+    其余选择器编译为 XPath 单独求值。
+    """
+
+    __slots__ = ('tag', 'id', 'classes', 'xpath')
+
+    def __init__(self, selector: str):
+        self.tag = self.id = None
+        self.classes: Tuple[str, ...] = ()
+        self.xpath = None
+
+        match = SIMPLE_SELECTOR_PATTERN.match(selector.strip())
+        if match and selector.strip():
+            self.tag = match.group(1).lower() if match.group(1) else None
+            parts = re.findall(r'[.#][\w-]+', match.group(2))
+            self.classes = tuple(part[1:] for part in parts if part[0] == '.')
+            ids = [part[1:] for part in parts if part[0] == '#']
+            self.id = ids[0] if ids else None
+        elif CSSSelector is not None:
+            self.xpath = CSSSelector(selector)
+        else:
+            logger.warning(f"cssselect not installed, selector ignored: {selector}")
+
+    @property
+    def is_simple(self) -> bool:
+        return self.xpath is None and bool(self.tag or self.id or self.classes)
+
+    @property
+    def index_key(self) -> Tuple[str, str]:
+        """单次遍历时用于快速定位候选元素的索引键"""
+        if self.id:
+            return ('id', self.id)
+        if self.classes:
+            return ('class', self.classes[0])
+        return ('tag', self.tag)
+
+    def matches(self, tag: str, element_id: Optional[str], classes: List[str]) -> bool:
+        return (
+            (self.tag is None or self.tag == tag)
+            and (self.id is None or self.id == element_id)
+            and all(cls in classes for cls in self.classes)
+        )
+
+
+class CompiledSelectorSet:
+    """一个站点配置的全部选择器"""
+
+    def __init__(self, title: Tuple[str, ...], content: Tuple[str, ...], date: Tuple[str, ...], links: Optional[str]):
+        self.sources = {'title': title, 'content': content, 'date': date}
+        self.fields = {
+            'title': [CompiledSelector(selector) for selector in title],
+            'content': [CompiledSelector(selector) for selector in content],
+            'date': [CompiledSelector(selector) for selector in date],
+        }
+        self.links = CompiledSelector(links) if links else None
+
+        # 简单选择器索引: 索引键 -> [(字段, 序号)]
+        self.index: Dict[Tuple[str, str], List[Tuple[str, int]]] = {}
+        for field, compiled in self.fields.items():
+            for position, selector in enumerate(compiled):
+                if selector.is_simple:
+                    self.index.setdefault(selector.index_key, []).append((field, position))
+        if self.links and self.links.is_simple:
+            self.index.setdefault(self.links.index_key, []).append(('links', 0))
+
+
+@lru_cache(maxsize=1024)
+def _compile_selector_set(
+    title: Tuple[str, ...],
+    content: Tuple[str, ...],
+    date: Tuple[str, ...],
+    links: Optional[str]
+) -> CompiledSelectorSet:
+    return CompiledSelectorSet(title, content, date, links)
+
+
+def compile_selectors(config: Dict[str, Any]) -> CompiledSelectorSet:
+    """编译站点选择器，相同配置只编译一次"""
+    selectors = normalize_selectors(config)
+    return _compile_selector_set(
+        tuple(selectors['title']),
+        tuple(selectors['content']),
+        tuple(selectors['date']),
+        selectors['links']
+    )
+
+
+def _iter_strings(root) -> Iterator[str]:
+    """按文档顺序输出元素内的文本，跳过脚本、样式和注释"""
+    if root.text:
+        yield root.text
+
+    stack = [(iter(root), None)]
+    while stack:
+        children, tail = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            if tail:
+                yield tail
+            continue
+
+        if isinstance(child.tag, str) and child.tag not in SKIP_TEXT_TAGS:
+            if child.text:
+                yield child.text
+            stack.append((iter(child), child.tail))
+        elif child.tail:
+            yield child.tail
+
+
+def _get_text(element, separator: str = '') -> str:
+    """与 BeautifulSoup get_text(strip=True) 相同的文本拼接规则"""
+    return separator.join(text for text in (s.strip() for s in _iter_strings(element)) if text)
+
+
+def _iter_blocks(root) -> Iterator[Tuple[str, str]]:
+    """按块级元素切分文本，输出 (块路径, 块文本)
+
+    各块文本以空格相连即为 _get_text(root, ' ') 的结果。
+    """
+    names = [_block_name(root.tag, root.get('class'))]
+    buffer: List[str] = []
+    if root.text and root.text.strip():
+        buffer.append(root.text.strip())
+
+    stack = [(iter(root), None, False)]
+    while stack:
+        children, tail, is_block = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            if is_block:
+                if buffer:
+                    yield '/'.join(names), ' '.join(buffer)
+                    buffer = []
+                names.pop()
+            if tail and tail.strip():
+                buffer.append(tail.strip())
+            continue
+
+        if isinstance(child.tag, str) and child.tag not in SKIP_TEXT_TAGS:
+            is_child_block = child.tag in BLOCK_TAGS
+            if is_child_block:
+                if buffer:
+                    yield '/'.join(names), ' '.join(buffer)
+                    buffer = []
+                names.append(_block_name(child.tag, child.get('class')))
+            if child.text and child.text.strip():
+                buffer.append(child.text.strip())
+            stack.append((iter(child), child.tail, is_child_block))
+        elif child.tail and child.tail.strip():
+            buffer.append(child.tail.strip())
+
+    if buffer:
+        yield '/'.join(names), ' '.join(buffer)
+
+
+class LxmlExtractionEngine(ExtractionEngine):
+    """lxml 提取引擎
+
+    一次遍历文档树，同时收集选择器命中、meta标签、链接、关键词和<title>，
+    不修改文档树，输出与 SoupExtractionEngine 兼容。
+    """
+
+    name = 'lxml'
+
+    def extract(self, html: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            root = lxml.html.document_fromstring(XML_DECLARATION_PATTERN.sub('', html, count=1))
+        except (etree.ParserError, ValueError):
+            return self._result("Untitled", "", None, {}, [])
+
+        compiled = compile_selectors(config)
+        profile = config.get('profile') or {}
+        matched: Dict[str, Any] = {}
+        matches: Dict[str, List[List[Any]]] = {
+            field: [[] for _ in selectors] for field, selectors in compiled.fields.items()
+        }
+        link_matches: List[Any] = []
+
+        title_tag = None
+        body = None
+        date_meta = None
+        published_meta = None
+        meta_tags = []
+        anchors = []
+        keywords = []
+
+        index = compiled.index
+        for element in root.iter():
+            tag = element.tag
+            if not isinstance(tag, str):
+                continue
+
+            element_id = element.get('id')
+            classes = element.get('class', '').split()
+
+            candidates = index.get(('tag', tag), [])
+            if element_id:
+                candidates = candidates + index.get(('id', element_id), [])
+            for cls in classes:
+                candidates = candidates + index.get(('class', cls), [])
+
+            for field, position in candidates:
+                if field == 'links':
+                    if compiled.links.matches(tag, element_id, classes):
+                        link_matches.append(element)
+                else:
+                    selector = compiled.fields[field][position]
+                    bucket = matches[field][position]
+                    if (not bucket or bucket[-1] is not element) and selector.matches(tag, element_id, classes):
+                        bucket.append(element)
+
+            if tag == 'a':
+                if element.get('href') is not None:
+                    anchors.append(element)
+            elif tag == 'meta':
+                meta_tags.append(element)
+                if date_meta is None and element.get('name') == 'date':
+                    date_meta = element
+                if published_meta is None and element.get('property') == 'article:published_time':
+                    published_meta = element
+            elif tag == 'title':
+                if title_tag is None:
+                    title_tag = element
+            elif tag == 'body':
+                if body is None:
+                    body = element
+
+            if classes and any(KEYWORD_CLASS_PATTERN.search(cls) for cls in classes):
+                keywords.append(element)
+
+        # 复杂选择器单独求值
+        for field, selectors in compiled.fields.items():
+            for position, selector in enumerate(selectors):
+                if selector.xpath is not None:
+                    matches[field][position] = selector.xpath(root)
+        if compiled.links and compiled.links.xpath is not None:
+            link_matches = compiled.links.xpath(root)
+
+        links = [element.get('href') for element in link_matches if element.get('href')]
+        if not links:
+            links = [element.get('href') for element in anchors if element.get('href')]
+
+        sources = compiled.sources
+        return self._result(
+            self._title(matches['title'], sources['title'], title_tag, matched),
+            self._content(matches['content'], sources['content'], body, matched, profile),
+            self._date(
+                matches['date'],
+                sources['date'],
+                date_meta if date_meta is not None else published_meta,
+                matched,
+                profile.get('date_format')
+            ),
+            self._metadata(meta_tags, keywords, anchors),
+            links,
+            matched
+        )
+
+    def _title(self, matches: List[List[Any]], sources: Tuple[str, ...], title_tag, matched: Dict[str, Optional[str]]) -> str:
+        for bucket, selector in zip(matches, sources):
+            if bucket:
+                matched['title'] = selector
+                return _get_text(bucket[0])
+        if title_tag is not None:
+            return _get_text(title_tag)
+        return "Untitled"
+
+    def _content(
+        self,
+        matches: List[List[Any]],
+        sources: Tuple[str, ...],
+        body,
+        matched: Dict[str, Any],
+        profile: Dict[str, Any]
+    ) -> str:
+        for bucket, selector in zip(matches, sources):
+            if bucket:
+                content = ' '.join(_get_text(element, ' ') for element in bucket)
+                if len(content) > 100:  # 确保内容足够长
+                    matched['content'] = selector
+                    return content
+        if body is not None:
+            return join_blocks(_iter_blocks(body), profile, matched)
+        return ""
+
+    def _date(
+        self,
+        matches: List[List[Any]],
+        sources: Tuple[str, ...],
+        date_meta,
+        matched: Dict[str, Optional[str]],
+        date_format: Optional[str] = None
+    ) -> Optional[datetime]:
+        for bucket, selector in zip(matches, sources):
+            if bucket:
+                parsed_date, matched['date_format'] = match_date(_get_text(bucket[0]), date_format)
+                if parsed_date:
+                    matched['date'] = selector
+                    return parsed_date
+        if date_meta is not None:
+            parsed_date, matched['date_format'] = match_date(date_meta.get('content', ''), date_format)
+            return parsed_date
+        return None
+
+    def _metadata(self, meta_tags: List[Any], keywords: List[Any], anchors: List[Any]) -> Dict[str, Any]:
+        metadata = {}
+
+        for tag in meta_tags:
+            name = tag.get('name') or tag.get('property')
+            content = tag.get('content')
+            if name and content:
+                metadata[name] = content
+
+        if keywords:
+            metadata['keywords'] = [_get_text(element) for element in keywords]
+
+        links = []
+        for anchor in anchors:
+            href = anchor.get('href')
+            if href.startswith('http') or href.startswith('/'):
+                links.append({'url': href, 'text': _get_text(anchor)})
+                if len(links) >= 10:  # 限制数量
+                    break
+
+        if links:
+            metadata['links'] = links
+
+        return metadata
+
+
+ENGINES = {
+    SoupExtractionEngine.name: SoupExtractionEngine,
+    LxmlExtractionEngine.name: LxmlExtractionEngine,
+}
+
+
+def get_engine(name: Optional[str] = None) -> ExtractionEngine:
+    """按名称创建提取引擎，lxml 不可用时回退到 BeautifulSoup"""
+    name = name or settings.CRAWL_PARSER_BACKEND
+    if name == LxmlExtractionEngine.name and lxml is None:
+        logger.warning("lxml not installed, falling back to BeautifulSoup extraction")
+        name = SoupExtractionEngine.name
+    return ENGINES.get(name, SoupExtractionEngine)()
+
+
+__all__ = [
+    'ExtractionEngine',
+    'SoupExtractionEngine',
+    'LxmlExtractionEngine',
+    'block_fingerprint',
+    'compile_selectors',
+    'get_engine',
+    'match_date',
+    'normalize_selectors',
+    'parse_date',
+]
@@ -0,0 +1,136 @@
+"""
+URL采集队列（Frontier）
+路径: /mnt/okcomputer/output/backend/workers/services/frontier.py
+"""
+
+import asyncio
+import heapq
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+
+class FrontierItem:
+    """待采集的URL条目"""
+
+    __slots__ = ('url', 'site_config', 'depth', 'host', 'parent')
+
+    def __init__(self, url: str, site_config: Dict[str, Any], depth: int = 0, parent: Optional[Dict[str, Any]] = None):
+        self.url = url
+        self.site_config = site_config
+        self.depth = depth
+        self.host = urlparse(url).netloc.lower()
+        # 附件条目记录所在页面的 url/title/publish_date，普通页面为None
+        self.parent = parent
+
+
+class CrawlFrontier:
+    """按主机分桶的URL队列
+
+    每个主机同一时刻只有一个在途请求（礼貌时间槽），两次请求之间至少间隔
+    delay 秒；不同主机之间互不等待，因此站点越多，整体吞吐越高。
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._queues: Dict[str, Deque[FrontierItem]] = {}
+        # 就绪堆: (可采集时间, 序号, 主机)
+        self._ready: List[Tuple[float, int, str]] = []
+        # 已在就绪堆中或正在采集的主机
+        self._active: Set[str] = set()
+        # 主机下次允许采集的时间
+        self._host_next: Dict[str, float] = {}
+        self._enqueued: Set[str] = set()
+        # 已取出、尚未完成的条目
+        self._processing: Set[FrontierItem] = set()
+        self._counter = 0
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @property
+    def in_flight(self) -> int:
+        """正在采集的URL数量"""
+        return len(self._processing)
+
+    def push(self, url: str, site_config: Dict[str, Any], depth: int = 0, parent: Optional[Dict[str, Any]] = None) -> bool:
+        """加入待采集URL，已入队过的URL返回False；附件传入所在页面信息 parent"""
+        if url in self._enqueued:
+            return False
+        self._enqueued.add(url)
+
+        item = FrontierItem(url, site_config, depth, parent)
+        self._queues.setdefault(item.host, deque()).append(item)
+
+        if item.host not in self._active:
+            self._active.add(item.host)
+            ready_at = max(time.monotonic(), self._host_next.get(item.host, 0.0))
+            self._schedule(item.host, ready_at)
+
+        return True
+
+    async def pop(self) -> Optional[FrontierItem]:
+        """取出下一个可采集的URL，队列耗尽时返回None"""
+        while True:
+            timeout = None
+            if self._ready:
+                ready_at, _, host = self._ready[0]
+                timeout = ready_at - time.monotonic()
+                if timeout <= 0:
+                    heapq.heappop(self._ready)
+                    item = self._queues[host].popleft()
+                    self._processing.add(item)
+                    return item
+            elif not self._processing:
+                # 没有待采集也没有在途请求，唤醒其他等待者一起退出
+                self._wakeup.set()
+                return None
+
+            self._wakeup.clear()
+            # 不用 wait_for：唤醒与取消同时发生时它会吞掉取消，任务被终止后采集协程仍在运行
+            waiter = asyncio.ensure_future(self._wakeup.wait())
+            try:
+                await asyncio.wait((waiter,), timeout=timeout)
+            finally:
+                waiter.cancel()
+
+    def done(self, item: FrontierItem, delay: Optional[float] = None):
+        """释放主机时间槽，delay为距离该主机下次采集的间隔"""
+        self._processing.discard(item)
+
+        host = item.host
+        next_at = time.monotonic() + (self.delay if delay is None else delay)
+        self._host_next[host] = next_at
+
+        if self._queues.get(host):
+            self._schedule(host, next_at)
+        else:
+            self._active.discard(host)
+            self._queues.pop(host, None)
+
+        self._wakeup.set()
+
+    def snapshot(self) -> Tuple[List[FrontierItem], List[str]]:
+        """返回 (未完成的条目, 已入队过的URL)，在途条目也算未完成"""
+        pending = list(self._processing)
+        for queue in self._queues.values():
+            pending.extend(queue)
+        return pending, list(self._enqueued)
+
+    def restore(self, items: List[FrontierItem], enqueued: List[str]):
+        """从检查点恢复队列"""
+        self._enqueued.update(enqueued)
+        for item in items:
+            self._enqueued.discard(item.url)
+            self.push(item.url, item.site_config, item.depth, item.parent)
+
+    def _schedule(self, host: str, ready_at: float):
+        """把主机放入就绪堆"""
+        self._counter += 1
+        heapq.heappush(self._ready, (ready_at, self._counter, host))
+        self._wakeup.set()
+
+
+__all__ = ['CrawlFrontier', 'FrontierItem']
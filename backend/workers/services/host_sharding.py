@@ -0,0 +1,230 @@
+"""
+按主机分片的采集队列
+路径: /mnt/okcomputer/output/backend/workers/services/host_sharding.py
+"""
+
+import bisect
+import hashlib
+import logging
+import math
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+from urllib.parse import urlparse
+
+import redis
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 存活worker的心跳有序集合（成员为worker主机名，分值为最近心跳时间）
+MEMBERS_KEY = 'crawl:shard:members'
+
+# 每个节点在哈希环上的虚拟节点数
+VIRTUAL_NODES = 64
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """一致性哈希环，节点增减时只有约 1/N 的键改变归属"""
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = VIRTUAL_NODES):
+        self.vnodes = vnodes
+        self._points: List[int] = []
+        self._owners: Dict[int, str] = {}
+        self.nodes: Set[str] = set()
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str):
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for replica in range(self.vnodes):
+            point = _hash(f"{node}#{replica}")
+            self._owners[point] = node
+            bisect.insort(self._points, point)
+
+    def remove(self, node: str):
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        self._points = [point for point in self._points if self._owners[point] != node]
+        self._owners = {point: self._owners[point] for point in self._points}
+
+    def node_for(self, key: str) -> Optional[str]:
+        """键所属的节点"""
+        return next(self.walk(key), None)
+
+    def walk(self, key: str) -> Iterator[str]:
+        """从键的位置顺时针依次给出各个不同节点"""
+        if not self._points:
+            return
+        start = bisect.bisect(self._points, _hash(key))
+        seen = set()
+        for offset in range(len(self._points)):
+            node = self._owners[self._points[(start + offset) % len(self._points)]]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == len(self.nodes):
+                    return
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+
+def shard_queues(shards: Optional[int] = None) -> List[str]:
+    """全部分片队列名"""
+    shards = settings.CRAWL_SHARDS if shards is None else shards
+    return [f"{settings.CRAWL_QUEUE}.{index:02d}" for index in range(shards)]
+
+
+_shard_ring: Optional[HashRing] = None
+
+
+def queue_for_host(host: str) -> str:
+    """主机对应的分片队列，未启用分片时为采集主队列"""
+    global _shard_ring
+    if settings.CRAWL_SHARDS <= 0 or not host:
+        return settings.CRAWL_QUEUE
+    if _shard_ring is None or len(_shard_ring) != settings.CRAWL_SHARDS:
+        _shard_ring = HashRing(shard_queues())
+    return _shard_ring.node_for(host.lower())
+
+
+def site_host(site_config: Dict[str, Any]) -> str:
+    """站点的主机名（取第一个入口URL）"""
+    start_urls = site_config.get('start_urls') or []
+    return urlparse(start_urls[0]).netloc.lower() if start_urls else ''
+
+
+def queue_for_site(site_config: Dict[str, Any]) -> str:
+    return queue_for_host(site_host(site_config))
+
+
+def group_sites_by_queue(site_configs: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """按分片队列分组站点"""
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for site_config in site_configs:
+        groups.setdefault(queue_for_site(site_config), []).append(site_config)
+    return groups
+
+
+def assign_shards(members: Iterable[str], queues: Optional[List[str]] = None) -> Dict[str, List[str]]:
+    """按有界负载的一致性哈希把分片队列分配给存活worker
+
+    分片数不多时纯一致性哈希容易分配不均，这里每个节点最多分到平均数（向上取整）
+    个分片，分片沿环顺时针找第一个未满的节点。所有节点看到同样的成员列表时得到
+    同样的分配结果，成员变化时大部分分片保持原主。
+    """
+    queues = shard_queues() if queues is None else queues
+    ring = HashRing(members)
+    assignment: Dict[str, List[str]] = {member: [] for member in ring.nodes}
+    if not ring.nodes:
+        return assignment
+
+    capacity = math.ceil(len(queues) / len(ring.nodes))
+    for queue in sorted(queues):
+        for node in ring.walk(queue):
+            if len(assignment[node]) < capacity:
+                assignment[node].append(queue)
+                break
+    return assignment
+
+
+class ShardBalancer:
+    """在worker主进程中维护本节点消费的分片队列
+
+    定期在Redis中登记心跳，读取存活节点列表，按一致性哈希计算本节点
+    负责的分片，通过Celery远程控制增减消费队列。节点加入或离开时只有少量
+    分片换主，其余节点保持原有主机集合，连接池和限速状态不被打散。
+    Redis不可用时消费全部分片，保证任务不积压。
+    """
+
+    def __init__(self, app, hostname: str, interval: Optional[int] = None):
+        self.app = app
+        self.hostname = hostname
+        self.interval = interval or settings.CRAWL_SHARD_HEARTBEAT
+        self.owned: Set[str] = set()
+        self._client: Optional[redis.Redis] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='shard-balancer', daemon=True)
+        self._thread.start()
+        logger.info(f"Shard balancer started for {self.hostname}")
+
+    def stop(self):
+        """停止心跳并退出成员列表，其他节点在下次检查时接管分片"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.interval)
+        try:
+            self._redis().zrem(MEMBERS_KEY, self.hostname)
+        except Exception as e:
+            logger.warning(f"Failed to leave shard membership: {e}")
+
+    def _redis(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.Redis.from_url(settings.REDIS_URL, db=settings.REDIS_DB, decode_responses=True)
+        return self._client
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.rebalance()
+            except Exception as e:
+                logger.error(f"Shard rebalance failed: {e}")
+            self._stop.wait(self.interval)
+
+    def alive_members(self) -> List[str]:
+        """登记心跳并返回存活节点"""
+        client = self._redis()
+        now = time.time()
+        pipe = client.pipeline()
+        pipe.zadd(MEMBERS_KEY, {self.hostname: now})
+        # 超过3个心跳周期未更新的节点视为已离开
+        pipe.zremrangebyscore(MEMBERS_KEY, 0, now - self.interval * 3)
+        pipe.zrange(MEMBERS_KEY, 0, -1)
+        return pipe.execute()[-1]
+
+    def rebalance(self):
+        """重新计算并应用本节点负责的分片"""
+        try:
+            members = self.alive_members()
+            wanted = set(assign_shards(members).get(self.hostname, []))
+        except redis.RedisError as e:
+            logger.warning(f"Shard membership unavailable, consuming all shards: {e}")
+            wanted = set(shard_queues())
+
+        added = wanted - self.owned
+        removed = self.owned - wanted
+        for queue in sorted(added):
+            self.app.control.add_consumer(queue, destination=[self.hostname], reply=False)
+        for queue in sorted(removed):
+            self.app.control.cancel_consumer(queue, destination=[self.hostname], reply=False)
+
+        if added or removed:
+            logger.info(
+                f"Shard ownership for {self.hostname}: {len(wanted)} shards "
+                f"(+{len(added)} -{len(removed)})"
+            )
+        self.owned = wanted
+
+
+__all__ = [
+    'HashRing',
+    'ShardBalancer',
+    'assign_shards',
+    'group_sites_by_queue',
+    'queue_for_host',
+    'queue_for_site',
+    'shard_queues',
+    'site_host',
+]
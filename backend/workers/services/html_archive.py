@@ -0,0 +1,207 @@
+"""
+原始HTML压缩归档
+路径: /mnt/okcomputer/output/backend/workers/services/html_archive.py
+"""
+
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 未安装时按zlib压缩
+    zstandard = None
+
+# 记录头: 魔数、压缩算法、压缩后长度
+RECORD_MAGIC = b'PPA1'
+RECORD_HEADER = struct.Struct('>4sBI')
+
+CODEC_ZSTD = 1
+CODEC_ZLIB = 2
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class ArchiveError(Exception):
+    """归档记录损坏或不存在"""
+
+
+def archive_dir(path: Optional[str] = None) -> str:
+    """归档目录，相对路径以backend目录为基准"""
+    path = path or settings.CRAWL_ARCHIVE_DIR
+    return path if os.path.isabs(path) else os.path.join(BACKEND_ROOT, path)
+
+
+def archive_node() -> str:
+    """本节点名称：段文件只在写入它的节点本地磁盘上，重新提取按节点分发"""
+    return socket.gethostname()
+
+
+def segment_node(segment: str) -> Optional[str]:
+    """从段文件名 segment-{时间}-{节点}-{进程号}-{序号}.ppa 中取出节点名"""
+    parts = segment.split('-')
+    if len(parts) < 5 or parts[0] != 'segment':
+        return None
+    return '-'.join(parts[2:-2])
+
+
+def _decompress(codec: int, data: bytes) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ArchiveError("zstandard is required to read this archive record")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    raise ArchiveError(f"Unknown archive codec {codec}")
+
+
+def _unpack(payload: bytes) -> Tuple[Dict[str, Any], bytes]:
+    meta, _, body = payload.partition(b'\n')
+    return json.loads(meta), body
+
+
+class HtmlArchive:
+    """只追加的分段压缩归档
+
+    每条记录独立压缩（meta JSON 一行 + 原始响应体），写入当前段文件末尾，
+    返回 {segment, offset, length, node} 指针随页面文档保存，作为URL到偏移量的索引。
+    段文件名带节点名和进程号，多个worker各写各的文件，无需加锁；
+    段文件超过大小上限后换新文件。段文件写在本节点磁盘上，指针中的 node
+    记录由哪个节点读取。
+    append/flush 会阻塞（压缩和写文件），采集协程通过线程池调用：压缩在各线程
+    独立进行，写入当前段文件时加锁。
+    """
+
+    def __init__(self, directory: Optional[str] = None, segment_bytes: Optional[int] = None, level: Optional[int] = None):
+        self.directory = archive_dir(directory)
+        self.segment_bytes = segment_bytes or settings.CRAWL_ARCHIVE_SEGMENT_MB * 1024 * 1024
+        self.level = level or settings.CRAWL_ARCHIVE_LEVEL
+        self.node = archive_node()
+        self._file = None
+        self._segment: Optional[str] = None
+        self._sequence = 0
+        self._lock = threading.Lock()
+        # ZstdCompressor 不能被多个线程同时使用，每个线程一个
+        self._local = threading.local()
+
+    def _compress(self, payload: bytes) -> Tuple[int, bytes]:
+        if zstandard is None:
+            return CODEC_ZLIB, zlib.compress(payload, min(self.level, 9))
+        compressor = getattr(self._local, 'compressor', None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.level)
+        return CODEC_ZSTD, compressor.compress(payload)
+
+    def _open_segment(self):
+        self.close()
+        os.makedirs(self.directory, exist_ok=True)
+        while True:
+            self._sequence += 1
+            name = (
+                f"segment-{datetime.utcnow():%Y%m%d%H%M%S}-{self.node}"
+                f"-{os.getpid()}-{self._sequence:04d}.ppa"
+            )
+            if not os.path.exists(os.path.join(self.directory, name)):
+                break
+        self._segment = name
+        self._file = open(os.path.join(self.directory, name), 'ab')
+
+    def append(self, url: str, body: bytes, **meta) -> Dict[str, Any]:
+        """追加一条记录，返回记录指针；目录不可写等情况抛出 OSError"""
+        meta['url'] = url
+        meta.setdefault('fetched_at', datetime.utcnow().isoformat())
+        payload = json.dumps(meta, ensure_ascii=False).encode('utf-8') + b'\n' + body
+        codec, compressed = self._compress(payload)
+
+        with self._lock:
+            if self._file is None or self._file.tell() >= self.segment_bytes:
+                self._open_segment()
+            offset = self._file.tell()
+            try:
+                self._file.write(RECORD_HEADER.pack(RECORD_MAGIC, codec, len(compressed)))
+                self._file.write(compressed)
+            except OSError:
+                # 写了一半的记录留在段尾，后续记录改写到新段文件
+                self.close()
+                raise
+            segment = self._segment
+
+        return {
+            'segment': segment,
+            'offset': offset,
+            'length': RECORD_HEADER.size + len(compressed),
+            'node': self.node,
+        }
+
+    def flush(self):
+        """把已追加的记录写到磁盘，保存指针前调用"""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_record(directory: str, segment: str, offset: int, length: int) -> Tuple[Dict[str, Any], bytes]:
+    """按指针读取一条记录，返回 (meta, 原始响应体)"""
+    with open(os.path.join(directory, segment), 'rb') as f:
+        f.seek(offset)
+        return parse_record(f.read(length))
+
+
+def parse_record(data: bytes) -> Tuple[Dict[str, Any], bytes]:
+    if len(data) < RECORD_HEADER.size:
+        raise ArchiveError("Truncated archive record")
+    magic, codec, size = RECORD_HEADER.unpack_from(data)
+    if magic != RECORD_MAGIC or len(data) < RECORD_HEADER.size + size:
+        raise ArchiveError("Corrupt archive record")
+    return _unpack(_decompress(codec, data[RECORD_HEADER.size:RECORD_HEADER.size + size]))
+
+
+def scan_segment(path: str) -> Iterator[Tuple[int, Dict[str, Any], bytes]]:
+    """顺序读取段文件中的全部记录，末尾未写完的记录被忽略"""
+    with open(path, 'rb') as f:
+        while True:
+            offset = f.tell()
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            magic, codec, size = RECORD_HEADER.unpack(header)
+            if magic != RECORD_MAGIC:
+                raise ArchiveError(f"Corrupt archive segment {path} at offset {offset}")
+            data = f.read(size)
+            if len(data) < size:
+                return
+            meta, body = _unpack(_decompress(codec, data))
+            yield offset, meta, body
+
+
+def create_archive() -> Optional[HtmlArchive]:
+    """按配置创建归档，未启用时返回None"""
+    return HtmlArchive() if settings.CRAWL_ARCHIVE_ENABLED else None
+
+
+__all__ = [
+    'ArchiveError',
+    'HtmlArchive',
+    'archive_dir',
+    'archive_node',
+    'create_archive',
+    'parse_record',
+    'read_record',
+    'scan_segment',
+    'segment_node',
+]
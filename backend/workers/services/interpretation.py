@@ -0,0 +1,335 @@
+"""
+政策双视角解读
+路径: /mnt/okcomputer/output/backend/workers/services/interpretation.py
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import openai
+from pydantic import BaseModel, Field, ValidationError
+from pymongo import UpdateOne
+
+from app.config import settings
+from app.database.mongodb import mongodb
+from app.models.policy import PolicyAnalysis, PolicyStatus, RiskLevel
+from .llm_cache import cache_key
+from .llm_client import LLMClient
+from .llm_dispatcher import MESSAGE_OVERHEAD, context_tokens, supports_json_mode
+from .work_leases import stage_queues
+
+logger = logging.getLogger(__name__)
+
+# 修改提示词或输出格式时提升版本号，缓存的旧结果随之失效
+PROMPT_VERSION = 'dual-interpretation-v1'
+
+SYSTEM_PROMPT = """你是资深政策分析师。用户以JSON提供一组政策文件（documents 数组，每篇含 id、title、content）。
+请对每篇文件同时给出激进和保守两种视角的解读，只输出一个JSON对象，格式为：
+{"results": [{"id": "文件id",
+  "aggressive": {"summary": "激进视角的100字以内摘要", "signals": ["信号"], "confidence": 0.8},
+  "conservative": {"summary": "保守视角的100字以内摘要", "signals": ["信号"], "confidence": 0.6},
+  "key_points": ["关键要点，3到5条"],
+  "risk_level": "high/medium/low/none 之一",
+  "opportunity": "商机评估"}]}
+signals 的取值为 opportunity、risk、neutral、trend，confidence 为0到1之间的小数。
+每篇文件在 results 中对应一项，id 与输入一致，不要遗漏，也不要输出JSON以外的内容。"""
+
+# 单篇文档单独请求仍未通过校验时的重试次数
+SINGLE_RETRIES = 1
+
+# 每篇文档在请求中的格式开销(token)
+DOCUMENT_OVERHEAD = 20
+
+# 请求内容导致的错误（如超出上下文窗口），重试同一请求不会成功，拆成单篇找出有问题的文档
+SPLIT_ERRORS = (openai.BadRequestError, openai.UnprocessableEntityError)
+
+
+class InterpretationItem(BaseModel):
+    """一篇文档的解读结果"""
+    id: Union[int, str]
+    aggressive: PolicyAnalysis
+    conservative: PolicyAnalysis
+    key_points: List[str] = Field(..., min_length=1)
+    risk_level: RiskLevel
+    opportunity: str
+
+
+class PendingDoc:
+    """待解读的文档"""
+
+    __slots__ = ('doc_id', 'document', 'tokens', 'key')
+
+    def __init__(self, doc_id: str, document: Dict[str, str], tokens: int, key: str):
+        self.doc_id = doc_id
+        self.document = document
+        self.tokens = tokens
+        self.key = key
+
+
+class BatchInterpreter:
+    """一次请求同时得到激进/保守解读、关键要点、风险等级和商机评估
+
+    多篇短文档按输入token上限和篇数上限合并为一次请求，每篇在响应的 results 中
+    对应一项，逐项按 InterpretationItem 校验。校验通过的结果按单篇文档的内容哈希
+    写入缓存（与合并方式无关，重跑时换了批次组合也能命中）；缺失或不合格的项
+    从批次中拆出单独重试，不连累同批的其他文档。max_docs 为1时即逐篇请求。
+    批次的输入加上按篇数预留的输出不超过模型的上下文窗口。请求被拒绝（400/422）
+    时同样拆成单篇；调度器重试后仍失败的临时故障不计为解读失败，单独返回以便稍后重试。
+    """
+
+    def __init__(
+        self,
+        client: LLMClient,
+        input_tokens: Optional[int] = None,
+        max_docs: Optional[int] = None,
+        output_tokens: Optional[int] = None,
+        max_doc_tokens: Optional[int] = None
+    ):
+        self.client = client
+        self.estimator = client.dispatcher.estimator
+        self.input_tokens = input_tokens or settings.LLM_BATCH_INPUT_TOKENS
+        self.max_docs = max_docs or settings.LLM_BATCH_MAX_DOCS
+        self.output_tokens = output_tokens or settings.LLM_INTERPRET_OUTPUT_TOKENS
+        self.context_tokens = context_tokens(client.model)
+        # 不支持JSON模式的模型只靠提示词约束输出格式，结果照常经过模式校验
+        self.json_mode = supports_json_mode(client.model)
+        self.system_tokens = self.estimator.count(SYSTEM_PROMPT) + 2 * MESSAGE_OVERHEAD
+        # 单篇文档连同输出也要放得进上下文窗口
+        self.max_doc_tokens = min(
+            max_doc_tokens or settings.LLM_INTERPRET_MAX_DOC_TOKENS,
+            self.context_tokens - self.system_tokens - self.output_tokens - DOCUMENT_OVERHEAD
+        )
+        self.stats = {'requests': 0, 'cached': 0, 'split': 0, 'retried': 0, 'failed': 0, 'deferred': 0}
+
+    def _prepare(self, doc: Dict[str, Any]) -> PendingDoc:
+        """截断过长的正文并估计token数"""
+        title = doc.get('title') or ''
+        content = doc.get('content') or ''
+        tokens = self.estimator.count(content)
+        if tokens > self.max_doc_tokens:
+            content = content[:int(len(content) * self.max_doc_tokens / tokens)]
+            tokens = self.max_doc_tokens
+        document = {'title': title, 'content': content}
+        key = cache_key(
+            self.client.model,
+            PROMPT_VERSION,
+            [{'role': 'user', 'content': json.dumps(document, ensure_ascii=False, sort_keys=True)}]
+        )
+        doc_id = str(doc.get('_id', doc.get('id')))
+        return PendingDoc(doc_id, document, tokens + self.estimator.count(title) + DOCUMENT_OVERHEAD, key)
+
+    def pack(self, pending: List[PendingDoc]) -> List[List[PendingDoc]]:
+        """按输入token上限、上下文窗口和篇数上限依次装入批次，超长的文档单独成批
+
+        每篇文档占用自身的输入token和 output_tokens 的输出预留（请求的 max_tokens 按篇数累加）。
+        """
+        input_budget = self.input_tokens - self.system_tokens
+        context_budget = self.context_tokens - self.system_tokens
+        batches: List[List[PendingDoc]] = []
+        current: List[PendingDoc] = []
+        used = 0
+        for item in pending:
+            if current and (
+                used + item.tokens > input_budget
+                or used + item.tokens + self.output_tokens * (len(current) + 1) > context_budget
+                or len(current) >= self.max_docs
+            ):
+                batches.append(current)
+                current, used = [], 0
+            current.append(item)
+            used += item.tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    async def interpret(
+        self,
+        docs: List[Dict[str, Any]]
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str], Dict[str, str]]:
+        """解读一组文档，返回 (文档ID -> 解读结果, 文档ID -> 失败原因, 文档ID -> 临时故障原因)"""
+        results: Dict[str, Dict[str, Any]] = {}
+        errors: Dict[str, str] = {}
+        deferred: Dict[str, str] = {}
+        pending = []
+        for doc in docs:
+            item = self._prepare(doc)
+            cached = await self._cached(item)
+            if cached is not None:
+                results[item.doc_id] = cached
+                self.stats['cached'] += 1
+            else:
+                pending.append(item)
+
+        await asyncio.gather(*(self._run(batch, results, errors, deferred) for batch in self.pack(pending)))
+        return results, errors, deferred
+
+    async def _cached(self, item: PendingDoc) -> Optional[Dict[str, Any]]:
+        if self.client.cache is None:
+            return None
+        cached = await self.client.cache.get(item.key)
+        if cached is None:
+            return None
+        try:
+            return InterpretationItem.model_validate_json(cached).model_dump(mode='json', exclude={'id'})
+        except ValidationError:
+            return None
+
+    def _messages(self, batch: List[PendingDoc]) -> List[Dict[str, str]]:
+        documents = [dict(item.document, id=str(index + 1)) for index, item in enumerate(batch)]
+        return [
+            {'role': 'system', 'content': SYSTEM_PROMPT},
+            {'role': 'user', 'content': json.dumps({'documents': documents}, ensure_ascii=False)},
+        ]
+
+    @staticmethod
+    def _parse(content: str) -> Tuple[Dict[str, Any], Optional[str]]:
+        """响应中按 id 排列的原始结果项；整体无法解析时返回错误
+
+        未开启JSON模式时模型可能把JSON包在 ```json 代码块里或前后附带说明，
+        直接解析失败时取最外层的 {...} 再解析一次。
+        """
+        try:
+            payload = json.loads(content)
+        except ValueError as e:
+            start, end = content.find('{'), content.rfind('}')
+            if start < 0 or end <= start:
+                return {}, f"invalid JSON: {e}"
+            try:
+                payload = json.loads(content[start:end + 1])
+            except ValueError as inner:
+                return {}, f"invalid JSON: {inner}"
+        items = payload.get('results') if isinstance(payload, dict) else None
+        if not isinstance(items, list):
+            return {}, 'missing results array'
+        return {str(item.get('id')): item for item in items if isinstance(item, dict)}, None
+
+    async def _run(
+        self,
+        batch: List[PendingDoc],
+        results: Dict[str, Dict[str, Any]],
+        errors: Dict[str, str],
+        deferred: Dict[str, str],
+        attempt: int = 0
+    ):
+        """请求一个批次，不合格的文档拆出来单独重试"""
+        self.stats['requests'] += 1
+        try:
+            content = await self.client.complete(
+                self._messages(batch),
+                PROMPT_VERSION,
+                max_tokens=self.output_tokens * len(batch),
+                json_mode=self.json_mode,
+                use_cache=False
+            )
+        except SPLIT_ERRORS as e:
+            if self.json_mode and 'response_format' in str(e):
+                # 能力表判断有误（如兼容接口的服务），关闭JSON模式后原样重试
+                logger.warning(f"{self.client.model} rejected JSON mode, falling back to prompt-only JSON: {e}")
+                self.json_mode = False
+                await self._run(batch, results, errors, deferred, attempt)
+                return
+            if len(batch) > 1:
+                self.stats['split'] += len(batch)
+                await asyncio.gather(*(self._run([item], results, errors, deferred) for item in batch))
+            else:
+                logger.warning(f"Interpretation request for {batch[0].doc_id} was rejected: {e}")
+                errors[batch[0].doc_id] = str(e)
+                self.stats['failed'] += 1
+            return
+        except openai.APIError as e:
+            # 调度器已按配额重试过的临时故障，不再拆分，留待下次认领
+            for item in batch:
+                deferred[item.doc_id] = str(e)
+            self.stats['deferred'] += len(batch)
+            return
+
+        raw_items, problem = self._parse(content)
+        rejected: List[Tuple[PendingDoc, str]] = []
+        for index, item in enumerate(batch):
+            raw = raw_items.get(str(index + 1))
+            if raw is None:
+                rejected.append((item, problem or 'missing from results'))
+                continue
+            try:
+                parsed = InterpretationItem.model_validate(raw)
+            except ValidationError as e:
+                rejected.append((item, f"schema validation failed: {e.error_count()} errors"))
+                continue
+            results[item.doc_id] = parsed.model_dump(mode='json', exclude={'id'})
+            if self.client.cache is not None:
+                await self.client.cache.put(item.key, parsed.model_dump_json(), self.client.model, PROMPT_VERSION)
+
+        if not rejected:
+            return
+        if len(batch) > 1:
+            self.stats['split'] += len(rejected)
+            await asyncio.gather(*(self._run([item], results, errors, deferred) for item, _ in rejected))
+        elif attempt < SINGLE_RETRIES:
+            self.stats['retried'] += 1
+            await self._run(batch, results, errors, deferred, attempt + 1)
+        else:
+            item, reason = rejected[0]
+            logger.warning(f"Interpretation of {item.doc_id} failed: {reason}")
+            errors[item.doc_id] = reason
+            self.stats['failed'] += 1
+
+
+def to_insight(doc_id: Any, result: Dict[str, Any], model: str) -> Dict[str, Any]:
+    """解读结果转为 insights 集合的文档"""
+    return {
+        'docId': doc_id,
+        'aggressive': result['aggressive'],
+        'conservative': result['conservative'],
+        'keyPoints': result['key_points'],
+        'riskLevel': result['risk_level'],
+        'opportunity': result['opportunity'],
+        'model': model,
+        'promptVersion': PROMPT_VERSION,
+        'analyzedAt': datetime.utcnow(),
+    }
+
+
+async def interpret_pending(client: LLMClient, batch_size: Optional[int] = None) -> Dict[str, int]:
+    """认领一批待解读的清洗后文档，解读后写入 insights 并完成租约
+
+    临时故障的文档让租约立即过期，本次认领计数，认领次数用尽前可以重新认领。
+    """
+    queue = stage_queues('analyze', projection={'title': 1, 'content': 1})[0]
+    lease = await queue.claim(batch_size)
+    if not lease.docs:
+        return {'analyzed': 0, 'failed': 0, 'deferred': 0}
+
+    interpreter = BatchInterpreter(client)
+    by_id = {str(doc['_id']): doc['_id'] for doc in lease.docs}
+    results, errors, deferred = await interpreter.interpret(lease.docs)
+
+    if results:
+        await mongodb.get_collection('insights').bulk_write([
+            UpdateOne(
+                {'docId': by_id[doc_id]},
+                {'$set': to_insight(by_id[doc_id], result, client.model)},
+                upsert=True
+            )
+            for doc_id, result in results.items()
+        ], ordered=False)
+    analyzed = await queue.complete(lease, [by_id[doc_id] for doc_id in results], PolicyStatus.PROCESSED.value)
+    failed = await queue.complete(
+        lease,
+        [by_id[doc_id] for doc_id in errors],
+        PolicyStatus.FAILED.value,
+        {'error': 'interpretation failed'}
+    )
+    released = 0
+    if deferred:
+        released = await queue.release(lease, [by_id[doc_id] for doc_id in deferred], count_attempt=True)
+    logger.info(
+        f"Interpreted {analyzed} documents in {interpreter.stats['requests']} requests "
+        f"({interpreter.stats['cached']} cached, {failed} failed, {released} deferred)"
+    )
+    return {'analyzed': analyzed, 'failed': failed, 'deferred': released}
+
+
+__all__ = ['BatchInterpreter', 'InterpretationItem', 'PROMPT_VERSION', 'interpret_pending', 'to_insight']
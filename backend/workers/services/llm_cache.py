@@ -0,0 +1,190 @@
+"""
+大模型调用结果缓存
+路径: /mnt/okcomputer/output/backend/workers/services/llm_cache.py
+"""
+
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.database.mongodb import mongodb
+from app.database.redis import redisdb
+
+logger = logging.getLogger(__name__)
+
+CACHE_COLLECTION = 'llm_cache'
+
+# 各worker进程命中统计的汇总，Redis不可用时只有进程内统计
+STATS_KEY = 'llm_cache:stats'
+
+# 每写入这么多条检查一次容量
+EVICT_CHECK_EVERY = 100
+
+# 超出上限时额外多淘汰的比例，避免之后每次检查都要淘汰
+EVICT_HEADROOM = 0.05
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """全角/半角统一，连续空白合并为一个空格，重新采集的页面排版差异不影响命中"""
+    return WHITESPACE_PATTERN.sub(' ', unicodedata.normalize('NFKC', text)).strip()
+
+
+def cache_key(
+    model: str,
+    prompt_version: str,
+    messages: List[Dict[str, str]],
+    params: Optional[Dict[str, Any]] = None
+) -> str:
+    """(模型, 提示词版本, 规范化后的输入, 生成参数) 的哈希
+
+    提示词模板修改时调用方应提升 prompt_version，旧结果随之失效。
+    """
+    payload = json.dumps(
+        [
+            model,
+            prompt_version,
+            params or {},
+            [[message['role'], normalize_text(message['content'])] for message in messages],
+        ],
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """以输入内容哈希为键的模型调用缓存
+
+    结果保存在 llm_cache 集合中，按 _id 直接查找。命中时刷新 last_used，
+    条数超过 max_entries 后按 last_used 淘汰最久未用的条目。
+    重新采集但正文未变的文档、失败后的重试和转载的重复内容都直接复用已有结果。
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.LLM_CACHE_MAX_ENTRIES
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        # 命中时节省的token数
+        self.tokens_saved = 0
+
+    @staticmethod
+    def _collection():
+        return mongodb.get_collection(CACHE_COLLECTION)
+
+    async def get(self, key: str) -> Optional[str]:
+        """取缓存的结果，未命中或读取失败时返回None"""
+        try:
+            doc = await self._collection().find_one_and_update(
+                {'_id': key},
+                {'$set': {'last_used': datetime.utcnow()}, '$inc': {'hits': 1}},
+                projection={'response': 1, 'usage': 1}
+            )
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed: {e}")
+            doc = None
+
+        if doc is None:
+            self.misses += 1
+            await self._count('misses')
+            return None
+        self.hits += 1
+        tokens = (doc.get('usage') or {}).get('total_tokens', 0)
+        self.tokens_saved += tokens
+        await self._count('hits', tokens)
+        return doc['response']
+
+    async def put(
+        self,
+        key: str,
+        response: str,
+        model: str,
+        prompt_version: str,
+        usage: Optional[Dict[str, int]] = None
+    ):
+        """保存一次调用的结果"""
+        now = datetime.utcnow()
+        try:
+            await self._collection().update_one(
+                {'_id': key},
+                {
+                    '$set': {
+                        'response': response,
+                        'model': model,
+                        'prompt_version': prompt_version,
+                        'usage': usage or {},
+                        'last_used': now,
+                    },
+                    '$setOnInsert': {'created_at': now, 'hits': 0},
+                },
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"LLM cache store failed: {e}")
+            return
+        self.stores += 1
+        if self.stores % EVICT_CHECK_EVERY == 0:
+            await self.evict()
+
+    async def evict(self) -> int:
+        """条数超过上限时删除最久未用的条目，返回删除数"""
+        collection = self._collection()
+        try:
+            surplus = await collection.estimated_document_count() - self.max_entries
+            if surplus <= 0:
+                return 0
+            surplus += int(self.max_entries * EVICT_HEADROOM)
+            oldest = await collection.find({}, {'_id': 1}).sort('last_used', 1).limit(surplus).to_list(length=surplus)
+            result = await collection.delete_many({'_id': {'$in': [doc['_id'] for doc in oldest]}})
+        except Exception as e:
+            logger.warning(f"LLM cache eviction failed: {e}")
+            return 0
+        self.evictions += result.deleted_count
+        await self._count('evictions', count=result.deleted_count)
+        logger.info(f"Evicted {result.deleted_count} LLM cache entries")
+        return result.deleted_count
+
+    async def _count(self, field: str, tokens: int = 0, count: int = 1):
+        if redisdb.client is None:
+            return
+        try:
+            pipe = redisdb.client.pipeline(transaction=False)
+            pipe.hincrby(STATS_KEY, field, count)
+            if tokens:
+                pipe.hincrby(STATS_KEY, 'tokens_saved', tokens)
+            await pipe.execute()
+        except Exception as e:
+            logger.debug(f"Failed to record LLM cache stats: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """本进程的命中统计"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'tokens_saved': self.tokens_saved,
+        }
+
+
+async def cache_stats() -> Dict[str, Any]:
+    """所有worker的命中统计汇总"""
+    if redisdb.client is None:
+        return {}
+    counts = {field: int(value) for field, value in (await redisdb.client.hgetall(STATS_KEY)).items()}
+    lookups = counts.get('hits', 0) + counts.get('misses', 0)
+    counts['hit_rate'] = round(counts.get('hits', 0) / lookups, 4) if lookups else 0.0
+    return counts
+
+
+__all__ = ['LLMCache', 'cache_key', 'cache_stats', 'normalize_text']
@@ -0,0 +1,116 @@
+"""
+大模型调用客户端
+路径: /mnt/okcomputer/output/backend/workers/services/llm_client.py
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from openai import AsyncOpenAI
+
+from app.config import settings
+from .llm_cache import LLMCache, cache_key
+from .llm_dispatcher import LLMDispatcher
+
+logger = logging.getLogger(__name__)
+
+
+class LLMClient:
+    """OpenAI对话接口的封装，清洗和解读共用
+
+    每次调用按 (模型, 提示词版本, 规范化输入, 生成参数) 查缓存，命中时不再请求接口；
+    同一进程内同时发起的相同调用只请求一次，其余等待同一结果。
+    未命中的请求经 LLMDispatcher 按RPM/TPM配额发出，重试也由它负责。
+    """
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        cache: Optional[LLMCache] = None,
+        client: Optional[AsyncOpenAI] = None,
+        dispatcher: Optional[LLMDispatcher] = None
+    ):
+        self.model = model or settings.OPENAI_MODEL
+        self.client = client or AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL or None,
+            timeout=settings.OPENAI_TIMEOUT,
+            max_retries=0
+        )
+        self.dispatcher = dispatcher or LLMDispatcher(self.model)
+        if cache is None and settings.LLM_CACHE_ENABLED:
+            cache = LLMCache()
+        self.cache = cache
+        self.calls = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        prompt_version: str,
+        temperature: float = 0.0,
+        max_tokens: Optional[int] = None,
+        json_mode: bool = False,
+        use_cache: bool = True
+    ) -> str:
+        """返回模型回复的文本，use_cache 为假时总是重新请求"""
+        params = {'temperature': temperature, 'max_tokens': max_tokens, 'json': json_mode}
+        key = cache_key(self.model, prompt_version, messages, params)
+
+        if not use_cache:
+            content, _ = await self._request(messages, params)
+            return content
+
+        if self.cache is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, messages, params, prompt_version))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        # 某个等待者被取消时不影响共享的请求
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"LLM request failed: {task.exception()}")
+
+    async def _fetch(
+        self,
+        key: str,
+        messages: List[Dict[str, str]],
+        params: Dict[str, Any],
+        prompt_version: str
+    ) -> str:
+        content, usage = await self._request(messages, params)
+        if self.cache is not None:
+            await self.cache.put(key, content, self.model, prompt_version, usage)
+        return content
+
+    async def _request(self, messages: List[Dict[str, str]], params: Dict[str, Any]):
+        """请求对话接口，返回 (回复文本, token用量)"""
+        kwargs: Dict[str, Any] = {
+            'model': self.model,
+            'messages': messages,
+            'temperature': params['temperature'],
+        }
+        if params['max_tokens']:
+            kwargs['max_tokens'] = params['max_tokens']
+        if params['json']:
+            kwargs['response_format'] = {'type': 'json_object'}
+
+        self.calls += 1
+        response = await self.dispatcher.create(self.client, **kwargs)
+        usage = response.usage.model_dump() if response.usage is not None else {}
+        return response.choices[0].message.content or '', usage
+
+    async def close(self):
+        await self.client.close()
+
+
+__all__ = ['LLMClient']
@@ -0,0 +1,342 @@
+"""
+大模型请求调度
+路径: /mnt/okcomputer/output/backend/workers/services/llm_dispatcher.py
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import openai
+
+from app.config import settings
+from app.database.redis import redisdb
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# 按模型的配额桶和全局暂停标记，所有worker共享
+BUDGET_KEY = 'llm:budget:{model}'
+PAUSE_KEY = 'llm:pause:{model}'
+
+# 配额桶容量相当于这么多秒的配额，限制瞬时突发（接口按秒级平滑计量）
+BURST_SECONDS = 10
+
+# 每条消息的格式开销(token)
+MESSAGE_OVERHEAD = 4
+
+# 常见模型的上下文窗口（输入+输出）token数，按最长的名称前缀匹配
+MODEL_CONTEXT_TOKENS = {
+    'gpt-3.5-turbo': 16385,
+    'gpt-4': 8192,
+    'gpt-4-32k': 32768,
+    'gpt-4-turbo': 128000,
+    'gpt-4-1106': 128000,
+    'gpt-4-0125': 128000,
+    'gpt-4o': 128000,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+
+# 是否支持 response_format={'type': 'json_object'}，按最长的名称前缀匹配；
+# 早期的 gpt-4、gpt-3.5-turbo 快照收到该参数直接返回400，未知模型按不支持处理
+MODEL_JSON_MODE = {
+    'gpt-3.5-turbo': True,
+    'gpt-3.5-turbo-0301': False,
+    'gpt-3.5-turbo-0613': False,
+    'gpt-3.5-turbo-16k': False,
+    'gpt-4': False,
+    'gpt-4-turbo': True,
+    'gpt-4-1106': True,
+    'gpt-4-0125': True,
+    'gpt-4o': True,
+}
+
+# 可以重试的错误：429、连接失败、超时、5xx
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+# 请求数和token数两个令牌桶，原子地检查并扣减；返回0表示已放行，否则为需要等待的毫秒数。
+# 超过桶容量的大请求等到桶满后放行并扣除全部token，桶余额为负（欠账），之后的请求等到还清
+ACQUIRE_SCRIPT = """
+local pause = redis.call('PTTL', KEYS[2])
+if pause > 0 then
+  return pause
+end
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local request_rate = tonumber(ARGV[1]) / 60000
+local token_rate = tonumber(ARGV[2]) / 60000
+local request_capacity = math.max(1, request_rate * tonumber(ARGV[4]))
+local token_capacity = token_rate * tonumber(ARGV[4])
+local cost = tonumber(ARGV[3])
+local needed = math.min(cost, token_capacity)
+local state = redis.call('HMGET', KEYS[1], 'requests', 'tokens', 'ts')
+local requests = tonumber(state[1]) or request_capacity
+local tokens = tonumber(state[2]) or token_capacity
+local elapsed = math.max(0, now - (tonumber(state[3]) or now))
+requests = math.min(request_capacity, requests + elapsed * request_rate)
+tokens = math.min(token_capacity, tokens + elapsed * token_rate)
+local wait = 0
+if requests < 1 then
+  wait = math.max(wait, (1 - requests) / request_rate)
+end
+if tokens < needed then
+  wait = math.max(wait, (needed - tokens) / token_rate)
+end
+if wait == 0 then
+  requests = requests - 1
+  tokens = tokens - cost
+end
+redis.call('HSET', KEYS[1], 'requests', tostring(requests), 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], 120000)
+return math.ceil(wait)
+"""
+
+# 按实际用量退还或补扣预估的token
+SETTLE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+  redis.call('HINCRBYFLOAT', KEYS[1], 'tokens', ARGV[1])
+end
+return 0
+"""
+
+
+def _heuristic_tokens(text: str) -> int:
+    """中文约每字一个token，其余约每4个字符一个"""
+    cjk = sum(1 for char in text if '一' <= char <= '鿿')
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class TokenEstimator:
+    """估计请求的token数，tiktoken 不可用（未安装或无法下载词表）时按字符数估计"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(model)
+            except Exception as e:
+                logger.info(f"tiktoken unavailable for {model}, estimating tokens from characters: {e}")
+
+    def count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return _heuristic_tokens(text)
+
+    def estimate(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None) -> int:
+        """输入token数加上预计的输出token数（接口按 max_tokens 计入TPM）"""
+        prompt = sum(self.count(message['content']) + MESSAGE_OVERHEAD for message in messages)
+        return prompt + (max_tokens or settings.LLM_COMPLETION_TOKENS)
+
+
+def context_tokens(model: str) -> int:
+    """模型的上下文窗口，LLM_CONTEXT_TOKENS 优先，未知模型按保守的默认值"""
+    if settings.LLM_CONTEXT_TOKENS:
+        return settings.LLM_CONTEXT_TOKENS
+    matches = [name for name in MODEL_CONTEXT_TOKENS if model.startswith(name)]
+    if not matches:
+        return DEFAULT_CONTEXT_TOKENS
+    return MODEL_CONTEXT_TOKENS[max(matches, key=len)]
+
+
+def supports_json_mode(model: str) -> bool:
+    """模型是否接受JSON模式，LLM_JSON_MODE 为 on/off 时以设置为准"""
+    if settings.LLM_JSON_MODE in ('on', 'off'):
+        return settings.LLM_JSON_MODE == 'on'
+    matches = [name for name in MODEL_JSON_MODE if model.startswith(name)]
+    if not matches:
+        return False
+    return MODEL_JSON_MODE[max(matches, key=len)]
+
+
+class LocalBudget:
+    """Redis不可用时的进程内配额桶，与 ACQUIRE_SCRIPT 的计算相同"""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.request_rate = rpm / 60.0
+        self.token_rate = tpm / 60.0
+        self.request_capacity = max(1.0, self.request_rate * BURST_SECONDS)
+        self.token_capacity = self.token_rate * BURST_SECONDS
+        self.requests = self.request_capacity
+        self.tokens = self.token_capacity
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+
+    def acquire(self, cost: int) -> float:
+        """放行时返回0，否则返回需要等待的秒数"""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        elapsed = now - self._updated
+        self._updated = now
+        self.requests = min(self.request_capacity, self.requests + elapsed * self.request_rate)
+        self.tokens = min(self.token_capacity, self.tokens + elapsed * self.token_rate)
+        # 超过容量的请求等到桶满即放行，全额扣减后余额为负
+        needed = min(cost, self.token_capacity)
+        wait = 0.0
+        if self.requests < 1:
+            wait = max(wait, (1 - self.requests) / self.request_rate)
+        if self.tokens < needed:
+            wait = max(wait, (needed - self.tokens) / self.token_rate)
+        if wait == 0:
+            self.requests -= 1
+            self.tokens -= cost
+        return wait
+
+    def settle(self, delta: int):
+        self.tokens = min(self.token_capacity, self.tokens + delta)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class LLMDispatcher:
+    """按RPM/TPM配额调度模型请求
+
+    每次请求前估计token数，从按模型划分的请求数、token数两个令牌桶中扣减，
+    配额不足时等待到恢复为止。令牌桶保存在Redis中，由Lua脚本原子地检查和扣减，
+    analyze队列的所有prefork进程共享同一份配额；Redis不可用时退回进程内令牌桶。
+    同一进程最多 max_concurrency 个请求同时进行，其余在事件循环中排队。
+    未指定 max_tokens 时收到响应后按实际用量修正预估的token。
+    遇到429时按 Retry-After（没有时按带随机抖动的指数退避）暂停该模型的全部请求，
+    连接错误和5xx同样退避后重试。
+    """
+
+    def __init__(
+        self,
+        model: str,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None
+    ):
+        self.model = model
+        self.rpm = rpm or settings.LLM_RPM_LIMIT
+        self.tpm = tpm or settings.LLM_TPM_LIMIT
+        self.max_retries = settings.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.estimator = TokenEstimator(model)
+        self.local = LocalBudget(self.rpm, self.tpm)
+        self.semaphore = asyncio.Semaphore(max_concurrency or settings.LLM_MAX_CONCURRENCY)
+        self.budget_key = BUDGET_KEY.format(model=model)
+        self.pause_key = PAUSE_KEY.format(model=model)
+        self.stats = {'requests': 0, 'rate_limited': 0, 'retries': 0, 'failed': 0, 'throttled_seconds': 0.0}
+        self._scripts: Dict[str, Any] = {}
+        self._scripts_client = None
+
+    def _script(self, name: str, source: str):
+        """按当前Redis连接注册脚本（fork后连接会重建）"""
+        if self._scripts_client is not redisdb.client:
+            self._scripts = {}
+            self._scripts_client = redisdb.client
+        if name not in self._scripts:
+            self._scripts[name] = redisdb.client.register_script(source)
+        return self._scripts[name]
+
+    async def _wait_time(self, cost: int) -> float:
+        if redisdb.client is not None:
+            try:
+                wait_ms = await self._script('acquire', ACQUIRE_SCRIPT)(
+                    keys=[self.budget_key, self.pause_key],
+                    args=[self.rpm, self.tpm, cost, BURST_SECONDS * 1000]
+                )
+                return int(wait_ms) / 1000.0
+            except Exception as e:
+                logger.warning(f"Shared LLM budget unavailable, using the local budget: {e}")
+        return self.local.acquire(cost)
+
+    async def _acquire(self, cost: int):
+        """等待到配额足够并扣减"""
+        while True:
+            wait = await self._wait_time(cost)
+            if wait <= 0:
+                return
+            # 加少量抖动，避免多个等待者同时醒来争抢
+            wait *= 1 + random.random() * 0.1
+            self.stats['throttled_seconds'] += wait
+            await asyncio.sleep(wait)
+
+    async def _settle(self, estimated: int, actual: Optional[int]):
+        if actual is None or actual == estimated:
+            return
+        delta = estimated - actual
+        if redisdb.client is not None:
+            try:
+                await self._script('settle', SETTLE_SCRIPT)(keys=[self.budget_key], args=[delta])
+                return
+            except Exception as e:
+                logger.debug(f"Failed to settle LLM budget: {e}")
+        self.local.settle(delta)
+
+    async def _pause(self, seconds: float):
+        """429后暂停该模型的全部请求"""
+        if redisdb.client is not None:
+            try:
+                await redisdb.client.set(self.pause_key, 1, px=max(1, int(seconds * 1000)))
+                return
+            except Exception as e:
+                logger.debug(f"Failed to share LLM rate limit pause: {e}")
+        self.local.pause(seconds)
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        response = getattr(error, 'response', None)
+        if response is None:
+            return None
+        for header, scale in (('retry-after-ms', 0.001), ('retry-after', 1.0)):
+            value = response.headers.get(header)
+            if value:
+                try:
+                    return min(float(value) * scale, settings.LLM_BACKOFF_MAX)
+                except ValueError:
+                    continue
+        return None
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Retry-After 加抖动；没有时为全抖动指数退避"""
+        retry_after = self._retry_after(error)
+        if retry_after is not None:
+            return retry_after + random.uniform(0, settings.LLM_BACKOFF_BASE)
+        return random.uniform(0, min(settings.LLM_BACKOFF_MAX, settings.LLM_BACKOFF_BASE * 2 ** attempt))
+
+    async def create(self, client: openai.AsyncOpenAI, **kwargs) -> Any:
+        """在配额内调用 chat.completions.create，参数与之相同"""
+        cost = self.estimator.estimate(kwargs['messages'], kwargs.get('max_tokens'))
+        attempt = 0
+        while True:
+            async with self.semaphore:
+                await self._acquire(cost)
+                self.stats['requests'] += 1
+                try:
+                    response = await client.chat.completions.create(**kwargs)
+                except RETRYABLE_ERRORS as e:
+                    if attempt >= self.max_retries:
+                        self.stats['failed'] += 1
+                        raise
+                    delay = self._backoff(attempt, e)
+                    if isinstance(e, openai.RateLimitError):
+                        self.stats['rate_limited'] += 1
+                        await self._pause(delay)
+                    logger.info(f"LLM request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                else:
+                    # 指定了 max_tokens 时接口按它计入TPM，只有按默认值预估的才按实际用量修正
+                    if not kwargs.get('max_tokens') and response.usage is not None:
+                        await self._settle(cost, response.usage.total_tokens)
+                    return response
+            # 退避期间不占用并发名额
+            self.stats['retries'] += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+__all__ = ['LLMDispatcher', 'TokenEstimator', 'context_tokens', 'supports_json_mode']
@@ -0,0 +1,281 @@
+"""
+近似重复内容检测（SimHash + LSH）
+路径: /mnt/okcomputer/output/backend/workers/services/near_duplicate.py
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import unicodedata
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from pymongo import UpdateOne
+
+from app.config import settings
+from app.database.mongodb import mongodb
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_COLLECTION = 'content_fingerprints'
+
+SIMHASH_BITS = 64
+
+# 64位指纹分为4段，汉明距离不超过3的两个指纹至少有一段完全相同
+LSH_BANDS = 4
+BAND_BITS = SIMHASH_BITS // LSH_BANDS
+
+# 正文太短时指纹不可靠，不参与去重
+MIN_CONTENT_CHARS = 200
+
+# 按标点和空白切分子句
+CLAUSE_SPLIT_PATTERN = re.compile(r'[\s，。；：、！？,.;:!?()（）“”"\'《》【】\[\]<>—\-_/|·…]+')
+
+# 子句太少时改用字符n-gram
+MIN_CLAUSES = 8
+SHINGLE_SIZE = 5
+
+
+def normalize_content(content: str) -> str:
+    """全角转半角、统一大小写"""
+    return unicodedata.normalize('NFKC', content or '').lower()
+
+
+def _features(text: str) -> List[Tuple[str, int]]:
+    """提取 (特征, 权重)
+
+    政府公文转载时正文基本一致，只是页眉页脚、排版不同。以子句为特征、子句长度
+    为权重，计算量比逐字shingle小一个数量级；子句很少的正文退回字符n-gram。
+    """
+    clauses = [clause for clause in CLAUSE_SPLIT_PATTERN.split(text) if len(clause) >= 4]
+    if len(clauses) >= MIN_CLAUSES:
+        return [(clause, len(clause)) for clause in clauses]
+
+    compact = CLAUSE_SPLIT_PATTERN.sub('', text)
+    return [(compact[i:i + SHINGLE_SIZE], 1) for i in range(max(1, len(compact) - SHINGLE_SIZE + 1))]
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def simhash(content: str) -> Optional[int]:
+    """计算正文的64位SimHash，正文过短时返回None"""
+    text = normalize_content(content)
+    if len(text) < MIN_CONTENT_CHARS:
+        return None
+
+    weights = [0] * SIMHASH_BITS
+    for feature, weight in _features(text):
+        value = _feature_hash(feature)
+        for bit in range(SIMHASH_BITS):
+            if value >> bit & 1:
+                weights[bit] += weight
+            else:
+                weights[bit] -= weight
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def lsh_bands(fingerprint: int) -> List[str]:
+    """LSH分段键，带段号避免不同段的值相互碰撞"""
+    mask = (1 << BAND_BITS) - 1
+    return [f"{band}:{fingerprint >> (band * BAND_BITS) & mask:04x}" for band in range(LSH_BANDS)]
+
+
+def _to_int64(value: int) -> int:
+    """MongoDB只支持有符号64位整数"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _from_int64(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+def fingerprint_content(content: str) -> Optional[int]:
+    """按MongoDB存储格式返回正文指纹"""
+    fingerprint = simhash(content)
+    return None if fingerprint is None else _to_int64(fingerprint)
+
+
+def fingerprint_contents(contents: List[str]) -> List[Optional[int]]:
+    """批量计算正文指纹，供工作池一次执行"""
+    return [fingerprint_content(content) for content in contents]
+
+
+def _host(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+
+class NearDuplicateIndex:
+    """保存时检测近似重复文档
+
+    每个文档的SimHash和4个LSH分段键存入 content_fingerprints，分段键建多键索引。
+    一批结果只查询一次候选（分段键 $in），在内存中比较汉明距离；距离不超过阈值的
+    文档标记为 duplicate 并指向最早入库的规范文档，不再进入清洗和解读流程。
+    同一批内的互相转载也能识别。
+
+    只识别跨站转载：同一主机的页面共用很长的页眉页脚和栏目模板，正文较短的
+    不同通知指纹也会很接近，因此候选文档或其规范文档与当前页面同主机时跳过。
+    """
+
+    def __init__(self, max_distance: Optional[int] = None):
+        self.max_distance = settings.CRAWL_DEDUP_DISTANCE if max_distance is None else max_distance
+        self.stats = {'checked': 0, 'duplicates': 0}
+
+    @staticmethod
+    def _collection():
+        return mongodb.get_collection(FINGERPRINT_COLLECTION)
+
+    async def annotate(
+        self,
+        results: List[Dict[str, Any]],
+        category: str = 'policy',
+        parse_pool: Optional[Any] = None
+    ) -> int:
+        """为结果计算指纹并标记重复，返回本批重复数
+
+        解析池中已算好的指纹直接使用；其余（如内联解析的页面）在 parse_pool（ParsePool）中
+        批量计算，未传入时在线程池中计算，不占用事件循环。
+        """
+        missing = [index for index, result in enumerate(results) if result.get('simhash') is None]
+        if missing:
+            contents = [results[index].get('content', '') for index in missing]
+            if parse_pool is not None:
+                computed = await parse_pool.run(fingerprint_contents, contents)
+            else:
+                computed = await asyncio.get_running_loop().run_in_executor(None, fingerprint_contents, contents)
+            for index, fingerprint in zip(missing, computed):
+                if fingerprint is not None:
+                    results[index]['simhash'] = fingerprint
+
+        fingerprints: Dict[int, int] = {
+            index: _from_int64(result['simhash'])
+            for index, result in enumerate(results)
+            if result.get('simhash') is not None
+        }
+        if not fingerprints:
+            return 0
+
+        try:
+            candidates = await self._candidates(fingerprints.values(), category)
+        except Exception as e:
+            logger.warning(f"Near-duplicate lookup failed, saving without dedup: {e}")
+            return 0
+
+        # 本批已确认的规范文档也加入候选，识别同批转载
+        batch_canonicals: List[Tuple[int, str]] = []
+        operations = []
+        duplicates = 0
+        now = datetime.utcnow()
+
+        for index, fingerprint in fingerprints.items():
+            result = results[index]
+            url = result['url']
+            canonical = self._match(fingerprint, url, candidates, batch_canonicals)
+            self.stats['checked'] += 1
+
+            if canonical:
+                result['duplicate_of'] = canonical
+                result['status'] = 'duplicate'
+                duplicates += 1
+            else:
+                result['duplicate_of'] = None
+                batch_canonicals.append((fingerprint, url))
+
+            operations.append(UpdateOne(
+                {'url': url},
+                {
+                    '$set': {
+                        'simhash': _to_int64(fingerprint),
+                        'bands': lsh_bands(fingerprint),
+                        'category': category,
+                        'canonical_url': canonical or url,
+                        'updated_at': now,
+                    },
+                    '$setOnInsert': {'created_at': now},
+                },
+                upsert=True
+            ))
+
+        try:
+            await self._collection().bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.warning(f"Failed to store content fingerprints: {e}")
+
+        self.stats['duplicates'] += duplicates
+        if duplicates:
+            logger.info(f"Marked {duplicates} of {len(fingerprints)} pages as near-duplicates")
+        return duplicates
+
+    async def _candidates(self, fingerprints, category: str) -> List[Tuple[int, str, str]]:
+        """一次查询取回与本批任一指纹有相同分段的已有文档"""
+        bands = sorted({band for fingerprint in fingerprints for band in lsh_bands(fingerprint)})
+        candidates = []
+        cursor = self._collection().find(
+            {'bands': {'$in': bands}, 'category': category},
+            {'url': 1, 'simhash': 1, 'canonical_url': 1}
+        )
+        async for doc in cursor:
+            candidates.append((_from_int64(doc['simhash']), doc['url'], doc.get('canonical_url') or doc['url']))
+        return candidates
+
+    def _match(
+        self,
+        fingerprint: int,
+        url: str,
+        candidates: List[Tuple[int, str, str]],
+        batch_canonicals: List[Tuple[int, str]]
+    ) -> Optional[str]:
+        """找到距离最近的其他站点的规范文档URL"""
+        host = _host(url)
+        best: Optional[Tuple[int, str]] = None
+        for other, other_url, canonical_url in candidates:
+            # 同一URL重新采集不算重复；指向自身的规范文档也跳过
+            if other_url == url or canonical_url == url:
+                continue
+            if _host(other_url) == host or _host(canonical_url) == host:
+                continue
+            distance = hamming_distance(fingerprint, other)
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, canonical_url)
+        for other, other_url in batch_canonicals:
+            if _host(other_url) == host:
+                continue
+            distance = hamming_distance(fingerprint, other)
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, other_url)
+        return best[1] if best else None
+
+
+async def link_duplicates(results: List[Dict[str, Any]], collection) -> None:
+    """在规范文档上记录转载它的URL"""
+    operations = [
+        UpdateOne({'url': result['duplicate_of']}, {'$addToSet': {'duplicate_urls': result['url']}})
+        for result in results
+        if result.get('duplicate_of')
+    ]
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+
+
+__all__ = [
+    'NearDuplicateIndex',
+    'fingerprint_content',
+    'fingerprint_contents',
+    'hamming_distance',
+    'link_duplicates',
+    'lsh_bands',
+    'normalize_content',
+    'simhash',
+]
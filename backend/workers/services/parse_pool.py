@@ -0,0 +1,175 @@
+"""
+HTML解析进程池
+路径: /mnt/okcomputer/output/backend/workers/services/parse_pool.py
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from app.config import settings
+from .attachments import extract_attachment
+from .extraction import ExtractionEngine, get_engine
+from .near_duplicate import fingerprint_content
+
+logger = logging.getLogger(__name__)
+
+# 子进程内复用的提取引擎
+_worker_engine: Optional[ExtractionEngine] = None
+
+
+def _extract_in_worker(html: str, config: Dict[str, Any], backend: str) -> Dict[str, Any]:
+    """在池内执行提取，每个子进程只创建一次引擎（选择器编译缓存随之保留）
+
+    正文指纹也在池内计算，避免占用事件循环。
+    """
+    global _worker_engine
+    if _worker_engine is None or _worker_engine.name != backend:
+        _worker_engine = get_engine(backend)
+    extracted = _worker_engine.extract(html, config)
+    if settings.CRAWL_DEDUP_ENABLED:
+        extracted['simhash'] = fingerprint_content(extracted['content'])
+    return extracted
+
+
+def _extract_attachment_in_worker(path: str, hint: Optional[str]) -> Dict[str, Any]:
+    """在池内提取附件文本，同时计算正文指纹"""
+    extracted = extract_attachment(path, hint)
+    if settings.CRAWL_DEDUP_ENABLED:
+        extracted['simhash'] = fingerprint_content(extracted['content'])
+    return extracted
+
+
+if sys.platform != 'win32':
+    class _DaemonParentForkProcess(multiprocessing.context.ForkProcess):
+        """允许守护进程创建子进程的 fork 进程
+
+        multiprocessing 禁止守护进程创建子进程（防止父进程退出后子进程成为孤儿），
+        Celery prefork 的子进程正是守护进程。启动期间临时去掉当前进程的 daemon 标记；
+        创建出的子进程继承该标记，仍是守护进程，不会再派生下一级进程。
+        """
+
+        def start(self):
+            config = multiprocessing.current_process()._config
+            daemon = config.pop('daemon', None)
+            try:
+                super().start()
+            finally:
+                if daemon is not None:
+                    config['daemon'] = daemon
+
+    class _DaemonParentForkContext(multiprocessing.context.ForkContext):
+        Process = _DaemonParentForkProcess
+
+
+def create_process_executor(workers: int, thread_name_prefix: str = 'parse') -> Executor:
+    """创建进程池，在 Celery prefork 子进程（守护进程）中同样可用
+
+    守护进程中改用允许创建子进程的 fork 上下文；子进程靠所在 worker 进程退出时
+    关闭进程池回收（worker_process_shutdown 信号）。平台不支持 fork 时才退化为线程池，
+    并记录警告，因为此时解析与采集共用一个 GIL。
+    """
+    if not multiprocessing.current_process().daemon:
+        return ProcessPoolExecutor(max_workers=workers)
+    if sys.platform != 'win32':
+        return ProcessPoolExecutor(max_workers=workers, mp_context=_DaemonParentForkContext())
+
+    logger.warning(
+        "Running inside a daemonic worker without fork support, falling back to a thread pool; "
+        "CPU-bound parsing will share the GIL with the event loop"
+    )
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=thread_name_prefix)
+
+
+class ParsePool:
+    """把HTML解析从事件循环移到独立的工作池
+
+    采集协程只负责I/O，页面体和落盘的附件交给进程池解析。池内（排队+执行）任务数不超过
+    max_pending，超出时提交方等待，采集协程随之暂停取新URL，形成背压。
+    Celery prefork 的子进程是守护进程，进程池由 create_process_executor 创建，照样使用多核。
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        backend: Optional[str] = None,
+        mode: Optional[str] = None
+    ):
+        self.workers = workers or settings.CRAWL_PARSE_WORKERS or os.cpu_count() or 1
+        self.max_pending = max_pending or settings.CRAWL_PARSE_QUEUE_SIZE or self.workers * 2
+        self.backend = backend or get_engine().name
+        self.mode = mode or settings.CRAWL_PARSE_MODE
+        self.executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._restart_lock = threading.Lock()
+
+    def start(self) -> 'ParsePool':
+        """创建工作池"""
+        if self.executor is not None:
+            return self
+
+        if self.mode == 'process':
+            self.executor = create_process_executor(self.workers)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='parse')
+
+        logger.info(f"Parse pool started: {self.mode} x {self.workers}, max pending {self.max_pending}")
+        return self
+
+    def close(self, wait: bool = False):
+        """关闭工作池
+
+        worker 进程退出前应传 wait=True，等子进程退出后再返回，避免留下孤儿进程。
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=True)
+            self.executor = None
+
+    def _restart(self, broken: Executor):
+        """替换已损坏的进程池
+
+        同一个池损坏时，池内所有在途任务都会收到 BrokenProcessPool，只有第一个
+        重建，其余直接使用新池。损坏池的任务已全部失败，关闭时不取消其他任务。
+        """
+        with self._restart_lock:
+            if self.executor is not broken:
+                return
+            logger.error("Parse pool broken, restarting")
+            broken.shutdown(wait=False)
+            self.executor = None
+            self.start()
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        """在池中执行任意解析函数（需可序列化），池满时等待空位"""
+        if self.executor is None:
+            self.start()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            executor = self.executor
+            try:
+                return await loop.run_in_executor(executor, func, *args)
+            except BrokenProcessPool:
+                # 子进程异常退出（如OOM），重建进程池后重试一次；再次失败说明是该任务本身导致，交给调用方
+                self._restart(executor)
+                return await loop.run_in_executor(self.executor, func, *args)
+
+    async def extract(self, html: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        """提交页面解析"""
+        return await self.run(_extract_in_worker, html, config, self.backend)
+
+    async def extract_attachment(self, path: str, hint: Optional[str] = None) -> Dict[str, Any]:
+        """提交附件文本提取，附件已落盘，只传递文件路径"""
+        return await self.run(_extract_attachment_in_worker, path, hint)
+
+
+__all__ = ['ParsePool', 'create_process_executor']
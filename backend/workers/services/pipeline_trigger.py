@@ -0,0 +1,329 @@
+"""
+清洗/分析流水线的事件触发
+路径: /mnt/okcomputer/output/backend/workers/services/pipeline_trigger.py
+"""
+
+import logging
+import math
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import redis
+from bson import json_util
+from celery import current_app
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.config import settings
+from app.database.redis import redisdb
+from .work_leases import STAGES
+
+logger = logging.getLogger(__name__)
+
+# 单机MongoDB不支持变更流时，写入方通过Redis流通知
+EVENTS_STREAM = 'pipeline:events'
+STREAM_MAXLEN = 10000
+
+# 同一时间只有一个节点运行触发器
+LEADER_KEY = 'pipeline:trigger:leader'
+# 变更流的恢复token / Redis流已读到的位置，触发器重启后从这里继续
+RESUME_KEY = 'pipeline:trigger:resume'
+STREAM_POSITION_KEY = 'pipeline:trigger:stream_id'
+
+# 各阶段触发的任务和队列，与beat定时任务一致；beat保留为兜底的定时扫描。
+# 只派发worker中已注册的任务
+STAGE_TASKS = {
+    'clean': ('workers.tasks.clean_tasks.scheduled_clean', 'clean'),
+    'analyze': ('workers.tasks.analyze_tasks.scheduled_analyze', 'analyze'),
+}
+
+# 变更流不受支持（单机部署）时的错误码
+CHANGE_STREAM_UNSUPPORTED = (40573, 40324)
+
+# 等待新事件的最长阻塞时间(毫秒)，决定攒批超时的检查精度
+POLL_MS = 200
+
+# 各集合所属阶段及表示“待处理”的字段
+WATCHED = {
+    collection: (stage, status_field)
+    for stage, collections in STAGES.items()
+    for collection, status_field in collections
+}
+
+
+def stage_registered(stage: str) -> bool:
+    """阶段的处理任务是否已在当前Celery应用中注册
+
+    worker 启动时导入 include 中的全部任务模块，与各节点代码一致；
+    未注册（如清洗任务模块不存在）时该阶段的事件不会被任何节点消费。
+    """
+    task = STAGE_TASKS.get(stage)
+    return task is not None and task[0] in current_app.tasks
+
+
+async def publish_pending(stage: str, count: int = 1):
+    """通知触发器有新的待处理文档（Redis流方式），Redis未连接或阶段无人处理时忽略"""
+    if (
+        count <= 0
+        or not settings.PIPELINE_TRIGGER_ENABLED
+        or settings.PIPELINE_TRIGGER_MODE == 'change_stream'
+        or redisdb.client is None
+        or not stage_registered(stage)
+    ):
+        return
+    try:
+        await redisdb.client.xadd(
+            EVENTS_STREAM, {'stage': stage, 'count': count}, maxlen=STREAM_MAXLEN, approximate=True
+        )
+    except Exception as e:
+        logger.warning(f"Failed to publish pipeline event: {e}")
+
+
+def change_pipeline() -> list:
+    """变更流过滤条件：新插入的文档，或状态被重新置为pending的文档"""
+    return [
+        {'$match': {
+            'ns.coll': {'$in': list(WATCHED)},
+            '$or': [
+                {'operationType': 'insert'},
+                {'updateDescription.updatedFields.status': 'pending'},
+                {'updateDescription.updatedFields.analysis_status': 'pending'},
+            ],
+        }},
+        {'$project': {
+            'ns': 1,
+            'operationType': 1,
+            'fullDocument.status': 1,
+            'fullDocument.analysis_status': 1,
+        }},
+    ]
+
+
+def stage_for_change(change: Dict[str, Any]) -> Optional[str]:
+    """变更事件对应的处理阶段，不需要处理时返回None"""
+    watched = WATCHED.get(change.get('ns', {}).get('coll'))
+    if watched is None:
+        return None
+    stage, status_field = watched
+    if change.get('operationType') != 'insert':
+        return stage
+    # 插入时已标记为duplicate等状态的文档不进入处理
+    status = (change.get('fullDocument') or {}).get(status_field)
+    return stage if status in (None, 'pending') else None
+
+
+class MicroBatcher:
+    """按阶段攒批：攒够一个认领批次，或第一条事件等待超过 wait 秒即派发"""
+
+    def __init__(self, batch_size: Optional[int] = None, wait: Optional[float] = None):
+        self.batch_size = batch_size or settings.PIPELINE_BATCH_SIZE
+        self.wait = settings.PIPELINE_TRIGGER_WAIT if wait is None else wait
+        self.counts: Dict[str, int] = {}
+        self.first_at: Dict[str, float] = {}
+
+    def add(self, stage: str, count: int = 1, now: Optional[float] = None):
+        self.counts[stage] = self.counts.get(stage, 0) + count
+        self.first_at.setdefault(stage, time.monotonic() if now is None else now)
+
+    def due(self, now: Optional[float] = None) -> Dict[str, int]:
+        """取出到期的批次"""
+        now = time.monotonic() if now is None else now
+        ready = {
+            stage: count for stage, count in self.counts.items()
+            if count >= self.batch_size or now - self.first_at[stage] >= self.wait
+        }
+        for stage in ready:
+            del self.counts[stage]
+            del self.first_at[stage]
+        return ready
+
+    def timeout(self, now: Optional[float] = None) -> float:
+        """距最早一个批次到期的秒数，没有待派发批次时为 wait"""
+        if not self.first_at:
+            return self.wait
+        now = time.monotonic() if now is None else now
+        return max(0.0, min(self.first_at.values()) + self.wait - now)
+
+
+class PipelineTrigger:
+    """新文档入库后立即派发清洗/分析任务，替代按固定间隔轮询
+
+    在worker主进程的后台线程中运行，通过Redis锁选出唯一的运行节点。
+    副本集部署时监听数据库变更流（raw_pages/raw_bids 的新文档触发清洗，
+    cleaned_docs 的新文档触发分析），单机MongoDB不支持变更流时改读
+    采集和清洗写入方发布的Redis流。事件按阶段攒批后派发 ceil(文档数/认领批量)
+    个任务，任务通过租约认领文档，重复派发不会重复处理。
+    成为运行节点时先检查一次积压，补上停机期间错过的事件。
+    只触发任务已在本worker注册的阶段，一个都没有时不启动。
+    """
+
+    def __init__(self, app, hostname: str, mode: Optional[str] = None):
+        self.app = app
+        self.hostname = hostname
+        self.mode = mode or settings.PIPELINE_TRIGGER_MODE
+        self.lease_ttl = max(10, int(settings.PIPELINE_TRIGGER_WAIT * 10))
+        self.batcher = MicroBatcher()
+        self.stage_tasks = {
+            stage: (task, queue) for stage, (task, queue) in STAGE_TASKS.items() if task in app.tasks
+        }
+        self.dispatched = {stage: 0 for stage in self.stage_tasks}
+        self._redis_client: Optional[redis.Redis] = None
+        self._mongo_client: Optional[MongoClient] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._renewed_at = 0.0
+
+    def start(self):
+        if not self.stage_tasks:
+            logger.warning("No clean/analyze tasks are registered, pipeline trigger not started")
+            return
+        for stage in STAGE_TASKS.keys() - self.stage_tasks.keys():
+            logger.warning(f"Task {STAGE_TASKS[stage][0]} is not registered, {stage} stage will not be triggered")
+        self._thread = threading.Thread(target=self._run, name='pipeline-trigger', daemon=True)
+        self._thread.start()
+        logger.info(f"Pipeline trigger started on {self.hostname} ({self.mode})")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.lease_ttl)
+        try:
+            if self._redis().get(LEADER_KEY) == self.hostname:
+                self._redis().delete(LEADER_KEY)
+        except Exception as e:
+            logger.warning(f"Failed to release pipeline trigger leadership: {e}")
+        if self._mongo_client is not None:
+            self._mongo_client.close()
+
+    def _redis(self) -> redis.Redis:
+        if self._redis_client is None:
+            self._redis_client = redis.Redis.from_url(settings.REDIS_URL, db=settings.REDIS_DB, decode_responses=True)
+        return self._redis_client
+
+    def _database(self):
+        if self._mongo_client is None:
+            self._mongo_client = MongoClient(settings.MONGODB_URL)
+        return self._mongo_client[settings.MONGODB_DATABASE]
+
+    # 选主
+    def _acquire(self) -> bool:
+        acquired = self._redis().set(LEADER_KEY, self.hostname, nx=True, ex=self.lease_ttl)
+        if acquired or self._redis().get(LEADER_KEY) == self.hostname:
+            self._renewed_at = time.monotonic()
+            return True
+        return False
+
+    def _still_leader(self) -> bool:
+        """每隔租期的三分之一续期一次，锁被他人持有时让出"""
+        if time.monotonic() - self._renewed_at < self.lease_ttl / 3:
+            return True
+        if self._redis().get(LEADER_KEY) != self.hostname:
+            return False
+        self._redis().expire(LEADER_KEY, self.lease_ttl)
+        self._renewed_at = time.monotonic()
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if not self._acquire():
+                    self._stop.wait(self.lease_ttl / 2)
+                    continue
+                logger.info(f"{self.hostname} is now the pipeline trigger")
+                self._catch_up()
+                if self.mode != 'redis' and self._watch_changes():
+                    continue
+                self._consume_stream()
+            except Exception as e:
+                logger.error(f"Pipeline trigger error: {e}")
+                self._stop.wait(self.lease_ttl / 2)
+
+    # 派发
+    def _catch_up(self):
+        """成为运行节点时派发已积压的待处理文档"""
+        database = self._database()
+        for collection, (stage, status_field) in WATCHED.items():
+            if stage not in self.stage_tasks:
+                continue
+            ready = [None, 'pending'] if stage == 'analyze' else ['pending']
+            pending = database[collection].count_documents(
+                {status_field: {'$in': ready}},
+                limit=settings.PIPELINE_BATCH_SIZE * settings.PIPELINE_TRIGGER_MAX_TASKS
+            )
+            if pending:
+                self.batcher.add(stage, pending, now=float('-inf'))
+        self._flush()
+
+    def _flush(self) -> bool:
+        """派发到期的批次，返回是否有派发"""
+        due = self.batcher.due()
+        for stage, count in due.items():
+            task, queue = self.stage_tasks[stage]
+            tasks = min(settings.PIPELINE_TRIGGER_MAX_TASKS, math.ceil(count / settings.PIPELINE_BATCH_SIZE))
+            for _ in range(tasks):
+                self.app.send_task(task, queue=queue)
+            self.dispatched[stage] += tasks
+            logger.info(f"Dispatched {tasks} {stage} tasks for {count} new documents")
+        return bool(due)
+
+    # 变更流
+    def _watch_changes(self) -> bool:
+        """监听变更流直到失去运行资格或停止，不支持变更流时返回False"""
+        resume_token = self._load_resume_token()
+        try:
+            with self._database().watch(
+                change_pipeline(),
+                resume_after=resume_token,
+                max_await_time_ms=POLL_MS
+            ) as stream:
+                while not self._stop.is_set() and self._still_leader():
+                    change = stream.try_next()
+                    if change is not None:
+                        stage = stage_for_change(change)
+                        if stage in self.stage_tasks:
+                            self.batcher.add(stage)
+                    # 派发后或空闲时记下恢复点，重启后不重复派发
+                    if (self._flush() or change is None) and stream.resume_token is not None:
+                        self._redis().set(RESUME_KEY, json_util.dumps(stream.resume_token))
+            return True
+        except OperationFailure as e:
+            if e.code in CHANGE_STREAM_UNSUPPORTED or 'replica set' in str(e):
+                logger.warning("MongoDB change streams unavailable, falling back to the Redis event stream")
+                self.mode = 'redis'
+                return False
+            if resume_token is not None:
+                # 恢复点已超出oplog范围，从当前位置重新开始（积压由下一轮 catch-up 补上）
+                logger.warning(f"Cannot resume change stream, starting over: {e}")
+                self._redis().delete(RESUME_KEY)
+                return True
+            raise
+        except PyMongoError as e:
+            logger.error(f"Change stream interrupted: {e}")
+            return True
+
+    def _load_resume_token(self) -> Optional[Dict[str, Any]]:
+        encoded = self._redis().get(RESUME_KEY)
+        return json_util.loads(encoded) if encoded else None
+
+    # Redis流
+    def _consume_stream(self):
+        client = self._redis()
+        position = client.get(STREAM_POSITION_KEY)
+        if position is None:
+            # 首次运行从流的当前末尾开始，之前的积压已由 catch-up 派发
+            last = client.xrevrange(EVENTS_STREAM, count=1)
+            position = last[0][0] if last else '0-0'
+        while not self._stop.is_set() and self._still_leader():
+            block = max(1, min(POLL_MS, int(self.batcher.timeout() * 1000)))
+            entries = client.xread({EVENTS_STREAM: position}, count=500, block=block)
+            for _, messages in entries or []:
+                for message_id, fields in messages:
+                    position = message_id
+                    if fields.get('stage') in self.stage_tasks:
+                        self.batcher.add(fields['stage'], int(fields.get('count', 1)))
+            if self._flush() or not entries:
+                client.set(STREAM_POSITION_KEY, position)
+
+
+__all__ = ['MicroBatcher', 'PipelineTrigger', 'publish_pending', 'stage_for_change', 'stage_registered']
@@ -0,0 +1,215 @@
+"""
+按主机自适应限速
+路径: /mnt/okcomputer/output/backend/workers/services/rate_limiter.py
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import aiohttp
+
+from app.config import settings
+from app.database.redis import redisdb
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'PolicyPulse-Bot'
+
+# 响应慢于该值时不再提速（秒）
+SLOW_RESPONSE_SECONDS = 3.0
+
+# 每次健康响应增加的速率（次/秒）
+RATE_INCREASE_STEP = 0.1
+
+# 触发退避的状态码
+BACKOFF_STATUSES = frozenset([429, 503])
+
+# robots.txt 需要认证时视为全站禁止采集
+ROBOTS_DISALLOW_ALL = 'User-agent: *\nDisallow: /\n'
+
+
+class HostState:
+    """单个主机的限速状态"""
+
+    __slots__ = ('rate', 'next_allowed', 'robots', 'robots_expires', 'crawl_delay')
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.next_allowed = 0.0
+        self.robots: Optional[RobotFileParser] = None
+        self.robots_expires = 0.0
+        self.crawl_delay: Optional[float] = None
+
+
+class HostRateLimiter:
+    """按主机的AIMD限速器
+
+    每个主机从 CRAWL_DELAY 对应的速率起步，健康且响应快时线性提速，
+    直到 CRAWL_MAX_RATE_PER_HOST；遇到429/503/超时速率减半，
+    并遵守 Retry-After。robots.txt 的 Crawl-delay 作为间隔下限，
+    robots.txt 本身按主机缓存在进程内和Redis中，进程内的副本与Redis同时过期。
+
+    worker 进程内所有采集任务共用一个实例（见 AsyncRuntime.get_rate_limiter），
+    同一主机的速率和退避状态跨任务保留，并发任务也不会各自按满速请求同一主机。
+    """
+
+    def __init__(
+        self,
+        default_delay: Optional[float] = None,
+        max_rate: Optional[float] = None,
+        max_backoff: Optional[float] = None,
+        respect_robots: Optional[bool] = None
+    ):
+        self.default_rate = 1.0 / max(default_delay or settings.CRAWL_DELAY, 0.001)
+        self.max_rate = max_rate or settings.CRAWL_MAX_RATE_PER_HOST
+        self.min_rate = 1.0 / (max_backoff or settings.CRAWL_MAX_BACKOFF)
+        self.respect_robots = settings.CRAWL_RESPECT_ROBOTS if respect_robots is None else respect_robots
+        self.hosts: Dict[str, HostState] = {}
+        self._robots_tasks: Dict[str, asyncio.Task] = {}
+
+    def _state(self, host: str) -> HostState:
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = HostState(min(self.default_rate, self.max_rate))
+        return state
+
+    def interval(self, host: str) -> float:
+        """主机当前的请求间隔"""
+        state = self._state(host)
+        interval = 1.0 / state.rate
+        if state.crawl_delay:
+            interval = max(interval, state.crawl_delay)
+        return interval
+
+    def delay_for(self, host: str) -> float:
+        """距离该主机下一次请求应等待的时间"""
+        state = self._state(host)
+        return max(self.interval(host), state.next_allowed - time.monotonic())
+
+    async def wait(self, url: str):
+        """等待并占用主机的下一个请求时间点"""
+        host = urlparse(url).netloc.lower()
+        state = self._state(host)
+        now = time.monotonic()
+        start = max(now, state.next_allowed)
+        state.next_allowed = start + self.interval(host)
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def record(
+        self,
+        host: str,
+        status: Optional[int] = None,
+        elapsed: Optional[float] = None,
+        retry_after: Optional[str] = None
+    ):
+        """根据一次请求的结果调整速率，status为None表示超时或连接错误"""
+        state = self._state(host)
+
+        if status is None or status in BACKOFF_STATUSES:
+            state.rate = max(self.min_rate, state.rate / 2)
+            pause = self._parse_retry_after(retry_after)
+            if pause:
+                state.next_allowed = max(state.next_allowed, time.monotonic() + pause)
+            logger.info(f"Backing off {host}: {1.0 / state.rate:.1f}s interval")
+        elif status < 500 and (elapsed is None or elapsed < SLOW_RESPONSE_SECONDS):
+            state.rate = min(self.max_rate, state.rate + RATE_INCREASE_STEP)
+
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+        if not value:
+            return None
+        try:
+            return min(float(value), settings.CRAWL_MAX_BACKOFF)
+        except ValueError:
+            return None
+
+    # robots.txt
+    async def ensure_robots(self, url: str, session: aiohttp.ClientSession):
+        """访问主机前加载robots.txt，缓存过期前同一主机只加载一次"""
+        if not self.respect_robots:
+            return
+
+        parsed = urlparse(url)
+        host = parsed.netloc.lower()
+        state = self._state(host)
+        if state.robots is not None and time.monotonic() < state.robots_expires:
+            return
+
+        task = self._robots_tasks.get(host)
+        if task is None:
+            task = self._robots_tasks[host] = asyncio.ensure_future(
+                self._load_robots(f"{parsed.scheme}://{parsed.netloc}", host, session)
+            )
+        try:
+            await task
+        finally:
+            # 加载结束（含失败）后移除，过期或出错时下次重新加载
+            if self._robots_tasks.get(host) is task:
+                del self._robots_tasks[host]
+
+    def can_fetch(self, url: str) -> bool:
+        """robots.txt 是否允许采集"""
+        state = self.hosts.get(urlparse(url).netloc.lower())
+        if not self.respect_robots or state is None or state.robots is None:
+            return True
+        return state.robots.can_fetch(USER_AGENT, url)
+
+    def robots_for(self, url: str) -> Optional[RobotFileParser]:
+        """已加载的robots.txt解析结果"""
+        state = self.hosts.get(urlparse(url).netloc.lower())
+        return state.robots if state else None
+
+    async def _load_robots(self, base_url: str, host: str, session: aiohttp.ClientSession):
+        cache_key = f"robots:{host}"
+        text = await redisdb.get(cache_key) if redisdb.client is not None else None
+
+        if text is None:
+            text, ttl = await self._fetch_robots(base_url, host, session)
+            if redisdb.client is not None:
+                await redisdb.set(cache_key, text, ex=ttl)
+        else:
+            # 沿用Redis中的剩余时间，各进程的副本同时过期
+            ttl = await redisdb.ttl(cache_key)
+            if ttl <= 0:
+                ttl = settings.CRAWL_ROBOTS_ERROR_TTL
+
+        robots = RobotFileParser()
+        robots.parse(text.splitlines())
+
+        state = self._state(host)
+        state.robots = robots
+        state.robots_expires = time.monotonic() + ttl
+        crawl_delay = robots.crawl_delay(USER_AGENT)
+        state.crawl_delay = float(crawl_delay) if crawl_delay else None
+        if crawl_delay:
+            logger.info(f"robots.txt Crawl-delay for {host}: {crawl_delay}s")
+
+    @staticmethod
+    async def _fetch_robots(base_url: str, host: str, session: aiohttp.ClientSession) -> Tuple[str, int]:
+        """下载robots.txt，返回 (内容, 缓存时间)
+
+        401/403 按全站禁止处理，其他4xx视为没有robots.txt；超时、连接错误和5xx
+        本次按允许采集处理，只短时间缓存，避免一次故障让整个缓存期都不受约束。
+        """
+        try:
+            timeout = aiohttp.ClientTimeout(total=10)
+            async with session.get(f"{base_url}/robots.txt", timeout=timeout) as response:
+                if response.status == 200:
+                    return await response.text(errors='replace'), settings.CRAWL_ROBOTS_TTL
+                if response.status in (401, 403):
+                    logger.info(f"robots.txt for {host} returned {response.status}, treating host as disallowed")
+                    return ROBOTS_DISALLOW_ALL, settings.CRAWL_ROBOTS_TTL
+                if response.status < 500:
+                    return '', settings.CRAWL_ROBOTS_TTL
+                logger.info(f"robots.txt for {host} returned {response.status}")
+        except Exception as e:
+            logger.info(f"Failed to fetch robots.txt for {host}: {e}")
+        return '', settings.CRAWL_ROBOTS_ERROR_TTL
+
+
+__all__ = ['HostRateLimiter']
@@ -0,0 +1,252 @@
+"""
+基于归档的批量重新提取
+路径: /mnt/okcomputer/output/backend/workers/services/reextraction.py
+"""
+
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from app.config import settings
+from app.database.mongodb import mongodb
+from .extraction import get_engine
+from .html_archive import ArchiveError, archive_dir, parse_record, segment_node
+from .parse_pool import create_process_executor
+from .response_reader import decode_html
+from .revalidation import collection_for
+from .site_profile import SiteProfileCache
+
+logger = logging.getLogger(__name__)
+
+# 重新提取后覆盖的字段
+EXTRACTED_FIELDS = ('title', 'content', 'publish_date', 'metadata')
+
+# 每个工作任务处理的记录数（同一段文件内按偏移排序，顺序读）
+CHUNK_SIZE = 200
+
+
+def _reextract_chunk(
+    directory: str,
+    segment: str,
+    entries: List[Tuple[str, int, int]],
+    configs: Dict[str, Dict[str, Any]],
+    site_ids: List[str],
+    backend: str
+) -> Tuple[List[Tuple[str, Dict[str, Any]]], int]:
+    """在工作进程中读取并解析一个段文件里的一批记录
+
+    entries 为 (url, offset, length)，site_ids 与之一一对应。
+    返回 (url, 提取结果) 列表和失败数。
+    """
+    engine = get_engine(backend)
+    results = []
+    failed = 0
+
+    with open(os.path.join(directory, segment), 'rb') as f:
+        for (url, offset, length), site_id in zip(entries, site_ids):
+            try:
+                f.seek(offset)
+                meta, body = parse_record(f.read(length))
+                if meta.get('url') != url:
+                    raise ArchiveError(f"Archive record at {segment}:{offset} belongs to {meta.get('url')}")
+                html, _ = decode_html(body, meta.get('content_type'))
+                extracted = engine.extract(html, configs[site_id])
+                results.append((url, {field: extracted[field] for field in EXTRACTED_FIELDS}))
+            except Exception as e:
+                failed += 1
+                logger.warning(f"Failed to re-extract {url}: {e}")
+
+    return results, failed
+
+
+def _archive_query(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    site_ids: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """[since, until) 内采集且带归档指针的文档"""
+    query: Dict[str, Any] = {'archive': {'$exists': True}}
+    date_range = {}
+    if since:
+        date_range['$gte'] = since
+    if until:
+        date_range['$lt'] = until
+    if date_range:
+        query['crawl_date'] = date_range
+    if site_ids:
+        query['archive.site_id'] = {'$in': [str(site_id) for site_id in site_ids]}
+    return query
+
+
+def _pointer_node(pointer: Dict[str, Any]) -> Optional[str]:
+    """归档所在节点，早期指针没有 node 字段时从段文件名中取"""
+    return pointer.get('node') or segment_node(pointer['segment'])
+
+
+async def archive_nodes(
+    since: Optional[datetime] = None,
+    site_ids: Optional[List[str]] = None,
+    category: str = 'policy'
+) -> List[str]:
+    """持有 since 之后归档记录的节点（按段文件名统计，段文件数远少于文档数）"""
+    collection = mongodb.get_collection(collection_for(category))
+    segments = await collection.distinct('archive.segment', _archive_query(since, site_ids=site_ids))
+    return sorted({node for node in map(segment_node, segments) if node})
+
+
+class ReextractionJob:
+    """从归档中读取原始页面，用当前站点配置重新提取并批量更新
+
+    按 crawl_date 范围流式读取带归档指针的文档，按段文件分组、按偏移排序后
+    分块提交给进程池解析，结果按批 bulk_write 回写。正文变化的文档重新
+    置为pending，交给后续清洗；不发起任何网络请求。
+
+    段文件只在写入它的节点本地，指定 node 时只处理该节点的记录（由该节点上的
+    worker执行）；本应在本地却找不到的段文件计入 missing，调用方据此报告失败。
+    """
+
+    def __init__(
+        self,
+        site_configs: List[Dict[str, Any]],
+        workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        backend: Optional[str] = None,
+        node: Optional[str] = None
+    ):
+        self.configs = {str(site.get('id', site.get('name', 'unknown'))): site for site in site_configs}
+        self.workers = workers or settings.CRAWL_PARSE_WORKERS or os.cpu_count() or 1
+        self.batch_size = batch_size or settings.CRAWL_SAVE_BATCH_SIZE
+        self.backend = backend or settings.CRAWL_PARSER_BACKEND
+        self.directory = archive_dir()
+        self.node = node
+        self.counts = {'scanned': 0, 'extracted': 0, 'updated': 0, 'failed': 0, 'skipped': 0, 'missing': 0}
+
+    async def run(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        site_ids: Optional[List[str]] = None,
+        category: str = 'policy'
+    ) -> Dict[str, int]:
+        """重新提取 [since, until) 内采集的页面"""
+        collection = mongodb.get_collection(collection_for(category))
+
+        # 带上采集时学到的站点画像和模板，只使用不再学习
+        profiles = SiteProfileCache()
+        await profiles.load(list(self.configs.values()))
+        site_configs = {site_id: profiles.apply(config, learn=False) for site_id, config in self.configs.items()}
+
+        query = _archive_query(since, until, site_ids)
+        if self.node:
+            # 早期指针没有 node 字段，按段文件名判断
+            query['archive.node'] = {'$in': [self.node, None]}
+
+        # 段文件 -> [(offset, length, url, site_id)]
+        by_segment: Dict[str, List[Tuple[int, int, str, str]]] = defaultdict(list)
+        async for doc in collection.find(query, {'url': 1, 'archive': 1}):
+            pointer = doc['archive']
+            if self.node and _pointer_node(pointer) != self.node:
+                continue
+            self.counts['scanned'] += 1
+            if pointer.get('site_id') not in self.configs:
+                self.counts['skipped'] += 1
+                continue
+            by_segment[pointer['segment']].append(
+                (pointer['offset'], pointer['length'], doc['url'], pointer['site_id'])
+            )
+
+        for segment in [name for name in by_segment if not os.path.exists(os.path.join(self.directory, name))]:
+            records = by_segment.pop(segment)
+            self.counts['missing'] += len(records)
+            logger.error(f"Archive segment {segment} not found under {self.directory}, {len(records)} pages not re-extracted")
+
+        logger.info(
+            f"Re-extracting {self.counts['scanned'] - self.counts['skipped']} archived pages "
+            f"from {len(by_segment)} segments with {self.workers} workers"
+        )
+
+        loop = asyncio.get_running_loop()
+        executor = create_process_executor(self.workers, 'reextract')
+        pending = set()
+        operations: List[UpdateOne] = []
+        try:
+            for segment, records in by_segment.items():
+                records.sort()
+                for start in range(0, len(records), CHUNK_SIZE):
+                    chunk = records[start:start + CHUNK_SIZE]
+                    entries = [(url, offset, length) for offset, length, url, _ in chunk]
+                    chunk_sites = [site_id for _, _, _, site_id in chunk]
+                    configs = {site_id: site_configs[site_id] for site_id in set(chunk_sites)}
+                    pending.add(loop.run_in_executor(
+                        executor, _reextract_chunk,
+                        self.directory, segment, entries, configs, chunk_sites, self.backend
+                    ))
+                    # 在途任务数为工作数的2倍，控制内存占用
+                    if len(pending) >= self.workers * 2:
+                        pending = await self._collect(pending, operations, collection)
+
+            while pending:
+                pending = await self._collect(pending, operations, collection)
+            await self._write(operations, collection)
+
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        logger.info(
+            f"Re-extraction finished: {self.counts['extracted']} extracted, "
+            f"{self.counts['updated']} changed, {self.counts['failed']} failed, "
+            f"{self.counts['missing']} in missing segments"
+        )
+        return self.counts
+
+    async def _collect(self, pending, operations: List[UpdateOne], collection):
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            try:
+                results, failed = future.result()
+            except Exception as e:
+                logger.error(f"Re-extraction chunk failed: {e}")
+                continue
+            self.counts['failed'] += failed
+            self.counts['extracted'] += len(results)
+            for url, fields in results:
+                # 正文变化时重新置为pending，再覆盖提取字段
+                operations.append(UpdateOne(
+                    {'url': url, 'content': {'$ne': fields['content']}, 'status': {'$ne': 'duplicate'}},
+                    {'$set': {'status': 'pending'}}
+                ))
+                operations.append(UpdateOne(
+                    {'url': url},
+                    {'$set': dict(fields, reextracted_at=datetime.utcnow())}
+                ))
+        if len(operations) >= self.batch_size * 2:
+            await self._write(operations, collection)
+        return pending
+
+    async def _write(self, operations: List[UpdateOne], collection):
+        if not operations:
+            return
+        # 同一URL的两条更新必须按顺序执行；第二条总能匹配，多出的匹配数即正文变化的文档数
+        result = await collection.bulk_write(operations, ordered=True)
+        self.counts['updated'] += result.bulk_api_result.get('nMatched', 0) - len(operations) // 2
+        operations.clear()
+
+
+async def reextract_recent(
+    site_configs: List[Dict[str, Any]],
+    days: int = 30,
+    site_ids: Optional[List[str]] = None,
+    category: str = 'policy',
+    node: Optional[str] = None
+) -> Dict[str, int]:
+    """重新提取最近 days 天采集的页面，node 为 None 时处理全部记录（单节点部署）"""
+    job = ReextractionJob(site_configs, node=node)
+    return await job.run(since=datetime.utcnow() - timedelta(days=days), site_ids=site_ids, category=category)
+
+
+__all__ = ['ReextractionJob', 'archive_nodes', 'reextract_recent']
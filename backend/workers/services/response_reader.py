@@ -0,0 +1,138 @@
+"""
+响应体读取与编码识别
+路径: /mnt/okcomputer/output/backend/workers/services/response_reader.py
+"""
+
+import codecs
+import logging
+import re
+from typing import Optional, Tuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+try:
+    from charset_normalizer import from_bytes
+except ImportError:  # pragma: no cover - 未安装时使用内置回退
+    from_bytes = None
+
+CHUNK_SIZE = 64 * 1024
+
+# 编码探测只看开头这部分字节
+SNIFF_BYTES = 8 * 1024
+
+HEADER_CHARSET_PATTERN = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+META_CHARSET_PATTERN = re.compile(
+    rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)',
+    re.I
+)
+
+# GB2312/GBK 页面按超集 GB18030 解码，避免生僻字乱码
+ENCODING_ALIASES = {
+    'gb2312': 'gb18030',
+    'gbk': 'gb18030',
+    'gb_2312-80': 'gb18030',
+    'x-gbk': 'gb18030',
+    'cp936': 'gb18030',
+    'utf8': 'utf-8',
+}
+
+# 任意字节都能解码的单字节编码，服务器常误报，不作为可信声明
+UNTRUSTED_ENCODINGS = frozenset(['latin-1', 'iso8859-1', 'cp1252'])
+
+BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+
+class ResponseTooLarge(Exception):
+    """响应体超过大小上限"""
+
+
+async def read_limited(response: aiohttp.ClientResponse, max_bytes: int) -> bytes:
+    """分块读取响应体，超过 max_bytes 立即中止"""
+    if response.content_length is not None and response.content_length > max_bytes:
+        raise ResponseTooLarge(f"Content-Length {response.content_length} exceeds {max_bytes}")
+
+    body = bytearray()
+    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+        body.extend(chunk)
+        if len(body) > max_bytes:
+            raise ResponseTooLarge(f"Body exceeds {max_bytes} bytes")
+
+    return bytes(body)
+
+
+def normalize_encoding(name: Optional[str]) -> Optional[str]:
+    """规范化编码名，未知编码返回None"""
+    if not name:
+        return None
+    name = name.strip().lower()
+    name = ENCODING_ALIASES.get(name, name)
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def _decodes(sample: bytes, encoding: str) -> bool:
+    """样本能否按该编码严格解码（允许末尾截断的多字节字符）"""
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+        return True
+    except (UnicodeDecodeError, LookupError):
+        return False
+
+
+def detect_encoding(body: bytes, content_type: Optional[str] = None) -> str:
+    """识别页面编码
+
+    BOM优先；含非ASCII字节且是合法UTF-8时直接按UTF-8（GB系文本几乎不可能
+    恰好是合法UTF-8）；否则依次尝试响应头、<meta> 声明的编码，只有能严格解码
+    开头样本时才采用；都不可信时对开头几KB做字节级探测。
+    """
+    sample = body[:SNIFF_BYTES]
+
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    if not sample.isascii() and _decodes(sample, 'utf-8'):
+        return 'utf-8'
+
+    candidates = []
+    if content_type:
+        match = HEADER_CHARSET_PATTERN.search(content_type)
+        if match:
+            candidates.append(match.group(1))
+    match = META_CHARSET_PATTERN.search(sample)
+    if match:
+        candidates.append(match.group(1).decode('ascii', errors='ignore'))
+
+    for candidate in candidates:
+        encoding = normalize_encoding(candidate)
+        if encoding and encoding not in UNTRUSTED_ENCODINGS and _decodes(sample, encoding):
+            return encoding
+
+    if sample.isascii():
+        return 'utf-8'
+
+    if from_bytes is not None:
+        best = from_bytes(sample).best()
+        if best is not None:
+            return normalize_encoding(best.encoding) or 'gb18030'
+
+    # 国内政府网站非UTF-8页面绝大多数为GB系编码
+    return 'gb18030'
+
+
+def decode_html(body: bytes, content_type: Optional[str] = None) -> Tuple[str, str]:
+    """一次解码页面，返回 (文本, 编码)"""
+    encoding = detect_encoding(body, content_type)
+    return body.decode(encoding, errors='replace'), encoding
+
+
+__all__ = ['ResponseTooLarge', 'read_limited', 'detect_encoding', 'decode_html', 'normalize_encoding']
@@ -0,0 +1,97 @@
+"""
+页面再验证缓存（条件GET）
+路径: /mnt/okcomputer/output/backend/workers/services/revalidation.py
+"""
+
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+from app.database.mongodb import mongodb
+
+logger = logging.getLogger(__name__)
+
+# 随页面文档保存的验证字段
+VALIDATOR_FIELDS = ('etag', 'last_modified', 'content_hash')
+
+# 页面中需要跟进的站内链接，与验证字段一起缓存：页面未变化（304或哈希相同）时不再解析，
+# 仍按上次的出链继续遍历，下层栏目和新文档不会因入口页未变而漏采
+LINKS_FIELD = 'links'
+CACHED_FIELDS = VALIDATOR_FIELDS + (LINKS_FIELD,)
+
+
+def collection_for(category: str) -> str:
+    """采集类别对应的原始数据集合"""
+    return 'raw_pages' if category == 'policy' else 'raw_bids'
+
+
+def content_hash(body: bytes) -> str:
+    """计算响应体哈希"""
+    return hashlib.sha1(body).hexdigest()
+
+
+def conditional_headers(validators: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """根据已保存的验证字段生成条件请求头"""
+    headers = {}
+    if not validators:
+        return headers
+
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+
+    return headers
+
+
+class ValidatorCache:
+    """按URL缓存 ETag/Last-Modified/内容哈希和页面出链，减少重复查询"""
+
+    def __init__(self):
+        # URL -> 验证字段，None 表示数据库中没有该URL
+        self._cache: Dict[str, Optional[Dict[str, Any]]] = {}
+
+    async def prefetch(self, urls: Iterable[str], category: str = 'policy'):
+        """批量预取验证字段"""
+        missing = [url for url in urls if url not in self._cache]
+        if not missing:
+            return
+
+        try:
+            collection = mongodb.get_collection(collection_for(category))
+            projection = {field: 1 for field in CACHED_FIELDS}
+            projection['url'] = 1
+
+            for url in missing:
+                self._cache[url] = None
+            async for doc in collection.find({'url': {'$in': missing}}, projection):
+                self._cache[doc['url']] = self._validators(doc)
+
+        except Exception as e:
+            logger.warning(f"Failed to prefetch validators: {e}")
+
+    async def get(self, url: str, category: str = 'policy') -> Optional[Dict[str, Any]]:
+        """获取URL的验证字段"""
+        if url not in self._cache:
+            await self.prefetch([url], category)
+        return self._cache.get(url)
+
+    def update(self, url: str, validators: Dict[str, Any]):
+        """更新本地缓存"""
+        self._cache[url] = self._validators(validators)
+
+    @staticmethod
+    def _validators(doc: Dict[str, Any]) -> Dict[str, Any]:
+        # 出链为空列表也要保留，区别于出链字段加入前保存的文档
+        return {field: doc[field] for field in CACHED_FIELDS if doc.get(field) is not None}
+
+
+__all__ = [
+    'CACHED_FIELDS',
+    'LINKS_FIELD',
+    'VALIDATOR_FIELDS',
+    'ValidatorCache',
+    'collection_for',
+    'content_hash',
+    'conditional_headers',
+]
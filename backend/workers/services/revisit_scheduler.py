@@ -0,0 +1,218 @@
+"""
+按更新频率的站点重访调度
+路径: /mnt/okcomputer/output/backend/workers/services/revisit_scheduler.py
+"""
+
+import hashlib
+import heapq
+import logging
+import random
+import statistics
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+from app.config import settings
+from app.database.mongodb import mongodb
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_COLLECTION = 'crawl_schedule'
+
+# 更新速率（新增/变化页面数每小时）的指数平滑系数
+RATE_SMOOTHING = 0.3
+
+# 没有历史记录的站点假定的更新速率
+PRIOR_RATE = 0.1
+
+# 没有历史记录的站点假定的单次采集请求数
+PRIOR_COST = 10.0
+
+# 两次采集的间隔范围（小时）
+MIN_REVISIT_HOURS = 1.0
+MAX_REVISIT_HOURS = 24.0 * 7
+
+# 视为"有更新"的页面结果
+CHANGED_OUTCOMES = ('new', 'changed')
+
+# 实际发出请求的页面结果
+FETCHED_OUTCOMES = ('new', 'changed', 'unchanged', 'not_modified', 'error')
+
+
+def _url_key(url: str) -> str:
+    """URL历史在文档中的字段名"""
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+
+
+class RevisitScheduler:
+    """根据站点历史更新频率分配每轮采集预算
+
+    每个站点在 crawl_schedule 中保存平滑后的更新速率、单次采集成本、
+    上次采集时间和下次到期时间，入口URL另记检查/变化次数。选站时按到期时间
+    建优先队列，取出到期站点后按"预计新增页面数/请求成本"从高到低装入
+    本轮的请求预算；更新越频繁的站点到期越早，很少更新的站点最多一周重访一次。
+
+    从未采集过的站点没有更新速率，得分取本轮已知站点的中位数，且在已知站点
+    也到期时最多占用 CRAWL_EXPLORE_RATIO 比例的预算，新加入大批站点时热点站点
+    不会被挤出；已知站点装完后剩余的预算再用于探测。
+    """
+
+    def __init__(self, budget: Optional[int] = None, max_sites: Optional[int] = None):
+        self.budget = budget or settings.CRAWL_FETCH_BUDGET
+        self.max_sites = max_sites or settings.CRAWL_SITES_PER_RUN
+
+    @staticmethod
+    def _collection():
+        return mongodb.get_collection(SCHEDULE_COLLECTION)
+
+    async def _load(self, site_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        cursor = self._collection().find({'site_id': {'$in': list(site_ids)}})
+        return {doc['site_id']: doc async for doc in cursor}
+
+    @staticmethod
+    def expected_gain(state: Optional[Dict[str, Any]], now: datetime) -> Optional[float]:
+        """站点自上次采集以来预计的新增页面数，从未采集过的站点返回None"""
+        if not state or not state.get('last_crawl'):
+            return None
+        hours = max((now - state['last_crawl']).total_seconds() / 3600, 0.0)
+        return state.get('rate', PRIOR_RATE) * hours
+
+    async def select_sites(self, sites: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """挑选本轮要采集的站点"""
+        if not sites:
+            return []
+
+        try:
+            states = await self._load(site['id'] for site in sites if site.get('id'))
+        except Exception as e:
+            logger.warning(f"Revisit schedule unavailable, sampling sites at random: {e}")
+            return random.sample(sites, min(self.max_sites, len(sites)))
+
+        now = datetime.utcnow()
+        queue = []
+        for index, site in enumerate(sites):
+            state = states.get(site.get('id'))
+            next_due = state.get('next_due') if state else None
+            heapq.heappush(queue, (next_due or datetime.min, index))
+
+        due = []
+        while queue and queue[0][0] <= now:
+            _, index = heapq.heappop(queue)
+            site = sites[index]
+            state = states.get(site.get('id'))
+            cost = state.get('cost', PRIOR_COST) if state else PRIOR_COST
+            gain = self.expected_gain(state, now)
+            due.append((None if gain is None else gain / max(cost, 1.0), cost, index))
+
+        observed = [score for score, _, _ in due if score is not None]
+        # 全是新站点时得分相同，按配置顺序装入
+        explore_score = statistics.median(observed) if observed else 0.0
+        # 得分相同时已知站点在前
+        ranked = sorted(
+            ((explore_score if score is None else score, score is None, cost, index) for score, cost, index in due),
+            key=lambda item: (-item[0], item[1])
+        )
+
+        explore_budget = self.budget * settings.CRAWL_EXPLORE_RATIO if observed else self.budget
+        selected = []
+        deferred = []
+        spent = 0.0
+        explored = 0.0
+        for _, unseen, cost, index in ranked:
+            if len(selected) >= self.max_sites:
+                break
+            if selected and spent + cost > self.budget:
+                continue
+            if unseen and explored and explored + cost > explore_budget:
+                deferred.append((cost, index))
+                continue
+            selected.append(sites[index])
+            spent += cost
+            if unseen:
+                explored += cost
+
+        for cost, index in deferred:
+            if len(selected) >= self.max_sites:
+                break
+            if spent + cost <= self.budget:
+                selected.append(sites[index])
+                spent += cost
+
+        logger.info(
+            f"Revisit scheduler: {len(due)} of {len(sites)} sites due, "
+            f"{len(selected)} selected, ~{spent:.0f}/{self.budget} requests"
+        )
+        return selected
+
+    async def record_crawl(
+        self,
+        sites: List[Dict[str, Any]],
+        site_stats: Dict[str, Dict[str, int]],
+        page_outcomes: Dict[str, str]
+    ):
+        """根据本轮各站点的页面结果更新更新速率和下次到期时间"""
+        sites = [site for site in sites if site.get('id')]
+        if not sites:
+            return
+
+        try:
+            states = await self._load(site['id'] for site in sites)
+            now = datetime.utcnow()
+            operations = []
+
+            for site in sites:
+                site_id = site['id']
+                state = states.get(site_id, {})
+                counts = site_stats.get(str(site_id), {})
+                changed = sum(counts.get(outcome, 0) for outcome in CHANGED_OUTCOMES)
+                fetched = sum(counts.get(outcome, 0) for outcome in FETCHED_OUTCOMES)
+
+                rate = state.get('rate', PRIOR_RATE)
+                cost = state.get('cost', PRIOR_COST)
+                if state.get('last_crawl'):
+                    hours = max((now - state['last_crawl']).total_seconds() / 3600, MIN_REVISIT_HOURS)
+                    rate += RATE_SMOOTHING * (changed / hours - rate)
+                elif changed:
+                    # 首次采集得到的是存量页面，不代表更新速率
+                    rate = PRIOR_RATE
+                if fetched:
+                    cost += RATE_SMOOTHING * (fetched - cost)
+
+                revisit_hours = min(max(1.0 / max(rate, 1e-6), MIN_REVISIT_HOURS), MAX_REVISIT_HOURS)
+
+                update = {
+                    '$set': {
+                        'site_id': site_id,
+                        'rate': rate,
+                        'cost': cost,
+                        'last_crawl': now,
+                        'next_due': now + timedelta(hours=revisit_hours),
+                        'last_changed': changed,
+                        'last_fetched': fetched,
+                    },
+                    '$inc': {'crawls': 1, 'total_changed': changed, 'total_fetched': fetched},
+                }
+
+                # 入口页面的变化历史
+                for url in site.get('start_urls', []):
+                    outcome = page_outcomes.get(url)
+                    if outcome is None or outcome == 'skipped':
+                        continue
+                    key = f"urls.{_url_key(url)}"
+                    update['$set'][f"{key}.url"] = url
+                    update['$inc'][f"{key}.checks"] = 1
+                    if outcome in CHANGED_OUTCOMES:
+                        update['$inc'][f"{key}.changes"] = 1
+                        update['$set'][f"{key}.last_changed"] = now
+
+                operations.append(UpdateOne({'site_id': site_id}, update, upsert=True))
+
+            await self._collection().bulk_write(operations, ordered=False)
+            logger.info(f"Revisit schedule updated for {len(operations)} sites")
+
+        except Exception as e:
+            logger.error(f"Failed to update revisit schedule: {e}")
+
+
+__all__ = ['RevisitScheduler']
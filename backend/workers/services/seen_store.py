@@ -0,0 +1,189 @@
+"""
+已访问URL存储
+路径: /mnt/okcomputer/output/backend/workers/services/seen_store.py
+"""
+
+import hashlib
+import logging
+import time
+from array import array
+from typing import Iterable, List, Optional
+
+from app.config import settings
+from app.database.redis import RedisDB, redisdb
+
+logger = logging.getLogger(__name__)
+
+
+def url_fingerprint(url: str) -> int:
+    """URL的64位指纹（0保留为空槽标记）"""
+    digest = hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') or 1
+
+
+class SeenURLStore:
+    """已访问URL存储接口"""
+
+    async def add(self, url: str) -> bool:
+        """记录URL，首次出现返回True"""
+        raise NotImplementedError
+
+    async def contains(self, url: str) -> bool:
+        """URL是否已记录"""
+        raise NotImplementedError
+
+    async def add_many(self, urls: Iterable[str]) -> List[bool]:
+        """批量记录URL，按顺序返回每个URL是否首次出现"""
+        return [await self.add(url) for url in urls]
+
+
+class CompactSeenStore(SeenURLStore):
+    """进程内紧凑存储
+
+    只保存64位指纹，用 array('Q') 做开放寻址哈希表，每个槽8字节，
+    负载因子不超过0.5，百万级URL约占16~32MB。
+    """
+
+    def __init__(self, capacity: int = 1 << 16):
+        size = 1
+        while size < capacity * 2:
+            size <<= 1
+        self._slots = array('Q', bytes(8 * size))
+        self._mask = size - 1
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def memory_bytes(self) -> int:
+        """指纹表占用的字节数"""
+        return self._slots.itemsize * len(self._slots)
+
+    async def add(self, url: str) -> bool:
+        return self.add_fingerprint(url_fingerprint(url))
+
+    async def contains(self, url: str) -> bool:
+        return self.contains_fingerprint(url_fingerprint(url))
+
+    def add_fingerprint(self, fingerprint: int) -> bool:
+        """记录指纹，首次出现返回True"""
+        slots, mask = self._slots, self._mask
+        index = fingerprint & mask
+        while True:
+            value = slots[index]
+            if value == 0:
+                slots[index] = fingerprint
+                self._count += 1
+                if self._count * 2 > len(slots):
+                    self._grow()
+                return True
+            if value == fingerprint:
+                return False
+            index = (index + 1) & mask
+
+    def contains_fingerprint(self, fingerprint: int) -> bool:
+        """指纹是否已记录"""
+        slots, mask = self._slots, self._mask
+        index = fingerprint & mask
+        while True:
+            value = slots[index]
+            if value == 0:
+                return False
+            if value == fingerprint:
+                return True
+            index = (index + 1) & mask
+
+    def _grow(self):
+        """容量翻倍并重新插入"""
+        old_slots = self._slots
+        self._slots = array('Q', bytes(8 * len(old_slots) * 2))
+        self._mask = len(self._slots) - 1
+        self._count = 0
+        for value in old_slots:
+            if value:
+                self.add_fingerprint(value)
+
+
+class RedisSeenStore(SeenURLStore):
+    """基于Redis的共享存储，所有Celery worker共用
+
+    指纹按低位分片到多个集合，集合按时间分桶并设置过期时间。查询同时检查
+    当前桶和上一个桶，因此URL在 ttl/2 ~ ttl 秒内视为已访问，之后可被重新采集。
+    Redis不可用时退化为进程内存储，不阻塞采集。
+    """
+
+    def __init__(
+        self,
+        redis: Optional[RedisDB] = None,
+        ttl: Optional[int] = None,
+        shards: int = 256,
+        prefix: str = 'crawl:seen'
+    ):
+        self.redis = redis or redisdb
+        self.ttl = ttl or settings.CRAWL_SEEN_TTL
+        self.shards = shards
+        self.prefix = prefix
+        self.fallback = CompactSeenStore()
+
+    def _keys(self, fingerprint: int):
+        span = max(1, self.ttl // 2)
+        bucket = int(time.time()) // span
+        shard = fingerprint % self.shards
+        return f"{self.prefix}:{bucket}:{shard}", f"{self.prefix}:{bucket - 1}:{shard}"
+
+    async def add(self, url: str) -> bool:
+        return (await self.add_many([url]))[0]
+
+    async def add_many(self, urls: Iterable[str]) -> List[bool]:
+        fingerprints = [url_fingerprint(url) for url in urls]
+        if not fingerprints:
+            return []
+
+        try:
+            pipe = self.redis.get_client().pipeline(transaction=False)
+            for fingerprint in fingerprints:
+                member = format(fingerprint, '016x')
+                current_key, previous_key = self._keys(fingerprint)
+                pipe.sismember(previous_key, member)
+                pipe.sadd(current_key, member)
+                pipe.expire(current_key, self.ttl)
+            replies = await pipe.execute()
+
+            return [
+                not replies[i * 3] and replies[i * 3 + 1] == 1
+                for i in range(len(fingerprints))
+            ]
+
+        except Exception as e:
+            logger.warning(f"Redis seen store unavailable, using local store: {e}")
+            return [self.fallback.add_fingerprint(fingerprint) for fingerprint in fingerprints]
+
+    async def contains(self, url: str) -> bool:
+        fingerprint = url_fingerprint(url)
+        try:
+            member = format(fingerprint, '016x')
+            pipe = self.redis.get_client().pipeline(transaction=False)
+            for key in self._keys(fingerprint):
+                pipe.sismember(key, member)
+            return any(await pipe.execute())
+
+        except Exception as e:
+            logger.warning(f"Redis seen store unavailable, using local store: {e}")
+            return self.fallback.contains_fingerprint(fingerprint)
+
+
+def create_seen_store() -> SeenURLStore:
+    """按配置创建已访问URL存储，Redis未连接时使用进程内存储"""
+    if settings.CRAWL_SEEN_BACKEND == 'redis' and redisdb.client is not None:
+        return RedisSeenStore()
+    return CompactSeenStore()
+
+
+__all__ = [
+    'SeenURLStore',
+    'CompactSeenStore',
+    'RedisSeenStore',
+    'create_seen_store',
+    'url_fingerprint'
+]
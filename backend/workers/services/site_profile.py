@@ -0,0 +1,195 @@
+"""
+站点提取画像
+路径: /mnt/okcomputer/output/backend/workers/services/site_profile.py
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from app.config import settings
+from app.database.mongodb import mongodb
+
+logger = logging.getLogger(__name__)
+
+PROFILE_COLLECTION = 'crawl_site_profiles'
+
+# 画像学习的字段：标题/正文/日期选择器和日期格式
+PROFILE_FIELDS = ('title', 'content', 'date', 'date_format')
+
+# 某个取值在该字段命中记录中的占比达到此值才写入画像
+MIN_SHARE = 0.6
+
+# 单个字段累计命中数超过此值时计数减半，站点改版后画像能随之更新
+MAX_COUNT = 1000
+
+# 出现在至少这个比例的样本页中的文本块视为站点模板
+TEMPLATE_MIN_SHARE = 0.5
+
+
+class SiteProfileCache:
+    """按站点学习标题、正文、日期命中的选择器和日期格式
+
+    同一站点的详情页由同一套模板生成，配置里的通用选择器列表大多只有一个会命中。
+    每次提取后记录命中的选择器和日期格式，采集够 min_pages 页后把占多数的取值
+    作为站点画像，之后的页面先用画像中的选择器和日期格式，不命中时仍按原顺序回退。
+
+    正文选择器都不命中、回退到整个body的页面会带上导航、页脚和侧栏。收集若干张
+    这类页面的文本块指纹，在过半样本中重复出现的块即站点模板，之后提取时去掉；
+    模板超过 refresh_days 天后重新采样。
+    计数和模板按站点保存在 crawl_site_profiles 中，本轮采集结束后调用 commit 写回。
+    """
+
+    def __init__(
+        self,
+        min_pages: Optional[int] = None,
+        template_pages: Optional[int] = None,
+        refresh_days: Optional[int] = None
+    ):
+        self.min_pages = min_pages or settings.CRAWL_SITE_PROFILE_MIN_PAGES
+        self.selectors_enabled = settings.CRAWL_SITE_PROFILE_ENABLED
+        self.template_enabled = settings.CRAWL_TEMPLATE_ENABLED
+        self.template_pages = template_pages or settings.CRAWL_TEMPLATE_SAMPLE_PAGES
+        self.refresh = timedelta(days=refresh_days or settings.CRAWL_TEMPLATE_REFRESH_DAYS)
+        # 站点 -> {'pages': 页数, 'counts': {字段: {取值: 次数}}, 'profile': {字段: 取值},
+        #          'template': 模板块指纹, 'template_at': 学习时间, 'samples': [样本页块指纹]}
+        self.states: Dict[str, Dict[str, Any]] = {}
+        self._dirty: set = set()
+
+    @staticmethod
+    def _collection():
+        return mongodb.get_collection(PROFILE_COLLECTION)
+
+    @staticmethod
+    def _site_key(site_config: Dict[str, Any]) -> str:
+        return str(site_config.get('id', site_config.get('name', 'unknown')))
+
+    def _state(self, key: str) -> Dict[str, Any]:
+        state = self.states.get(key)
+        if state is None:
+            state = self.states[key] = {
+                'pages': 0,
+                'counts': {field: {} for field in PROFILE_FIELDS},
+                'profile': {},
+                'template': frozenset(),
+                'template_at': None,
+                'samples': [],
+            }
+        return state
+
+    async def load(self, site_configs: List[Dict[str, Any]]):
+        """一次查询取回本轮站点的画像"""
+        keys = [self._site_key(site) for site in site_configs]
+        try:
+            async for doc in self._collection().find({'site_id': {'$in': keys}}):
+                state = self._state(doc['site_id'])
+                state['pages'] = doc.get('pages', 0)
+                # 选择器含"."和"#"，计数存为 [取值, 次数] 列表
+                for field, pairs in (doc.get('counts') or {}).items():
+                    if field in state['counts']:
+                        state['counts'][field] = dict(pairs)
+                state['profile'] = self._learn(state)
+                state['template'] = frozenset(doc.get('template') or ())
+                state['template_at'] = doc.get('template_at')
+                state['samples'] = doc.get('samples') or []
+        except Exception as e:
+            logger.warning(f"Failed to load site profiles: {e}")
+
+    async def commit(self):
+        """保存本轮更新的画像"""
+        operations = [
+            UpdateOne(
+                {'site_id': key},
+                {'$set': {
+                    'pages': self.states[key]['pages'],
+                    'counts': {
+                        field: [[value, count] for value, count in counts.items()]
+                        for field, counts in self.states[key]['counts'].items()
+                    },
+                    'profile': self.states[key]['profile'],
+                    'template': sorted(self.states[key]['template']),
+                    'template_at': self.states[key]['template_at'],
+                    'samples': self.states[key]['samples'],
+                    'updated_at': datetime.utcnow(),
+                }},
+                upsert=True
+            )
+            for key in sorted(self._dirty)
+        ]
+        if not operations:
+            return
+        try:
+            await self._collection().bulk_write(operations, ordered=False)
+            self._dirty.clear()
+        except Exception as e:
+            logger.error(f"Failed to save site profiles: {e}")
+
+    def apply(self, site_config: Dict[str, Any], learn: bool = True) -> Dict[str, Any]:
+        """带上站点画像的提取配置
+
+        learn 为真且模板需要（重新）学习时，要求提取引擎返回正文块指纹。
+        """
+        state = self._state(self._site_key(site_config))
+        profile = dict(state['profile'])
+        if self.template_enabled:
+            if state['template']:
+                profile['template'] = state['template']
+            if learn and self._template_due(state):
+                profile['sample_blocks'] = True
+        if not profile:
+            return site_config
+        return dict(site_config, profile=profile)
+
+    def _template_due(self, state: Dict[str, Any]) -> bool:
+        return state['template_at'] is None or datetime.utcnow() - state['template_at'] > self.refresh
+
+    def record(self, site_config: Dict[str, Any], matched: Optional[Dict[str, Optional[str]]]):
+        """记录一个页面命中的选择器、日期格式和正文块指纹"""
+        if not matched:
+            return
+        key = self._site_key(site_config)
+        state = self._state(key)
+        if matched.get('blocks') and self._template_due(state):
+            self._sample(state, matched['blocks'])
+        state['pages'] += 1
+        for field in PROFILE_FIELDS:
+            value = matched.get(field)
+            if value is None:
+                continue
+            counts = state['counts'][field]
+            counts[value] = counts.get(value, 0) + 1
+            if counts[value] > MAX_COUNT:
+                state['counts'][field] = {item: count // 2 for item, count in counts.items() if count > 1}
+        state['profile'] = self._learn(state)
+        self._dirty.add(key)
+
+    def _sample(self, state: Dict[str, Any], blocks: List[str]):
+        """加入一张样本页，样本足够时重新计算模板"""
+        state['samples'].append(blocks)
+        if len(state['samples']) < self.template_pages:
+            return
+        occurrences = Counter(fingerprint for sample in state['samples'] for fingerprint in set(sample))
+        threshold = max(2, TEMPLATE_MIN_SHARE * len(state['samples']))
+        state['template'] = frozenset(fingerprint for fingerprint, count in occurrences.items() if count >= threshold)
+        state['template_at'] = datetime.utcnow()
+        state['samples'] = []
+        logger.info(f"Learned template with {len(state['template'])} blocks from {self.template_pages} pages")
+
+    def _learn(self, state: Dict[str, Any]) -> Dict[str, str]:
+        """各字段占多数的取值"""
+        if not self.selectors_enabled or state['pages'] < self.min_pages:
+            return {}
+        profile = {}
+        for field, counts in state['counts'].items():
+            if not counts:
+                continue
+            value, count = max(counts.items(), key=lambda item: item[1])
+            if count >= MIN_SHARE * sum(counts.values()):
+                profile[field] = value
+        return profile
+
+
+__all__ = ['SiteProfileCache']
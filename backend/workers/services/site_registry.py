@@ -0,0 +1,234 @@
+"""
+站点配置注册表
+路径: /mnt/okcomputer/output/backend/workers/services/site_registry.py
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import yaml
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+GOV_TREE_PATH = os.path.join(DATA_DIR, 'gov_tree.json')
+CUSTOM_SITES_DIR = os.path.join(DATA_DIR, 'sites_custom')
+
+# 建立二级索引的字段
+INDEXED_FIELDS = ('region', 'level', 'category')
+
+
+def parse_gov_tree(tree_data: Any) -> List[Dict[str, Any]]:
+    """解析政府树形结构为站点配置"""
+    sites = []
+
+    def process_node(node, level=0):
+        if level > 5:  # 限制层级深度
+            return
+
+        # 生成站点配置
+        if 'website' in node:
+            site_config = {
+                'id': node.get('id', f"gov_{len(sites)}"),
+                'name': node.get('name', 'Unknown'),
+                'region': node.get('name', 'Unknown'),
+                'level': level,
+                'start_urls': [node['website']],
+                'category': 'policy',
+                'selectors': {
+                    'title': ['h1', '.title', 'title'],
+                    'content': ['.content', '.article', 'main'],
+                    'date': ['.date', '.publish-date', '.time']
+                }
+            }
+            sites.append(site_config)
+
+        # 处理子节点
+        if 'children' in node:
+            for child in node['children']:
+                process_node(child, level + 1)
+
+    if isinstance(tree_data, list):
+        for node in tree_data:
+            process_node(node)
+    else:
+        process_node(tree_data)
+
+    return sites
+
+
+def _load_custom_site(path: str) -> Optional[Dict[str, Any]]:
+    """读取一个自定义站点YAML，示例配置使用 site_id 作标识"""
+    with open(path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    if not isinstance(config, dict):
+        logger.warning(f"Ignoring site configuration {path}: not a mapping")
+        return None
+    if config.get('id') is None and config.get('site_id') is not None:
+        config['id'] = config['site_id']
+    return config
+
+
+class SiteRegistry:
+    """站点配置注册表
+
+    首次访问时才读取 gov_tree.json 和 sites_custom/*.yml，导入模块不再解析配置。
+    按ID建立字典索引，按地区、层级、类别建立二级索引。之后每次访问最多每隔
+    check_interval 秒检查一次文件的修改时间，只重新读取变化的文件，
+    worker 和 API 进程无需重启即可生效。
+    """
+
+    def __init__(
+        self,
+        gov_tree_path: str = GOV_TREE_PATH,
+        custom_dir: str = CUSTOM_SITES_DIR,
+        check_interval: Optional[float] = None
+    ):
+        self.gov_tree_path = gov_tree_path
+        self.custom_dir = custom_dir
+        self.check_interval = settings.CRAWL_SITES_RELOAD_INTERVAL if check_interval is None else check_interval
+        # 文件路径 -> (修改时间, 其中的站点配置)
+        self._files: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._sites: List[Dict[str, Any]] = []
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._indexes: Dict[str, Dict[Any, List[Dict[str, Any]]]] = {field: {} for field in INDEXED_FIELDS}
+        self._loaded = False
+        self._static = False
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_configs(cls, site_configs: Iterable[Dict[str, Any]]) -> 'SiteRegistry':
+        """由给定配置构建、不读取文件的注册表（基准测试和脚本使用）"""
+        registry = cls(check_interval=0)
+        registry._static = True
+        registry._loaded = True
+        registry._build(list(site_configs))
+        return registry
+
+    def _scan(self) -> Dict[str, float]:
+        """当前配置文件及其修改时间"""
+        files = {}
+        if os.path.exists(self.gov_tree_path):
+            files[self.gov_tree_path] = os.path.getmtime(self.gov_tree_path)
+        if os.path.isdir(self.custom_dir):
+            for filename in sorted(os.listdir(self.custom_dir)):
+                if filename.endswith('.yml') or filename.endswith('.yaml'):
+                    path = os.path.join(self.custom_dir, filename)
+                    files[path] = os.path.getmtime(path)
+        return files
+
+    def _read(self, path: str) -> List[Dict[str, Any]]:
+        if path == self.gov_tree_path:
+            with open(path, 'r', encoding='utf-8') as f:
+                return parse_gov_tree(json.load(f))
+        config = _load_custom_site(path)
+        return [config] if config else []
+
+    def _refresh(self, force: bool = False):
+        """重新读取修改过的文件，有变化时重建索引"""
+        if self._static:
+            return
+        now = time.monotonic()
+        if self._loaded and not force and now - self._checked_at < self.check_interval:
+            return
+
+        with self._lock:
+            if self._loaded and not force and now - self._checked_at < self.check_interval:
+                return
+            try:
+                current = self._scan()
+                changed = force or current.keys() != self._files.keys() or any(
+                    self._files[path][0] != mtime for path, mtime in current.items()
+                )
+                if changed:
+                    files = {}
+                    for path, mtime in current.items():
+                        cached = self._files.get(path)
+                        if cached is not None and cached[0] == mtime and not force:
+                            files[path] = cached
+                            continue
+                        try:
+                            files[path] = (mtime, self._read(path))
+                        except Exception as e:
+                            # 编辑中途的文件解析失败时保留上一次的内容，文件再次修改前不重试
+                            logger.error(f"Error loading site configuration {path}: {e}")
+                            files[path] = (mtime, cached[1] if cached is not None else [])
+                    self._files = files
+                    self._build([site for path in current if path in files for site in files[path][1]])
+                    logger.info(
+                        f"{'Reloaded' if self._loaded else 'Loaded'} {len(self._sites)} site configurations"
+                    )
+            except Exception as e:
+                logger.error(f"Error loading sites configuration: {e}")
+            self._loaded = True
+            self._checked_at = time.monotonic()
+
+    def _build(self, sites: List[Dict[str, Any]]):
+        """建立ID索引和二级索引，整体替换，读取方不会看到构建到一半的索引"""
+        by_id = {}
+        indexes: Dict[str, Dict[Any, List[Dict[str, Any]]]] = {field: {} for field in INDEXED_FIELDS}
+        for site in sites:
+            if site.get('id') is not None:
+                by_id[str(site['id'])] = site
+            for field in INDEXED_FIELDS:
+                if site.get(field) is not None:
+                    indexes[field].setdefault(site[field], []).append(site)
+        self._sites, self._by_id, self._indexes = sites, by_id, indexes
+
+    def reload(self):
+        """立即重新读取全部配置文件"""
+        self._refresh(force=True)
+
+    def all(self) -> List[Dict[str, Any]]:
+        """全部站点配置"""
+        self._refresh()
+        return self._sites
+
+    def get(self, site_id: Any) -> Optional[Dict[str, Any]]:
+        """按ID查找站点"""
+        self._refresh()
+        return self._by_id.get(str(site_id))
+
+    def get_many(self, site_ids: Iterable[Any]) -> List[Dict[str, Any]]:
+        """按ID批量查找站点，忽略不存在的ID，结果按ID去重"""
+        self._refresh()
+        sites = []
+        seen = set()
+        for site_id in site_ids:
+            key = str(site_id)
+            if key in self._by_id and key not in seen:
+                seen.add(key)
+                sites.append(self._by_id[key])
+        return sites
+
+    def find(self, **filters: Any) -> List[Dict[str, Any]]:
+        """按地区、层级、类别筛选站点，如 find(region='北京市', category='policy')"""
+        unknown = set(filters) - set(INDEXED_FIELDS)
+        if unknown:
+            raise ValueError(f"Unindexed site fields: {', '.join(sorted(unknown))}")
+        self._refresh()
+        if not filters:
+            return list(self._sites)
+        # 从最小的候选集合开始过滤
+        candidates = sorted(
+            (self._indexes[field].get(value, []) for field, value in filters.items()),
+            key=len
+        )
+        return [site for site in candidates[0] if all(site.get(field) == value for field, value in filters.items())]
+
+    def __len__(self) -> int:
+        return len(self.all())
+
+
+# 全局注册表，首次访问时加载
+site_registry = SiteRegistry()
+
+
+__all__ = ['SiteRegistry', 'parse_gov_tree', 'site_registry']
@@ -0,0 +1,213 @@
+"""
+待处理文档的租约认领
+路径: /mnt/okcomputer/output/backend/workers/services/work_leases.py
+"""
+
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+from app.config import settings
+from app.database.mongodb import mongodb
+
+logger = logging.getLogger(__name__)
+
+# 各处理阶段认领的集合及其状态字段；cleaned_docs 的 analysis_status 缺省即待分析
+STAGES = {
+    'clean': (('raw_pages', 'status'), ('raw_bids', 'status')),
+    'analyze': (('cleaned_docs', 'analysis_status'),),
+}
+
+PROCESSING = 'processing'
+FAILED = 'failed'
+
+
+def default_owner() -> str:
+    """租约持有者标识: 主机名:进程号"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Lease:
+    """一次认领得到的文档批次"""
+
+    __slots__ = ('token', 'owner', 'docs', 'expires_at')
+
+    def __init__(self, token: str, owner: str, docs: List[Dict[str, Any]], expires_at: datetime):
+        self.token = token
+        self.owner = owner
+        self.docs = docs
+        self.expires_at = expires_at
+
+    @property
+    def ids(self) -> List[Any]:
+        return [doc['_id'] for doc in self.docs]
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+
+class LeaseQueue:
+    """基于租约的待处理文档认领
+
+    每次 find_one_and_update 原子地把一篇待处理文档置为 processing，并写入
+    lease.owner/token/expires，多个worker同时认领也不会拿到同一篇。处理完调用
+    complete 写入最终状态并清除租约，条件带上租约token，租约过期被他人重新认领后，
+    原持有者的写入不生效。worker崩溃留下的过期租约在下次认领时回到待处理池；
+    同一文档认领超过 max_attempts 次仍未完成时置为 failed，避免反复拖垮worker。
+    认领条件走 (状态字段, lease.expires) 复合索引。
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        status_field: str = 'status',
+        ready: Tuple[Optional[str], ...] = ('pending',),
+        owner: Optional[str] = None,
+        lease_seconds: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        projection: Optional[Dict[str, Any]] = None
+    ):
+        self.collection_name = collection_name
+        self.status_field = status_field
+        self.ready = list(ready)
+        self.owner = owner or default_owner()
+        self.lease_seconds = lease_seconds or settings.PIPELINE_LEASE_SECONDS
+        self.max_attempts = max_attempts or settings.PIPELINE_MAX_ATTEMPTS
+        self.projection = projection
+
+    def _collection(self):
+        return mongodb.get_collection(self.collection_name)
+
+    def _claimable(self, now: datetime) -> Dict[str, Any]:
+        return {'$or': [
+            {self.status_field: {'$in': self.ready}},
+            {
+                self.status_field: PROCESSING,
+                'lease.expires': {'$lt': now},
+                'lease.attempts': {'$lt': self.max_attempts},
+            },
+        ]}
+
+    async def claim(self, batch_size: Optional[int] = None) -> Lease:
+        """认领至多 batch_size 篇文档，没有待处理文档时返回空批次
+
+        每篇文档一次 find_one_and_update（MongoDB没有原子地更新并返回多篇文档的操作），
+        即 batch_size 次顺序往返；批次大小在几十以内时这部分开销相对处理时间可以忽略。
+        不指定排序：$or 条件下按 _id 排序用不上 (状态字段, lease.expires) 索引，每次认领
+        都要在内存中排序全部待处理文档；各文档的处理互不依赖，先后顺序无关紧要。
+        """
+        batch_size = batch_size or settings.PIPELINE_BATCH_SIZE
+        await self.reap()
+
+        token = uuid.uuid4().hex
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        collection = self._collection()
+        docs = []
+        while len(docs) < batch_size:
+            doc = await collection.find_one_and_update(
+                self._claimable(now),
+                {
+                    '$set': {
+                        self.status_field: PROCESSING,
+                        'lease.owner': self.owner,
+                        'lease.token': token,
+                        'lease.expires': expires_at,
+                    },
+                    '$inc': {'lease.attempts': 1},
+                },
+                projection=self.projection,
+                return_document=ReturnDocument.AFTER
+            )
+            if doc is None:
+                break
+            docs.append(doc)
+
+        if docs:
+            logger.info(f"{self.owner} claimed {len(docs)} documents from {self.collection_name}")
+        return Lease(token, self.owner, docs, expires_at)
+
+    async def renew(self, lease: Lease) -> int:
+        """延长租约，处理耗时较长的批次时定期调用，返回仍持有的文档数"""
+        lease.expires_at = datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+        result = await self._collection().update_many(
+            {'lease.token': lease.token},
+            {'$set': {'lease.expires': lease.expires_at}}
+        )
+        return result.matched_count
+
+    async def complete(
+        self,
+        lease: Lease,
+        doc_ids: Iterable[Any],
+        status: str,
+        fields: Optional[Dict[str, Any]] = None
+    ) -> int:
+        """写入最终状态并释放租约，返回实际更新的文档数（租约已失效的不更新）"""
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return 0
+        result = await self._collection().update_many(
+            {'_id': {'$in': doc_ids}, 'lease.token': lease.token},
+            {'$set': dict(fields or {}, **{self.status_field: status}), '$unset': {'lease': ''}}
+        )
+        if result.matched_count < len(doc_ids):
+            logger.warning(
+                f"{len(doc_ids) - result.matched_count} leases in {self.collection_name} "
+                f"expired before completion"
+            )
+        return result.matched_count
+
+    async def release(
+        self,
+        lease: Lease,
+        doc_ids: Optional[Iterable[Any]] = None,
+        count_attempt: bool = False
+    ) -> int:
+        """放弃未处理的文档，立即可以重新认领
+
+        默认（如worker退出）回到待处理池，不计入认领次数。count_attempt 为真时
+        （如临时故障处理失败）只让租约立即过期，本次认领照常计数，
+        认领次数用尽后由 reap 置为失败。
+        """
+        query: Dict[str, Any] = {'lease.token': lease.token}
+        if doc_ids is not None:
+            query['_id'] = {'$in': list(doc_ids)}
+        if count_attempt:
+            update: Dict[str, Any] = {'$set': {'lease.expires': datetime.utcnow()}}
+        else:
+            update = {
+                '$set': {self.status_field: self.ready[0], 'lease.expires': datetime.utcnow()},
+                '$inc': {'lease.attempts': -1},
+            }
+        update['$unset'] = {'lease.token': '', 'lease.owner': ''}
+        result = await self._collection().update_many(query, update)
+        return result.matched_count
+
+    async def reap(self) -> int:
+        """把认领次数用尽仍未完成的文档置为失败"""
+        result = await self._collection().update_many(
+            {
+                self.status_field: PROCESSING,
+                'lease.expires': {'$lt': datetime.utcnow()},
+                'lease.attempts': {'$gte': self.max_attempts},
+            },
+            {'$set': {self.status_field: FAILED, 'error': 'lease expired repeatedly'}}
+        )
+        if result.modified_count:
+            logger.warning(f"Marked {result.modified_count} stuck documents in {self.collection_name} as failed")
+        return result.modified_count
+
+
+def stage_queues(stage: str, **kwargs) -> List[LeaseQueue]:
+    """一个处理阶段的全部认领队列"""
+    ready = (None, 'pending') if stage == 'analyze' else ('pending',)
+    return [LeaseQueue(name, status_field, ready, **kwargs) for name, status_field in STAGES[stage]]
+
+
+__all__ = ['Lease', 'LeaseQueue', 'STAGES', 'default_owner', 'stage_queues']
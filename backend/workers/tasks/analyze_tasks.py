@@ -0,0 +1,71 @@
+"""
+智能分析任务
+路径: /mnt/okcomputer/output/backend/workers/tasks/analyze_tasks.py
+"""
+
+from celery import shared_task
+from typing import Dict, Any, Optional
+import logging
+
+from ..services.async_runtime import async_runtime
+from ..services.interpretation import interpret_pending
+from ..services.llm_client import LLMClient
+
+logger = logging.getLogger(__name__)
+
+# 单次任务最多处理的批次数，剩余文档留给下一次定时或触发的任务
+MAX_BATCHES_PER_TASK = 50
+
+_llm_client: Optional[LLMClient] = None
+
+def _get_client() -> LLMClient:
+    """进程共享的模型客户端，复用调度器的并发控制和进行中请求的合并"""
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = LLMClient()
+    return _llm_client
+
+async def _run_analyze(max_batches: int = MAX_BATCHES_PER_TASK) -> Dict[str, Any]:
+    """逐批认领并解读待分析文档，直到没有待处理文档或一批都没有完成"""
+    client = _get_client()
+    totals = {'analyzed': 0, 'failed': 0, 'deferred': 0, 'batches': 0}
+    for _ in range(max_batches):
+        counts = await interpret_pending(client)
+        for name, value in counts.items():
+            totals[name] += value
+        if not any(counts.values()):
+            break
+        totals['batches'] += 1
+        # 整批都是临时故障（如配额耗尽），稍后再试
+        if not counts['analyzed'] and not counts['failed']:
+            break
+    return totals
+
+@shared_task(bind=True, max_retries=2, default_retry_delay=600)
+def scheduled_analyze(self) -> Dict[str, Any]:
+    """定时/新文档触发的解读任务"""
+    try:
+        logger.info("Starting analyze task")
+        totals = async_runtime.run(_run_analyze())
+        result = {
+            'success': True,
+            **totals,
+            'message': (
+                f"Analyzed {totals['analyzed']} documents in {totals['batches']} batches "
+                f"({totals['failed']} failed, {totals['deferred']} deferred)"
+            )
+        }
+        logger.info(f"Analyze task completed: {result['message']}")
+        return result
+
+    except Exception as e:
+        logger.error(f"Analyze task failed: {e}")
+        if self.request.retries < self.max_retries:
+            logger.info(f"Retrying analyze task (attempt {self.request.retries + 1})")
+            raise self.retry(exc=e, countdown=self.default_retry_delay)
+        else:
+            return {
+                'success': False,
+                'error': str(e),
+                'message': 'Analyze task failed after max retries'
+            }
@@ -3,15 +3,108 @@
 路径: /mnt/okcomputer/output/backend/workers/tasks/crawl_tasks.py
 """
 
-from celery import shared_task
+from celery import shared_task, group
+from celery.signals import worker_process_shutdown, worker_ready, worker_shutdown
 from typing import Dict, Any, List, Optional
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 
+from app.config import settings
+from ..services.async_runtime import async_runtime
 from ..services.crawler import crawler_service
+from ..services.host_sharding import ShardBalancer, group_sites_by_queue, queue_for_site
+from ..services.html_archive import archive_node
+from ..services.pipeline_trigger import PipelineTrigger
+from ..services.reextraction import archive_nodes, reextract_recent
+from ..services.revisit_scheduler import RevisitScheduler
 
 logger = logging.getLogger(__name__)
 
+async def _run_crawl(site_ids: Optional[List[str]] = None, checkpoint_key: Optional[str] = None) -> Dict[str, Any]:
+    """在worker常驻事件循环中采集，复用进程共享的HTTP连接池、限速器和解析池
+
+    checkpoint_key 传入任务ID，任务被重新投递或重试时从检查点续采。
+    """
+    session = await async_runtime.get_session()
+    return await crawler_service.run_crawl_task(
+        site_ids,
+        session=session,
+        rate_limiter=async_runtime.get_rate_limiter(),
+        parse_pool=async_runtime.get_parse_pool(),
+        archive=async_runtime.get_archive(),
+        checkpoint_key=checkpoint_key
+    )
+
+@worker_process_shutdown.connect
+def _shutdown_async_runtime(**kwargs):
+    """worker进程退出时关闭共享连接"""
+    async_runtime.shutdown()
+
+_shard_balancer: Optional[ShardBalancer] = None
+
+@worker_ready.connect
+def _start_shard_balancer(sender=None, **kwargs):
+    """消费采集队列的worker启动后按一致性哈希认领主机分片"""
+    global _shard_balancer
+    if settings.CRAWL_SHARDS <= 0 or sender is None:
+        return
+    queues = {queue.name for queue in sender.task_consumer.queues}
+    if settings.CRAWL_QUEUE not in queues:
+        return
+    _shard_balancer = ShardBalancer(sender.app, sender.hostname)
+    _shard_balancer.start()
+
+@worker_shutdown.connect
+def _stop_shard_balancer(**kwargs):
+    if _shard_balancer is not None:
+        _shard_balancer.stop()
+
+def _archive_queue(node: str) -> str:
+    """节点专属队列，归档段文件在哪个节点，重新提取就投递到哪个节点"""
+    return f"{settings.CRAWL_QUEUE}.archive.{node}"
+
+@worker_ready.connect
+def _consume_archive_queue(sender=None, **kwargs):
+    """消费采集队列的worker同时消费本节点的归档队列"""
+    if not settings.CRAWL_ARCHIVE_ENABLED or sender is None:
+        return
+    queues = {queue.name for queue in sender.task_consumer.queues}
+    if settings.CRAWL_QUEUE not in queues:
+        return
+    sender.app.control.add_consumer(_archive_queue(archive_node()), destination=[sender.hostname], reply=False)
+
+_pipeline_trigger: Optional[PipelineTrigger] = None
+
+@worker_ready.connect
+def _start_pipeline_trigger(sender=None, **kwargs):
+    """新文档入库即派发清洗/分析任务，各worker竞选，只有一个节点实际运行"""
+    global _pipeline_trigger
+    if not settings.PIPELINE_TRIGGER_ENABLED or sender is None:
+        return
+    _pipeline_trigger = PipelineTrigger(sender.app, sender.hostname)
+    _pipeline_trigger.start()
+
+@worker_shutdown.connect
+def _stop_pipeline_trigger(**kwargs):
+    if _pipeline_trigger is not None:
+        _pipeline_trigger.stop()
+
+def _sites_by_id(site_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    sites = {}
+    for site_id in site_ids:
+        site = crawler_service.registry.get(site_id)
+        if site is not None:
+            sites[site_id] = site
+    return sites
+
+def _dispatch_by_shard(site_configs: List[Dict[str, Any]]) -> Dict[str, int]:
+    """按主机分片把站点分组投递，同一主机总由同一节点采集"""
+    dispatched = {}
+    for queue, sites in group_sites_by_queue(site_configs).items():
+        crawl_sites_task.apply_async(args=[[site['id'] for site in sites]], queue=queue)
+        dispatched[queue] = len(sites)
+    return dispatched
+
 @shared_task(bind=True, max_retries=3, default_retry_delay=300)
 def crawl_site_task(self, site_id: str) -> Dict[str, Any]:
     """采集指定站点的任务"""
@@ -19,7 +112,7 @@ def crawl_site_task(self, site_id: str) -> Dict[str, Any]:
         logger.info(f"Starting crawl task for site: {site_id}")
         
         # 运行采集任务
-        result = crawler_service.run_crawl_task([site_id])
+        result = async_runtime.run(_run_crawl([site_id], checkpoint_key=self.request.id))
         
         if result['success']:
             logger.info(f"Crawl task completed for site {site_id}: {result['message']}")
@@ -47,8 +140,19 @@ def scheduled_crawl(self) -> Dict[str, Any]:
     try:
         logger.info("Starting scheduled crawl task")
         
-        # 运行批量采集
-        result = crawler_service.run_crawl_task()
+        if settings.CRAWL_SHARDS > 0:
+            # 选出本轮站点后按主机分片投递给各节点
+            sites = async_runtime.run(RevisitScheduler().select_sites(crawler_service.sites_config))
+            dispatched = _dispatch_by_shard(sites)
+            result = {
+                'success': True,
+                'total_sites': len(sites),
+                'shards': dispatched,
+                'message': f'Dispatched {len(sites)} sites to {len(dispatched)} crawl shards.'
+            }
+        else:
+            # 运行批量采集
+            result = async_runtime.run(_run_crawl(checkpoint_key=self.request.id))
         
         logger.info(f"Scheduled crawl task completed: {result['message']}")
         return result
@@ -65,6 +169,99 @@ def scheduled_crawl(self) -> Dict[str, Any]:
                 'message': 'Scheduled crawl task failed after max retries'
             }
 
+@shared_task(bind=True, max_retries=3, default_retry_delay=300)
+def crawl_sites_task(self, site_ids: List[str]) -> Dict[str, Any]:
+    """在同一个采集队列中并发采集一个分片内的多个站点"""
+    try:
+        logger.info(f"Starting crawl task for {len(site_ids)} sites")
+        result = async_runtime.run(_run_crawl(site_ids, checkpoint_key=self.request.id))
+        if not result['success']:
+            raise Exception(result.get('error', 'Crawl task failed'))
+        logger.info(f"Crawl task completed: {result['message']}")
+        return result
+        
+    except Exception as e:
+        logger.error(f"Crawl task exception for sites {site_ids}: {e}")
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e, countdown=self.default_retry_delay)
+        return {
+            'success': False,
+            'error': str(e),
+            'message': f'Crawl task failed after {self.max_retries} retries',
+            'site_ids': site_ids
+        }
+
+@shared_task(bind=True, max_retries=1, default_retry_delay=600)
+def reextract_archive_task(self, days: int = 30, site_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """用当前站点配置重新提取归档中的页面，不发起网络请求
+
+    段文件保存在各采集节点的本地磁盘上，这里只找出持有归档的节点，
+    给每个节点的归档队列投递一个 reextract_node_task，由该节点读取本地段文件。
+    """
+    try:
+        logger.info(f"Starting re-extraction of pages crawled in the last {days} days")
+        since = datetime.utcnow() - timedelta(days=days)
+        nodes = async_runtime.run(archive_nodes(since, site_ids))
+        for node in nodes:
+            reextract_node_task.apply_async(args=[node, days, site_ids], queue=_archive_queue(node))
+        return {
+            'success': True,
+            'nodes': nodes,
+            'message': f"Dispatched re-extraction to {len(nodes)} archive nodes."
+        }
+        
+    except Exception as e:
+        logger.error(f"Re-extraction task failed: {e}")
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e, countdown=self.default_retry_delay)
+        return {
+            'success': False,
+            'error': str(e),
+            'message': 'Re-extraction task failed'
+        }
+
+@shared_task(bind=True, max_retries=1, default_retry_delay=600)
+def reextract_node_task(self, node: str, days: int = 30, site_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """重新提取本节点归档中的页面，段文件缺失时报告失败"""
+    if node != archive_node():
+        # 节点改名或队列配置错误，读不到该节点的段文件
+        logger.error(f"Re-extraction for archive node {node} received by {archive_node()}")
+        return {
+            'success': False,
+            'error': f"Archive node {node} is not this node ({archive_node()})",
+            'message': 'Re-extraction task routed to the wrong node'
+        }
+
+    try:
+        counts = async_runtime.run(reextract_recent(crawler_service.sites_config, days, site_ids, node=node))
+    except Exception as e:
+        logger.error(f"Re-extraction on node {node} failed: {e}")
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e, countdown=self.default_retry_delay)
+        return {
+            'success': False,
+            'node': node,
+            'error': str(e),
+            'message': 'Re-extraction task failed'
+        }
+
+    if counts['missing']:
+        # 段文件被删除或节点磁盘已更换，重试也无法恢复
+        logger.error(f"Re-extraction on node {node}: {counts['missing']} pages in missing archive segments")
+        return {
+            'success': False,
+            'node': node,
+            **counts,
+            'error': f"{counts['missing']} archived pages are in segments missing on {node}",
+            'message': f"Re-extracted {counts['extracted']} pages, {counts['missing']} missing."
+        }
+    return {
+        'success': True,
+        'node': node,
+        **counts,
+        'message': f"Re-extracted {counts['extracted']} pages, {counts['updated']} changed."
+    }
+
 @shared_task(bind=True, max_retries=3, default_retry_delay=180)
 def test_crawl(self) -> Dict[str, Any]:
     """测试采集任务"""
@@ -146,9 +343,13 @@ def batch_crawl_sites(site_ids: List[str]) -> Dict[str, Any]:
     try:
         logger.info(f"Starting batch crawl for sites: {site_ids}")
         
-        # 创建任务组
+        # 创建任务组，每个站点投递到其主机所属的分片队列
+        sites = _sites_by_id(site_ids)
         job = group([
-            crawl_site_task.s(site_id) for site_id in site_ids
+            crawl_site_task.s(site_id).set(
+                queue=queue_for_site(sites[site_id]) if site_id in sites else settings.CRAWL_QUEUE
+            )
+            for site_id in site_ids
         ])
         
         # 异步执行